@@ -34,9 +34,27 @@ _beamlineSpecificationCSVfile : Kept for backward compatibility, optional.
                                 beam line.
 
    _Location[] :   str : Name of location where parameters are recorded
+   _iLoc       :  list : Element index of each location in the sums
+                         (CovSums, CovMtrx, etc.); from the start location
+                         on, restricted to the recorded locations if the
+                         data file holds selected locations only
+   _RcrdLoc    :  list : Element index of each trace-space record of the
+                         particles read; found from the location names,
+                         so that files written with
+                         BeamLine.setRecordLocations are summed correctly
    _s[]        : float : s coordinate at which parameters are recorded
    _nParticles :  list : Number of particles arriving at location
-   _CovMtrx    :  list : Covariance matrix by location
+   _Means      :  list : Mean trace space by location
+   _CovSums    :  list : Sum over particles of (x - mean)(x - mean)^T by
+                         location, accumulated with the pairwise
+                         (Chan/Welford) update of mergeSums
+   _SumBuffer  :  list : Trace-space records of particles not yet added to
+                         the sums; flushed every SumBufferSize particles
+   _Reservoir  :  list : CompactParticles kept for plotting after a streaming
+                         (or columnar) evaluation; a uniform random sample
+                         of at most ReservoirSize events.  Not registered
+                         in Particle.instances.
+   _CovMtrx    :  list : Covariance matrix (about the mean) by location
    _sigmaxy    :  list : RMS x and y by location.  [0] sigmax, [1] sigmay
    _emittance  :  list : emittance by location; calculated from CovMtrx
                          [0] e_x, [1] e_y, [2] e_L, [3] e_{xy}, [4] e_{6D}
@@ -88,8 +106,8 @@ _beamlineSpecificationCSVfile : Kept for backward compatibility, optional.
   Get methods:
       getDebug, getbeamlineSpecificationCSVfile,getInputDataFile, 
       getoutputCSVfile, getBeamInstances(cls), getLocation, 
-      getnEvtMax, getCovSums, getnParticles, getCovarianceMatrix,
-      getsigmaxy, getemittance, getTwiss
+      getnEvtMax, getCovSums, getnParticles, getMeans, getCovarianceMatrix,
+      getsigmaxy, getemittance, getTwiss, getiLoc, getRcrdLoc
           -- thought to be self documenting!
 
   Processing methods:
@@ -102,6 +120,40 @@ _beamlineSpecificationCSVfile : Kept for backward compatibility, optional.
      incrementSums: increment sums used to calculate covariance matrix
          Input: Instance of particle class
 
+         mergeSums: add a stack of trace-space vectors at one location to
+                    the count, mean and centred sums of that location
+         Input: iAddr, np.ndarray (n,6)
+
+         flushSums: add the buffered particles to the sums, location by
+                    location, with mergeRecords
+
+      mergeRecords: add the records of a set of particles to the sums;
+                    records are stacked by location and added with
+                    mergeSums
+         Input: nRcrd np.ndarray (nPrtcl,) records per particle,
+                TrcSpc np.ndarray (sum nRcrd, 6)
+
+ incrementSumsBlock: increment sums with a block of events as read by
+                    BeamIO.readBeamDataBlock
+         Input: Location [list of lists of names], nRcrd, TrcSpc as
+                mergeRecords
+
+        setRcrdLoc: extend _RcrdLoc for a list of record location names
+                    longer than any seen so far.  Records are in beam-line
+                    order, so each name is looked up after the element of
+                    the previous record.
+         Input: list of location names
+
+      compressSums: drop the locations, upstream of the last one recorded,
+                    that are not recorded in the data file (no-op for
+                    files holding every location)
+
+  setSumBufferSize, getSumBufferSize: number of particles buffered by
+                    incrementSums before the sums are updated
+
+  setReservoirSize, getReservoirSize: number of particles kept for plotting
+                    by streaming and columnar evaluation (default 1000)
+
 printProgression : prints evolution of beam parameters by location.
 
     createReport : creates csv file with evolutio of beam paramters by
@@ -113,15 +165,46 @@ printProgression : prints evolution of beam parameters by location.
                 input : iPrtcl : instance of particle class by which sums are
                                  to be updated
 
- calcCovarianceMatrix : Calculate covariance matrix given sums
+incrementSumsBunch : Increment sums from the columns of one bunch of a
+                     columnar (version 3) data file.
+                input : Index, TrcSpc : lists, by location, of event numbers
+                                        and (6, nSurv) trace space
+                        nUse : events with number < nUse are summed
+
+ evaluateBeamColumnar : Sum over all bunches of a columnar data file, then
+                        keep a random sample of ReservoirSize events as
+                        CompactParticles (for plotting).
+                input : nEvtMax : maximum number of events (None: all)
+               return : number of events summed
+
+ calcCovarianceMatrix : Calculate covariance matrix, about the mean, given
+                        sums
 
    evaluateBeam : Read data file and increment sums.  Then, calculate
                   covariance matrix, RMS x and y, emittance, and Twiss
-                  paramters
+                  paramters.  Columnar data files are summed bunch by
+                  bunch with evaluateBeamColumnar unless TrackBeam.
+                input : TrackBeam [bool], Streaming [bool]: if True read
+                        the file with readBeamStreaming.
+
+readBeamStreaming : Read the data file in chunks of SumBufferSize events,
+                    update the sums and release each chunk, keeping only
+                    a reservoir sample (algorithm R) of ReservoirSize
+                    particles as CompactParticles.  Memory use is then
+                    independent of the number of events in the file.
+                    Version 1 and 2 files are read in blocks with
+                    BeamIO.readBeamDataBlock and summed block by block;
+                    columnar files are summed bunch by bunch with
+                    evaluateBeamColumnar.  With TrackBeam, or a BDSIM
+                    file, particles are read one at a time.
+                input : TrackBeam [bool]
+               return : number of events read
 
 plotBeamProgression : create standard plots
                       (in 99-Scratch/BeamProgressionPlot.pdf!) of beam
-                      parameters.
+                      parameters.  The particles of the reservoir, if
+                      any, are plotted as Particle instances made with
+                      CompactParticle.toParticle and released after.
 
 
   I/o methods:
@@ -138,14 +221,14 @@ Created on Mon 28Feb24: Version history:
 @author: kennethlong
 """
 
-from matplotlib.backends.backend_pdf import PdfPages
-import matplotlib.ticker as ticker
-import matplotlib.pyplot as plt
 from   copy   import deepcopy
 import math   as     mth
+import random as     rnd
 import numpy  as     np
 import os
 
+#.. matplotlib is imported by plotBeamProgression, on first use.
+
 import visualise         as vis
 import Particle          as Prtcl
 import BeamLine          as BL
@@ -158,6 +241,9 @@ class Beam:
     instances  = []
     __Debug    = False
 
+    _SumBufferSize = 10000
+    _ReservoirSize = 1000
+
 
 #--------  "Built-in methods":
     def __init__(self, _InputDataFile=None, _nEvtMax=None, \
@@ -277,10 +363,9 @@ class Beam:
 
         print("         ----> start location, locations:",
               self.getstartlocation(), len(self.getLocation()))
-        for iLoc in range(self.getstartlocation(), len(self.getLocation())+1):
-            iAddr = iLoc - 1
+        for iAddr, iLoc in enumerate(self.getiLoc()):
             print("         ----> iLoc, iAddr:", iLoc, iAddr)
-            print("         ----> iLoc:", iLoc, self.getLocation()[iAddr])
+            print("         ----> iLoc:", iLoc, self.getLocation()[iLoc-1])
             if len(self.getnParticles()) > iAddr:
                 print("             ----> Number of particles:", \
                       " nParticles:", int(self.getnParticles()[iAddr]))
@@ -313,6 +398,20 @@ class Beam:
             print(" Beam.setDebug: ", Debug)
         cls.__Debug = Debug
 
+    @classmethod
+    def setSumBufferSize(cls, SumBufferSize=10000):
+        if not isinstance(SumBufferSize, int) or SumBufferSize < 1:
+            raise badParameter(" Beam.setSumBufferSize: bad size:", \
+                               SumBufferSize)
+        cls._SumBufferSize = SumBufferSize
+
+    @classmethod
+    def setReservoirSize(cls, ReservoirSize=1000):
+        if not isinstance(ReservoirSize, int) or ReservoirSize < 0:
+            raise badParameter(" Beam.setReservoirSize: bad size:", \
+                               ReservoirSize)
+        cls._ReservoirSize = ReservoirSize
+
     @classmethod
     def resetBeamInstances(cls):
         if len(cls.instances) > 0:
@@ -328,8 +427,13 @@ class Beam:
         self._BeamLineInstance                 = None
 
         self._Location   = []
+        self._iLoc       = []
+        self._RcrdLoc    = []
         self._CovSums    = []
         self._nParticles = []
+        self._Means      = []
+        self._SumBuffer  = []
+        self._Reservoir  = []
         self._CovMtrx    = []
         self._sigmaxy    = []
         self._emittance  = []
@@ -564,6 +668,15 @@ class Beam:
 
     def getLocation(self):
         return self._Location
+
+    def getiLoc(self):
+        if len(self._iLoc) == 0:
+            return list(range(self.getstartlocation(), \
+                              len(BLE.BeamLineElement.getinstances())))
+        return self._iLoc
+
+    def getRcrdLoc(self):
+        return self._RcrdLoc
     
     def getnEvtMax(self):
         return self._nEvtMax
@@ -577,6 +690,20 @@ class Beam:
 
     def getCovSums(self):
         return self._CovSums
+
+    def getMeans(self):
+        return self._Means
+
+    @classmethod
+    def getSumBufferSize(cls):
+        return cls._SumBufferSize
+
+    @classmethod
+    def getReservoirSize(cls):
+        return cls._ReservoirSize
+
+    def getReservoir(self):
+        return self._Reservoir
     
     def getCovMtrx(self):
         return self._CovMtrx
@@ -614,8 +741,10 @@ class Beam:
                 print("     ----> iLoc, BLE name, type:", \
                       iLoc, iBLE.getName(), type(iBLE))
 
+            self._iLoc.append(iLoc)
             self._CovSums.append(deepcopy(CovSums))
             self._nParticles.append(0.)
+            self._Means.append(np.zeros(6))
                 
         if self.getDebug():
             print(" Beam.initialiseSums: n, CovSums:")
@@ -639,52 +768,182 @@ class Beam:
                     print("         ----> iAddr, trace space:", \
                           iAddr, \
                           iPrtcl.getTraceSpace()[iAddr])
-            
-        for iPhsSpcRcrd in range(startlocation-1, \
-                                 len(iPrtcl.getTraceSpace())):
-            iLoc  = iPhsSpcRcrd + 1
-            iAddr = iLoc - startlocation
-            if self.getDebug():
-                with np.printoptions(linewidth=500,precision=10,\
-                                     suppress=True):
-                    print("         ----> Phs, iLoc, iAddr:", \
-                      iPhsSpcRcrd, iLoc, iAddr, \
-                      iPrtcl.getTraceSpace()[iPhsSpcRcrd])
-                    print("         ----> Location:", iLoc)
-                    print("                CovSums_(i): \n", \
-                          self.getCovSums()[iAddr])
-                    print("         ----> iAddr, startlocation, ", \
-                          "len(getnPartcles):", iAddr, startlocation, \
-                          len(self.getnParticles()))
-                    
-            self._nParticles[iAddr] += 1
-
-            for i in range(6):
-                for j in range(i,6):
-                    self._CovSums[iAddr][i,j]     = \
-                        self._CovSums[iAddr][i,j] + \
-                        iPrtcl.getTraceSpace()[iPhsSpcRcrd][i] * \
-                        iPrtcl.getTraceSpace()[iPhsSpcRcrd][j]
-                    if i != j:
-                        self._CovSums[iAddr][j,i] = \
-                            deepcopy(self._CovSums[iAddr][i,j])
 
-            if self.getDebug():
-                print("         ----> Location:", iLoc)
-                with np.printoptions(linewidth=500,precision=7,\
-                                     suppress=True):
-                    print("                CovSums_(i+1): \n", \
-                          self.getCovSums()[iAddr]) 
+        #.. Records from start location on; address from _RcrdLoc:
+        self.setRcrdLoc(iPrtcl.getLocation())
+        nRcrd = len(iPrtcl.getTraceSpace())
+        if nRcrd > 0 and self._RcrdLoc[nRcrd-1] >= startlocation:
+            self._SumBuffer.append(np.array(iPrtcl.getTraceSpace()))
+        if len(self._SumBuffer) >= self.getSumBufferSize():
+            self.flushSums()
                                 
         if self.getDebug():
             print(" <---- Beam.incrementSums: Done")
 
+    def flushSums(self):
+        if len(self._SumBuffer) == 0:
+            return
+
+        nRcrd = np.array([len(TrcSpc) for TrcSpc in self._SumBuffer])
+        TrcSpc = np.concatenate(self._SumBuffer)
+        self._SumBuffer = []
+        self.mergeRecords(nRcrd, TrcSpc)
+
+    def mergeRecords(self, nRcrd, TrcSpc):
+        if len(TrcSpc) == 0:
+            return
+
+        #.. Address of each record, then stack records by address:
+        iRcrd  = np.arange(len(TrcSpc)) - np.repeat(np.cumsum(nRcrd)-nRcrd, \
+                                                    nRcrd)
+        Addr   = self.getLocAddr()[np.asarray(self._RcrdLoc)[iRcrd]]
+        Use    = Addr >= 0
+        TrcSpc = TrcSpc[Use]
+        Addr   = Addr[Use]
+        if len(Addr) == 0:
+            return
+        Order = np.argsort(Addr, kind="stable")
+        nAddr = np.bincount(Addr)
+        Stack = np.split(TrcSpc[Order], np.cumsum(nAddr)[:-1])
+        for iAddr in range(len(Stack)):
+            self.mergeSums(iAddr, Stack[iAddr])
+
+    def getLocAddr(self):
+        LocAddr = -np.ones(len(BLE.BeamLineElement.getinstances()), \
+                           dtype=int)
+        LocAddr[self.getiLoc()] = np.arange(len(self.getiLoc()))
+        return LocAddr
+
+    def setRcrdLoc(self, Location):
+        if len(Location) <= len(self._RcrdLoc):
+            return
+
+        Names = [iBLE.getName() for iBLE in \
+                 BLE.BeamLineElement.getinstances()]
+        for iRcrd in range(len(self._RcrdLoc), len(Location)):
+            #.. Source first, then (selected) elements in order; a name
+            #   not in the beam line is taken to be the next element:
+            iLoc = 1
+            if iRcrd > 0:
+                iLoc = self._RcrdLoc[-1] + 1
+                if Location[iRcrd] in Names[iLoc:]:
+                    iLoc = Names.index(Location[iRcrd], iLoc)
+            self._RcrdLoc.append(iLoc)
+
+    def compressSums(self):
+        Rcrdd = set(self._RcrdLoc)
+        if len(Rcrdd) == 0:
+            return
+        iLocMax = max(Rcrdd)
+        Keep    = [iAddr for iAddr in range(len(self._CovSums)) \
+                   if self._iLoc[iAddr] in Rcrdd or \
+                      self._iLoc[iAddr] > iLocMax]
+        if len(Keep) == len(self._CovSums):
+            return
+
+        if self.getDebug():
+            print(" Beam.compressSums: locations kept:", \
+                  [self._iLoc[iAddr] for iAddr in Keep])
+
+        self._iLoc       = [self._iLoc[iAddr]       for iAddr in Keep]
+        self._CovSums    = [self._CovSums[iAddr]    for iAddr in Keep]
+        self._nParticles = [self._nParticles[iAddr] for iAddr in Keep]
+        self._Means      = [self._Means[iAddr]      for iAddr in Keep]
+
+    def mergeSums(self, iAddr, TrcSpc):
+        nB = np.shape(TrcSpc)[0]
+        if nB == 0:
+            return
+
+        MeanB = np.mean(TrcSpc, axis=0)
+        DltB  = TrcSpc - MeanB
+        
+        nA    = self._nParticles[iAddr]
+        n     = nA + nB
+        Dlt   = MeanB - self._Means[iAddr]
+
+        self._Means[iAddr]      += Dlt * nB / n
+        self._CovSums[iAddr]    += DltB.T @ DltB + \
+                                   np.outer(Dlt, Dlt) * nA * nB / n
+        self._nParticles[iAddr]  = n
+
+    def incrementSumsBlock(self, Location, nRcrd, TrcSpc):
+        for Names in Location:
+            self.setRcrdLoc(Names)
+
+        #.. Events whose last record is at or after the start location:
+        Use = nRcrd > 0
+        Use[Use] = np.asarray(self._RcrdLoc)[nRcrd[Use]-1] >= \
+            self.getstartlocation()
+        self.mergeRecords(nRcrd[Use], TrcSpc[np.repeat(Use, nRcrd)])
+
+    def incrementSumsBunch(self, Index, TrcSpc, nUse):
+        LocAddr = self.getLocAddr()
+            
+        for iPhsSpcRcrd in range(len(TrcSpc)):
+            iLoc  = self._RcrdLoc[iPhsSpcRcrd]
+            iAddr = LocAddr[iLoc]
+            if iAddr < 0:
+                continue
+
+            Cols = TrcSpc[iPhsSpcRcrd]
+            if len(Index[iPhsSpcRcrd]) > 0 and Index[iPhsSpcRcrd][-1] >= nUse:
+                Cols = Cols[:, np.asarray(Index[iPhsSpcRcrd]) < nUse]
+            self.mergeSums(iAddr, np.asarray(Cols, dtype=float).T)
+
+    def evaluateBeamColumnar(self, nEvtMax=None):
+        if self.getDebug():
+            print(" Beam.evaluateBeamColumnar start:")
+
+        ibmIOr = self.getBeamIOread()
+        if not ibmIOr.getReadFirstRecord():
+            ibmIOr.readBeamDataRecord()
+
+        self.setRcrdLoc(ibmIOr.getLocation())
+
+        iEvt   = 0
+        nBunch = 0
+        for Bunch in ibmIOr.getBunches():
+            NEvt, Index, TrcSpc = Bunch
+            nUse = NEvt
+            if nEvtMax != None:
+                nUse = min(NEvt, nEvtMax - iEvt)
+            if nUse <= 0:
+                break
+            self.incrementSumsBunch(Index, TrcSpc, nUse)
+            iEvt   += nUse
+            nBunch += 1
+
+        #.. Keep a random sample of particles for plotting:
+        Keep  = sorted(rnd.sample(range(iEvt), \
+                                  min(iEvt, self.getReservoirSize())))
+        iFrst = 0
+        iKeep = 0
+        self._Reservoir = []
+        for iBunch in range(nBunch):
+            NEvt = ibmIOr.getBunches()[iBunch][0]
+            while iKeep < len(Keep) and Keep[iKeep] < iFrst + NEvt:
+                iPrtcl = ibmIOr.makeParticle(iBunch, Keep[iKeep] - iFrst, \
+                                             True)
+                if iPrtcl != None:
+                    self._Reservoir.append(iPrtcl)
+                iKeep += 1
+            iFrst += NEvt
+
+        if self.getDebug():
+            print(" <---- Beam.evaluateBeamColumnar:", iEvt, "events")
+
+        return iEvt
+
     def calcCovarianceMatrix(self):
         if self.getDebug():
             print(" Beam.calcCovarianceMatrix start:")
             print("     ----> Number of locations:", \
                   len(self.getCovSums()))
 
+        self.flushSums()
+        self.compressSums()
+
         for iAddr in range(len(self.getCovSums())):
             if self.getDebug():
                 print("         ----> Location:", iAddr)
@@ -710,11 +969,101 @@ class Beam:
                     print("                CovMtrx: \n", \
                           self.getCovarianceMatrix()[iAddr]) 
 
-    def evaluateBeam(self, TrackBeam=False):
+    def readBeamStreaming(self, TrackBeam=False):
+        if self.getDebug():
+            print(" Beam.readBeamStreaming start:")
+
+        ibmIOr = self.getBeamIOread()
+        if not ibmIOr.getReadFirstRecord():
+            ibmIOr.readBeamDataRecord()
+
+        #.. Columnar file read bunch by bunch; binary files read in blocks
+        #   unless the particles are to be tracked:
+        if ibmIOr.getdataFILEversion() == 3 and not TrackBeam:
+            return self.evaluateBeamColumnar(self.getnEvtMax())
+        Block = not TrackBeam and not ibmIOr.getBDSIMfile() and \
+            ibmIOr.getdataFILEversion() != 3
+
+        nEvtMax   = self.getnEvtMax()
+        nRsrvr    = self.getReservoirSize()
+        iEvt      = 0
+        EndOfFile = False
+        self._Reservoir = []
+        while Block and not EndOfFile:
+            nRead = self.getSumBufferSize()
+            if nEvtMax != None:
+                nRead = min(nRead, nEvtMax - iEvt)
+            if nRead <= 0:
+                break
+            Location, nRcrd, Rcrd, EndOfFile = \
+                ibmIOr.readBeamDataBlock(nRead)
+
+            #.. Sums, then reservoir sample of the events of the block:
+            self.incrementSumsBlock(Location, nRcrd, Rcrd[:,2:])
+            iFrst = np.cumsum(nRcrd) - nRcrd
+            for iBlk in range(len(nRcrd)):
+                jEvt = iEvt
+                if len(self._Reservoir) >= nRsrvr:
+                    jEvt = int(rnd.random() * (iEvt + 1))
+                if jEvt < nRsrvr:
+                    iCmpct = Prtcl.CompactParticle.fromRecords( \
+                        Location[iBlk], \
+                        Rcrd[iFrst[iBlk]:iFrst[iBlk]+nRcrd[iBlk]], False)
+                    if jEvt < len(self._Reservoir):
+                        self._Reservoir[jEvt] = iCmpct
+                    else:
+                        self._Reservoir.append(iCmpct)
+                iEvt += 1
+
+            if self.getDebug():
+                print("     ----> Events read:", iEvt)
+
+        while not Block and not EndOfFile:
+            #.. Read chunk:
+            Chunk = []
+            while len(Chunk) < self.getSumBufferSize():
+                if nEvtMax != None and iEvt + len(Chunk) >= nEvtMax:
+                    EndOfFile = True
+                    break
+                EndOfFile = ibmIOr.readBeamDataRecord()
+                if EndOfFile:
+                    break
+                Chunk.append(Prtcl.Particle.getinstances()[-1])
+
+            #.. Sums and reservoir sample:
+            for iPrtcl in Chunk:
+                if TrackBeam:
+                    nEvtGen = BL.BeamLine.getinstances().trackBeam( \
+                            1, None, iPrtcl, self.getstartlocation(), False)
+                self.incrementSums(iPrtcl)
+                
+                if len(self._Reservoir) < nRsrvr:
+                    self._Reservoir.append( \
+                        Prtcl.CompactParticle.fromParticle(iPrtcl, False))
+                else:
+                    jEvt = int(rnd.random() * (iEvt + 1))
+                    if jEvt < nRsrvr:
+                        self._Reservoir[jEvt] = \
+                            Prtcl.CompactParticle.fromParticle(iPrtcl, False)
+                iEvt += 1
+
+            #.. Release chunk; the reservoir is held by the Beam only:
+            Prtcl.Particle.cleanParticles()
+
+            if self.getDebug():
+                print("     ----> Events read:", iEvt)
+
+        if self.getDebug():
+            print(" <---- Beam.readBeamStreaming:", iEvt, "events")
+
+        return iEvt
+
+    def evaluateBeam(self, TrackBeam=False, Streaming=False):
         if self.getDebug():
             print(" Beam.evaluateBeam: ", \
                   "perform` sums to get covariance matrices")
             print("     ----> TrackBeam:", TrackBeam)
+            print("     ----> Streaming:", Streaming)
         
         EndOfFile = False
         iEvt = 0
@@ -729,6 +1078,12 @@ class Beam:
         if nEvtMax == None:
             nEvtMax = 1000
         iEvtStopClean = max(0, nEvtMax-1000)
+        if self.getBeamIOread().getdataFILEversion() == 3 and not TrackBeam:
+            iEvt      = self.evaluateBeamColumnar(self.getnEvtMax())
+            EndOfFile = True
+        elif Streaming:
+            iEvt      = self.readBeamStreaming(TrackBeam)
+            EndOfFile = True
         while not EndOfFile:
             EndOfFile = self.getBeamIOread().readBeamDataRecord()
             if not EndOfFile:
@@ -816,9 +1171,9 @@ class Beam:
                   len(self.getLocation()))
             print("     ----> Start location:", iLocMin)
         
-        for iLoc in range(iLocMin, \
-                          len(BLE.BeamLineElement.getinstances())-1):
-            iAddr = iLoc - iLocMin
+        for iAddr, iLoc in enumerate(self.getiLoc()):
+            if iLoc >= len(BLE.BeamLineElement.getinstances())-1:
+                break
             if self.getDebug():
                 print("         ----> iLoc, Name, iAddr:", \
                       iLoc, self.getLocation()[iLoc-1], iAddr)
@@ -878,6 +1233,9 @@ class Beam:
 
     def plotBeamProgression(self, \
                             plotFILE='99-Scratch/BeamProgressionPlot.pdf'):
+        import matplotlib.pyplot as plt
+        from matplotlib.backends.backend_pdf import PdfPages
+
         pathNAME = os.path.split(plotFILE)
         if not os.path.exists(pathNAME[0]):
             raise noPath4plotFILE( \
@@ -919,9 +1277,7 @@ class Beam:
             print("     ----> Number of locations:", \
                   len(self.getLocation()))
         
-        for iLoc in range(iLocMin, \
-                          len(BLE.BeamLineElement.getinstances())):
-            iAddr = iLoc - iLocMin
+        for iAddr, iLoc in enumerate(self.getiLoc()):
             if self.getDebug():
                 print("         ----> start location, locations:",
                       self.getstartlocation(), len(self.getLocation()))
@@ -950,6 +1306,11 @@ class Beam:
                           iLoc, self.getLocation()[iAddr], \
                           s[iAddr], sx[iAddr], sy[iAddr])
 
+        #.. Particles of the reservoir plotted as Particle instances:
+        nInst = len(Prtcl.Particle.getinstances())
+        for iCmpct in self.getReservoir():
+            iCmpct.toParticle()
+
         with PdfPages(plotFILE) as pdf:
             fig, axs = plt.subplots(nrows=5, ncols=1, \
                                     layout="constrained")
@@ -1089,6 +1450,8 @@ class Beam:
 
             pdf.savefig()
             plt.close()
+
+        del Prtcl.Particle.getinstances()[nInst:]
             
         if self.getDebug():
             print(" <----  Beam.plotBeamProgression done.")
@@ -1252,8 +1615,10 @@ class extrapolateBeam(Beam):
             print("     ----> iLoc, BLE name, type:", \
                   iLoc, iBLE.getName(), type(iBLE))
 
+        self._iLoc.append(iLoc)
         self._CovSums.append(deepcopy(CovSums))
         self._nParticles.append(0.)
+        self._Means.append(np.zeros(6))
                 
         if self.getDebug():
             print("     ----> n, CovSums:")
@@ -1281,41 +1646,29 @@ class extrapolateBeam(Beam):
                           startlocation, \
                           iPrtcl.getTraceSpace()[startlocation-1])
 
-        if len(iPrtcl.getTraceSpace()) >= startlocation:
-            
-            iAddr = 0
-            if self.getDebug():
-                print("     ----> Start location:", startlocation, \
-                BLE.BeamLineElement.getinstances()[startlocation].getName())
-            
-            self._nParticles[iAddr] += 1
-
-            if self.getDebug():
-                print("         ----> Location:", startlocation)
-                with np.printoptions(linewidth=500,precision=10,\
-                                     suppress=True):
-                    print("                CovSums_(i): \n", \
-                          self.getCovSums()[iAddr])
-
-            for i in range(6):
-                for j in range(i,6):
-                    self._CovSums[iAddr][i,j]     = \
-                        self._CovSums[iAddr][i,j] + \
-                        iPrtcl.getTraceSpace()[startlocation-1][i] * \
-                        iPrtcl.getTraceSpace()[startlocation-1][j]
-                    if i != j:
-                        self._CovSums[iAddr][j,i] = \
-                            deepcopy(self._CovSums[iAddr][i,j])
-            if self.getDebug():
-                print("         ----> Location:", startlocation)
-                with np.printoptions(linewidth=500,precision=7,\
-                                     suppress=True):
-                    print("                CovSums_(i+1): \n", \
-                          self.getCovSums()[iAddr]) 
+        #.. Only the record at the start location has an address:
+        self.setRcrdLoc(iPrtcl.getLocation())
+        nRcrd = len(iPrtcl.getTraceSpace())
+        if nRcrd > 0 and self._RcrdLoc[nRcrd-1] >= startlocation:
+            self._SumBuffer.append(np.array(iPrtcl.getTraceSpace()))
+        if len(self._SumBuffer) >= self.getSumBufferSize():
+            self.flushSums()
 
         if self.getDebug():
             print(" <---- extrapolateBeam.incrementSums: Done")
 
+    def incrementSumsBunch(self, Index, TrcSpc, nUse):
+        if self.getstartlocation() not in self._RcrdLoc:
+            return
+        iPhsSpcRcrd = self._RcrdLoc.index(self.getstartlocation())
+        if iPhsSpcRcrd >= len(TrcSpc):
+            return
+
+        Cols = TrcSpc[iPhsSpcRcrd]
+        if len(Index[iPhsSpcRcrd]) > 0 and Index[iPhsSpcRcrd][-1] >= nUse:
+            Cols = Cols[:, np.asarray(Index[iPhsSpcRcrd]) < nUse]
+        self.mergeSums(0, np.asarray(Cols, dtype=float).T)
+
     def extrapolateCovarianceMatrix(self):
         if self.getDebug():
             print(" extrapolateBeam.extrapolateCovarianceMatrix start:")
@@ -1385,7 +1738,7 @@ class extrapolateBeam(Beam):
                     print("         ----> jLoc, CovMtrx: \n", \
                           self.getCovMtrx()[jAddr])
 
-    def extrapolateBeam(self):
+    def extrapolateBeam(self, Streaming=False):
         if self.getDebug():
             print(" extrapolateBeam.extrapolateBeam: transport beam envelope")
             print(" BeamLine: nBLs:", id(BL.BeamLine.getinstances()))
@@ -1414,6 +1767,12 @@ class extrapolateBeam(Beam):
                 nEvtMax = 1000
             iEvtStopClean = max(0, nEvtMax-1000)
             Cleaned       = None
+            if self.getBeamIOread().getdataFILEversion() == 3:
+                iEvt      = self.evaluateBeamColumnar(self.getnEvtMax())
+                EndOfFile = True
+            elif Streaming:
+                iEvt      = self.readBeamStreaming()
+                EndOfFile = True
             while not EndOfFile:
                 try:
                     EndOfFile = Prtcl.Particle.readParticle(ParticleFILE)
@@ -1484,6 +1843,578 @@ class extrapolateBeam(Beam):
         return DoneOK
 
     
+"""
+Derived class Envelope:
+=======================
+
+  Moment-based transport of the beam envelope; no events are generated or
+  read.  The mean and covariance matrix of the trace space at the source
+  are either given or obtained from the Source parameters (analytically
+  for the Gaussian and flat sources, modes 1 and 2; from a fixed-seed
+  sample otherwise).  They are then transported element by element with
+  the affine map X -> M X + m of the element (m is non-zero for an
+  off-crest RF cavity, getAffineMap), and sigma_xy, emittance and Twiss
+  parameters are evaluated as for Beam.
+
+  For elements whose transfer matrix depends on delta (quadrupoles,
+  solenoid, sector dipole, Gabor lens, quadrupole doublet and triplet)
+  the matrix is either evaluated at the mean delta (nDelta = 1) or the
+  source distribution is split into nDelta slices at the Gauss-Hermite
+  nodes, delta_k, of the delta distribution.  Each slice k carries its
+  conditional mean and second moments and is transported with M(delta_k):
+     <X>_k' = M_k <X>_k,   <XX^T>_k' = M_k <XX^T>_k M_k^T ,
+  and the beam moments are the weighted sums over slices.  Chromatic
+  correlations built up along the beam line are therefore kept.
+
+  RESTRICTION -- losses: by default (_Truncate False) apertures are
+  treated as drifts and no particle is lost, so downstream of a
+  collimating aperture sigma_xy, emittance and Twiss parameters describe
+  the whole source beam, not the transmitted beam, and may be several
+  times larger than those of the tracked beam.  With _Truncate True each
+  slice is truncated at each Aperture as a Gaussian (an elliptical or
+  circular aperture is replaced by the rectangle of equal area) and its
+  weight reduced by the fraction transmitted; the losses on the beam pipe
+  and by the acceptance tests of the elements are still ignored, and the
+  beam is taken to be Gaussian after each cut.  On the LhARA Gauss-Gabor
+  beam line this brings sigma_xy at the end to within ~15% of the
+  tracked beam, but the transmission is overestimated (0.36 against
+  0.20).  Where the beam is cut the envelope (getsigmaxy, getEmittance,
+  getTwiss, getnParticles) is therefore an approximation to, not a
+  replacement for, tracking.  RPLCswitch elements with a 3D rotation act
+  in phase space and are not supported.
+
+  The cumulative affine map of each slice from the source to each
+  location is stored so that, without truncation, any other source
+  covariance, with the same delta distribution, can be transported with
+  one matrix product per location (repropagate).
+
+
+  Class attributes:
+  -----------------
+    instances : List of instances of Envelope class
+  __Debug     : Debug flag
+
+
+  Instance attributes:
+  --------------------
+   As Beam, plus:
+   _nDelta      : int : Number of delta quadrature nodes (1: mean delta)
+   _TransferMap : list: Cumulative transfer map, source to location, by
+                        location; np.ndarray (nDelta,6,6), one per slice
+   _TransferOffset : list: Offset of the cumulative affine map, by
+                        location; np.ndarray (nDelta,6), one per slice
+   _Truncate    : bool: Gaussian truncation of the slices at apertures
+   _Deltas      : np.ndarray (nDelta,) : delta at source of each slice
+   _Weights     : np.ndarray (nDelta,) : weight of each slice
+   _nParticles  : list: Nominal number of particles by location
+                        (default 100000 at the source; reduced by the
+                        fraction transmitted if _Truncate, constant
+                        otherwise), used by setEmittance/setTwiss and the
+                        report only.
+
+
+  Methods:
+  --------
+  __init__ : Input:
+               _SourceCovariance : np.ndarray (6,6) or None: covariance
+                                   at the source; from Source parameters
+                                   if None
+               _SourceMeans      : np.ndarray (6,) or None
+               _outputCSVfile    : Path to csv report
+               _nDelta           : int, default 1
+               _nParticles       : int, nominal beam population
+               _Truncate         : bool, default False: Gaussian
+                                   truncation at apertures (see
+                                   RESTRICTION above)
+
+  getSourceMoments : Class method; mean and covariance of the source trace
+                     space from the Source parameters.
+             Input : iSrc [Source instance], nSample [int, default
+                     100000], Seed [int] used for modes with no analytic
+                     moments
+            Return : Means [np.ndarray (6,)], CovMtrx [np.ndarray (6,6)]
+
+  getDeltaAffineMaps : Class method; affine maps, X -> M X + m, of
+                     element at each delta node; m from getAffineMap
+                     (RF cavity), zero otherwise.  Raises
+                     unsupportedElement for an RPLCswitch with a 3D
+                     rotation.
+             Input : iBLE [BeamLineElement], Deltas [np.ndarray (K,)]
+            Return : [M np.ndarray (K,6,6), m np.ndarray (K,6)]
+
+  truncateSlices : Class method; Gaussian truncation of the slices at
+                an aperture, one transverse coordinate at a time.
+             Input : iBLE [Aperture], slice means (K,6), second moments
+                     (K,6,6), weights (K,)
+            Return : slice means, second moments, weights (the weight of
+                     each slice times the fraction transmitted)
+
+  propagate   : Transport means and covariance from source to end of
+                beam line, then evaluate sigmaxy, emittance and Twiss.
+
+  repropagate : Transport a new source covariance (and means) with the
+                stored cumulative affine maps.  Not available with
+                _Truncate (raises badBeam).
+             Input : CovMtrx0 [np.ndarray (6,6)], Means0 [np.ndarray (6,)
+                     or None]
+
+  setBeamParameters : Evaluate sigmaxy, emittance and Twiss parameters
+                from the covariance matrices (Beam methods).
+             Input : Transmission [list, fraction transmitted by
+                     location; default None: all 1]
+
+     getSlices : Split a source distribution into the delta slices.
+             Input : CovMtrx0, Means0
+            Return : slice means (nDelta,6), second moments (nDelta,6,6)
+
+  getTransferMap, getTransferOffset, getnDelta, getDeltas, getWeights,
+  getTruncate : self documenting
+
+    cleanEnvelopes : Deletes all Envelope instances and resets list.
+
+
+Created on Mon 28Feb24: Version history:
+----------------------------------------
+ 1.0: First implementation
+
+@author: kennethlong
+"""
+class Envelope(Beam):
+    instances  = []
+    __Debug    = False
+
+
+#--------  "Built-in methods":
+    def __init__(self, _SourceCovariance=None, _SourceMeans=None, \
+                       _outputCSVfile=None, _nDelta=1, _nParticles=100000, \
+                       _Truncate=False):
+
+        if self.__Debug:
+            print(' Envelope.__init__: ', \
+                  'creating the Envelope object')
+
+        Envelope.instances.append(self)
+        Beam.instances.append(self)
+
+        self.setAll2None()
+
+        if not isinstance(_nDelta, int) or _nDelta < 1:
+            raise badParameter(" Envelope.__init__: bad nDelta:", _nDelta)
+        self._nDelta = _nDelta
+
+        if not isinstance(_nParticles, int) or _nParticles < 10:
+            raise badParameter(" Envelope.__init__: bad nParticles:", \
+                               _nParticles)
+        self._nParticles0 = _nParticles
+
+        if not isinstance(_Truncate, bool):
+            raise badParameter(" Envelope.__init__: bad Truncate:", \
+                               _Truncate)
+        self._Truncate = _Truncate
+
+        if _outputCSVfile != None:
+            self.setoutputCSVfile(_outputCSVfile)
+            dirname, filename = os.path.split(self.getoutputCSVfile())
+            if not os.path.isdir(dirname):
+                raise Exception( \
+                        " Envelope.__init__: output data frame invalid.")
+
+        iBm = BL.BeamLine.getinstances()
+        if iBm == None:
+            raise badBeam(" Envelope.__init__: no beam line.")
+        self.setBeamLineInstance(iBm)
+
+        if not isinstance(Prtcl.ReferenceParticle.getinstances(), \
+                          Prtcl.ReferenceParticle):
+            raise noReferenceBeam(" Envelope.__init__:", \
+                                  " no reference particle.")
+
+        for iBLE in BLE.BeamLineElement.getinstances():
+            if not isinstance(iBLE, BLE.Facility):
+                self.setLocation(iBLE.getName())
+
+        #.. Source moments:
+        if _SourceCovariance is None:
+            Means, CovMtrx = Envelope.getSourceMoments( \
+                                        BLE.BeamLineElement.getinstances()[1])
+        else:
+            CovMtrx = np.array(_SourceCovariance, dtype=float)
+            Means   = np.zeros(6)
+        if _SourceMeans is not None:
+            Means   = np.array(_SourceMeans, dtype=float)
+        if np.shape(CovMtrx) != (6,6) or np.shape(Means) != (6,):
+            raise badParameter(" Envelope.__init__: bad source moments:", \
+                               np.shape(CovMtrx), np.shape(Means))
+        self._Means   = [Means]
+        self._CovMtrx = [CovMtrx]
+
+        if self.__Debug:
+            print("     ----> New Envelope instance: \n", \
+                  Envelope.__str__(self))
+            print(" <---- Envelope instance created.")
+
+    def __repr__(self):
+        return "Envelope(<SourceCovariance>=None, <SourceMeans>=None, " + \
+               "<OutputFile>=None, nDelta=1, nParticles=100000, " + \
+               "Truncate=False)"
+
+    def __str__(self):
+        print(" Envelope:")
+        print(" ---------")
+        print("     ----> Number of delta nodes:", self.getnDelta())
+        if self.getTruncate():
+            print("     ----> Gaussian truncation at apertures.")
+        else:
+            print("     ----> No losses: apertures treated as drifts.")
+        print("     ----> Number of locations:", len(self.getLocation()))
+        for iAddr in range(len(self.getsigmaxy())):
+            print("         ---->", self.getLocation()[iAddr], \
+                  ": sigma_x, sigma_y:", \
+                  self.getsigmaxy()[iAddr][0], self.getsigmaxy()[iAddr][1])
+        return " Envelope __str__ done."
+
+
+#--------  "Set method" only Debug
+#.. Method believed to be self documenting(!)
+
+    @classmethod
+    def setDebug(cls, Debug=False):
+        if cls.__Debug:
+            print(" Envelope.setDebug: ", Debug)
+        cls.__Debug = Debug
+
+    @classmethod
+    def resetEnvelopeInstances(cls):
+        if len(cls.instances) > 0:
+            cls.instances = []
+
+    def setAll2None(self):
+        Beam.setAll2None(self)
+        self._nDelta      = 1
+        self._nParticles0 = 100000
+        self._Truncate    = False
+        self._TransferMap = []
+        self._TransferOffset = []
+        self._Deltas      = None
+        self._Weights     = None
+
+
+#--------  "Get methods" only; version, reference, and constants
+#.. Methods believed to be self documenting(!)
+
+    @classmethod
+    def getDebug(cls):
+        return cls.__Debug
+
+    @classmethod
+    def getEnvelopeInstances(cls):
+        return cls.instances
+
+    def getnDelta(self):
+        return self._nDelta
+
+    def getTransferMap(self):
+        return self._TransferMap
+
+    def getTransferOffset(self):
+        return self._TransferOffset
+
+    def getTruncate(self):
+        return self._Truncate
+
+    def getDeltas(self):
+        return self._Deltas
+
+    def getWeights(self):
+        return self._Weights
+
+
+#--------  Processing methods:
+    @classmethod
+    def getSourceMoments(cls, iSrc, nSample=100000, Seed=20240228):
+        if not isinstance(iSrc, BLE.Source):
+            raise badParameter(" Envelope.getSourceMoments: not a Source:", \
+                               iSrc)
+
+        Means   = np.zeros(6)
+        CovMtrx = np.zeros((6,6))
+
+        Mode   = iSrc.getMode()
+        Params = iSrc.getParameters()
+        if Mode == 1 or Mode == 2:
+            p0   = Prtcl.ReferenceParticle.getinstances().getMomentumIn(0)
+            E0   = mth.sqrt(BLE.protonMASS**2 + p0**2)
+            K0   = E0 - BLE.protonMASS
+
+            if Mode == 1:
+                K1 = Params[3]
+                K2 = Params[3]**2 + Params[4]**2
+            else:
+                K1 = (Params[3] + Params[4]) / 2.
+                K2 = (Params[3]**2 + Params[3]*Params[4] + \
+                      Params[4]**2) / 3.
+
+            #.. cos(theta) flat on [MinCTheta, 1], phi flat:
+            cMin = Params[2]
+            if cMin < 1.:
+                s2Theta = 1. - (1. - cMin**3) / (3.*(1. - cMin))
+            else:
+                s2Theta = 0.
+            p2   = K2 + 2.*BLE.protonMASS*K1
+
+            Means[5]     = (K1 - K0) / p0
+            CovMtrx[0,0] = Params[0]**2
+            CovMtrx[2,2] = Params[1]**2
+            CovMtrx[1,1] = 0.5 * s2Theta * p2 / p0**2
+            CovMtrx[3,3] = CovMtrx[1,1]
+            CovMtrx[5,5] = (K2 - K1**2) / p0**2
+        else:
+            TrcSpc  = iSrc.getParticlesFromSource(nSample, \
+                                            np.random.default_rng(Seed))
+            Means   = np.mean(TrcSpc, axis=0)
+            CovMtrx = np.cov(TrcSpc, rowvar=False, bias=True)
+
+        if cls.getDebug():
+            print(" Envelope.getSourceMoments: mode", Mode)
+            with np.printoptions(linewidth=500,precision=7,suppress=True):
+                print("     ----> Means:", Means)
+                print("     ----> CovMtrx: \n", CovMtrx)
+
+        return Means, CovMtrx
+
+    @classmethod
+    def getDeltaAffineMaps(cls, iBLE, Deltas):
+        Deltas = np.asarray(Deltas, dtype=float)
+        Offset = np.zeros((len(Deltas), 6))
+        if isinstance(iBLE, BLE.FocusQuadrupole)   or \
+           isinstance(iBLE, BLE.DefocusQuadrupole) or \
+           isinstance(iBLE, BLE.Solenoid)          or \
+           isinstance(iBLE, BLE.SectorDipole)      or \
+           isinstance(iBLE, BLE.GaborLens):
+            return [iBLE.calcTransferMatrixBatch(Deltas), Offset]
+        elif isinstance(iBLE, BLE.QuadDoublet) or \
+             isinstance(iBLE, BLE.QuadTriplet):
+            TrnsMtrx = np.empty((len(Deltas), 6, 6))
+            for iDlt in range(len(Deltas)):
+                iBLE.setTransferMatrix(np.array([0., 0., 0., 0., 0., \
+                                                 Deltas[iDlt]]))
+                TrnsMtrx[iDlt] = iBLE.getTransferMatrix()
+            return [TrnsMtrx, Offset]
+        elif isinstance(iBLE, BLE.RPLCswitch) and iBLE.get3Drotation():
+            raise unsupportedElement(" Envelope.getDeltaAffineMaps:", \
+                    iBLE.getName(), ": RPLCswitch with 3D rotation acts", \
+                    "in phase space; not supported by Envelope.")
+
+        TrnsMtrx = iBLE.getTransferMatrix()
+        Map      = iBLE.getAffineMap()
+        if Map is not None:
+            TrnsMtrx, Offset[:] = Map
+        return [np.tile(TrnsMtrx, (len(Deltas), 1, 1)), Offset]
+
+    @classmethod
+    def truncateSlices(cls, iBLE, SlcMeans, SlcScnd, SlcWghts):
+        #.. Half widths in x and y; ellipse and circle replaced by the
+        #   rectangle of equal area:
+        Params = iBLE.getParams()
+        if iBLE.getType() == 0:
+            HlfWdth = [0.5*mth.sqrt(mth.pi)*Params[0]] * 2
+        elif iBLE.getType() == 1:
+            HlfWdth = [0.5*mth.sqrt(mth.pi)*Params[0], \
+                       0.5*mth.sqrt(mth.pi)*Params[1]]
+        elif iBLE.getType() == 2:
+            HlfWdth = [Params[0], Params[1]]
+        else:
+            return SlcMeans, SlcScnd, SlcWghts
+
+        SlcMeans = SlcMeans.copy()
+        SlcScnd  = SlcScnd.copy()
+        SlcWghts = SlcWghts.copy()
+        Wght0    = np.sum(SlcWghts)
+        Phi      = lambda u: 0.5*(1. + mth.erf(u/mth.sqrt(2.)))
+        phi      = lambda u: mth.exp(-0.5*u**2) / mth.sqrt(2.*mth.pi)
+        for iSlc in range(len(SlcWghts)):
+            if SlcWghts[iSlc] <= 0.:
+                continue
+            Mean = SlcMeans[iSlc]
+            Cov  = SlcScnd[iSlc] - np.outer(Mean, Mean)
+            for iCrd, Hlf in zip([0, 2], HlfWdth):
+                Var = Cov[iCrd,iCrd]
+                if Var <= 0.:
+                    if abs(Mean[iCrd]) > Hlf:
+                        SlcWghts[iSlc] = 0.
+                    continue
+                Sgm = mth.sqrt(Var)
+                a   = (-Hlf - Mean[iCrd]) / Sgm
+                b   = ( Hlf - Mean[iCrd]) / Sgm
+                Z   = Phi(b) - Phi(a)
+                if Z <= 1.E-12:
+                    SlcWghts[iSlc] = 0.
+                    break
+                dM  = (phi(a) - phi(b)) / Z
+                dV  = (a*phi(a) - b*phi(b)) / Z - dM**2
+                #.. Others follow by regression on the truncated
+                #   coordinate:
+                Rgrs = Cov[:,iCrd] / Var
+                Mean = Mean + Rgrs * Sgm*dM
+                Cov  = Cov  + np.outer(Rgrs, Rgrs) * Var*dV
+                SlcWghts[iSlc] = SlcWghts[iSlc] * Z
+            SlcMeans[iSlc] = Mean
+            SlcScnd[iSlc]  = Cov + np.outer(Mean, Mean)
+
+        if cls.getDebug():
+            print(" Envelope.truncateSlices:", iBLE.getName(), \
+                  ": fraction transmitted:", \
+                  np.sum(SlcWghts) / Wght0)
+
+        return SlcMeans, SlcScnd, SlcWghts
+
+    def propagate(self):
+        if self.getDebug():
+            print(" Envelope.propagate: start; nDelta:", self.getnDelta())
+
+        #.. Gauss-Hermite nodes and weights (probabilists'):
+        Nodes, Weights = np.polynomial.hermite_e.hermegauss(self.getnDelta())
+        Weights        = Weights / np.sum(Weights)
+        self._Weights  = Weights
+
+        #.. Delta slices of the source distribution:
+        Means0   = self._Means[0]
+        CovMtrx0 = self._CovMtrx[0]
+        sDelta   = mth.sqrt(max(CovMtrx0[5,5], 0.))
+        self._Deltas = Means0[5] + sDelta*Nodes
+        
+        SlcMeans, SlcScnd = self.getSlices(CovMtrx0, Means0)
+        SlcWghts          = Weights.copy()
+        TrnsfrMap         = np.tile(np.identity(6), (len(Nodes), 1, 1))
+        TrnsfrOffset      = np.zeros((len(Nodes), 6))
+
+        self._Means          = [Means0]
+        self._CovMtrx        = [CovMtrx0]
+        self._TransferMap    = [TrnsfrMap]
+        self._TransferOffset = [TrnsfrOffset]
+        Transmission         = [1.]
+        for iBLE in BLE.BeamLineElement.getinstances()[2:]:
+            if self.getTruncate() and isinstance(iBLE, BLE.Aperture):
+                SlcMeans, SlcScnd, SlcWghts = Envelope.truncateSlices( \
+                                        iBLE, SlcMeans, SlcScnd, SlcWghts)
+                if np.sum(SlcWghts) <= 0.:
+                    raise badBeam(" Envelope.propagate: no beam after", \
+                                  iBLE.getName())
+
+            #.. <X>' = M <X> + m, <XX^T>' = M <XX^T> M^T + M<X> m^T +
+            #   m (M<X>)^T + m m^T:
+            TrnsMtrx, Offset = Envelope.getDeltaAffineMaps(iBLE, \
+                                                           SlcMeans[:,5])
+            MMeans    = np.einsum('kij,kj->ki', TrnsMtrx, SlcMeans)
+            SlcScnd   = np.matmul(np.matmul(TrnsMtrx, SlcScnd), \
+                                  np.transpose(TrnsMtrx, (0,2,1))) + \
+                        np.einsum('ki,kj->kij', MMeans, Offset) + \
+                        np.einsum('ki,kj->kij', Offset, MMeans) + \
+                        np.einsum('ki,kj->kij', Offset, Offset)
+            SlcMeans  = MMeans + Offset
+            TrnsfrMap    = np.matmul(TrnsMtrx, TrnsfrMap)
+            TrnsfrOffset = np.einsum('kij,kj->ki', TrnsMtrx, TrnsfrOffset) \
+                           + Offset
+
+            Wghts     = SlcWghts / np.sum(SlcWghts)
+            Means     = np.einsum('k,ki->i', Wghts, SlcMeans)
+            self._Means.append(Means)
+            self._CovMtrx.append(np.einsum('k,kij->ij', Wghts, SlcScnd) \
+                                 - np.outer(Means, Means))
+            self._TransferMap.append(TrnsfrMap)
+            self._TransferOffset.append(TrnsfrOffset)
+            Transmission.append(np.sum(SlcWghts))
+
+            if self.getDebug():
+                with np.printoptions(linewidth=500,precision=7, \
+                                     suppress=True):
+                    print("     ---->", iBLE.getName(), ": CovMtrx \n", \
+                          self._CovMtrx[-1])
+
+        self.setBeamParameters(Transmission)
+
+        if self.getDebug():
+            print(" <---- Envelope.propagate: done.")
+
+    def getSlices(self, CovMtrx0, Means0):
+        #.. Split the distribution into delta slices at the nodes; the
+        #   slice means and second moments reproduce the total means and
+        #   covariance (for nDelta = 1 the single slice is the whole beam):
+        Weights = self._Weights
+        Dlt     = self._Deltas - Means0[5]
+        Cnd     = np.dot(Weights, Dlt**2)
+        if CovMtrx0[5,5] > 0.:
+            Rgrs = CovMtrx0[:,5] / CovMtrx0[5,5]
+            Cnd  = Cnd / CovMtrx0[5,5]**2
+        else:
+            Rgrs = np.zeros(6)
+            Cnd  = 0.
+        CovSlc   = CovMtrx0 - Cnd * np.outer(CovMtrx0[:,5], CovMtrx0[:,5])
+
+        SlcMeans = Means0 + np.outer(Dlt, Rgrs)
+        SlcScnd  = CovSlc + np.einsum('ki,kj->kij', SlcMeans, SlcMeans)
+
+        return SlcMeans, SlcScnd
+
+    def repropagate(self, CovMtrx0, Means0=None):
+        if len(self.getTransferMap()) == 0:
+            raise badBeam(" Envelope.repropagate: propagate first.")
+        if self.getTruncate():
+            raise badBeam(" Envelope.repropagate: not available with", \
+                          "truncation at apertures; propagate instead.")
+        if Means0 is None:
+            Means0 = np.zeros(6)
+        CovMtrx0 = np.array(CovMtrx0, dtype=float)
+        Means0   = np.array(Means0, dtype=float)
+
+        SlcMeans, SlcScnd = self.getSlices(CovMtrx0, Means0)
+
+        #.. One product per location, all slices at once:
+        TrnsfrMap    = np.array(self.getTransferMap())
+        TrnsfrOffset = np.array(self.getTransferOffset())
+        MMeans = np.einsum('lkij,kj->lki', TrnsfrMap, SlcMeans)
+        Means  = np.einsum('k,lki->li', self._Weights, \
+                           MMeans + TrnsfrOffset)
+        Scnd   = np.einsum('k,lkij,kjm,lknm->lin', self._Weights, \
+                           TrnsfrMap, SlcScnd, TrnsfrMap) + \
+                 np.einsum('k,lki,lkj->lij', self._Weights, \
+                           MMeans, TrnsfrOffset) + \
+                 np.einsum('k,lki,lkj->lij', self._Weights, \
+                           TrnsfrOffset, MMeans) + \
+                 np.einsum('k,lki,lkj->lij', self._Weights, \
+                           TrnsfrOffset, TrnsfrOffset)
+        self._Means   = list(Means)
+        self._CovMtrx = list(Scnd - np.einsum('li,lj->lij', Means, Means))
+
+        self.setBeamParameters()
+
+    def setBeamParameters(self, Transmission=None):
+        if Transmission is None:
+            Transmission = [1.] * len(self._CovMtrx)
+        self._nParticles = [self._nParticles0 * Trnsmssn for Trnsmssn in \
+                            Transmission]
+        self._sigmaxy    = []
+        self._emittance  = []
+        self._Twiss      = []
+        self.setsigmaxy()
+        self.setEmittance()
+        self.setTwiss()
+
+    
+#--------  Utilities:
+    @classmethod
+    def cleanEnvelopes(cls):
+        DoneOK = False
+        
+        for iEnv in cls.getEnvelopeInstances():
+            del iEnv
+            
+        cls.resetEnvelopeInstances()
+        DoneOK = True
+
+        return DoneOK
+
+
 #--------  Exceptions:
 class noReferenceBeam(Exception):
     pass
@@ -1502,3 +2433,6 @@ class noPath4plotFILE(Exception):
 
 class BadCovMtrx(Exception):
     pass
+
+class unsupportedElement(Exception):
+    pass
@@ -11,6 +11,8 @@ Class BeamIO:
   -----------------
     instances : List of instances of Particle class
   __Debug     : Debug flag
+    BlockSize : Number of bytes read from the file at a time by
+                readBeamDataBlock (default 1 MB)
 
       
       Input arguments:
@@ -29,8 +31,69 @@ Class BeamIO:
            _Rd1stRcrd :
      _dataFILEversion :
            _BDSIMfile :
-
-
+           _Columnar  : True if the file is (to be) written in the columnar
+                        format, version 3
+      _LocTableDone   : True once the location table has been written/read
+           _Location  : List of location names (version 3)
+                 _zLoc: List of z at each location (version 3)
+                 _sLoc: List of s at each location (version 3)
+              _Bunch  : List of bunches mapped from the file (version 3);
+                        each is [NEvt, [Index], [TrcSpc]], where, for each
+                        location, Index is a view of the np.memmap of the
+                        file holding the (in-bunch) numbers of the events
+                        that reached it and TrcSpc a (6, nSurv) view
+                        holding their trace space.
+     _iBunch, _iEvt   : Bunch and event to be returned by the next call to
+                        readBeamDataRecord (version 3)
+
+
+  Data file format:
+  -----------------
+   Version 1: particle records (Particle.writeParticle) only.
+   Version 2: >i 9999, >i len, "BeamIO v2", beam line
+              (BeamLine.writeBeamLine), particle records.
+   Version 3 (columnar):
+              >i 9999, >i len, "BeamIO v3", beam line, then the location
+              table, written once:
+                >i nLoc; for each location: >i len, name, >2d z, s
+              then any number of bunches, each:
+                >q NEvt; for each location: >q nSurv, nSurv x >i8 event
+                number in bunch, 6 x nSurv >f8 trace space (one contiguous
+                column per trace-space coordinate).
+              Readers map the columns with np.memmap.
+
+
+  Methods:
+  --------
+   readBeamDataRecord : Reads the header on first call and then one event
+                        per call; version 3 events are built from the
+                        mapped columns.
+    readBeamDataBlock : Read up to nMax events (versions 1 and 2) into
+                        arrays, without creating Particle instances.  The
+                        file is read BlockSize bytes at a time and the
+                        records are unpacked from the buffer; the file is
+                        left positioned after the last event returned, so
+                        readBeamDataRecord may follow.
+                  Input : nMax [int]
+                 Return : Location [list, by event, of lists of location
+                          names], nRcrd [np.ndarray(nEvt,) number of
+                          records of each event], Rcrd [np.ndarray(n,8):
+                          z, s and trace space of each record, event by
+                          event], EoF [bool]
+   writeBeamDataBunch : Write a bunch (as from BeamLine.trackBunch) to a
+                        version 3 file; the location table is written on
+                        the first call.
+                  Input : Location, z, s [lists], TrcSpc [list of
+                          (nSurv,6) np.ndarray], Index [list of np.ndarray]
+           getBunches : Returns list of mapped bunches (version 3).
+         makeParticle : Create a Particle instance for one event of a
+                        mapped bunch.
+                  Input : iBunch, iEvt [int], Compact [bool, default
+                          False]: if True create a CompactParticle, not
+                          registered in Particle.instances
+                 Return : Particle instance, or None if event not present
+    writeLocationTable, readLocationTable, writeBunch : [classmethods]
+                        low-level version 3 i/o on an open file.
 
 
 """
@@ -51,10 +114,11 @@ protonMASS         = constants_instance.mp()
 class BeamIO:
     instances = []
     __Debug   = False
+    BlockSize = 1048576
 
 #--------  "Built-in methods":
     def __init__(self, _datafilePATH=None, _datafileNAME=None, \
-                 _create=False, _BDSIMfile=False):
+                 _create=False, _BDSIMfile=False, _Columnar=False):
         if self.getDebug():
             print(' BeamIO.__init__: ', \
                   'creating BeamIO object')
@@ -94,6 +158,7 @@ class BeamIO:
         #if not os.path.isfile(pathFILE) or _create:
         self.setcreate(_create)
         self.setBDSIMfile(_BDSIMfile)
+        self.setColumnar(_Columnar)
         if _create:
             if not self.getBDSIMfile():
                 dataFILE = open(pathFILE, "wb")
@@ -108,6 +173,8 @@ class BeamIO:
                           " is a large integer to distinguish v2 from v1")
                 
                 version  = "BeamIO v2"
+                if self.getColumnar():
+                    version  = "BeamIO v3"
                 bversion = bytes(version, 'utf-8')
                 record   = strct.pack(">i", len(version))
                 dataFILE.write(record)
@@ -156,6 +223,7 @@ class BeamIO:
         print("     ----> Data file:", self.getdataFILE())
         print("     ---->    Create:", self.getcreate())
         print("     ----> BDSIMfile:", self.getBDSIMfile())
+        print("     ---->  Columnar:", self.getColumnar())
 
         
 #--------  "Set method" only Debug
@@ -173,6 +241,14 @@ class BeamIO:
         self._dataFILEversion = None
         self._create          = None
         self._BDSIMfile       = None
+        self._Columnar        = False
+        self._LocTableDone    = False
+        self._Location        = []
+        self._zLoc            = []
+        self._sLoc            = []
+        self._Bunch           = []
+        self._iBunch          = 0
+        self._iEvt            = 0
 
     def setpathFILE(self, _pathFILE):
         self._pathFILE = _pathFILE
@@ -200,6 +276,11 @@ class BeamIO:
             raise badArgument()
         self._BDSIMfile = _BDSIMfile
 
+    def setColumnar(self, _Columnar):
+        if not isinstance(_Columnar, bool):
+            raise badArgument()
+        self._Columnar = _Columnar
+
         
 #--------  "Get methods" only; version, reference, and constants
 #.. Methods believed to be self documenting(!)
@@ -229,6 +310,15 @@ class BeamIO:
     def getBDSIMfile(self):
         return self._BDSIMfile
 
+    def getColumnar(self):
+        return self._Columnar
+
+    def getLocation(self):
+        return self._Location
+
+    def getBunches(self):
+        return self._Bunch
+
     
 #--------  Processing methods:
 
@@ -299,6 +389,9 @@ class BeamIO:
                           self.getdataFILEversion())
                     
                 BL.BeamLine.readBeamLine(self.getdataFILE())
+
+                if self.getdataFILEversion() == 3:
+                    self.mapBunches()
             else:
                 if self.getDebug():
                     print("           Handle version 1!")
@@ -308,6 +401,16 @@ class BeamIO:
             if self.getDebug():
                 print("     <---- Data file format version:", \
                       self.getdataFILEversion())
+        elif self.getdataFILEversion() == 3:
+            EoF = True
+            while self._iBunch < len(self.getBunches()):
+                if self._iEvt < self.getBunches()[self._iBunch][0]:
+                    self.makeParticle(self._iBunch, self._iEvt)
+                    self._iEvt += 1
+                    EoF = False
+                    break
+                self._iBunch += 1
+                self._iEvt    = 0
         else:
             EoF = Prtcl.Particle.readParticle(self.getdataFILE())
             if self.getDebug():
@@ -318,6 +421,64 @@ class BeamIO:
 
         return EoF
 
+    def readBeamDataBlock(self, nMax):
+        if self.getDebug():
+            print(" BeamIO.readBeamDataBlock starts.")
+            print("     ----> Maximum number of events:", nMax)
+
+        if self.getBDSIMfile() or self.getdataFILEversion() == 3:
+            raise badArgument( \
+                " BeamIO.readBeamDataBlock: version 1 or 2 file required.")
+
+        dataFILE = self.getdataFILE()
+        Location = []
+        nRcrd    = []
+        Rcrd     = []
+        Buffer   = b''
+        iPos     = 0
+        EoF      = False
+        while len(nRcrd) < nMax:
+            #.. Unpack one event; refill the buffer if it is incomplete:
+            Names    = []
+            Complete = False
+            jPos     = iPos + 4
+            if jPos <= len(Buffer):
+                nLoc = strct.unpack_from(">i", Buffer, iPos)[0]
+                for iLoc in range(nLoc):
+                    if jPos + 4 > len(Buffer):
+                        break
+                    nChr = strct.unpack_from(">i", Buffer, jPos)[0]
+                    if jPos + 4 + nChr + 64 > len(Buffer):
+                        break
+                    Names.append(Buffer[jPos+4:jPos+4+nChr].decode('utf-8'))
+                    Rcrd.append(strct.unpack_from(">8d", Buffer, \
+                                                  jPos + 4 + nChr))
+                    jPos += 4 + nChr + 64
+                Complete = len(Names) == nLoc
+            if not Complete:
+                del Rcrd[len(Rcrd)-len(Names):]
+                bBlock = dataFILE.read(self.BlockSize)
+                if bBlock == b'':
+                    EoF = True
+                    break
+                Buffer = Buffer[iPos:] + bBlock
+                iPos   = 0
+                continue
+            Location.append(Names)
+            nRcrd.append(nLoc)
+            iPos = jPos
+
+        #.. Leave the file after the last event returned:
+        if iPos < len(Buffer):
+            dataFILE.seek(iPos - len(Buffer), 1)
+
+        if self.getDebug():
+            print(" <---- BeamIO.readBeamDataBlock: events read:", \
+                  len(nRcrd), "; end of file:", EoF)
+
+        return Location, np.array(nRcrd, dtype=int), \
+            np.array(Rcrd, dtype=float).reshape(len(Rcrd), 8), EoF
+
     def readVersion(self):
         if self.getDebug():
             print(" BeamIO.readVersion start.")
@@ -335,6 +496,106 @@ class BeamIO:
 
         return Version
         
+#.. Columnar (version 3) i/o:
+    def mapBunches(self):
+        if self.getDebug():
+            print(" BeamIO.mapBunches start.")
+
+        dataFILE = self.getdataFILE()
+        self._Location, self._zLoc, self._sLoc = \
+            BeamIO.readLocationTable(dataFILE)
+        self._LocTableDone = True
+        nLoc = len(self.getLocation())
+        Map  = np.memmap(self.getpathFILE(), dtype=np.uint8, mode="r")
+
+        while True:
+            brecord = dataFILE.read(8)
+            if len(brecord) < 8:
+                break
+            NEvt   = strct.unpack(">q", brecord)[0]
+            Index  = []
+            TrcSpc = []
+            for iLoc in range(nLoc):
+                nSurv  = strct.unpack(">q", dataFILE.read(8))[0]
+                Offset = dataFILE.tell()
+                Index.append(Map[Offset:Offset+8*nSurv].view(">i8"))
+                TrcSpc.append(Map[Offset+8*nSurv:Offset+8*7*nSurv]. \
+                              view(">f8").reshape(6, nSurv))
+                dataFILE.seek(Offset + 8*7*nSurv)
+            self._Bunch.append([NEvt, Index, TrcSpc])
+
+        if self.getDebug():
+            print(" <---- BeamIO.mapBunches: bunches mapped:", \
+                  len(self.getBunches()))
+
+    def makeParticle(self, iBunch, iEvt, Compact=False):
+        NEvt, Index, TrcSpc = self.getBunches()[iBunch]
+
+        iPrtcl = None
+        for iLoc in range(len(Index)):
+            iRow = np.searchsorted(Index[iLoc], iEvt)
+            if iRow >= len(Index[iLoc]) or Index[iLoc][iRow] != iEvt:
+                break
+            if iPrtcl == None:
+                if Compact:
+                    iPrtcl = Prtcl.CompactParticle(len(Index), \
+                                                   "proton", False)
+                else:
+                    iPrtcl = Prtcl.Particle()
+            iPrtcl.recordParticle(self.getLocation()[iLoc], \
+                                  self._zLoc[iLoc], self._sLoc[iLoc], \
+                                  np.array(TrcSpc[iLoc][:,iRow], \
+                                           dtype=float))
+
+        return iPrtcl
+
+    def writeBeamDataBunch(self, Location, z, s, TrcSpc, Index):
+        if self.getDebug():
+            print(" BeamIO.writeBeamDataBunch start.")
+
+        if not self.getColumnar():
+            raise badArgument( \
+                " BeamIO.writeBeamDataBunch: file is not columnar.")
+
+        if not self._LocTableDone:
+            BeamIO.writeLocationTable(self.getdataFILE(), Location, z, s)
+            self._LocTableDone = True
+
+        BeamIO.writeBunch(self.getdataFILE(), TrcSpc, Index)
+
+    @classmethod
+    def writeLocationTable(cls, dataFILE, Location, z, s):
+        dataFILE.write(strct.pack(">i", len(Location)))
+        for iLoc in range(len(Location)):
+            bLocation = bytes(Location[iLoc], 'utf-8')
+            dataFILE.write(strct.pack(">i", len(bLocation)))
+            dataFILE.write(bLocation)
+            dataFILE.write(strct.pack(">2d", z[iLoc], s[iLoc]))
+
+    @classmethod
+    def readLocationTable(cls, dataFILE):
+        Location = []
+        z        = []
+        s        = []
+        nLoc = strct.unpack(">i", dataFILE.read(4))[0]
+        for iLoc in range(nLoc):
+            nChr = strct.unpack(">i", dataFILE.read(4))[0]
+            Location.append(dataFILE.read(nChr).decode('utf-8'))
+            zLoc, sLoc = strct.unpack(">2d", dataFILE.read(16))
+            z.append(zLoc)
+            s.append(sLoc)
+
+        return Location, z, s
+
+    @classmethod
+    def writeBunch(cls, dataFILE, TrcSpc, Index):
+        dataFILE.write(strct.pack(">q", len(Index[0])))
+        for iLoc in range(len(Index)):
+            dataFILE.write(strct.pack(">q", len(Index[iLoc])))
+            dataFILE.write(np.asarray(Index[iLoc], dtype=">i8").tobytes())
+            dataFILE.write(np.asarray(np.transpose(TrcSpc[iLoc]), \
+                                      dtype=">f8").tobytes())
+
 #.. Flush and close
     def flushNclosedataFile(self, dataFILE=None):
         if self.getDebug():
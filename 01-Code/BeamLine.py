@@ -24,15 +24,90 @@ __BeamLineInst: Instance of BeamLine class.  Set on creation of first
     _Element[] : BeamLineElement : List of beam line elements making up the
                                    beam line.
    _BeamLineSpecificationCSVfile : Path to csv file in which beam line is
-                                   specified.
+                                   specified (None if the beam line was
+                                   built from a pandas data frame).
             _BeamLineParamPandas : Pandas data frame instance containing
-                                   parameters.
+                                   parameters; None until requested if
+                                   the beam line was built from a file.
+                _BeamLineParams : Table used to build the beam line:
+                                   ParamTable read from the csv file, or
+                                   the pandas data frame given
+                     _ElementRow : List, parallel to _Element, of the index
+                                   of the last row of _BeamLineParamPandas
+                                   that specifies each element
                       _SrcTrcSpc : 6D trace space at source (np.ndarray)
+                      _BatchSize : Number of events tracked together by
+                                   trackBeamBatch (default 100000)
+                      _SourceRng : Class attribute; np.random.Generator
+                                   used by trackBeamBatch to generate the
+                                   bunches at the source (None: a
+                                   Generator seeded from "random" for each
+                                   call, default)
+                   _ScalarSource : Class attribute; True: trackBeamBatch
+                                   generates the bunch particle by
+                                   particle with getParticleFromSource, as
+                                   trackBeam (default False)
+                  _BatchLocation : List of location names recorded by the last
+                                   call to trackBunch
+               _Batchz, _Batchs : z and s at each recorded location
+                    _BatchTrcSpc : List of np.ndarray(n,6), trace space of
+                                   the n particles surviving at each location
+                     _BatchIndex : List of np.ndarray(n,), event number
+                                   (within bunch) of the survivors
+                  _CheckpointLoc : Class attribute; list of element indices
+                                   at whose exit trackBunch keeps a
+                                   checkpoint (None: no checkpoints)
+                     _Checkpoint : dict, element index -> [Name, z, s,
+                                   TrcSpc np.ndarray(n,6), Index
+                                   np.ndarray(n,)], survivors of the last
+                                   bunch at the checkpoints, including the
+                                   start location of the bunch
+                _RecordLocations : Class attribute; list of locations
+                                   recorded by trackBeam and trackBunch,
+                                   given as element index, element name or
+                                   element type (class name, e.g. "Drift").
+                                   The start and the end of the beam line
+                                   are always recorded.  None: every
+                                   location recorded (default)
+                          _Fused : Class attribute; True: trackBunch fuses
+                                   runs of affine elements (default False)
+                 _CacheDirectory : Class attribute; directory of the cache
+                                   of built beam lines (None: no cache,
+                                   default)
+                    _CodeVersion : Class attribute; hash of the source of
+                                   the modules from which the beam line is
+                                   built, evaluated once per process
+                      _Profiling : Class attribute; True: trackBeam and
+                                   trackBunch accumulate the profile
+                                   (default False)
+                        _Profile : Class attribute; dict of lists indexed
+                                   by element: "Time" (s) and "Calls" of
+                                   Transport/TransportBatch, particles
+                                   "In" and "Out", and "Loss", the number
+                                   lost for each of
+                                   BeamLineElement.LossReasons
+                      _Compiled : Class attribute; True: trackBeam uses the
+                                   compiled steps (default False)
+                 _CompiledSteps : Class attribute; list, one [iLoc, Step]
+                                   per element after the source, Step
+                                   from BeamLineElement.compileStep (None
+                                   until compileBeamLine is called)
+                _CompiledStamps : Class attribute; list, for each compiled
+                                   step, the change count of the element
+                                   and of the facility and the reference
+                                   kinematics at the element when the
+                                   step was compiled
+                 _CompiledCheck : Class attribute; total change count of
+                                   the elements and table of reference
+                                   kinematics when the compiled steps
+                                   were last checked
     
   Methods:
   --------
   Built-in methods __new__, __repr__ and __str__.
-      __new__ : Creates single instance of BeamLine class.
+      __new__ : Creates single instance of BeamLine class.  The beam line
+                is specified by the path to a csv file or by a pandas data
+                frame with the same columns.
       __repr__: One liner with call.
       __str__ : Dump of constants
 
@@ -42,16 +117,82 @@ __BeamLineInst: Instance of BeamLine class.  Set on creation of first
     setSrcTrcSpc: Set trace space at source.
              Input: np.array([6,]) containing 6D trace space vector.
 
+    setBatchSize: Set number of events tracked together in trackBeamBatch.
+             Input: int > 0
+
+setSourceGenerator: Set the np.random.Generator with which trackBeamBatch
+                  generates bunches at the source.
+             Input: np.random.Generator or None (default)
+
+setScalarSourceSampling: Generate the bunches of trackBeamBatch particle by
+                  particle, as trackBeam, so that, for the same "random"
+                  seed, the two track the same particles.
+             Input: bool (default False)
+
+  setCheckpoints: Set the locations of the checkpoints kept by trackBunch
+                  and clear the checkpoints.
+             Input: list of element indices, int N (every N-th element) or
+                    None (no checkpoints, default)
+
+setRecordLocations: Set the locations recorded by trackBeam and
+                  trackBunch, and so written to the data file.
+             Input: list of element indices, names and/or types, or None
+                    (all locations, default)
+
+setFusedTracking: Switch fused tracking (see trackBunch) on or off.
+             Input: bool (default False)
+
+setCacheDirectory: Set the directory in which __new__ caches the built
+                  beam line; the directory must exist.
+             Input: path or None (no cache, default)
+
+    setProfiling: Switch the per-element profile (see trackBeam) on or
+                  off; the profile is kept until resetProfile.
+             Input: bool (default False)
+
+    resetProfile: Zero the profile, sized to the present beam line.
+
+setCompiledTracking: Switch compiled tracking (see trackBeam) on or off;
+                  the beam line is compiled when switched on.
+             Input: bool (default False)
+
+    checkProfile: Get the profile, reset first if it is not sized to the
+                  present beam line.
+
   Get methods:
      getinstance: Get instance of beam class
       getDebug  : get debug flag
 getBeamLineSpecificationCSVfile:
                   Get the path to the csv file specifying the beam line
 getBeamLineParamPandas:
-                  Get pandas instance specifying the beam line
+                  Get pandas instance specifying the beam line; read
+                  from the csv file (and pandas imported) on first call
+                  if the beam line was built from a file
+getBeamLineParams:
+                  Get the table from which the beam line was built:
+                  ParamTable if built from a csv file, the data frame
+                  if built from a data frame
       getElement: get list of instances of BeamLineElement objects that make
                   up the beam line
+   getElementRow: get list of the last row of the specification data frame
+                  used by each element (see _ElementRow)
     getSrcTrcSpc: get source trace space nd.array(6,)
+getCheckpointLoc, getCheckpoint, getRecordLocations, getFusedTracking,
+getCacheDirectory, getProfiling, getProfile, getCompiledTracking: believed
+                  to be self documenting.
+
+getCompiledSteps: get the compiled steps, compiling the beam line first
+                  if it has not been compiled since it was built or
+                  changed by addBeamLineElement or truncateBeamLine.
+                  If an element, or the reference particle, has changed
+                  since the steps were last checked, steps whose element,
+                  facility or reference kinematics have changed since
+                  they were compiled (see getCompileStamp) are
+                  recompiled.
+
+  getBatchSize, getBatchLocation, getBatchz, getBatchs, getBatchTrcSpc,
+  getBatchIndex, getSourceGenerator, getScalarSourceSampling: believed to
+                  be self documenting.
 
   Processing method:
       print()   : Dumps parameters
@@ -80,16 +221,182 @@ getBeamLineParamPandas:
                        containing specification of the beam line
                 Input: pandas source instance
 
+      fillElementRow: Record the specification row, Row, of the elements
+                      added since the last call (see _ElementRow).
+                Input: Row: int, row index, or str, name of section
+                            whose last row is used
+
+   addBeamLineElement: Append element to the beam line and set its index
+                       (BeamLineElement.setiLoc), used by the element to
+                       look up the reference-particle kinematics.
+                Input: BeamLineElement instance
+
+    truncateBeamLine: Class method; remove the elements after the first
+                      nLoc from the beam line, together with the
+                      corresponding reference-particle records, so that
+                      new elements can be appended with
+                      addBeamLineElement.
+                Input: nLoc: int, number of elements (including Facility
+                             and Source) to keep
+
    checkConsistency: Runs through beam line elements to make sure total
                      length is consistent with sum of element lengths and
                      position of final element
                 Input: None
                Return: True/False: consistent/not consistent
 
-          trackBeam: Tracks through the beam line.
+          trackBeam: Tracks through the beam line; the particle is
+                     recorded at the locations selected with
+                     setRecordLocations.  When an existing particle is
+                     re-tracked from LocStrt its record at LocStrt is
+                     found by name if it was recorded at selected
+                     locations only.
+                     With profiling on, the wall time of Transport, the
+                     calls and the particles in and out are accumulated
+                     for each element; the reason of each loss is found
+                     by BeamLineElement.getLossReasonBatch, which is
+                     called for lost particles only.  A particle that
+                     fails the expansion-parameter test on exit is
+                     counted as "ExpansionParameter".
+                     With compiled tracking on (and debug and profiling
+                     off) the particle is taken through the list of
+                     compiled steps instead: no type dispatch and no
+                     debug branch per element, and the elements that
+                     are recorded are looked up once per call.
+
+     compileBeamLine: Compile the beam line into the list of steps used
+                      by compiled tracking (see _CompiledSteps).  Steps
+                      made stale by a later change to an element, or to
+                      the reference particle, are recompiled by
+                      getCompiledSteps.
+               Return: list of [iLoc, Step]
+
+     getCompileStamp: Stamp used to find stale compiled steps.
+               Input: iBLE: instance of BeamLineElement
+              Return: [change count of iBLE, change count of facility,
+                       reference kinematics at iBLE (list)]
+
+     getCompileCheck: Quick check for changes since the compiled steps
+                      were last checked; the reference-particle table is
+                      replaced, not modified, when it changes.
+              Return: [BeamLineElement.getTotalChangeCount(),
+                       ReferenceParticle kinematics table (or None)]
+
+     trackBeamBatch: Tracks a bunch of particles through the beam line, the
+                     bunch held as np.ndarray(N,6).  Same acceptance tests
+                     as trackBeam; lost particles are masked out.
+                Input: NEvts: number of events to generate at source,
+                              in bunches of BatchSize, with
+                              Source.getParticlesFromSource (source
+                              modes Source.BatchModes) unless scalar
+                              source sampling is set
+                       ParticleFILE: io.BufferedWriter, events written in
+                                     same format as writeParticle, or
+                                     columnar BeamIO instance, bunches
+                                     written with writeBeamDataBunch
+                       SrcTrcSpc: optional np.ndarray(N,6) bunch to track
+                                  instead of generating NEvts at source
+                       LocStrt: optional, element index at which SrcTrcSpc
+                                is given; tracking continues from next
+                                element
+               Return: number of events tracked
+
+          trackBunch: Transport one bunch element by element, recording
+                      survivors at each location (see _Batch* attributes)
+                      and, if set, at the checkpoints.  Only the
+                      locations selected with setRecordLocations are
+                      recorded.  In fused mode (see setFusedTracking) runs
+                      of elements with an affine map
+                      (BeamLineElement.getAffineMap) between recorded
+                      locations and checkpoints are transported with one
+                      fused matrix and offset.  The
+                      acceptance tests of a run are applied on entry to
+                      its first and its last element and the expansion
+                      parameter test on exit.  For a run of drifts this
+                      is equivalent to the element-by-element tests (the
+                      radius and z are linear along the run and x', y'
+                      and delta constant); across an RF cavity the tests
+                      between the first and last element are skipped.
+                      With profiling on, the time, particles and
+                      losses of a step are accounted as for trackBeam;
+                      a call is one bunch.  The fused part of a step is
+                      accounted to its first element, the elements inside
+                      it have no entries.
+                Input: TrcSpc: np.ndarray(N,6); Name, zStrt, sStrt: label
+                       of starting location; LocStrt: as trackBeamBatch;
+                       Index: optional event numbers of the N particles
+                       (default 0, ..., N-1)
+
+    getTrackingSteps: Steps taken by trackBunch; one per element unless
+                      in fused mode.
+                Input: LocStrt: as trackBunch; Stops: set of element
+                       indices at which a step must end (in addition to
+                       the recorded locations)
+               Return: list of [iFrst, iLst, M, c]; elements iFrst to iLst
+                       are transported as one step, with M, c the fused
+                       affine map of elements iFrst to iLst-1 (None if
+                       iFrst == iLst)
+
+        getRecordLoc: Set of element indices of the locations selected
+                      with setRecordLocations (all elements if None).
+
+         retrackFrom: Re-track the last bunch from the nearest checkpoint
+                      upstream of a changed element, e.g. after changing
+                      the strength of a quadrupole.  Checkpoints
+                      downstream are refreshed and the _Batch* attributes
+                      hold the locations from the checkpoint on, with the
+                      original event numbers.
+                Input: BeamLineElement instance or element index
+               Return: element index of the checkpoint used
 
   I/o methods:
-To be added ...
+          csv2table: read csv file into a ParamTable (no pandas)
+               Input: filename
+              Return: ParamTable instance
+
+        isDataFrame: True if the argument is a pandas data frame; pandas
+                     is not imported to find out.
+
+        getCacheKey: Key of the cached beam line; hash of the csv file
+                     content (or of the data frame written as csv), the
+                     code version and the numpy and python versions.
+               Input: path to csv file or pandas data frame
+              Return: str, hexadecimal digest
+
+        getCacheFile: Path of the cache file for Key in the cache
+                      directory.
+
+          writeCache: Write the built beam line (elements, including any
+                      transfer matrices, polynomial maps and delta grids
+                      already evaluated, reference particle, element rows
+                      and specification data frame) to the cache file
+                      for Key.  The file is written under a temporary
+                      name and then renamed, so that concurrent jobs
+                      never read a partial file.
+               Input: Key: str, from getCacheKey
+
+           readCache: Load the beam line from the cache file for Key.
+                      Used by __new__ only when no element and no
+                      reference particle exist yet; the beam line is
+                      built from the specification if the file does not
+                      exist or cannot be read.
+               Input: Key: str, from getCacheKey
+              Return: True if the beam line was loaded from the cache
+
+         addProfile: Add a profile, e.g. from another process, to the
+                     profile of this beam line.
+               Input: dict as getProfile
+
+    getProfileTable: Profile as a table, one row per element after the
+                     source: location, name, type, calls, time (s),
+                     time per particle (us), particles in, out and lost,
+                     transmission and the losses by reason.
+              Return: list of dicts
+
+       printProfile: Print the profile table.
+
+       writeProfile: Write the profile table to a csv file.
+               Input: path to csv file
 
 Created on Mon 02Oct23: Version history:
 ----------------------------------------
@@ -105,18 +412,28 @@ import sys
 
 import os
 import io
+import random as rnd
 import math   as mth
 import numpy  as np
-import pandas as pnds
 import struct as strct
+import csv
+import collections
+import pickle
+import hashlib
+import time
 
 import Particle        as Prtcl
 import BeamLineElement as BLE
 import Simulation      as Smltn
+import BeamIO          as bmIO
 
 #-------- Physical Constants Instances and Methods ----------------
 from PhysicalConstants import PhysicalConstants
 
+#.. pandas is imported only when a data frame is needed (csv2pandas,
+#   pandasBeamLine, getBeamLineParamPandas); the beam line is built from a
+#   csv file with the pandas-free ParamTable.
+
 constants_instance = PhysicalConstants()
 
 protonMASS         = constants_instance.mp()
@@ -127,6 +444,21 @@ class BeamLine(object):
     __BeamLineInst = None
     __Debug        = False
     _SrcTrcSpc     = None
+    _BatchSize     = 100000
+    _SourceRng     = None
+    _ScalarSource  = False
+    _CheckpointLoc = None
+    _Checkpoint    = {}
+    _RecordLocations = None
+    _Fused           = False
+    _CacheDirectory  = None
+    _Profiling       = False
+    _Profile         = None
+    _CodeVersion     = None
+    _Compiled        = False
+    _CompiledSteps   = None
+    _CompiledStamps  = None
+    _CompiledCheck   = None
 
 
 #--------  "Built-in methods":
@@ -150,30 +482,49 @@ class BeamLine(object):
                     print(" <---- return after init.")
                 return cls.getinstances()
               
-            #.. Check and load parameter file
-            if _BeamLineSpecificationCSVfile == None:
-                raise Exception( \
+            #.. Check parameter file (or data frame):
+            if BeamLine.isDataFrame(_BeamLineSpecificationCSVfile):
+                cls._BeamLineSpecificationCSVfile = None
+                cls._BeamLineParamPandas = \
+                               _BeamLineSpecificationCSVfile.copy()
+                cls._BeamLineParams      = cls._BeamLineParamPandas
+            else:
+                if _BeamLineSpecificationCSVfile == None:
+                    raise Exception( \
                             " BeamLine.__new__: no parameter file given.")
         
-            if not os.path.exists(_BeamLineSpecificationCSVfile):
-                print(" BeamLine.__New__: _BeamLineSpecificationCSVfile:", \
-                      _BeamLineSpecificationCSVfile)
-                raise Exception( \
-                    " BeamLine.__new__: parameter file does not exist.")
+                if not os.path.exists(_BeamLineSpecificationCSVfile):
+                    print(" BeamLine.__New__:", \
+                          " _BeamLineSpecificationCSVfile:", \
+                          _BeamLineSpecificationCSVfile)
+                    raise Exception( \
+                        " BeamLine.__new__: parameter file does not exist.")
         
-            cls._BeamLineSpecificationCSVfile = \
+                cls._BeamLineSpecificationCSVfile = \
                                _BeamLineSpecificationCSVfile
-            cls._BeamLineParamPandas = BeamLine.csv2pandas( \
+
+            #.. Load built beam line from cache if available:
+            CacheKey = None
+            if cls.getCacheDirectory() != None:
+                CacheKey = cls.getCacheKey(_BeamLineSpecificationCSVfile)
+                if cls.readCache(CacheKey):
+                    if cls.getCompiledTracking():
+                        cls.compileBeamLine()
+                    return cls.getinstances()
+
+            if cls._BeamLineParams is None:
+                cls._BeamLineParams = BeamLine.csv2table( \
                                _BeamLineSpecificationCSVfile)
-            if not isinstance(cls._BeamLineParamPandas, pnds.DataFrame):
+            if not isinstance(cls._BeamLineParams, ParamTable) and \
+               not BeamLine.isDataFrame(cls._BeamLineParams):
                 raise Exception( \
-                    " BeamLine.__new__: pandas data frame invalid.")
+                    " BeamLine.__new__: parameter table invalid.")
 
             if cls.getDebug():
                 print("     ----> Parameter file: ", \
                       cls.getBeamLineSpecificationCSVfile())
-                print("     ----> Dump of pandas paramter list: \n", \
-                      cls.getBeamLineParamPandas())
+                print("     ----> Dump of paramter list: \n", \
+                      cls.getBeamLineParams())
 
 #.. Build facility:
             if cls.getDebug():
@@ -195,6 +546,7 @@ class BeamLine(object):
                 print("         ----> Facility: ")
 
             cls.addFacility()
+            cls.fillElementRow("Facility")
         
             if cls.getDebug():
                 print("         <---- Facility done.")
@@ -205,6 +557,7 @@ class BeamLine(object):
                 print("         ----> Source: ")
 
             cls.addSource()
+            cls.fillElementRow("Source")
         
             if cls.getDebug():
                 print("        <---- Source done.")
@@ -231,6 +584,12 @@ class BeamLine(object):
                 print("        <---- Reference particle done. ")
 #    <---- Done reference particle -----  --------  --------  --------
 
+            if CacheKey != None:
+                cls.writeCache(CacheKey)
+
+            if cls.getCompiledTracking():
+                cls.compileBeamLine()
+
         else:
             if cls.getDebug():
                 print(' BeamLine.__new__: ', \
@@ -268,9 +627,20 @@ class BeamLine(object):
     @classmethod
     def setAll2None(cls):
         cls._Element                       = []
-        cls.__BeamLineSpecificationCSVfile = None
+        cls._ElementRow                    = []
+        cls._BeamLineSpecificationCSVfile  = None
         cls._BeamLineParamPandas           = None
+        cls._BeamLineParams                = None
         cls._SrcTrcSpc                     = []
+        cls._BatchLocation                 = []
+        cls._Batchz                        = []
+        cls._Batchs                        = []
+        cls._BatchTrcSpc                   = []
+        cls._BatchIndex                    = []
+        cls._Checkpoint                    = {}
+        cls._CompiledSteps                 = None
+        cls._CompiledStamps                = None
+        cls._CompiledCheck                 = None
 
     @classmethod
     def setDebug(cls, Debug=False):
@@ -295,7 +665,102 @@ class BeamLine(object):
                         " BeamLine.setSrcTrcSpc:", SrcTrcSpc)
 
         cls._SrcTrcSpc = SrcTrcSpc
+
+    @classmethod
+    def setBatchSize(cls, BatchSize=100000):
+        if not isinstance(BatchSize, int) or BatchSize < 1:
+            raise badParameter(" BeamLine.setBatchSize: bad batch size:", \
+                               BatchSize)
+        cls._BatchSize = BatchSize
+
+    @classmethod
+    def setSourceGenerator(cls, Rng=None):
+        if Rng != None and not isinstance(Rng, np.random.Generator):
+            raise badParameter( \
+                " BeamLine.setSourceGenerator: bad generator:", Rng)
+        cls._SourceRng = Rng
+
+    @classmethod
+    def setScalarSourceSampling(cls, Scalar=False):
+        if not isinstance(Scalar, bool):
+            raise badParameter( \
+                " BeamLine.setScalarSourceSampling: bad flag:", Scalar)
+        cls._ScalarSource = Scalar
+
+    @classmethod
+    def setCheckpoints(cls, CheckpointLoc=None):
+        if isinstance(CheckpointLoc, int) and CheckpointLoc > 0:
+            CheckpointLoc = list(range(CheckpointLoc, \
+                                       len(cls.getElement()), CheckpointLoc))
+        elif CheckpointLoc != None:
+            if not isinstance(CheckpointLoc, list) or \
+               not all(isinstance(iLoc, int) for iLoc in CheckpointLoc):
+                raise badParameter( \
+                    " BeamLine.setCheckpoints: bad checkpoints:", \
+                    CheckpointLoc)
+            CheckpointLoc = sorted(CheckpointLoc)
+        cls._CheckpointLoc = CheckpointLoc
+        cls._Checkpoint    = {}
+
+    @classmethod
+    def setRecordLocations(cls, RecordLocations=None):
+        if RecordLocations != None:
+            if not isinstance(RecordLocations, list) or \
+               not all(isinstance(Loc, (int, str)) \
+                       for Loc in RecordLocations):
+                raise badParameter( \
+                    " BeamLine.setRecordLocations: bad locations:", \
+                    RecordLocations)
+        cls._RecordLocations = RecordLocations
+
+    @classmethod
+    def setFusedTracking(cls, Fused=False):
+        if not isinstance(Fused, bool):
+            raise badParameter( \
+                " BeamLine.setFusedTracking: bad flag:", Fused)
+        cls._Fused = Fused
+
+    @classmethod
+    def setProfiling(cls, Profiling=False):
+        if not isinstance(Profiling, bool):
+            raise badParameter( \
+                " BeamLine.setProfiling: bad flag:", Profiling)
+        cls._Profiling = Profiling
+
+    @classmethod
+    def setCompiledTracking(cls, Compiled=False):
+        if not isinstance(Compiled, bool):
+            raise badParameter( \
+                " BeamLine.setCompiledTracking: bad flag:", Compiled)
+        cls._Compiled = Compiled
+        if Compiled:
+            cls.compileBeamLine()
+
+    @classmethod
+    def resetProfile(cls):
+        nLoc   = len(BLE.BeamLineElement.getinstances())
+        nRsn   = len(BLE.BeamLineElement.LossReasons)
+        cls._Profile = {"Time":  [0.] * nLoc, \
+                        "Calls": [0] * nLoc, \
+                        "In":    [0] * nLoc, \
+                        "Out":   [0] * nLoc, \
+                        "Loss":  [[0] * nRsn for iLoc in range(nLoc)]}
+
+    @classmethod
+    def checkProfile(cls):
+        if cls._Profile == None or len(cls._Profile["Time"]) != \
+           len(BLE.BeamLineElement.getinstances()):
+            cls.resetProfile()
+        return cls._Profile
         
+    @classmethod
+    def setCacheDirectory(cls, CacheDirectory=None):
+        if CacheDirectory != None and not os.path.isdir(CacheDirectory):
+            raise badParameter( \
+                    " BeamLine.setCacheDirectory: not a directory:", \
+                    CacheDirectory)
+        cls._CacheDirectory = CacheDirectory
+
 #--------  "Get methods"
 #.. Method believed to be self documenting(!)
     @classmethod
@@ -312,15 +777,118 @@ class BeamLine(object):
 
     @classmethod
     def getBeamLineParamPandas(cls):
+        if cls._BeamLineParamPandas is None and \
+           cls.getBeamLineSpecificationCSVfile() != None:
+            cls._BeamLineParamPandas = BeamLine.csv2pandas( \
+                               cls.getBeamLineSpecificationCSVfile())
         return cls._BeamLineParamPandas
 
+    @classmethod
+    def getBeamLineParams(cls):
+        return cls._BeamLineParams
+
     @classmethod
     def getElement(cls):
         return cls._Element
+
+    @classmethod
+    def getElementRow(cls):
+        return cls._ElementRow
     
     @classmethod
     def getSrcTrcSpc(cls):
         return cls._SrcTrcSpc
+
+    @classmethod
+    def getBatchSize(cls):
+        return cls._BatchSize
+
+    @classmethod
+    def getSourceGenerator(cls):
+        return cls._SourceRng
+
+    @classmethod
+    def getScalarSourceSampling(cls):
+        return cls._ScalarSource
+
+    @classmethod
+    def getBatchLocation(cls):
+        return cls._BatchLocation
+
+    @classmethod
+    def getBatchz(cls):
+        return cls._Batchz
+
+    @classmethod
+    def getBatchs(cls):
+        return cls._Batchs
+
+    @classmethod
+    def getBatchTrcSpc(cls):
+        return cls._BatchTrcSpc
+
+    @classmethod
+    def getBatchIndex(cls):
+        return cls._BatchIndex
+
+    @classmethod
+    def getCheckpointLoc(cls):
+        return cls._CheckpointLoc
+
+    @classmethod
+    def getCheckpoint(cls):
+        return cls._Checkpoint
+
+    @classmethod
+    def getRecordLocations(cls):
+        return cls._RecordLocations
+
+    @classmethod
+    def getFusedTracking(cls):
+        return cls._Fused
+
+    @classmethod
+    def getCacheDirectory(cls):
+        return cls._CacheDirectory
+
+    @classmethod
+    def getCompiledTracking(cls):
+        return cls._Compiled
+
+    @classmethod
+    def getCompiledSteps(cls):
+        if cls._CompiledSteps == None:
+            cls.compileBeamLine()
+            return cls._CompiledSteps
+
+        #.. Nothing changed since last check:
+        Check = cls.getCompileCheck()
+        if Check[0] == cls._CompiledCheck[0] and \
+           Check[1] is cls._CompiledCheck[1]:
+            return cls._CompiledSteps
+        cls._CompiledCheck = Check
+
+        #.. Recompile steps made stale by changes since compilation:
+        for iStp in range(len(cls._CompiledSteps)):
+            iLoc  = cls._CompiledSteps[iStp][0]
+            iBLE  = BLE.BeamLineElement.getinstances()[iLoc]
+            Stamp = cls.getCompileStamp(iBLE)
+            if Stamp != cls._CompiledStamps[iStp]:
+                if cls.getDebug():
+                    print(" BeamLine.getCompiledSteps: recompile", \
+                          iBLE.getName())
+                cls._CompiledSteps[iStp]  = [iLoc, iBLE.compileStep()]
+                cls._CompiledStamps[iStp] = Stamp
+
+        return cls._CompiledSteps
+
+    @classmethod
+    def getProfiling(cls):
+        return cls._Profiling
+
+    @classmethod
+    def getProfile(cls):
+        return cls._Profile
     
         
 #--------  Processing methods:
@@ -387,9 +955,9 @@ class BeamLine(object):
             print("                 ----> BeamLine.parseFacility starts:")
             
         #.. Get "sub" pandas data frame with facility parameters only:
-        pndsFacility = cls.getBeamLineParamPandas()[ \
-                  (cls.getBeamLineParamPandas()["Section"] == "Facility") & \
-                  (cls.getBeamLineParamPandas()["Element"] == "Global") \
+        pndsFacility = cls.getBeamLineParams()[ \
+                  (cls.getBeamLineParams()["Section"] == "Facility") & \
+                  (cls.getBeamLineParams()["Element"] == "Global") \
                                                   ]
         Name = str(pndsFacility[ \
                         (pndsFacility["Type"]=="Name") & \
@@ -426,8 +994,8 @@ class BeamLine(object):
             print("                 ----> BeamLine.parseSource starts:")
 
         #.. Get "sub" pandas data frame with source parameters only:
-        pndsSource = cls.getBeamLineParamPandas()[ \
-                     cls.getBeamLineParamPandas()["Section"] == "Source" \
+        pndsSource = cls.getBeamLineParams()[ \
+                     cls.getBeamLineParams()["Section"] == "Source" \
                                                   ]
 
         if pndsSource.empty:
@@ -550,9 +1118,9 @@ class BeamLine(object):
             print("            BeamLine.addBeamline starts:")
             
         #.. Get "sub" pandas data frame with beamline parameters only:
-        pndsBeamline = cls.getBeamLineParamPandas()[ \
-                    (cls.getBeamLineParamPandas()["Section"] != "Source") & \
-                    (cls.getBeamLineParamPandas()["Section"] != "Facility") \
+        pndsBeamline = cls.getBeamLineParams()[ \
+                    (cls.getBeamLineParams()["Section"] != "Source") & \
+                    (cls.getBeamLineParams()["Section"] != "Facility") \
                                                   ]
 
         if pndsBeamline.empty:
@@ -570,7 +1138,10 @@ class BeamLine(object):
         p0        = mth.sqrt(np.dot(iRefPrtcl.getPrIn()[0][:3], \
                                     iRefPrtcl.getPrIn()[0][:3]))
         
+        iRow = None
         for iLine in pndsBeamline.itertuples():
+            cls.fillElementRow(iRow)
+            iRow = iLine.Index
             Name = BLE.BeamLineElement.getinstances()[0].getName() + ":" \
                            + str(iLine.Stage) + ":"  \
                            + iLine.Section    + ":" \
@@ -884,8 +1455,9 @@ class BeamLine(object):
                 Name   += str(nDpl)
                 rho     = DplL/DplA
                 B       = (1/(speed_of_light*1.E-9))*p0/rho/1000.
-                cls.addBeamLineElement(BLE.SectorDipole(Name, \
-                                rStrt, vStrt, drStrt, dvStrt, DplA, B))
+                iBLE    = BLE.SectorDipole(Name, \
+                                rStrt, vStrt, drStrt, dvStrt, DplA, B)
+                cls.addBeamLineElement(iBLE)
                 s += cls._Element[len(cls._Element)-1].getLength()
                 refPrtcl    = Prtcl.ReferenceParticle.getinstances()
                 refPrtclSet = refPrtcl.setReferenceParticleAtDrift(iBLE)
@@ -936,7 +1508,20 @@ class BeamLine(object):
                 print("                         Momentum:", \
                       refPrtcl.getPrIn()[0])
                 print("                 <---- Done.")
+
+        cls.fillElementRow(iRow)
         
+    @classmethod
+    def fillElementRow(cls, Row):
+        if isinstance(Row, str):
+            Rows = cls.getBeamLineParams().index[ \
+                        cls.getBeamLineParams()["Section"] == Row]
+            Row  = None
+            if len(Rows) > 0: Row = int(Rows.max())
+        nNew = len(cls._Element) - len(cls._ElementRow)
+        if nNew > 0:
+            cls._ElementRow.extend([Row] * nNew)
+
     @classmethod
     def addBeamLineElement(cls, iBLE=False):
         if cls.getDebug():
@@ -944,6 +1529,28 @@ class BeamLine(object):
         if not isinstance(iBLE, BLE.BeamLineElement):
             raise badBeamLineElement()
         cls._Element.append(iBLE)
+        iBLE.setiLoc(len(cls._Element)-1)
+        cls._CompiledSteps = None
+        
+    @classmethod
+    def truncateBeamLine(cls, nLoc):
+        if not isinstance(nLoc, int) or nLoc < 2:
+            raise badParameter(" BeamLine.truncateBeamLine: bad nLoc:", nLoc)
+        if cls.getDebug():
+            print(" BeamLine.truncateBeamLine: keep", nLoc, "of", \
+                  len(cls._Element), "elements.")
+
+        for iBLE in cls._Element[nLoc:]:
+            BLE.BeamLineElement.removeInstance(iBLE)
+            if iBLE in type(iBLE).instances:
+                type(iBLE).instances.remove(iBLE)
+        del cls._Element[nLoc:]
+        del cls._ElementRow[nLoc:]
+        for iCkpt in [iCkpt for iCkpt in cls._Checkpoint if iCkpt >= nLoc]:
+            del cls._Checkpoint[iCkpt]
+        cls._CompiledSteps = None
+
+        Prtcl.ReferenceParticle.getinstances().truncateRecords(nLoc-1)
         
     def checkConsistency(self):
         if self.getDebug():
@@ -1004,6 +1611,37 @@ class BeamLine(object):
         iCnt = 1
 
         iRefPrtcl = Prtcl.ReferenceParticle.getinstances()
+        Record    = cls.getRecordLoc()
+        iLocEnd   = len(BLE.BeamLineElement.getinstances()) - 1
+
+        Profiling = cls.getProfiling()
+        if Profiling:
+            Profile  = cls.checkProfile()
+            PrfTime  = Profile["Time"]
+            PrfCalls = Profile["Calls"]
+            PrfIn    = Profile["In"]
+            PrfOut   = Profile["Out"]
+            PrfLoss  = Profile["Loss"]
+            iExpFail = \
+                BLE.BeamLineElement.LossReasons.index("ExpansionParameter")
+
+        #.. Compiled steps from the start location on; name and s of the
+        #   recorded locations looked up once:
+        Compiled = cls.getCompiledTracking() and not cls.getDebug() and \
+                   not Profiling
+        if Compiled:
+            nLocStrt = -1
+            if LocStrt != None: nLocStrt = LocStrt
+            Steps = []
+            for iLoc, Step in cls.getCompiledSteps():
+                if iLoc <= nLocStrt:
+                    continue
+                iBLE = cls.getElement()[iLoc]
+                Name = None
+                if iLoc in Record or iLoc == iLocEnd:
+                    Name = iBLE.getName()
+                Steps.append([Step, Name, \
+                              iBLE.getrStrt()[2] + iBLE.getLength()])
 
         for iEvt in range(0, NEvts):
             if (iEvt % Scl) == 0:
@@ -1026,20 +1664,28 @@ class BeamLine(object):
                           len(PrtclInst.getTraceSpace()))
                 iLoc = 1
                 if LocStrt != None: iLoc = LocStrt
-                if iLoc-1 >= len(PrtclInst.getTraceSpace()):
+
+                #.. Record at start location; found by name if the
+                #   particle was recorded at selected locations only:
+                iRcrd    = iLoc - 1
+                Names    = PrtclInst.getLocation()
+                NameStrt = cls.getElement()[iLoc].getName()
+                if iRcrd > 0 and (iRcrd >= len(Names) or \
+                                  Names[iRcrd] != NameStrt):
+                    if NameStrt not in Names:
+                        continue
+                    iRcrd = Names.index(NameStrt)
+                if iRcrd >= len(PrtclInst.getTraceSpace()):
                     continue
                 
                 del PrtclInst.getLocation() \
-                    [iLoc:len(PrtclInst.getLocation())]
-                del PrtclInst.getz()[iLoc:len(PrtclInst.getz())]
-                del PrtclInst.gets()[iLoc:len(PrtclInst.gets())]
+                    [iRcrd+1:len(PrtclInst.getLocation())]
+                del PrtclInst.getz()[iRcrd+1:len(PrtclInst.getz())]
+                del PrtclInst.gets()[iRcrd+1:len(PrtclInst.gets())]
                 del PrtclInst.getTraceSpace() \
-                    [iLoc:len(PrtclInst.getTraceSpace())]
-                del PrtclInst.getRPLCPhaseSpace()\
-                    [iLoc:len(PrtclInst.getRPLCPhaseSpace())]
-                del PrtclInst.getLabPhaseSpace()\
-                    [iLoc:len(PrtclInst.getLabPhaseSpace())]
-                SrcTrcSpc = PrtclInst.getTraceSpace()[iLoc-1]
+                    [iRcrd+1:len(PrtclInst.getTraceSpace())]
+                PrtclInst.resetPhaseSpace()
+                SrcTrcSpc = PrtclInst.getTraceSpace()[iRcrd]
             else:
                 PrtclInst   = Prtcl.Particle()
                 if cls.getDebug():
@@ -1071,45 +1717,70 @@ class BeamLine(object):
             TrcSpc   = SrcTrcSpc
             if cls.getDebug():
                 print("     ----> Transport through beam line")
-            iLoc = -1
-            nLocStrt = -1
-            if LocStrt != None: nLocStrt = LocStrt
-            for iBLE in BLE.BeamLineElement.getinstances():
-                iLoc += 1
-                if iLoc <= nLocStrt or \
-                   isinstance(iBLE, BLE.Source) or \
-                   isinstance(iBLE, BLE.Facility):
-                    continue
-                if cls.getDebug():
-                    print("         ---->", iBLE.getName())
-
-                TrcSpc     = iBLE.Transport(TrcSpc_i)
-                if cls.getDebug():
-                    with np.printoptions(\
-                                linewidth=500,precision=7,suppress=True):
-                        print("             ----> Updated trace space   :", \
-                              TrcSpc)
-                        
-                if not isinstance(TrcSpc, np.ndarray):
+            if Compiled:
+                for Step, Name, sEnd in Steps:
+                    TrcSpc = Step(TrcSpc)
+                    if TrcSpc is None:
+                        break
+                    if Name != None:
+                        Success = PrtclInst.recordParticle(Name, \
+                                                           -999999., \
+                                                           sEnd, \
+                                                           TrcSpc)
+            else:
+                iLoc = -1
+                nLocStrt = -1
+                if LocStrt != None: nLocStrt = LocStrt
+                for iBLE in BLE.BeamLineElement.getinstances():
+                    iLoc += 1
+                    if iLoc <= nLocStrt or \
+                       isinstance(iBLE, BLE.Source) or \
+                       isinstance(iBLE, BLE.Facility):
+                        continue
                     if cls.getDebug():
-                        print("              ---->", \
-                              " partice outside acceptance(1)")
-                    break
-                else:
-                    if iBLE.ExpansionParameterFail(TrcSpc):
+                        print("         ---->", iBLE.getName())
+
+                    if Profiling:
+                        tStrt = time.perf_counter()
+                    TrcSpc     = iBLE.Transport(TrcSpc_i)
+                    if Profiling:
+                        PrfTime[iLoc]  += time.perf_counter() - tStrt
+                        PrfCalls[iLoc] += 1
+                        PrfIn[iLoc]    += 1
+                    if cls.getDebug():
+                        with np.printoptions(\
+                                    linewidth=500,precision=7,suppress=True):
+                            print("             ---->", \
+                                  "Updated trace space   :", TrcSpc)
+                        
+                    if not isinstance(TrcSpc, np.ndarray):
                         if cls.getDebug():
                             print("              ---->", \
-                                " Particle fails expansion parameter test")
-                        TrcSpc = None
+                                  " partice outside acceptance(1)")
+                        if Profiling:
+                            PrfLoss[iLoc][iBLE.getLossReasonBatch( \
+                                                TrcSpc_i.reshape(1,6))[0]] += 1
                         break
                     else:
-                        zEnd    = -999999.
-                        sEnd    = iBLE.getrStrt()[2] + iBLE.getLength()
-                        Success = PrtclInst.recordParticle(iBLE.getName(), \
-                                                           zEnd, \
-                                                           sEnd, \
-                                                           TrcSpc)
-                TrcSpc_i = TrcSpc
+                        if iBLE.ExpansionParameterFail(TrcSpc):
+                            if cls.getDebug():
+                                print("              ---->", \
+                                    " Particle fails expansion parameter test")
+                            if Profiling:
+                                PrfLoss[iLoc][iExpFail] += 1
+                            TrcSpc = None
+                            break
+                        if Profiling:
+                            PrfOut[iLoc] += 1
+                        if iLoc in Record or iLoc == iLocEnd:
+                            zEnd    = -999999.
+                            sEnd    = iBLE.getrStrt()[2] + iBLE.getLength()
+                            Success = PrtclInst.recordParticle( \
+                                                            iBLE.getName(), \
+                                                            zEnd, \
+                                                            sEnd, \
+                                                            TrcSpc)
+                    TrcSpc_i = TrcSpc
 
             if cls.getDebug():
                 print("         ----> Reached end of beam line.")
@@ -1129,12 +1800,413 @@ class BeamLine(object):
             print("     <---- End of this simulation, ", NEvts, \
                   " events generated")
 
+    @classmethod
+    def trackBeamBatch(cls, NEvts=0, ParticleFILE=None, \
+                       SrcTrcSpc=None, LocStrt=None):
+        if cls.getDebug():
+            print(" BeamLine.trackBeamBatch start")
+            print("     ----> NEvts:", NEvts)
+            print("     ----> ParticleFILE:", ParticleFILE)
+            print("     ----> SrcTrcSpc supplied:", \
+                  isinstance(SrcTrcSpc, np.ndarray))
+            print("     ----> LocStrt:", LocStrt)
+            print("     ----> Batch size:", cls.getBatchSize())
+
+        if isinstance(SrcTrcSpc, np.ndarray):
+            if np.ndim(SrcTrcSpc) != 2 or np.shape(SrcTrcSpc)[1] != 6:
+                raise badTraceSpaceVector( \
+                        " BeamLine.trackBeamBatch: bad bunch shape:", \
+                                           np.shape(SrcTrcSpc))
+            NEvts = np.shape(SrcTrcSpc)[0]
+        elif LocStrt != None:
+            raise badParameter( \
+                " BeamLine.trackBeamBatch: LocStrt requires SrcTrcSpc.")
+
+        if (cls.getDebug() or NEvts > 1) and \
+           Smltn.Simulation.getProgressPrint():
+            print("     ----> BeamLine.trackBeamBatch for", NEvts, " events.")
+
+        #.. Bunches at source generated in one call unless scalar:
+        iSrc   = cls.getElement()[1]
+        Scalar = cls.getScalarSourceSampling() or \
+                 not isinstance(iSrc, BLE.Source) or \
+                 not iSrc.getMode() in BLE.Source.BatchModes
+        Rng    = cls.getSourceGenerator()
+        if Rng == None and not Scalar:
+            Rng = np.random.default_rng(rnd.getrandbits(64))
+
+        for iFrst in range(0, NEvts, cls.getBatchSize()):
+            iLst = min(NEvts, iFrst + cls.getBatchSize())
+            if (cls.getDebug() or NEvts > 1) and \
+               Smltn.Simulation.getProgressPrint():
+                print("         ----> Tracking events ", iFrst, "to", iLst-1)
+
+            #.. Generate bunch at start:
+            if isinstance(SrcTrcSpc, np.ndarray):
+                TrcSpc = np.array(SrcTrcSpc[iFrst:iLst], dtype=float)
+                if LocStrt != None:
+                    iBLE = BLE.BeamLineElement.getinstances()[LocStrt]
+                    Name = iBLE.getName()
+                    zStrt = -999999.
+                    sStrt = iBLE.getrStrt()[2] + iBLE.getLength()
+                else:
+                    Name  = BLE.BeamLineElement.getinstances()[0].getName() \
+                        + ":Source:User"
+                    zStrt = 0.
+                    sStrt = 0.
+            elif isinstance(cls.getSrcTrcSpc(), np.ndarray):
+                Name   = BLE.BeamLineElement.getinstances()[0].getName() + \
+                    ":Source:User"
+                TrcSpc = np.tile(cls.getSrcTrcSpc(), (iLst-iFrst, 1))
+                zStrt  = 0.
+                sStrt  = 0.
+            elif Scalar:
+                Name   = iSrc.getName()
+                TrcSpc = np.empty((iLst-iFrst, 6))
+                for iEvt in range(iLst-iFrst):
+                    TrcSpc[iEvt] = iSrc.getParticleFromSource()
+                zStrt  = 0.
+                sStrt  = 0.
+            else:
+                Name   = iSrc.getName()
+                TrcSpc = iSrc.getParticlesFromSource(iLst-iFrst, Rng)
+                zStrt  = 0.
+                sStrt  = 0.
+
+            cls.trackBunch(TrcSpc, Name, zStrt, sStrt, LocStrt)
+
+            #.. Write events:
+            if isinstance(ParticleFILE, io.BufferedWriter):
+                Prtcl.Particle.writeParticleBatch(ParticleFILE, \
+                                                  cls.getBatchLocation(), \
+                                                  cls.getBatchz(), \
+                                                  cls.getBatchs(), \
+                                                  cls.getBatchTrcSpc(), \
+                                                  cls.getBatchIndex())
+            elif isinstance(ParticleFILE, bmIO.BeamIO):
+                ParticleFILE.writeBeamDataBunch(cls.getBatchLocation(), \
+                                                cls.getBatchz(), \
+                                                cls.getBatchs(), \
+                                                cls.getBatchTrcSpc(), \
+                                                cls.getBatchIndex())
+
+        if (cls.getDebug() or NEvts > 1) and \
+        Smltn.Simulation.getProgressPrint():
+            print("     <---- End of this simulation, ", NEvts, \
+                  " events generated")
+
+        return NEvts
+
+    @classmethod
+    def trackBunch(cls, TrcSpc, Name, zStrt=0., sStrt=0., LocStrt=None, \
+                   Index=None):
+        if cls.getDebug():
+            print(" BeamLine.trackBunch: start; number of particles:", \
+                  np.shape(TrcSpc)[0])
+
+        if Index is None:
+            Index = np.arange(np.shape(TrcSpc)[0])
+
+        #.. Checkpoint at start, those downstream will be refreshed:
+        Checkpoints = set()
+        if cls.getCheckpointLoc() != None:
+            Checkpoints = set(cls.getCheckpointLoc())
+            iLocStrt    = 1
+            if LocStrt != None: iLocStrt = LocStrt
+            for iLoc in [iLoc for iLoc in cls._Checkpoint \
+                         if iLoc >= iLocStrt]:
+                del cls._Checkpoint[iLoc]
+            cls._Checkpoint[iLocStrt] = [Name, zStrt, sStrt, TrcSpc, Index]
+
+        cls._BatchLocation = [Name]
+        cls._Batchz        = [zStrt]
+        cls._Batchs        = [sStrt]
+        cls._BatchTrcSpc   = [TrcSpc]
+        cls._BatchIndex    = [Index]
+
+        #.. One step per element unless fused:
+        Steps  = cls.getTrackingSteps(LocStrt, Checkpoints)
+        Record = cls.getRecordLoc()
+
+        Elements = BLE.BeamLineElement.getinstances()
+
+        Profiling = cls.getProfiling()
+        if Profiling:
+            Profile = cls.checkProfile()
+
+        for iFrst, iLst, M, c in Steps:
+            iBLE = Elements[iLst]
+
+            #.. Fused map up to the last element of the step:
+            if iFrst < iLst:
+                if Profiling:
+                    tStrt    = time.perf_counter()
+                    TrcSpcIn = TrcSpc
+                Pass   = np.logical_not( \
+                             Elements[iFrst].AcceptanceFailBatch(TrcSpc))
+                TrcSpc = np.matmul(TrcSpc[Pass], np.transpose(M)) + c
+                Index  = Index[Pass]
+                if Profiling:
+                    cls.addProfileStep(iFrst, time.perf_counter() - tStrt, \
+                                       TrcSpcIn, Pass, None)
+
+            if Profiling:
+                tStrt    = time.perf_counter()
+                TrcSpcIn = TrcSpc
+
+            TrcSpc, Alive = iBLE.TransportBatch(TrcSpc)
+            Index         = Index[Alive]
+
+            #.. Expansion parameter test on exit, as for scalar tracking:
+            Pass   = np.logical_not(iBLE.ExpansionParameterFailBatch(TrcSpc))
+            TrcSpc = TrcSpc[Pass]
+            Index  = Index[Pass]
+
+            if Profiling:
+                cls.addProfileStep(iLst, time.perf_counter() - tStrt, \
+                                   TrcSpcIn, Alive, Pass)
+
+            if cls.getDebug():
+                print("     ---->", iBLE.getName(), ": survivors:", \
+                      np.shape(TrcSpc)[0])
+
+            Name = iBLE.getName()
+            s    = iBLE.getrStrt()[2] + iBLE.getLength()
+            if iLst in Record or iLst == Steps[-1][1]:
+                cls._BatchLocation.append(Name)
+                cls._Batchz.append(-999999.)
+                cls._Batchs.append(s)
+                cls._BatchTrcSpc.append(TrcSpc)
+                cls._BatchIndex.append(Index)
+
+            if iLst in Checkpoints:
+                cls._Checkpoint[iLst] = [Name, -999999., s, TrcSpc, Index]
+
+        if cls.getDebug():
+            print(" <---- BeamLine.trackBunch: done.")
+
+    @classmethod
+    def addProfileStep(cls, iLoc, Time, TrcSpcIn, Alive, Pass=None):
+        Profile = cls._Profile
+        nIn     = np.shape(TrcSpcIn)[0]
+        Lost    = np.logical_not(Alive)
+        nOut    = nIn - np.count_nonzero(Lost)
+
+        Profile["Time"][iLoc]  += Time
+        Profile["Calls"][iLoc] += 1
+        Profile["In"][iLoc]    += nIn
+        if nOut < nIn:
+            iBLE    = BLE.BeamLineElement.getinstances()[iLoc]
+            Reasons = np.bincount(iBLE.getLossReasonBatch(TrcSpcIn[Lost]), \
+                            minlength=len(BLE.BeamLineElement.LossReasons))
+            for iRsn in range(len(Reasons)):
+                Profile["Loss"][iLoc][iRsn] += int(Reasons[iRsn])
+        if Pass is not None:
+            nFail = np.shape(Pass)[0] - np.count_nonzero(Pass)
+            Profile["Loss"][iLoc][BLE.BeamLineElement.LossReasons.index( \
+                                            "ExpansionParameter")] += nFail
+            nOut -= nFail
+        Profile["Out"][iLoc]   += nOut
+
+    @classmethod
+    def addProfile(cls, Profile):
+        Sum = cls.checkProfile()
+        if len(Profile["Time"]) != len(Sum["Time"]):
+            raise badParameter( \
+                " BeamLine.addProfile: profile of another beam line.")
+        for Key in ["Time", "Calls", "In", "Out"]:
+            for iLoc in range(len(Sum[Key])):
+                Sum[Key][iLoc] += Profile[Key][iLoc]
+        for iLoc in range(len(Sum["Loss"])):
+            for iRsn in range(len(Sum["Loss"][iLoc])):
+                Sum["Loss"][iLoc][iRsn] += Profile["Loss"][iLoc][iRsn]
+
+    @classmethod
+    def getProfileTable(cls):
+        Profile = cls.checkProfile()
+        Table   = []
+        for iLoc in range(2, len(BLE.BeamLineElement.getinstances())):
+            iBLE = BLE.BeamLineElement.getinstances()[iLoc]
+            nIn  = Profile["In"][iLoc]
+            Row  = {"Location": iLoc, "Name": iBLE.getName(), \
+                    "Type": type(iBLE).__name__, \
+                    "Calls": Profile["Calls"][iLoc], \
+                    "Time [s]": Profile["Time"][iLoc], \
+                    "Time per particle [us]": None, \
+                    "In": nIn, "Out": Profile["Out"][iLoc], \
+                    "Lost": nIn - Profile["Out"][iLoc], \
+                    "Transmission": None}
+            if nIn > 0:
+                Row["Time per particle [us]"] = 1.E6*Profile["Time"][iLoc]/nIn
+                Row["Transmission"]           = Profile["Out"][iLoc] / nIn
+            for iRsn, Reason in enumerate(BLE.BeamLineElement.LossReasons):
+                Row["Lost:"+Reason] = Profile["Loss"][iLoc][iRsn]
+            Table.append(Row)
+        return Table
+
+    @classmethod
+    def printProfile(cls):
+        Table = cls.getProfileTable()
+        print(" BeamLine.printProfile:")
+        print("     {:>3} {:<44} {:>7} {:>10} {:>8} {:>8} {:>7}  {}".format( \
+              "Loc", "Name", "Calls", "Time [s]", "In", "Out", "Trnsm", \
+              "Losses"))
+        for Row in Table:
+            Trnsm  = "-"
+            if Row["Transmission"] != None:
+                Trnsm = "{:7.4f}".format(Row["Transmission"])
+            Losses = ", ".join([Reason + ": " + str(Row["Lost:"+Reason]) \
+                        for Reason in BLE.BeamLineElement.LossReasons \
+                        if Row["Lost:"+Reason] > 0])
+            print("     {:>3} {:<44} {:>7} {:10.4g} {:>8} {:>8} {:>7}  {}". \
+                  format(Row["Location"], Row["Name"][:44], Row["Calls"], \
+                         Row["Time [s]"], Row["In"], Row["Out"], Trnsm, \
+                         Losses))
+        print(" <---- BeamLine.printProfile: total time [s]:", \
+              sum([Row["Time [s]"] for Row in Table]))
+
+    @classmethod
+    def getRecordLoc(cls):
+        Elements = BLE.BeamLineElement.getinstances()
+        if cls.getRecordLocations() == None:
+            return set(range(len(Elements)))
+
+        Record = set()
+        for Loc in cls.getRecordLocations():
+            if isinstance(Loc, str):
+                Record |= {iLoc for iLoc in range(len(Elements)) \
+                           if Elements[iLoc].getName() == Loc or \
+                              type(Elements[iLoc]).__name__ == Loc}
+            else:
+                Record.add(Loc)
+        return Record
+
+    @classmethod
+    def getTrackingSteps(cls, LocStrt=None, Stops=set()):
+        Stops    = Stops | cls.getRecordLoc()
+        nLocStrt = -1
+        if LocStrt != None: nLocStrt = LocStrt
+
+        #.. Group consecutive affine elements, a group ends at a stop:
+        Steps = []
+        Maps  = []
+        iLoc  = -1
+        for iBLE in BLE.BeamLineElement.getinstances():
+            iLoc += 1
+            if iLoc <= nLocStrt or \
+               isinstance(iBLE, BLE.Source) or \
+               isinstance(iBLE, BLE.Facility):
+                continue
+            Map = None
+            if cls.getFusedTracking(): Map = iBLE.getAffineMap()
+            if len(Steps) > 0 and Map != None and Maps[-1][-1] != None \
+               and Steps[-1][1] not in Stops:
+                Steps[-1][1] = iLoc
+                Maps[-1].append(Map)
+            else:
+                Steps.append([iLoc, iLoc, None, None])
+                Maps.append([Map])
+
+        #.. Fused map of all but the last element of each step:
+        for iStp in range(len(Steps)):
+            if len(Maps[iStp]) < 2:
+                continue
+            M = np.identity(6)
+            c = np.zeros(6)
+            for Mi, ci in Maps[iStp][:-1]:
+                M = np.matmul(Mi, M)
+                c = np.matmul(Mi, c) + ci
+            Steps[iStp][2] = M
+            Steps[iStp][3] = c
+
+        if cls.getDebug():
+            print(" BeamLine.getTrackingSteps: steps:", \
+                  [Step[0:2] for Step in Steps])
+
+        return Steps
+
+    @classmethod
+    def compileBeamLine(cls):
+        cls._CompiledSteps  = []
+        cls._CompiledStamps = []
+        iLoc = -1
+        for iBLE in BLE.BeamLineElement.getinstances():
+            iLoc += 1
+            if isinstance(iBLE, BLE.Source) or \
+               isinstance(iBLE, BLE.Facility):
+                continue
+            cls._CompiledSteps.append([iLoc, iBLE.compileStep()])
+            cls._CompiledStamps.append(cls.getCompileStamp(iBLE))
+        cls._CompiledCheck = cls.getCompileCheck()
+
+        if cls.getDebug():
+            print(" BeamLine.compileBeamLine: steps compiled:", \
+                  len(cls._CompiledSteps))
+
+        return cls._CompiledSteps
+
+    @classmethod
+    def getCompileStamp(cls, iBLE):
+        nFclty = 0
+        iFclty = BLE.BeamLineElement.getinstances()[0]
+        if isinstance(iFclty, BLE.Facility):
+            nFclty = iFclty.getChangeCount()
+        return [iBLE.getChangeCount(), nFclty, \
+                iBLE.getRefKinematics().tolist()]
+
+    @classmethod
+    def getCompileCheck(cls):
+        KinematicsIn = None
+        iRefPrtcl    = Prtcl.ReferenceParticle.getinstances()
+        if isinstance(iRefPrtcl, Prtcl.ReferenceParticle):
+            KinematicsIn = iRefPrtcl.getKinematicsIn()
+        return [BLE.BeamLineElement.getTotalChangeCount(), KinematicsIn]
+
+    @classmethod
+    def retrackFrom(cls, Changed):
+        iLoc = Changed
+        if isinstance(Changed, BLE.BeamLineElement):
+            iLoc = Changed.getiLoc()
+        Upstream = [iCkpt for iCkpt in cls.getCheckpoint() if iCkpt < iLoc]
+        if len(Upstream) == 0:
+            raise noCheckpoint( \
+                " BeamLine.retrackFrom: no checkpoint upstream of", iLoc)
+
+        iCkpt = max(Upstream)
+        if cls.getDebug():
+            print(" BeamLine.retrackFrom: element", iLoc, \
+                  "changed, restart at checkpoint", iCkpt)
+
+        Name, z, s, TrcSpc, Index = cls.getCheckpoint()[iCkpt]
+        cls.trackBunch(TrcSpc, Name, z, s, iCkpt, Index)
+
+        return iCkpt
+
 #--------  I/o methods:
+    @classmethod
+    def writeProfile(cls, _filename):
+        Table = cls.getProfileTable()
+        with open(_filename, "w", newline="") as ProfileFILE:
+            Writer = csv.DictWriter(ProfileFILE, fieldnames=list(Table[0]))
+            Writer.writeheader()
+            Writer.writerows(Table)
+
     def csv2pandas(_filename):
+        import pandas as pnds
+
         ParamsPandas = pnds.read_csv(_filename)
         return ParamsPandas
 
+    def csv2table(_filename):
+        return ParamTable.read_csv(_filename)
+
+    def isDataFrame(_Object):
+        return "pandas" in sys.modules and \
+            isinstance(_Object, sys.modules["pandas"].DataFrame)
+
     def pandasBeamLine(self):
+        import pandas as pnds
+
         if self.getDebug():
             print(" BeamLine.pandasBeamLine starts.")
 
@@ -1384,6 +2456,87 @@ class BeamLine(object):
 
         return EoF
 
+    @classmethod
+    def getCacheKey(cls, _BeamLineSpecification):
+        if cls._CodeVersion == None:
+            CodeHash = hashlib.sha256()
+            for Module in [sys.modules[__name__], BLE, Prtcl, \
+                           sys.modules[PhysicalConstants.__module__]]:
+                with open(Module.__file__, "rb") as ModuleFILE:
+                    CodeHash.update(ModuleFILE.read())
+            cls._CodeVersion = CodeHash.hexdigest()
+
+        Hash = hashlib.sha256()
+        if BeamLine.isDataFrame(_BeamLineSpecification):
+            Hash.update(_BeamLineSpecification.to_csv().encode('utf-8'))
+        else:
+            with open(_BeamLineSpecification, "rb") as csvFILE:
+                Hash.update(csvFILE.read())
+        Hash.update(cls._CodeVersion.encode('utf-8'))
+        Hash.update((np.__version__ + sys.version).encode('utf-8'))
+
+        return Hash.hexdigest()
+
+    @classmethod
+    def getCacheFile(cls, Key):
+        return os.path.join(cls.getCacheDirectory(), \
+                            "BeamLine-" + Key[:32] + ".pkl")
+
+    @classmethod
+    def writeCache(cls, Key):
+        Cache = [BLE.BeamLineElement.getinstances(), \
+                 Prtcl.ReferenceParticle.getinstances(), \
+                 cls.getElement(), cls.getElementRow(), \
+                 cls.getBeamLineParams(), cls._BeamLineParamPandas]
+
+        CacheFile = cls.getCacheFile(Key)
+        TmpFile   = CacheFile + "." + str(os.getpid())
+        with open(TmpFile, "wb") as CacheFILE:
+            pickle.dump(Cache, CacheFILE, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(TmpFile, CacheFile)
+
+        if cls.getDebug():
+            print(" BeamLine.writeCache: beam line written to", CacheFile)
+
+    @classmethod
+    def readCache(cls, Key):
+        CacheFile = cls.getCacheFile(Key)
+        if len(BLE.BeamLineElement.getinstances()) > 0 or \
+           Prtcl.ReferenceParticle.getinstances() != None or \
+           not os.path.isfile(CacheFile):
+            return False
+
+        try:
+            with open(CacheFile, "rb") as CacheFILE:
+                Elements, refPrtcl, Element, ElementRow, Params, \
+                    ParamPandas = pickle.load(CacheFILE)
+        except Exception as Error:
+            if cls.getDebug():
+                print(" BeamLine.readCache: cannot read", CacheFile, \
+                      ":", Error)
+            return False
+
+        #.. Restore the instance lists filled when the elements and the
+        #   reference particle are created:
+        BLE.BeamLineElement.instances = Elements
+        for iBLE in Elements:
+            if "instances" in type(iBLE).__dict__:
+                type(iBLE).instances.append(iBLE)
+            if isinstance(iBLE, BLE.Facility):
+                BLE.Facility.instance = iBLE
+        Prtcl.ReferenceParticle.setinstance(refPrtcl)
+        Prtcl.Particle.instances.append(refPrtcl)
+
+        cls._Element             = Element
+        cls._ElementRow          = ElementRow
+        cls._BeamLineParams      = Params
+        cls._BeamLineParamPandas = ParamPandas
+
+        if cls.getDebug():
+            print(" BeamLine.readCache: beam line read from", CacheFile)
+
+        return True
+
 #--------  Utilities:
     @classmethod
     def cleaninstance(cls):
@@ -1416,6 +2569,117 @@ class BeamLine(object):
                       "     ---->   iBLE.getrStrt():", iBLE.getrStrt())
 
 
+"""
+Class ParamTable:
+=================
+
+  Light-weight, read-only table of the beam-line specification read from
+  the csv file with the csv module, so that building a beam line does not
+  import pandas.  It provides the subset of the pandas.DataFrame
+  interface used to parse the specification:
+
+    Table["Column"]    : column, np.ndarray (dtype object) with .iloc
+    Table[Mask]        : rows selected by a boolean mask
+    Table.iloc[i]      : row i as dict
+    Table.index        : np.ndarray of row numbers (as in the file)
+    Table.empty, len(Table), Table.itertuples()
+
+  Values are converted as pandas.read_csv does: a column in which all
+  entries are integers (floats) holds int (float); empty and "NA"-like
+  entries are nan.
+
+  Class method:
+       read_csv : Read csv file.
+          Input : filename
+         Return : ParamTable instance
+
+"""
+class ParamColumn(np.ndarray):
+    @property
+    def iloc(self):
+        return np.asarray(self)
+
+class ParamTable(object):
+    NAvalues = {"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", \
+                "-NaN", "-nan", "1.#IND", "1.#QNAN", "<NA>", "N/A", "NA", \
+                "NULL", "NaN", "None", "n/a", "nan", "null"}
+
+#--------  "Built-in methods":
+    def __init__(self, _Columns, _Data, _Index):
+        self._Columns = _Columns
+        self._Data    = _Data
+        self.index    = _Index
+
+    def __repr__(self):
+        return "ParamTable()"
+
+    def __str__(self):
+        Lines = [", ".join(["Index"] + self._Columns)]
+        for Row in self.itertuples():
+            Lines.append(", ".join([str(Value) for Value in Row]))
+        return "\n".join(Lines)
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, Key):
+        if isinstance(Key, str):
+            return self._Data[Key].view(ParamColumn)
+        Mask = np.asarray(Key, dtype=bool)
+        return ParamTable(self._Columns, \
+                          {Column: Values[Mask] for Column, Values in \
+                           self._Data.items()}, \
+                          self.index[Mask])
+
+#--------  Get methods:
+    @property
+    def empty(self):
+        return len(self.index) == 0
+
+    @property
+    def iloc(self):
+        return [dict(zip(self._Columns, Row)) for Row in \
+                zip(*[self._Data[Column] for Column in self._Columns])]
+
+    def itertuples(self):
+        Row = collections.namedtuple("Pandas", ["Index"] + self._Columns, \
+                                     rename=True)
+        for Values in zip(self.index, \
+                          *[self._Data[Column] for Column in self._Columns]):
+            yield Row(*Values)
+
+#--------  I/o methods:
+    @classmethod
+    def read_csv(cls, _filename):
+        with open(_filename, "r", newline="", encoding="utf-8-sig") \
+             as csvFILE:
+            Rows = [Row for Row in csv.reader(csvFILE) if len(Row) > 0]
+
+        Columns = Rows[0]
+        Rows    = [Row + [""]*(len(Columns) - len(Row)) for Row in Rows[1:]]
+        Data    = {}
+        for iCol, Column in enumerate(Columns):
+            Data[Column] = np.array( \
+                cls.convert([Row[iCol] for Row in Rows]), dtype=object)
+
+        return cls(Columns, Data, np.arange(len(Rows)))
+
+#--------  Utilities:
+    @classmethod
+    def convert(cls, Fields):
+        NA = [Field in cls.NAvalues for Field in Fields]
+        for Type in [int, float]:
+            try:
+                Values = [np.nan if isNA else Type(Field) \
+                          for Field, isNA in zip(Fields, NA)]
+            except ValueError:
+                continue
+            if Type == int and any(NA):
+                Values = [float(Value) for Value in Values]
+            return Values
+        return [np.nan if isNA else Field for Field, isNA in zip(Fields, NA)]
+
+
 #--------  Exceptions:
 class badParameter(Exception):
     pass
@@ -1428,3 +2692,6 @@ class noFILE(Exception):
 
 class BLEnotvalid(Exception):
     pass
+
+class noCheckpoint(Exception):
+    pass
@@ -27,6 +27,26 @@ Class BeamLineElement:
   -----------------
         instances : List of instances of BeamLineElement class
       __Debug     : Debug flag
+     _TaylorOrder : Order of the polynomial-in-delta transfer matrices of
+                    the chromatic elements used by TransportBatch (None:
+                    exact matrices, default)
+     _TaylorRange : [delta_min, delta_max] over which the polynomial is
+                    fitted and used (default [-0.02, 0.02])
+      _GridPoints : Number of points of the delta grid on which the
+                    matrices of the chromatic elements are tabulated and
+                    interpolated by TransportBatch (None: no table,
+                    default)
+_GridInterpolation: "linear" or "cubic" (cubic spline) interpolation
+       _GridRange : [delta_min, delta_max] covered by the grid (None,
+                    default: derived from the source, see
+                    getSourceDeltaRange)
+ _GridRangeSource : Range derived from the source on first use after
+                    setDeltaGrid (None until then)
+      LossReasons : Names of the reasons for which a particle is lost,
+                    indexed by getLossReasonBatch: beam pipe, expansion
+                    parameter (on entry or exit), |z| cut, aperture by
+                    type, other (e.g. no valid phase space in RPLC
+                    switch)
 constants_instance: Instance of PhysicalConstants class
     speed_of_light: Speed of light from PhysicalConstants
 
@@ -51,9 +71,25 @@ constants_instance: Instance of PhysicalConstants class
                 axes.  3x3 np.ndarray
    _Rot2LbEnd : Calculated; otation matrix that takes RPLC axes to Lab
                 axes.  3x3 np.ndarray.  Set in derived class.
+        _iLoc : Index of element in beam line; index of reference-particle
+                record for element is _iLoc-1.
     _TrnsMtrx : Calculated; transfer matrix (6x6).  Set to Null in
                 __init__, initialised (to Null) in
                 BeamLineElement.__init__, set in derived classes.
+_TrnsMtrxStale: True if a set method has changed a parameter on which
+                the (particle independent) transfer matrix depends; the
+                matrix is then recalculated on the next call to
+                getTransferMatrix.
+_detTrnsfrMtrx: Cached determinant of transfer matrix; evaluated (and
+                checked) once per transfer matrix.
+     _nChange : Number of changes made to the element by its set
+                methods (see setChanged).
+  _nChangeAll : Class attribute; total number of changes made to all
+                elements.
+  _TaylorMap  : Polynomial-in-delta transfer matrix of a chromatic
+                element, [Key, Coeffs, ErrBound]; see calcTaylorMap.
+  _DeltaGrid  : Tabulated transfer matrix of a chromatic element,
+                [Key, Coeffs]; see calcDeltaGrid.
 
     
   Methods:
@@ -78,6 +114,45 @@ constants_instance: Instance of PhysicalConstants class
         setdvStrt  : Set offset orientation of element, theta, phi (rad)
      setRot2LbStrt : set rotation matrix totransform from RLBC to lab at
                      start.
+           setiLoc : Set index of element in beam line (set by
+                     BeamLine.addBeamLineElement)
+resetTransferMatrix: Flag transfer matrix and its determinant for
+                     recalculation.  Called by the set methods of elements
+                     with particle-independent transfer matrices (Drift,
+                     Aperture, Octupole, CylindricalRFCavity, RPLCswitch).
+                     Also calls setChanged.
+        setChanged : Increment the change count of the element; called by
+                     every set method that changes a parameter of the
+                     element (and by resetTransferMatrix).
+setTaylorExpansion : Class method; switch on (Order > 0) or off (None)
+                     the polynomial-in-delta transfer matrices of the
+                     chromatic elements (FocusQuadrupole,
+                     DefocusQuadrupole, Solenoid, SectorDipole,
+                     GaborLens) in TransportBatch.
+                Input: Order [int or None], DeltaRange [list, default
+                       [-0.02, 0.02]]
+                Switching on the polynomial switches off the delta grid.
+      setDeltaGrid : Class method; switch on (nPoints >= 2) or off
+                     (None) the tabulation of the matrices of the
+                     chromatic elements on a delta grid.
+                Input: nPoints [int or None], Interpolation ["linear" or
+                       "cubic"], DeltaRange [list, or None (default) to
+                       derive the range from the source on first use]
+                Switching on the grid switches off the polynomial.
+  validateDeltaGrid: Class method; compare, for each chromatic element,
+                     the interpolated matrices with the exact matrices
+                     and print the report.
+                Return: list of [Name, element type, max abs error]
+getSourceDeltaRange: Class method; delta range spanned by the last
+                     source created: min and max of the delta of a
+                     sample of particles (fixed seed) widened by Margin
+                     times the width (below the sample, by at most Margin
+                     times the distance to zero kinetic energy).
+                     [-0.02, 0.02] if there is no source that can be
+                     generated in batch.
+                Input: nSample [int, default 10000], Margin [float,
+                       default 0.1]
+                Return: [delta_min, delta_max]
 
   Get methods:
          getDebug  : get debug flag
@@ -91,7 +166,25 @@ constants_instance: Instance of PhysicalConstants class
      getRot2LbStrt : Get rotation matrix totransform from RLBC to lab at
                      start.
       getRot2LbEnd : Get rotation matrix totransform from RLBC to lab at end.
- getTransferMatrix : Get transfer matrix.
+           getiLoc : Get index of element in beam line; if not set, found
+                     (once) from list of instances.
+    getChangeCount : Get number of changes made to the element since it
+                     was created (see setChanged); composite elements
+                     (QuadDoublet, QuadTriplet) add the counts of their
+                     components.  Used by BeamLine to find stale compiled
+                     steps.
+getTotalChangeCount: Class method; get total number of changes made to all
+                     elements.
+  getRefKinematics : Get reference-particle p0, E0, beta0, gamma0 and Brho
+                     at entrance to element; row getiLoc()-1 of
+                     ReferenceParticle.getKinematicsIn().  Before the
+                     reference particle has reached the element (i.e.
+                     during construction) the last row is returned.
+ getTransferMatrix : Get transfer matrix; recalculated first if flagged
+                     by resetTransferMatrix.
+  getdetTrnsfrMtrx : Get determinant of transfer matrix.  Evaluated, and a
+                     warning printed if |det| differs from 1 by more than
+                     1.E-6, only when the transfer matrix has changed.
 
 
   Processing methods:
@@ -103,6 +196,139 @@ OutsideBeamPipe : Returns true of  particle outside beam pipe defined in
              Input: 6D phase-space vector, np.array.
             Return: 6D phase-space vector after element
 
+ TransportBatch : Batch version of Transport.  Applies the same
+                  acceptance tests as Transport to a bunch of particles and
+                  transports the survivors.
+             Input: np.ndarray(N,6) of trace-space vectors
+            Return: np.ndarray(n,6) of trace-space vectors of the n
+                    surviving particles after element, and
+                    np.ndarray(N,) bool mask, True for survivors.
+
+OutsideBeamPipeBatch, ExpansionParameterFailBatch:
+                  Batch versions of OutsideBeamPipe and
+                  ExpansionParameterFail.
+             Input: np.ndarray(N,6) of trace-space vectors
+            Return: np.ndarray(N,) bool, True if test fails
+                  ExpansionParameterFailBatch, AcceptanceFailBatch,
+                  TransportChromaticBatch (exact matrices) and
+                  Source.getParticles (laser driven) use the
+                  JIT-compiled kernels of TrackingKernels if numba is
+                  installed (see TrackingKernels.getJIT).
+
+AcceptanceFailBatch: Union of the acceptance tests applied by
+                  TransportBatch on entry to the element (beam pipe,
+                  expansion parameter and |z| cut).
+             Input: np.ndarray(N,6) of trace-space vectors; zCut
+                    (default 5.)
+            Return: np.ndarray(N,) bool, True if particle is lost
+
+getLossReasonBatch: Reason for which particles lost by Transport or
+                  TransportBatch were lost; the first test failed, in
+                  the order of Transport.  Called for lost particles
+                  only, so that the tracking path is unchanged.
+             Input: np.ndarray(N,6) of trace-space vectors on entry
+            Return: np.ndarray(N,) int, index in LossReasons
+
+initTransferMatrixBatch: Common start of calcTransferMatrixBatch of the
+                  chromatic elements: reference kinematics and, for each
+                  particle, energy and momentum, with the stack of
+                  matrices allocated and its longitudinal part
+                  (M44 = M55 = 1, M45 = l/beta0^2/gamma0^2) filled.
+             Input: delta, array-like (N,)
+            Return: [delta np.ndarray(N,), np.ndarray(N,6,6), p0, b0,
+                     E np.ndarray(N,), p np.ndarray(N,) (nan below zero
+                     kinetic energy)]
+
+getChromaticMatrixBatch: Transfer matrices of a chromatic element for a
+                  bunch.  Exact (calcTransferMatrixBatch) unless a Taylor
+                  order or a delta grid is set; then the polynomial or
+                  the interpolation is evaluated for the particles with
+                  delta in range and the exact matrices are used for
+                  the others.
+             Input: np.ndarray(N,) delta
+            Return: np.ndarray(N,6,6)
+
+TransportChromaticBatch: Transport a bunch through a chromatic element;
+                  used by TransportBatch.  With a Taylor order set the
+                  polynomial is applied to the trace space by Horner's
+                  scheme, i.e. (Order+1) products with fixed 6x6
+                  matrices, and no per-particle matrix is built.  With a
+                  delta grid set only the tabulated elements are
+                  interpolated per particle.
+             Input: np.ndarray(N,6) trace space
+            Return: np.ndarray(N,6) trace space at exit
+
+TransportKernelBatch: Exact transport of a bunch through a chromatic
+                  element with the JIT-compiled kernel of
+                  TrackingKernels; used by TransportChromaticBatch in
+                  place of calcTransferMatrixBatch.
+             Input: np.ndarray(N,6) trace space
+            Return: np.ndarray(N,6) trace space at exit
+
+  calcTaylorMap : Fit, once per element and reference energy (the fit is
+                  redone if the exact matrices at the ends and centre of
+                  the range change), the polynomial
+                    M(delta) = M0 + u M1 + u^2 M2 + ... ,
+                  u = (delta - delta_c)/half width of the range, to the
+                  exact matrices at Chebyshev nodes.  The error bound is
+                  the largest deviation of any matrix element from the
+                  exact matrix on a fine grid over the range.
+            Return: [Key, Coeffs np.ndarray(Order+1,6,6), ErrBound]
+
+getTaylorErrorBound: Error bound of the polynomial of the element over
+                  the Taylor range (None if no Taylor order set).
+
+  calcDeltaGrid : Tabulate, once per element and reference energy, the
+                  exact matrices at the nodes of the delta grid and
+                  store, for each interval, the coefficients of the
+                  linear or cubic-spline interpolation in
+                  t = delta - node.  The cost per particle is then the
+                  same for all element types.
+                  Only the delta-dependent elements are tabulated.
+            Return: [Key, Coeffs np.ndarray(nPoints-1, k+1, nV), Vary
+                    indices of the nV tabulated elements of the flattened
+                    matrix, constant part np.ndarray(6,6)]
+
+interpolateDeltaGrid: Interpolated delta-dependent matrix elements for
+                  a bunch (delta outside the grid is extrapolated from
+                  the end intervals; callers use the exact matrices).
+             Input: np.ndarray(N,) delta
+            Return: np.ndarray(N,nV)
+
+getDeltaGridError: Largest deviation of any interpolated matrix element
+                  from the exact value, evaluated at 8 points per grid
+                  interval (None if no grid set).
+
+   getAffineMap : Energy-independent affine map of the element, used by
+                  BeamLine to fuse consecutive elements.
+            Return: [M np.ndarray(6,6), c np.ndarray(6,)] such that
+                    R' = M.R + c, or None if the map depends on the
+                    particle (default).  Returned by Drift,
+                    CylindricalRFCavity and planar RPLCswitch.
+
+  compileKernel : Transport of one particle through the element as a
+                  function with the transfer matrix, or for the
+                  chromatic elements the function of delta returned by
+                  their compileTransferMatrix (which setTransferMatrix
+                  also uses, here filling one matrix in place), bound in;
+                  no acceptance test and no debug print.  Evaluated by
+                  BeamLine.compileBeamLine and again when the change
+                  count of the element (see getChangeCount) or the
+                  reference kinematics change.
+            Return: function, np.ndarray(6,) -> np.ndarray(6,) (None if
+                    the particle is lost in the element)
+
+    compileStep : The step taken by compiled tracking (see
+                  BeamLine.trackBeam): acceptance tests of Transport on
+                  entry, compileKernel and the expansion-parameter test
+                  on exit, with the beam-pipe radius and b0 bound in.
+                  A negative 1 + 2 delta/b0 + delta^2 fails the
+                  expansion-parameter test, as in the batch tests.
+             Input: zCut: |z| cut on entry (default 5., 2.5 for
+                    RPLCswitch; not applied by Aperture)
+            Return: function, np.ndarray(6,) -> np.ndarray(6,), None if
+                    the particle is lost
+
     Shift2Local : Transform from laboratory to local coordinates.
                  <---- Not correct yet!
              Input: 6D phase-space vector, np.array.
@@ -140,18 +366,21 @@ Created on Mon 12Jun23: Version history:
 @author: kennethlong
 """
 
-import matplotlib.patches as patches
 import scipy  as sp
 import numpy  as np
 import math   as mth
 import random as rnd
 import scipy
-from scipy.optimize import fsolve
 import struct as strct
 import math
 
+#.. matplotlib (visualise methods), scipy.optimize (laser-driven source)
+#   and scipy.interpolate (delta grid) are imported where used, on first
+#   use.
+
 import PhysicalConstants as PhysCnst
 import Particle          as Prtcl
+import TrackingKernels   as TrkKrnl
 import LaTeX             as LTX
 
 #.. Physical Constants
@@ -179,6 +408,27 @@ class BeamLineElement:
     instances  = []
     __Debug    = False
 
+#.. Polynomial-in-delta transfer matrices of chromatic elements:
+    _TaylorOrder = None
+    _TaylorRange = [-0.02, 0.02]
+
+#.. Tabulated transfer matrices of chromatic elements:
+    _GridPoints        = None
+    _GridInterpolation = "linear"
+    _GridRange         = None
+    _GridRangeSource   = None
+
+#.. Change count of an element, see setChanged; class default so that
+#   set methods called before BeamLineElement.__init__ may count.  Total
+#   over all elements kept for a quick check by BeamLine:
+    _nChange    = 0
+    _nChangeAll = 0
+
+#.. Reasons for loss of a particle, see getLossReasonBatch:
+    LossReasons = ["BeamPipe", "ExpansionParameter", "zCut", \
+                   "Aperture:Circular", "Aperture:Elliptical", \
+                   "Aperture:Rectangular", "Other"]
+
 #--------  "Built-in methods":
     def __init__(self, _Name=None, \
                  _rStrt=None, _vStrt=None, _drStrt=None, _dvStrt=None):
@@ -258,6 +508,13 @@ class BeamLineElement:
         self._Rot2LbStrt = None
         self._Rot2LbEnd  = None
         self._TrnsMtrx   = None
+
+        self._TrnsMtrxStale = False
+        self._detTrnsfrMtrx = None
+        self._TaylorMap     = None
+        self._DeltaGrid     = None
+
+        self._iLoc       = None
     
     def setName(self, _Name):
         if not isinstance(_Name, str):
@@ -296,6 +553,23 @@ class BeamLineElement:
 
     def setLength(self, _Length):
         self._Length = _Length
+        self.setChanged()
+
+    def setiLoc(self, _iLoc):
+        if not isinstance(_iLoc, int) or _iLoc < 0:
+            raise badParameter(" BeamLineElement.setiLoc: bad location:", \
+                               _iLoc)
+        self._iLoc = _iLoc
+
+    def resetTransferMatrix(self):
+        self._TrnsMtrx      = None
+        self._TrnsMtrxStale = True
+        self._detTrnsfrMtrx = None
+        self.setChanged()
+
+    def setChanged(self):
+        self._nChange += 1
+        BeamLineElement._nChangeAll += 1
 
     def setRot2LbStrt(self):
         if not isinstance(self.getvStrt(), np.ndarray):
@@ -449,9 +723,42 @@ class BeamLineElement:
 
         return vEnd
 
+    def getiLoc(self):
+        if self._iLoc is None:
+            self._iLoc = BeamLineElement.getinstances().index(self)
+        return self._iLoc
+
+    def getChangeCount(self):
+        return self._nChange
+
+    def getRefKinematics(self):
+        iRefPrtcl = Prtcl.ReferenceParticle.getinstances()
+        if not isinstance(iRefPrtcl, Prtcl.ReferenceParticle):
+            raise ReferenceParticleNotSpecified()
+
+        KinematicsIn = iRefPrtcl.getKinematicsIn()
+        iRef         = self.getiLoc() - 1
+        if iRef < 0 or iRef >= len(KinematicsIn):
+            iRef = len(KinematicsIn) - 1
+
+        return KinematicsIn[iRef]
+
     def getTransferMatrix(self):
+        if self._TrnsMtrx is None and self._TrnsMtrxStale:
+            self.setTransferMatrix()
+            self._TrnsMtrxStale = False
         return self._TrnsMtrx
 
+    def getdetTrnsfrMtrx(self):
+        if self._detTrnsfrMtrx is None:
+            self._detTrnsfrMtrx = np.linalg.det(self.getTransferMatrix())
+            error               = abs(1. - abs(self._detTrnsfrMtrx))
+            if error > 1.E-6:
+                print(" BeamLineElement.getdetTrnsfrMtrx:", \
+                      self.getName(), "; detTrnsfrMtrx:", \
+                      self._detTrnsfrMtrx)
+        return self._detTrnsfrMtrx
+
     def getLines(self):
         Lines = []
         return Lines
@@ -466,24 +773,15 @@ class BeamLineElement:
         return Outside
 
     def ExpansionParameterFail(self, _R):
-        iLctn = BeamLineElement.getinstances().index(self)
-        iAddr = iLctn - 1
-        
         if self.getDebug():
             print(" Particle.ExpansionParameterFail: start")
             with np.printoptions(linewidth=500,precision=7,suppress=True):
                 print("     ----> TraceSpace:", _R)
-                print("     ----> iLctn:", iLctn, self.getName())
-                print("     ----> iAddr:", iAddr)
+                print("     ----> iLoc:", self.getiLoc(), self.getName())
                 
         Fail = False
         
-        iRefPrtcl = Prtcl.ReferenceParticle.getinstances()
-
-        p0    = mth.sqrt(np.dot(iRefPrtcl.getPrIn()[iAddr][:3], \
-                                iRefPrtcl.getPrIn()[iAddr][:3]))
-        E0    = iRefPrtcl.getPrOut()[iAddr][3]
-        b0    = p0/E0
+        b0    = self.getRefKinematics()[2]
         D     = mth.sqrt(1. + \
                          2.*_R[5]/b0 +
                          _R[5]**2)
@@ -526,14 +824,11 @@ class BeamLineElement:
                isinstance(self, SectorDipole)      or \
                isinstance(self, GaborLens)         or \
                isinstance(self, QuadDoublet)       or \
-               isinstance(self, QuadTriplet):         \
+               isinstance(self, QuadTriplet):
                 self.setTransferMatrix(_R)
+                self._detTrnsfrMtrx = None
 
-            detTrnsfrMtrx = np.linalg.det(self.getTransferMatrix())
-            error         = abs(1. - abs(detTrnsfrMtrx))
-            if error > 1.E-6:
-                print(" BeamLineElement.Transport: detTrnsfrMtrx:", \
-                      detTrnsfrMtrx)
+            self.getdetTrnsfrMtrx()
             
             _Rprime = self.getTransferMatrix().dot(_R)
 
@@ -546,6 +841,420 @@ class BeamLineElement:
 
         return _Rprime
 
+#.. Batch (bunch) processing methods; same tests as scalar methods above
+#   applied to (N,6) array of trace-space vectors:
+    def OutsideBeamPipeBatch(self, _R):
+        Rad = np.sqrt(_R[:,0]**2 + _R[:,2]**2)
+        return Rad >= Facility.getinstances().getVCMVr()
+
+    def ExpansionParameterFailBatch(self, _R):
+        b0    = self.getRefKinematics()[2]
+        if TrkKrnl.TrackingKernels.getJIT():
+            return TrkKrnl.TrackingKernels.getKernel( \
+                                    "expansionParameterFail")(_R, b0)
+        with np.errstate(invalid='ignore'):
+            D2    = 1. + 2.*_R[:,5]/b0 + _R[:,5]**2
+            eps   = ( _R[:,1]**2 + _R[:,3]**2  ) / (2.*D2)
+
+        #.. Unphysical delta (D2 < 0, NaN) treated as failure:
+        return np.logical_not(eps <= 1.0)
+
+    def AcceptanceFailBatch(self, _R, zCut=5.):
+        if TrkKrnl.TrackingKernels.getJIT():
+            return TrkKrnl.TrackingKernels.getKernel("acceptanceFail")( \
+                        _R, Facility.getinstances().getVCMVr(), \
+                        self.getRefKinematics()[2], zCut)
+        return self.OutsideBeamPipeBatch(_R)         | \
+               self.ExpansionParameterFailBatch(_R) | \
+               (np.abs(_R[:,4]) > zCut)
+
+    def getLossReasonBatch(self, _R, zCut=5.):
+        return np.select([self.OutsideBeamPipeBatch(_R), \
+                          self.ExpansionParameterFailBatch(_R), \
+                          np.abs(_R[:,4]) > zCut], [0, 1, 2], \
+                         BeamLineElement.LossReasons.index("Other"))
+
+    def getAffineMap(self):
+        return None
+
+#.. Compiled tracking: the step of the element as one closure with the
+#   constants and the reference kinematics bound in; see compileStep:
+    def compileKernel(self):
+        if hasattr(self, "compileTransferMatrix"):
+            TransferMatrix = self.compileTransferMatrix()
+            TrnsMtrx       = TransferMatrix(0.)
+
+            def Kernel(_R):
+                return TransferMatrix(_R[5], TrnsMtrx).dot(_R)
+
+            return Kernel
+
+        self.getdetTrnsfrMtrx()
+        TrnsMtrx = self.getTransferMatrix().copy()
+        return TrnsMtrx.dot
+
+    def compileStep(self, zCut=5.):
+        Kernel = self.compileKernel()
+        Vr     = Facility.getinstances().getVCMVr()
+        b0     = self.getRefKinematics()[2]
+        sqrt   = mth.sqrt
+
+        def Step(_R):
+            x, xp, y, yp, z, d = _R.tolist()
+            D2 = 1. + 2.*d/b0 + d**2
+            if sqrt(x**2 + y**2) >= Vr or D2 <= 0. or \
+               (xp**2 + yp**2) / (2.*sqrt(D2)**2) > 1. or abs(z) > zCut:
+                return None
+            _Rprime = Kernel(_R)
+            if _Rprime is None:
+                return None
+            x, xp, y, yp, z, d = _Rprime.tolist()
+            D2 = 1. + 2.*d/b0 + d**2
+            if D2 <= 0. or (xp**2 + yp**2) / (2.*sqrt(D2)**2) > 1.:
+                return None
+            return _Rprime
+
+        return Step
+
+    @classmethod
+    def setTaylorExpansion(cls, Order=None, DeltaRange=[-0.02, 0.02]):
+        if Order != None and (not isinstance(Order, int) or Order < 1):
+            raise badParameter( \
+                " BeamLineElement.setTaylorExpansion: bad order:", Order)
+        if len(DeltaRange) != 2 or not DeltaRange[0] < 0. < DeltaRange[1]:
+            raise badParameter( \
+                " BeamLineElement.setTaylorExpansion: bad range:", \
+                DeltaRange)
+        BeamLineElement._TaylorOrder = Order
+        BeamLineElement._TaylorRange = [float(DeltaRange[0]), \
+                                        float(DeltaRange[1])]
+        if Order != None:
+            BeamLineElement._GridPoints = None
+
+    @classmethod
+    def setDeltaGrid(cls, nPoints=None, Interpolation="linear", \
+                     DeltaRange=None):
+        if nPoints != None and (not isinstance(nPoints, int) or \
+                                nPoints < 2):
+            raise badParameter( \
+                " BeamLineElement.setDeltaGrid: bad number of points:", \
+                nPoints)
+        if Interpolation not in ["linear", "cubic"] or \
+           (Interpolation == "cubic" and nPoints != None and nPoints < 4):
+            raise badParameter( \
+                " BeamLineElement.setDeltaGrid: bad interpolation:", \
+                Interpolation)
+        if DeltaRange != None and \
+           (len(DeltaRange) != 2 or not DeltaRange[0] < DeltaRange[1]):
+            raise badParameter( \
+                " BeamLineElement.setDeltaGrid: bad range:", DeltaRange)
+        BeamLineElement._GridPoints        = nPoints
+        BeamLineElement._GridInterpolation = Interpolation
+        BeamLineElement._GridRange         = None
+        BeamLineElement._GridRangeSource   = None
+        if DeltaRange != None:
+            BeamLineElement._GridRange     = [float(DeltaRange[0]), \
+                                              float(DeltaRange[1])]
+        if nPoints != None:
+            BeamLineElement._TaylorOrder = None
+
+    @classmethod
+    def validateDeltaGrid(cls):
+        Report = []
+        for iBLE in cls.getinstances():
+            if not hasattr(iBLE, "calcTransferMatrixBatch"):
+                continue
+            Report.append([iBLE.getName(), type(iBLE).__name__, \
+                           iBLE.getDeltaGridError()])
+
+        print(" BeamLineElement.validateDeltaGrid: points, interpolation,", \
+              "range:", cls.getGridPoints(), cls.getGridInterpolation(), \
+              cls.getGridRange())
+        for Name, Type, Error in Report:
+            print("     ---->", f"{Name:40s}", f"{Type:18s}", \
+                  "max abs error:", Error)
+
+        return Report
+
+    @classmethod
+    def getSourceDeltaRange(cls, nSample=10000, Margin=0.1):
+        iSrc = None
+        if len(Source.getinstances()) > 0:
+            iSrc = Source.getinstances()[-1]
+        if iSrc == None or not iSrc.getMode() in Source.BatchModes:
+            return [-0.02, 0.02]
+
+        #.. Fixed seed, the global random state is not touched:
+        delta = iSrc.getParticlesFromSource(nSample, \
+                                            np.random.default_rng(0))[:,5]
+        delta = delta[np.isfinite(delta)]
+        dMin  = float(np.min(delta))
+        dMax  = float(np.max(delta))
+        Wdth  = dMax - dMin
+        if not Wdth > 0.:
+            Wdth = 0.04
+
+        #.. Below the sample the margin is limited to a fraction of the
+        #   distance to zero kinetic energy, where the matrices diverge:
+        p0    = Prtcl.ReferenceParticle.getinstances().getMomentumIn(0)
+        dZero = (protonMASS - mth.sqrt(protonMASS**2 + p0**2)) / p0
+        return [max(dMin - Margin*Wdth, dMin - Margin*(dMin - dZero)), \
+                dMax + Margin*Wdth]
+
+    @classmethod
+    def getTotalChangeCount(cls):
+        return BeamLineElement._nChangeAll
+
+    @classmethod
+    def getTaylorOrder(cls):
+        return BeamLineElement._TaylorOrder
+
+    @classmethod
+    def getTaylorRange(cls):
+        return BeamLineElement._TaylorRange
+
+    @classmethod
+    def getGridPoints(cls):
+        return BeamLineElement._GridPoints
+
+    @classmethod
+    def getGridInterpolation(cls):
+        return BeamLineElement._GridInterpolation
+
+    @classmethod
+    def getGridRange(cls):
+        if BeamLineElement._GridRange != None:
+            return BeamLineElement._GridRange
+        if BeamLineElement._GridRangeSource == None:
+            BeamLineElement._GridRangeSource = cls.getSourceDeltaRange()
+            if cls.getDebug():
+                print(" BeamLineElement.getGridRange: range from source:", \
+                      BeamLineElement._GridRangeSource)
+        return BeamLineElement._GridRangeSource
+
+    def initTransferMatrixBatch(self, _delta):
+        p0, E0, b0, g0, Brho0 = self.getRefKinematics()
+        b02      = b0**2
+        g02      = 1./(1.-b02)
+
+        _delta   = np.asarray(_delta, dtype=float)
+        TrnsMtrx = np.zeros((len(_delta), 6, 6))
+        TrnsMtrx[:,4,4] = 1.
+        TrnsMtrx[:,4,5] = self.getLength()/b02/g02
+        TrnsMtrx[:,5,5] = 1.
+
+        with np.errstate(invalid='ignore'):
+            E = E0 + p0*_delta
+            p = np.sqrt(E**2 - protonMASS**2)
+
+        return [_delta, TrnsMtrx, p0, b0, E, p]
+
+    def calcTaylorMap(self):
+        Order      = self.getTaylorOrder()
+        dMin, dMax = self.getTaylorRange()
+        dC         = 0.5*(dMax + dMin)
+        dH         = 0.5*(dMax - dMin)
+
+        #.. Refit only if the element or the reference energy changed:
+        Key = self.calcTransferMatrixBatch(np.array([dMin, dC, dMax]))
+        Key = np.append(Key.flatten(), [Order, dMin, dMax])
+        if self._TaylorMap != None and \
+           np.array_equal(self._TaylorMap[0], Key):
+            return self._TaylorMap
+
+        #.. Fit the delta-dependent elements at Chebyshev nodes, keep the
+        #   others exact:
+        nFit   = 4*(Order + 1)
+        uFit   = np.cos(np.pi*(np.arange(nFit) + 0.5)/nFit)
+        MFit   = self.calcTransferMatrixBatch(dC + dH*uFit).reshape(nFit, 36)
+        Vary   = np.nonzero(np.ptp(MFit, axis=0) > 0.)[0]
+        Coeffs = np.zeros((Order+1, 36))
+        Coeffs[0]      = Key[36:72]
+        Coeffs[:,Vary] = \
+            np.polynomial.polynomial.polyfit(uFit, MFit[:,Vary], Order)
+
+        uChk     = np.linspace(-1., 1., 201)
+        MChk     = self.calcTransferMatrixBatch(dC + dH*uChk).reshape(201, 36)
+        Pwrs     = uChk[:,np.newaxis]**np.arange(Order+1)
+        ErrBound = np.max(np.abs(Pwrs @ Coeffs - MChk))
+
+        if self.getDebug():
+            print(" BeamLineElement.calcTaylorMap:", self.getName(), \
+                  "; order, range, error bound:", Order, dMin, dMax, \
+                  ErrBound)
+
+        self._TaylorMap = [Key, Coeffs.reshape(Order+1, 6, 6), ErrBound]
+        return self._TaylorMap
+
+    def getTaylorErrorBound(self):
+        if self.getTaylorOrder() == None:
+            return None
+        return self.calcTaylorMap()[2]
+
+    def calcDeltaGrid(self):
+        from scipy.interpolate import CubicSpline
+
+        nPoints    = self.getGridPoints()
+        Intrpltn   = self.getGridInterpolation()
+        dMin, dMax = self.getGridRange()
+
+        #.. Retabulate only if the element or the reference energy changed:
+        Key = self.calcTransferMatrixBatch(np.array([dMin, 0., dMax]))
+        Key = np.append(Key.flatten(), \
+                        [nPoints, Intrpltn == "cubic", dMin, dMax])
+        if self._DeltaGrid != None and \
+           np.array_equal(self._DeltaGrid[0], Key):
+            return self._DeltaGrid
+
+        #.. Tabulate the delta-dependent elements only, the others are
+        #   kept in a constant matrix:
+        Nodes  = np.linspace(dMin, dMax, nPoints)
+        M      = self.calcTransferMatrixBatch(Nodes).reshape(nPoints, 36)
+        Vary   = np.nonzero(np.ptp(M, axis=0) > 0.)[0]
+        Cnst   = M[0].copy()
+        Cnst[Vary] = 0.
+        if Intrpltn == "linear":
+            Coeffs = np.array([M[:-1,Vary], \
+                               np.diff(M[:,Vary], axis=0)/np.diff(Nodes)[0]])
+        else:
+            Coeffs = CubicSpline(Nodes, M[:,Vary], axis=0).c[::-1]
+
+        if self.getDebug():
+            print(" BeamLineElement.calcDeltaGrid:", self.getName(), \
+                  "; points, interpolation, range:", nPoints, Intrpltn, \
+                  dMin, dMax, "; elements tabulated:", len(Vary))
+
+        #.. Coefficients stored interval by interval, (nPoints-1, k+1, nV):
+        self._DeltaGrid = [Key, np.ascontiguousarray(Coeffs.swapaxes(0, 1)), \
+                           Vary, Cnst.reshape(6, 6)]
+        return self._DeltaGrid
+
+    def getDeltaGridError(self):
+        if self.getGridPoints() == None:
+            return None
+        dMin, dMax = self.getGridRange()
+        delta = np.linspace(dMin, dMax, 8*(self.getGridPoints() - 1) + 1)
+        return np.max(np.abs(self.getChromaticMatrixBatch(delta) - \
+                             self.calcTransferMatrixBatch(delta)))
+
+    def interpolateDeltaGrid(self, _delta):
+        Coeffs     = self.calcDeltaGrid()[1]
+        dMin, dMax = self.getGridRange()
+        h          = (dMax - dMin) / len(Coeffs)
+        iInt       = np.clip(((_delta - dMin)/h).astype(int), \
+                             0, len(Coeffs)-1)
+        t          = (_delta - dMin - iInt*h)[:,np.newaxis]
+
+        return np.einsum('nk,nkj->nj', \
+                         t**np.arange(np.shape(Coeffs)[1]), Coeffs[iInt])
+
+    def getChromaticMatrixBatch(self, _delta):
+        _delta = np.asarray(_delta, dtype=float)
+        if self.getGridPoints() != None:
+            Key, Coeffs, Vary, Cnst = self.calcDeltaGrid()
+            dMin, dMax = self.getGridRange()
+            TrnsMtrx   = np.tile(Cnst.flatten(), (len(_delta), 1))
+            TrnsMtrx[:,Vary] = self.interpolateDeltaGrid(_delta)
+            TrnsMtrx   = TrnsMtrx.reshape(len(_delta), 6, 6)
+
+            Out = (_delta < dMin) | (_delta > dMax)
+            if np.any(Out):
+                TrnsMtrx[Out] = self.calcTransferMatrixBatch(_delta[Out])
+            return TrnsMtrx
+
+        if self.getTaylorOrder() == None:
+            return self.calcTransferMatrixBatch(_delta)
+
+        Coeffs     = self.calcTaylorMap()[1]
+        dMin, dMax = self.getTaylorRange()
+        u          = (_delta - 0.5*(dMax + dMin)) / (0.5*(dMax - dMin))
+        TrnsMtrx   = np.einsum('nk,kij->nij', \
+                               u[:,np.newaxis]**np.arange(len(Coeffs)), \
+                               Coeffs)
+
+        Out = (_delta < dMin) | (_delta > dMax)
+        if np.any(Out):
+            TrnsMtrx[Out] = self.calcTransferMatrixBatch(_delta[Out])
+
+        return TrnsMtrx
+
+    def TransportChromaticBatch(self, _R):
+        if self.getGridPoints() != None:
+            #.. Constant part as one matrix product, tabulated elements
+            #   (row i, column j) added as V_ij R_j to row i:
+            Key, Coeffs, Vary, Cnst = self.calcDeltaGrid()
+            dMin, dMax = self.getGridRange()
+            Rows       = np.zeros((len(Vary), 6))
+            Rows[np.arange(len(Vary)), Vary//6] = 1.
+            _Rprime    = _R @ Cnst.T + \
+                (self.interpolateDeltaGrid(_R[:,5]) * _R[:,Vary%6]) @ Rows
+
+            Out = (_R[:,5] < dMin) | (_R[:,5] > dMax)
+            if np.any(Out):
+                TrnsMtrx     = self.calcTransferMatrixBatch(_R[Out][:,5])
+                _Rprime[Out] = np.einsum('nij,nj->ni', TrnsMtrx, _R[Out])
+            return _Rprime
+
+        if self.getTaylorOrder() == None:
+            if TrkKrnl.TrackingKernels.getJIT():
+                return self.TransportKernelBatch(_R)
+            TrnsMtrx = self.calcTransferMatrixBatch(_R[:,5])
+            return np.einsum('nij,nj->ni', TrnsMtrx, _R)
+
+        #.. Horner's scheme in u with the fixed coefficient matrices; no
+        #   per-particle matrices are built:
+        Coeffs     = self.calcTaylorMap()[1]
+        dMin, dMax = self.getTaylorRange()
+        u          = (_R[:,5] - 0.5*(dMax + dMin)) / (0.5*(dMax - dMin))
+        _Rprime    = _R @ Coeffs[-1].T
+        for Coeff in Coeffs[-2::-1]:
+            _Rprime *= u[:,np.newaxis]
+            _Rprime += _R @ Coeff.T
+
+        Out = (_R[:,5] < dMin) | (_R[:,5] > dMax)
+        if np.any(Out):
+            TrnsMtrx     = self.calcTransferMatrixBatch(_R[Out][:,5])
+            _Rprime[Out] = np.einsum('nij,nj->ni', TrnsMtrx, _R[Out])
+
+        return _Rprime
+
+    def TransportBatch(self, _R):
+        if not isinstance(_R, np.ndarray) or np.ndim(_R) != 2 or \
+           np.shape(_R)[1] != 6:
+            raise badParameter( \
+                    " BeamLineElement.TransportBatch: bad input array:", \
+                                np.shape(_R))
+
+        if self.getDebug():
+            print(" BeamLineElement.TransportBatch:", self.getName(), \
+                  "; number of particles:", np.shape(_R)[0])
+
+        Alive = np.logical_not(self.AcceptanceFailBatch(_R))
+
+        _Rprime = np.empty((np.count_nonzero(Alive), 6))
+        if isinstance(self, DefocusQuadrupole) or \
+           isinstance(self, FocusQuadrupole)   or \
+           isinstance(self, Solenoid)          or \
+           isinstance(self, SectorDipole)      or \
+           isinstance(self, GaborLens):
+            _Rprime[:] = self.TransportChromaticBatch(_R[Alive])
+        elif isinstance(self, QuadDoublet)       or \
+             isinstance(self, QuadTriplet):
+            iPrtcl = -1
+            for _Ri in _R[Alive]:
+                iPrtcl += 1
+                self.setTransferMatrix(_Ri)
+                _Rprime[iPrtcl] = self.getTransferMatrix().dot(_Ri)
+        else:
+            _Rprime[:] = np.matmul(_R[Alive], \
+                                   np.transpose(self.getTransferMatrix()))
+
+        if self.getDebug():
+            print(" <---- TransportBatch: number of survivors:", \
+                  np.shape(_Rprime)[0])
+
+        return _Rprime, Alive
+
     def Shift2Local(self, _R):
         if not isinstance(_R, np.ndarray) or np.size(_R) != 6:
             raise badParameter( \
@@ -674,6 +1383,8 @@ class BeamLineElement:
                       inst.Name, "not in BeamLineElement.Instances!")
                 
     def visualise(self, axs, CoordSys, Proj):
+        import matplotlib.patches as patches
+
         if self.getDebug():
             print(" BeamLineElement.visualise: start")
             print("     ----> self.getrStrt():", self.getrStrt())
@@ -882,6 +1593,7 @@ class Facility(BeamLineElement):
                      " BeamLineElement.Facility.setp0: bad p0",
                                 _p0)
         self._p0 = _p0
+        self.setChanged()
 
     def setVCMVr(self, _VCMVr=None):
         if not isinstance(_VCMVr, float):
@@ -889,6 +1601,7 @@ class Facility(BeamLineElement):
                      " BeamLineElement.Facility.setVCMVr: bad VCMVr",
                                 _VCMVr)
         self._VCMVr = _VCMVr
+        self.setChanged()
 
         
 #--------  "get methods"
@@ -1035,6 +1748,7 @@ Derived class Drift:
 
   Get methods:
      getLength  : get debug flag
+  getAffineMap  : [transfer matrix, zero offset]
 
 """
 class Drift(BeamLineElement):
@@ -1096,24 +1810,17 @@ class Drift(BeamLineElement):
             raise badParameter(" BeamLineElement.Drift.setLength: bad length:",
                                _Length)
         self._Length = _Length
+        self.resetTransferMatrix()
 
     def setTransferMatrix(self):
-        iRefPrtcl = Prtcl.ReferenceParticle.getinstances()
-        if not isinstance(iRefPrtcl, Prtcl.ReferenceParticle):
-            raise ReferenceParticleNotSpecified()
-
-        iPrev = len(iRefPrtcl.getPrOut()) - 1
-
-        p0        = mth.sqrt(np.dot(iRefPrtcl.getPrOut()[iPrev][:3], \
-                                    iRefPrtcl.getPrOut()[iPrev][:3]))
-        E0        = iRefPrtcl.getPrOut()[iPrev][3]
+        p0, E0, b0, g0, Brho0 = self.getRefKinematics()
         b02       = (p0/E0)**2
         g02       = 1./(1.-b02)
         
         if self.getDebug():
             print(" Drift(BeamLineElement).setTransferMatrix:")
-            print("     ----> Reference particle 4-mmtm:", \
-                  iRefPrtcl.getPrIn()[0])
+            print("     ----> Reference particle p0, E0, b0, g0, Brho0:", \
+                  self.getRefKinematics())
             print("         ----> p0, E0:", p0, E0)
             print("     <---- b02, g02:", b02, g02)
 
@@ -1142,6 +1849,9 @@ class Drift(BeamLineElement):
 
     def getLength(self):
         return self._Length
+
+    def getAffineMap(self):
+        return [self.getTransferMatrix(), np.zeros(6)]
     
         
 #--------  I/o methods:
@@ -1283,6 +1993,7 @@ setAoertureParameters: Sets aperture parameters:
    getLenbgth: Returns length of aperture (presently 0)
 
   Utilities:
+getLossReasonBatch: Losses are due to the aperture; "Aperture:<type>".
 
 
 """
@@ -1390,6 +2101,8 @@ class Aperture(BeamLineElement):
             self._Params = np.append(self._Params, _Param[1])
             self._Params = np.append(self._Params, _Param[2])
 
+        self.resetTransferMatrix()
+
     def setTransferMatrix(self):
         
         TrnsMtrx = np.array( [ \
@@ -1455,18 +2168,78 @@ class Aperture(BeamLineElement):
         if not NotCut:
             return _Rprime
 
-        detTrnsfrMtrx = np.linalg.det(self.getTransferMatrix())
-        error         = abs(1. - abs(detTrnsfrMtrx))
-        if error > 1.E-6:
-            print(" Aperture(BeamLineElement).Transport: detTrnsfrMtrx:", \
-                  detTrnsfrMtrx)
+        self.getdetTrnsfrMtrx()
 
         _Rprime = None
         if NotCut:
             _Rprime = self.getTransferMatrix().dot(_R)
-            
+
         return _Rprime
 
+    def TransportBatch(self, _R):
+        if not isinstance(_R, np.ndarray) or np.ndim(_R) != 2 or \
+           np.shape(_R)[1] != 6:
+            raise badParameter( \
+                " Aperture(BeamLineElement).TransportBatch: bad input:", \
+                                np.shape(_R))
+
+        if self.getDebug():
+            print(" Aperture(BeamLineElement).TransportBatch:", \
+                  self.getType(), self.getParams())
+
+        Alive = np.ones(np.shape(_R)[0], dtype=bool)
+        if self.getType() == 0:
+            Rad   = np.sqrt(_R[:,0]**2 + _R[:,2]**2)
+            Alive = Rad < self.getParams()[0]
+        elif self.getType() == 1:
+            RadX2 = (_R[:,0]/self.getParams()[0])**2
+            RadY2 = (_R[:,2]/self.getParams()[1])**2
+            Alive = (RadX2+RadY2) < 1.
+        elif self.getType() == 2:
+            Alive = (np.abs(_R[:,0]) <= self.getParams()[0]) & \
+                    (np.abs(_R[:,2]) <= self.getParams()[1])
+
+        _Rprime = np.matmul(_R[Alive], np.transpose(self.getTransferMatrix()))
+
+        return _Rprime, Alive
+
+    def getLossReasonBatch(self, _R):
+        return np.full(np.shape(_R)[0], \
+                       BeamLineElement.LossReasons.index("Aperture:Circular") \
+                       + self.getType())
+
+    def compileStep(self, zCut=None):
+        Kernel = self.compileKernel()
+        Type   = self.getType()
+        Params = list(self.getParams())
+        b0     = self.getRefKinematics()[2]
+        sqrt   = mth.sqrt
+
+        if Type == 0:
+            def Cut(x, y):
+                return sqrt(x**2 + y**2) >= Params[0]
+        elif Type == 1:
+            def Cut(x, y):
+                return (x/Params[0])**2 + (y/Params[1])**2 >= 1.
+        elif Type == 2:
+            def Cut(x, y):
+                return abs(x) > Params[0] or abs(y) > Params[1]
+        else:
+            def Cut(x, y):
+                return False
+
+        def Step(_R):
+            if Cut(_R[0], _R[2]):
+                return None
+            _Rprime = Kernel(_R)
+            x, xp, y, yp, z, d = _Rprime.tolist()
+            D2 = 1. + 2.*d/b0 + d**2
+            if D2 <= 0. or (xp**2 + yp**2) / (2.*sqrt(D2)**2) > 1.:
+                return None
+            return _Rprime
+
+        return Step
+
     def visualise(self, axs, CoordSys, Proj):
         if self.getDebug():
             print(" Aperture(BeamLineElement).visualise: start")
@@ -1686,11 +2459,21 @@ Derived class FocusQuadrupole:
 setTransferMatrix: Set transfer matrix; calculate using i/p brhop
           Input: Brho (T m)
          Return: np.array(6,6,) transfer matrix
+compileTransferMatrix: Transfer matrix as a function of delta, with the
+               strength and the reference kinematics bound in; used by
+               setTransferMatrix and by compiled tracking (compileKernel).
+         Return: function, delta [float] (and, optionally, the
+                 np.ndarray(6,6) to fill in place) -> np.ndarray(6,6)
 
   Get methods:
       getLength, getStrength
 
   Utilities:
+calcTransferMatrixBatch: Stacked transfer matrices for a bunch; same
+               calculation as setTransferMatrix, vectorised in delta
+          Input: _delta: np.ndarray(N,) of particle delta values
+         Return: np.ndarray(N,6,6) transfer matrices
+
     Transport: transport through focus quad.  Sets transfer matrix (using
                call to setTransferMatrix) given Brho
             Input:
@@ -1793,6 +2576,7 @@ class FocusQuadrupole(BeamLineElement):
                             "BeamLineElement.FocusQuadrupole.setFQmode:", \
                             " bad FQmode:", _FQmode)
         self._FQmode = _FQmode
+        self.setChanged()
 
     def setLength(self, _Length):
         if not isinstance(_Length, float):
@@ -1800,6 +2584,7 @@ class FocusQuadrupole(BeamLineElement):
                             "BeamLineElement.FocusQuadrupole.setLength:", \
                             " bad length:", _Length)
         self._Length = _Length
+        self.setChanged()
 
     def setStrength(self, _Strength):
         if not isinstance(_Strength, float):
@@ -1807,6 +2592,7 @@ class FocusQuadrupole(BeamLineElement):
                     "BeamLineElement.FocusQuadrupole.setStrength:", \
                     " bad quadrupole strength:", _Strength)
         self._Strength = _Strength
+        self.setChanged()
 
     def setkFQ(self, _kFQ):
         if not isinstance(_kFQ, float):
@@ -1814,73 +2600,100 @@ class FocusQuadrupole(BeamLineElement):
                     "BeamLineElement.FocusQuadrupole.setStrength:", \
                                 " bad quadrupole k constant:", _kFQ)
         self._kFQ = _kFQ
+        self.setChanged()
 
     def setTransferMatrix(self, _R):
-        iRefPrtcl = Prtcl.ReferenceParticle.getinstances()
-        if not isinstance(iRefPrtcl, Prtcl.ReferenceParticle):
-            raise ReferenceParticleNotSpecified()
-
-        iPrev = len(iRefPrtcl.getPrOut()) - 1
-
-        p0        = mth.sqrt(np.dot(iRefPrtcl.getPrOut()[iPrev][:3], \
-                                    iRefPrtcl.getPrOut()[iPrev][:3]))
-        E0        = iRefPrtcl.getPrOut()[iPrev][3]
-        b0        = p0/E0
-        b02       = b0**2
-        g02       = 1./(1.-b02)
-        
         if self.getDebug():
             print(" FocusQuadrupole(BeamLineElement).setTransferMatrix:")
             with np.printoptions(linewidth=500,precision=7,suppress=True):
-                print("     ----> Reference particle 4-mmtm:", \
-                      iRefPrtcl.getPrOut()[iPrev])
-            print("         ----> p0, E0:", p0, E0)
-            print("     <---- b0, b02, g02:", b0, b02, g02)
-
-        if self.getDebug():
-            with np.printoptions(linewidth=500,precision=7,suppress=True):
+                print("     ----> Reference particle p0, E0, b0, g0, Brho0:", \
+                      self.getRefKinematics())
                 print("     ----> Trace space:", _R)
 
-        D   = 1.
-        Scl = 1.
-        if self.getFQmode() == 1:
-            D = mth.sqrt(1. + 2.*_R[5]/b0 + _R[5]**2)
-        else:
-            E   = E0 + _R[5]*p0
-            p   = mth.sqrt(E**2 - protonMASS**2)
-            if p > 0:
-                Scl = p0 / p
-        
-        if self.getDebug():
-            print("     ----> D:", D)
-            print("     ----> E, p, Scl:", E, p, Scl)
+        self._TrnsMtrx = self.compileTransferMatrix()(_R[5])
 
-        k = self.getkFQ() * Scl
-        l = self.getLength()
+        if self.getDebug():
+            with np.printoptions(linewidth=500,precision=7,suppress=True):
+                print(self._TrnsMtrx)
+
+    def compileTransferMatrix(self):
+        p0, E0, b0, g0, Brho0 = self.getRefKinematics()
+        b02   = b0**2
+        g02   = 1./(1.-b02)
+        Mode  = self.getFQmode()
+        kFQ   = self.getkFQ()
+        l     = self.getLength()
+        sqrt  = mth.sqrt
+        Tmplt = np.identity(6)
+        Tmplt[4,5] = l/b02/g02
+
+        def TransferMatrix(d, TrnsMtrx=None):
+            D   = 1.
+            Scl = 1.
+            if Mode == 1:
+                D = sqrt(1. + 2.*d/b0 + d**2)
+            else:
+                E = E0 + d*p0
+                p = sqrt(E**2 - protonMASS**2)
+                if p > 0:
+                    Scl = p0 / p
+            b = sqrt(kFQ*Scl/D)
+            a = l * b
+            b = b * D
+            if TrnsMtrx is None:
+                TrnsMtrx = Tmplt.copy()
+            TrnsMtrx[0,0] = TrnsMtrx[1,1] = mth.cos(a)
+            TrnsMtrx[0,1] =  mth.sin(a)/b
+            TrnsMtrx[1,0] = -b*mth.sin(a)
+            TrnsMtrx[2,2] = TrnsMtrx[3,3] = mth.cosh(a)
+            TrnsMtrx[2,3] =  mth.sinh(a)/b
+            TrnsMtrx[3,2] =  b*mth.sinh(a)
+            return TrnsMtrx
+
+        return TransferMatrix
+
+    def TransportKernelBatch(self, _R):
+        p0, E0, b0, g0, Brho0 = self.getRefKinematics()
+        b02 = b0**2
+        g02 = 1./(1.-b02)
+        l   = self.getLength()
+        return TrkKrnl.TrackingKernels.getKernel("transportQuadrupole")( \
+                    _R, self.getkFQ(), l, b0, p0, E0, l/b02/g02, \
+                    self.getFQmode(), 0, 2)
+
+    def calcTransferMatrixBatch(self, _delta):
+        _delta, TrnsMtrx, p0, b0, E, p = self.initTransferMatrixBatch(_delta)
+
+        D   = np.ones(len(_delta))
+        Scl = np.ones(len(_delta))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if self.getFQmode() == 1:
+                D   = np.sqrt(1. + 2.*_delta/b0 + _delta**2)
+            else:
+                Scl = np.where(p > 0., p0/p, 1.)
 
-        b = mth.sqrt(k/D)
-        a = l * b
-        b = b * D
+            k = self.getkFQ() * Scl
+            l = self.getLength()
 
-        if self.getDebug():
-            print("     ----> Length, Strength, kFQ:", \
-                  self.getLength(), self.getStrength(), self.getkFQ())
-            print("     ----> omegaPrime*L, omegaPrime*D:", a, b)
+            b = np.sqrt(k/D)
+            a = l * b
+            b = b * D
 
-        TrnsMtrx = np.array([                                             \
-            [   np.cos(a), np.sin(a)/b, 0., 0.,                   0., 0.],\
-            [-b*np.sin(a),   np.cos(a), 0., 0.,                   0., 0.],\
-            [          0.,          0., np.cosh(a), np.sinh(a)/b, 0., 0.],\
-            [          0.,          0., b*np.sinh(a), np.cosh(a), 0., 0.],\
-            [          0.,          0.,           0., 0.,  1., l/b02/g02],\
-            [          0.,          0.,           0., 0.,  0.,        1.]\
-                            ])
+            Xf, Yf = 0, 2
+            TrnsMtrx[:,Xf,  Xf  ] =    np.cos(a)
+            TrnsMtrx[:,Xf,  Xf+1] =    np.sin(a)/b
+            TrnsMtrx[:,Xf+1,Xf  ] = -b*np.sin(a)
+            TrnsMtrx[:,Xf+1,Xf+1] =    np.cos(a)
+            TrnsMtrx[:,Yf,  Yf  ] =    np.cosh(a)
+            TrnsMtrx[:,Yf,  Yf+1] =    np.sinh(a)/b
+            TrnsMtrx[:,Yf+1,Yf  ] =  b*np.sinh(a)
+            TrnsMtrx[:,Yf+1,Yf+1] =    np.cosh(a)
 
         if self.getDebug():
-            with np.printoptions(linewidth=500,precision=7,suppress=True):
-                print(TrnsMtrx)
+            print(" FocusQuadrupole(BeamLineElement)" \
+                  ".calcTransferMatrixBatch:", len(_delta), "matrices")
 
-        self._TrnsMtrx = TrnsMtrx
+        return TrnsMtrx
 
         
 # -------- "Get methods"
@@ -1956,6 +2769,8 @@ class FocusQuadrupole(BeamLineElement):
         return Strn
     
     def visualise(self, axs, CoordSys, Proj):
+        import matplotlib.patches as patches
+
         if self.getDebug():
             print(" FocusQuadrupole(BeamLineElement).visualise: start")
             print("     ----> CoordSys, Proj:", CoordSys, Proj)
@@ -2253,11 +3068,21 @@ Derived class DefocusQuadrupole:
 setTransferMatrix: Set transfer matrix; calculate using i/p brhop
           Input: Brho (T m)
          Return: np.array(6,6,) transfer matrix
+compileTransferMatrix: Transfer matrix as a function of delta, with the
+               strength and the reference kinematics bound in; used by
+               setTransferMatrix and by compiled tracking (compileKernel).
+         Return: function, delta [float] (and, optionally, the
+                 np.ndarray(6,6) to fill in place) -> np.ndarray(6,6)
 
   Get methods:
       getLength, getStrength
 
   Utilities:
+calcTransferMatrixBatch: Stacked transfer matrices for a bunch; same
+               calculation as setTransferMatrix, vectorised in delta
+          Input: _delta: np.ndarray(N,) of particle delta values
+         Return: np.ndarray(N,6,6) transfer matrices
+
     Transport: transport through focus quad.  Sets transfer matrix (using
                call to setTransferMatrix) given Brho
             Input:
@@ -2360,6 +3185,7 @@ class DefocusQuadrupole(BeamLineElement):
                             "BeamLineElement.FocusQuadrupole.setDQmode:", \
                             " bad DQmode:", _DQmode)
         self._DQmode = _DQmode
+        self.setChanged()
 
     def setLength(self, _Length):
         if not isinstance(_Length, float):
@@ -2367,6 +3193,7 @@ class DefocusQuadrupole(BeamLineElement):
                 "BeamLineElement.DefocusQuadrupole.setLength:", \
                 " bad length:", _Length)
         self._Length = _Length
+        self.setChanged()
 
     def setStrength(self, _Strength):
         if not isinstance(_Strength, float):
@@ -2374,6 +3201,7 @@ class DefocusQuadrupole(BeamLineElement):
                 "BeamLineElement.DefocusQuadrupole.setStrength:", \
                 " bad quadrupole strength:", _Strength)
         self._Strength = _Strength
+        self.setChanged()
 
     def setkDQ(self, _kDQ):
         if not isinstance(_kDQ, float):
@@ -2381,73 +3209,100 @@ class DefocusQuadrupole(BeamLineElement):
                     "BeamLineElement.DefocusQuadrupole.setkDQ:", \
                                 " bad quadrupole k constant:", _kDQ)
         self._kDQ = _kDQ
+        self.setChanged()
 
     def setTransferMatrix(self, _R):
-        iRefPrtcl = Prtcl.ReferenceParticle.getinstances()
-        if not isinstance(iRefPrtcl, Prtcl.ReferenceParticle):
-            raise ReferenceParticleNotSpecified()
-
-        iPrev = len(iRefPrtcl.getPrOut()) - 1
-
-        p0        = mth.sqrt(np.dot(iRefPrtcl.getPrOut()[iPrev][:3], \
-                                    iRefPrtcl.getPrOut()[iPrev][:3]))
-        E0        = iRefPrtcl.getPrOut()[iPrev][3]
-        b0        = p0/E0
-        b02       = b0**2
-        g02       = 1./(1.-b02)
-        
         if self.getDebug():
             print(" DefocusQuadrupole(BeamLineElement).setTransferMatrix:")
             with np.printoptions(linewidth=500,precision=7,suppress=True):
-                print("     ----> Reference particle 4-mmtm:", \
-                      iRefPrtcl.getPrOut()[iPrev])
-            print("         ----> p0, E0:", p0, E0)
-            print("     <---- b0, b02, g02:", b0, b02, g02)
-
-        if self.getDebug():
-            with np.printoptions(linewidth=500,precision=7,suppress=True):
+                print("     ----> Reference particle p0, E0, b0, g0, Brho0:", \
+                      self.getRefKinematics())
                 print("     ----> Trace space:", _R)
 
-        D   = 1.
-        Scl = 1.
-        if self.getDQmode() == 1:
-            D = mth.sqrt(1. + 2.*_R[5]/b0 + _R[5]**2)
-        else:
-            E   = E0 + _R[5]*p0
-            p   = mth.sqrt(E**2 - protonMASS**2)
-            if p > 0:
-                Scl = p0 / p
-        
-        if self.getDebug():
-            print("     ----> D:", D)
-            print("     ----> E, p, Scl:", E, p, Scl)
+        self._TrnsMtrx = self.compileTransferMatrix()(_R[5])
 
-        k = self.getkDQ() * Scl
-        l = self.getLength()
+        if self.getDebug():
+            with np.printoptions(linewidth=500,precision=7,suppress=True):
+                print(self._TrnsMtrx)
+
+    def compileTransferMatrix(self):
+        p0, E0, b0, g0, Brho0 = self.getRefKinematics()
+        b02   = b0**2
+        g02   = 1./(1.-b02)
+        Mode  = self.getDQmode()
+        kDQ   = self.getkDQ()
+        l     = self.getLength()
+        sqrt  = mth.sqrt
+        Tmplt = np.identity(6)
+        Tmplt[4,5] = l/b02/g02
+
+        def TransferMatrix(d, TrnsMtrx=None):
+            D   = 1.
+            Scl = 1.
+            if Mode == 1:
+                D = sqrt(1. + 2.*d/b0 + d**2)
+            else:
+                E = E0 + d*p0
+                p = sqrt(E**2 - protonMASS**2)
+                if p > 0:
+                    Scl = p0 / p
+            b = sqrt(kDQ*Scl/D)
+            a = l * b
+            b = b * D
+            if TrnsMtrx is None:
+                TrnsMtrx = Tmplt.copy()
+            TrnsMtrx[2,2] = TrnsMtrx[3,3] = mth.cos(a)
+            TrnsMtrx[2,3] =  mth.sin(a)/b
+            TrnsMtrx[3,2] = -b*mth.sin(a)
+            TrnsMtrx[0,0] = TrnsMtrx[1,1] = mth.cosh(a)
+            TrnsMtrx[0,1] =  mth.sinh(a)/b
+            TrnsMtrx[1,0] =  b*mth.sinh(a)
+            return TrnsMtrx
+
+        return TransferMatrix
+
+    def TransportKernelBatch(self, _R):
+        p0, E0, b0, g0, Brho0 = self.getRefKinematics()
+        b02 = b0**2
+        g02 = 1./(1.-b02)
+        l   = self.getLength()
+        return TrkKrnl.TrackingKernels.getKernel("transportQuadrupole")( \
+                    _R, self.getkDQ(), l, b0, p0, E0, l/b02/g02, \
+                    self.getDQmode(), 2, 0)
+
+    def calcTransferMatrixBatch(self, _delta):
+        _delta, TrnsMtrx, p0, b0, E, p = self.initTransferMatrixBatch(_delta)
+
+        D   = np.ones(len(_delta))
+        Scl = np.ones(len(_delta))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if self.getDQmode() == 1:
+                D   = np.sqrt(1. + 2.*_delta/b0 + _delta**2)
+            else:
+                Scl = np.where(p > 0., p0/p, 1.)
 
-        b = mth.sqrt(k/D)
-        a = l * b
-        b = b * D
+            k = self.getkDQ() * Scl
+            l = self.getLength()
 
-        if self.getDebug():
-            print("     ----> Length, Strength, kDQ:", \
-                  self.getLength(), self.getStrength(), self.getkDQ())
-            print("     ----> omegaPrime*L, omegaPrime*D:", a, b)
+            b = np.sqrt(k/D)
+            a = l * b
+            b = b * D
 
-        TrnsMtrx = np.array([                                               \
-            [  np.cosh(a), np.sinh(a)/b,           0.,          0., 0., 0.],\
-            [b*np.sinh(a),   np.cosh(a),           0.,          0., 0., 0.],\
-            [          0.,           0.,    np.cos(a), np.sin(a)/b, 0., 0.],\
-            [          0.,           0., -b*np.sin(a),   np.cos(a), 0., 0.],\
-            [          0.,           0.,           0.,  0.,  1., l/b02/g02],\
-            [          0.,           0.,           0.,  0.,  0.,        1.]\
-        ])
+            Xf, Yf = 2, 0
+            TrnsMtrx[:,Xf,  Xf  ] =    np.cos(a)
+            TrnsMtrx[:,Xf,  Xf+1] =    np.sin(a)/b
+            TrnsMtrx[:,Xf+1,Xf  ] = -b*np.sin(a)
+            TrnsMtrx[:,Xf+1,Xf+1] =    np.cos(a)
+            TrnsMtrx[:,Yf,  Yf  ] =    np.cosh(a)
+            TrnsMtrx[:,Yf,  Yf+1] =    np.sinh(a)/b
+            TrnsMtrx[:,Yf+1,Yf  ] =  b*np.sinh(a)
+            TrnsMtrx[:,Yf+1,Yf+1] =    np.cosh(a)
 
         if self.getDebug():
-            with np.printoptions(linewidth=500,precision=7,suppress=True):
-                print(TrnsMtrx)
+            print(" DefocusQuadrupole(BeamLineElement)" \
+                  ".calcTransferMatrixBatch:", len(_delta), "matrices")
 
-        self._TrnsMtrx = TrnsMtrx
+        return TrnsMtrx
 
         
 # -------- "Get methods"
@@ -2523,6 +3378,8 @@ class DefocusQuadrupole(BeamLineElement):
         return Strn
 
     def visualise(self, axs, CoordSys, Proj):
+        import matplotlib.patches as patches
+
         if self.getDebug():
             print(" DefocusQuadrupole(BeamLineElement).visualise: start")
             print("     ----> CoordSys, Proj:", CoordSys, Proj)
@@ -2821,11 +3678,21 @@ Derived class SectorDipole:
 setTransferMatrix: Set transfer matrix; calculate using i/p brhop
           Input: Brho (T m)
          Return: np.array(6,6,) transfer matrix
+compileTransferMatrix: Transfer matrix as a function of delta, with the
+               strength and the reference kinematics bound in; used by
+               setTransferMatrix and by compiled tracking (compileKernel).
+         Return: function, delta [float] (and, optionally, the
+                 np.ndarray(6,6) to fill in place) -> np.ndarray(6,6)
 
   Get methods:
       getAngle
 
   Utilities:
+calcTransferMatrixBatch: Stacked transfer matrices for a bunch; same
+               calculation as setTransferMatrix, vectorised in delta
+          Input: _delta: np.ndarray(N,) of particle delta values
+         Return: np.ndarray(N,6,6) transfer matrices
+
 
 """
 class SectorDipole(BeamLineElement):
@@ -2893,6 +3760,8 @@ class SectorDipole(BeamLineElement):
         return Str
 
     def visualise(self, axs, CoordSys, Proj):
+        import matplotlib.patches as patches
+
         if self.getDebug():
             print(" SectorDipole(BeamLineElement).visualise: start")
             print("     ----> CoordSys, Proj:", CoordSys, Proj)
@@ -3010,6 +3879,7 @@ class SectorDipole(BeamLineElement):
                                "BeamLineElement.SectorDipole.setAngle:", \
                                "bad bending angle (Angle):", _Angle)
         self._Angle = _Angle
+        self.setChanged()
 
     def setB(self, _B):
         if not isinstance(_B, float):
@@ -3017,6 +3887,7 @@ class SectorDipole(BeamLineElement):
                                "BeamLineElement.SectorDipole.setB:", \
                                "bad B:", _B)
         self._B = _B
+        self.setChanged()
 
     def setLength(self):
         iRefPrtcl = Prtcl.ReferenceParticle.getinstances()
@@ -3042,33 +3913,64 @@ class SectorDipole(BeamLineElement):
             print("     ----> Brho, r, l:", Brho, r, l)
 
         self._Length = l
+        self.setChanged()
 
     def setTransferMatrix(self, _R):
-        iRefPrtcl = Prtcl.ReferenceParticle.getinstances()
-        if not isinstance(iRefPrtcl, Prtcl.ReferenceParticle):
-            raise ReferenceParticleNotSpecified()
-
-        iPrev = len(iRefPrtcl.getPrOut()) - 1
-
-        p0        = mth.sqrt(np.dot(iRefPrtcl.getPrOut()[iPrev][:3], \
-                                    iRefPrtcl.getPrOut()[iPrev][:3]))
-        E0        = iRefPrtcl.getPrOut()[iPrev][3]
-        b0        = p0/E0
-        b02       = b0**2
-        g02       = 1./(1.-b02)
-        
         if self.getDebug():
             print(" Dipole(BeamLineElement).setTransferMatrix:")
-            print("     ----> Reference particle 4-mmtm:", \
-                  iRefPrtcl.getPrIn()[0])
-            print("         ----> p0, E0:", p0, E0)
-            print("     <---- b02, g02:", b02, g02)
-        
-        E    = E0 + p0*_R[5]
-        p    = mth.sqrt(E**2 - protonMASS**2)
-        
+            with np.printoptions(linewidth=500,precision=7,suppress=True):
+                print("     ----> Reference particle p0, E0, b0, g0, Brho0:", \
+                      self.getRefKinematics())
+                print("     ----> Trace space:", _R)
+
+        self._TrnsMtrx = self.compileTransferMatrix()(_R[5])
+
         if self.getDebug():
-            print("     ----> Particle energy and mmtm:", E, p)
+            with np.printoptions(linewidth=500,precision=7,suppress=True):
+                print(self._TrnsMtrx)
+
+    def compileTransferMatrix(self):
+        p0, E0, b0, g0, Brho0 = self.getRefKinematics()
+        b02   = b0**2
+        g02   = 1./(1.-b02)
+        B     = self.getB()
+        c     = np.cos(self.getAngle())
+        s     = np.sin(self.getAngle())
+        l     = self.getLength()
+        R56   = l/b02/g02
+        sqrt  = mth.sqrt
+        Tmplt = np.identity(6)
+        Tmplt[0,0] = Tmplt[1,1] = c
+        Tmplt[2,3] = l
+
+        def TransferMatrix(d, TrnsMtrx=None):
+            E    = E0 + p0*d
+            Brho = (1/(speed_of_light*1.E-9))*sqrt(E**2 - protonMASS**2)/1000.
+            r    = Brho / B
+            if TrnsMtrx is None:
+                TrnsMtrx = Tmplt.copy()
+            TrnsMtrx[0,1] =  r*s
+            TrnsMtrx[0,5] =  r*(1-c)/b0
+            TrnsMtrx[1,0] = -s/r
+            TrnsMtrx[1,5] =  s/b0
+            TrnsMtrx[4,0] = -s/b0
+            TrnsMtrx[4,1] = -(r/b0)*(1.-c)
+            TrnsMtrx[4,5] =  R56 - (l-r*s)/b0**2
+            return TrnsMtrx
+
+        return TransferMatrix
+
+    def TransportKernelBatch(self, _R):
+        p0, E0, b0, g0, Brho0 = self.getRefKinematics()
+        b02 = b0**2
+        g02 = 1./(1.-b02)
+        l   = self.getLength()
+        return TrkKrnl.TrackingKernels.getKernel("transportSectorDipole")( \
+                    _R, self.getB(), np.cos(self.getAngle()), \
+                    np.sin(self.getAngle()), l, b0, p0, E0, l/b02/g02)
+
+    def calcTransferMatrixBatch(self, _delta):
+        _delta, TrnsMtrx, p0, b0, E, p = self.initTransferMatrixBatch(_delta)
 
         Brho = (1/(speed_of_light*1.E-9))*p/1000.
         r    = Brho / self.getB()
@@ -3076,23 +3978,24 @@ class SectorDipole(BeamLineElement):
         s    = np.sin(self.getAngle())
         l    = self.getLength()
 
-        if self.getDebug():
-            print("     ----> Brho, r, c, s, l:", Brho, r, c, s, l)
-
-        TrnsMtrx = np.array([
-            [     c,            r*s, 0., 0., 0.,                r*(1-c)/b0],
-            [  -s/r,              c, 0., 0., 0.,                      s/b0],
-            [    0.,             0., 1.,  l, 0.,                        0.],
-            [    0.,             0., 0., 1., 0.,                        0.],
-            [ -s/b0, -(r/b0)*(1.-c), 0., 0., 1., l/b02/g02 - (l-r*s)/b0**2],
-            [    0.,             0., 0., 0., 0.,                        1.]
-        ])
+        TrnsMtrx[:,0,0] = c
+        TrnsMtrx[:,0,1] = r*s
+        TrnsMtrx[:,0,5] = r*(1-c)/b0
+        TrnsMtrx[:,1,0] = -s/r
+        TrnsMtrx[:,1,1] = c
+        TrnsMtrx[:,1,5] = s/b0
+        TrnsMtrx[:,2,2] = 1.
+        TrnsMtrx[:,2,3] = l
+        TrnsMtrx[:,3,3] = 1.
+        TrnsMtrx[:,4,0] = -s/b0
+        TrnsMtrx[:,4,1] = -(r/b0)*(1.-c)
+        TrnsMtrx[:,4,5] -= (l-r*s)/b0**2
 
         if self.getDebug():
-            with np.printoptions(linewidth=500,precision=7,suppress=True):
-                print(TrnsMtrx)
+            print(" Dipole(BeamLineElement).calcTransferMatrixBatch:", \
+                  len(_delta), "matrices")
 
-        self._TrnsMtrx = TrnsMtrx
+        return TrnsMtrx
 
     @classmethod
     def setDebug(cls, Debug=False):
@@ -3218,6 +4121,7 @@ class Octupole(BeamLineElement):
         if not isinstance(_Length, float):
             raise badParameter("BeamLineElement.Octupole.setLength: bad length:", _Length)
         self._Length = _Length
+        self.resetTransferMatrix()
 
     def setTransferMatrix(self):
         l = self._Length
@@ -3293,12 +4197,22 @@ setTransferMatrix: Set transfer matrix; calculate using i/p kinetic
                    energy for test particle and reference particle
           Input: Brho (T m)
          Return: np.array(6,6,) transfer matrix
+compileTransferMatrix: Transfer matrix as a function of delta, with the
+               strength and the reference kinematics bound in; used by
+               setTransferMatrix and by compiled tracking (compileKernel).
+         Return: function, delta [float] (and, optionally, the
+                 np.ndarray(6,6) to fill in place) -> np.ndarray(6,6)
          Return: np.array(6,6,) transfer matrix
 
   Get methods:
       getLength, getStrength
 
   Utilities:
+calcTransferMatrixBatch: Stacked transfer matrices for a bunch; same
+               calculation as setTransferMatrix, vectorised in delta
+          Input: _delta: np.ndarray(N,) of particle delta values
+         Return: np.ndarray(N,6,6) transfer matrices
+
     Transport: transport through solenoid.  Sets transfer matrix (using
                call to setTransferMatrix) given Brho
             Input:
@@ -3394,6 +4308,7 @@ class Solenoid(BeamLineElement):
                 "BeamLineElement.Solenoid.setLength: bad length:", \
                                 _Length)
         self._Length = _Length
+        self.setChanged()
 
     def setStrength(self, _Strength):
         if not isinstance(_Strength, float):
@@ -3401,6 +4316,7 @@ class Solenoid(BeamLineElement):
                                " bad strength value:", \
                                _Strength)
         self._Strength = _Strength
+        self.setChanged()
 
     def setksol(self, _ksol):
         if not isinstance(_ksol, float):
@@ -3408,67 +4324,103 @@ class Solenoid(BeamLineElement):
                     "BeamLineElement.Solenloid.setcsol:", \
                                 " bad quadrupole k constant:", _kDQ)
         self._ksol = _ksol
+        self.setChanged()
 
     def setTransferMatrix(self, _R):
-        iRefPrtcl = Prtcl.ReferenceParticle.getinstances()
-        if not isinstance(iRefPrtcl, Prtcl.ReferenceParticle):
-            raise ReferenceParticleNotSpecified()
-
-        iPrev = len(iRefPrtcl.getPrOut()) - 1
-
-        p0        = mth.sqrt(np.dot(iRefPrtcl.getPrOut()[iPrev][:3], \
-                                    iRefPrtcl.getPrOut()[iPrev][:3]))
-        E0        = iRefPrtcl.getPrOut()[iPrev][3]
-        b02       = (p0/E0)**2
-        g02       = 1./(1.-b02)
-        
         if self.getDebug():
             print(" Solenoid(BeamLineElement).setTransferMatrix:")
             with np.printoptions(linewidth=500,precision=7,suppress=True):
-                print("     ----> Reference particle 4-mmtm:", \
-                      iRefPrtcl.getPrIn()[0])
-            print("         ----> p0, E0:", p0, E0)
-            print("     <---- b02, g02:", b02, g02)
+                print("     ----> Reference particle p0, E0, b0, g0, Brho0:", \
+                      self.getRefKinematics())
+                print("     ----> Trace space:", _R)
+
+        self._TrnsMtrx = self.compileTransferMatrix()(_R[5])
 
         if self.getDebug():
             with np.printoptions(linewidth=500,precision=7,suppress=True):
-                print("     ----> Trace space:", _R)
+                print(self._TrnsMtrx)
+
+    def compileTransferMatrix(self):
+        p0, E0, b0, g0, Brho0 = self.getRefKinematics()
+        b02   = (p0/E0)**2
+        g02   = 1./(1.-b02)
+        l     = self.getLength()
+        Bs    = self.getStrength()
+        sqrt  = mth.sqrt
+        Tmplt = np.identity(6)
+        Tmplt[4,5] = l/b02/g02
+
+        def TransferMatrix(d, TrnsMtrx=None):
+            E    = E0 + p0*d
+            Brho = (1./(speed_of_light*1.E-9))*sqrt(E**2 - protonMASS**2) \
+                   /1000.
+            k    = Bs / (2.*Brho)
+            ckl  = mth.cos(k*l)
+            skl  = mth.sin(k*l)
+            sckl = ckl*skl
+            ckl2 = ckl**2
+            skl2 = skl**2
+            if TrnsMtrx is None:
+                TrnsMtrx = Tmplt.copy()
+            TrnsMtrx[0,0] = TrnsMtrx[1,1] = TrnsMtrx[2,2] = TrnsMtrx[3,3] = ckl2
+            TrnsMtrx[0,1] = TrnsMtrx[2,3] =  sckl/k
+            TrnsMtrx[1,0] = TrnsMtrx[3,2] = -k*sckl
+            TrnsMtrx[0,2] = TrnsMtrx[1,3] =  sckl
+            TrnsMtrx[2,0] = TrnsMtrx[3,1] = -sckl
+            TrnsMtrx[0,3] =  skl2/k
+            TrnsMtrx[2,1] = -skl2/k
+            TrnsMtrx[1,2] = -k*skl2
+            TrnsMtrx[3,0] =  k*skl2
+            return TrnsMtrx
+
+        return TransferMatrix
+
+    def TransportKernelBatch(self, _R):
+        p0, E0, b0, g0, Brho0 = self.getRefKinematics()
+        b02 = b0**2
+        g02 = 1./(1.-b02)
+        l   = self.getLength()
+        return TrkKrnl.TrackingKernels.getKernel("transportSolenoid")( \
+                    _R, self.getStrength(), l, p0, E0, l/b02/g02)
 
-        E    = E0 + p0*_R[5]
-        p    = mth.sqrt(E**2 - protonMASS**2)
-        
-        if self.getDebug():
-            print("     ----> Particle energy and mmtm:", E, p)
+    def calcTransferMatrixBatch(self, _delta):
+        _delta, TrnsMtrx, p0, b0, E, p = self.initTransferMatrixBatch(_delta)
 
         Brho = (1./(speed_of_light*1.E-9))*p/1000.
         l  = self.getLength()
-        k  = self.getStrength() / (2.*Brho)
-        
-        ckl  = mth.cos(k*l)
-        skl  = mth.sin(k*l)
-        sckl = ckl*skl
-
-        if self.getDebug():
-            print("     ----> Length, Strength:", \
-                  self.getLength(), self.getStrength())
-            print("     ----> Brho, k, l:", Brho, k, l)
-
-        TrnsMtrx = np.array([                                      \
-            [   ckl**2,    sckl/k,      sckl, (skl**2)/k, 0., 0.], \
-            [  -k*sckl,    ckl**2, -k*skl**2,       sckl, 0., 0.], \
-            [    -sckl, -skl**2/k,    ckl**2,     sckl/k, 0., 0.], \
-            [ k*skl**2,     -sckl,   -k*sckl,     ckl**2, 0., 0.], \
-            [       0.,        0.,        0.,  0.,  1., l/b02/g02],\
-            [       0.,        0.,        0.,  0.,  0.,        1.] \
-                             ])
-
-        if self.getDebug():
-            with np.printoptions(linewidth=500,precision=7,suppress=True):
-                print(TrnsMtrx)
-
-        self._TrnsMtrx = TrnsMtrx
+        with np.errstate(divide='ignore', invalid='ignore'):
+            k  = self.getStrength() / (2.*Brho)
+
+            ckl  = np.cos(k*l)
+            skl  = np.sin(k*l)
+            sckl = ckl*skl
+
+            TrnsMtrx[:,0,0] =  ckl**2
+            TrnsMtrx[:,0,1] =  sckl/k
+            TrnsMtrx[:,0,2] =  sckl
+            TrnsMtrx[:,0,3] =  (skl**2)/k
+            TrnsMtrx[:,1,0] = -k*sckl
+            TrnsMtrx[:,1,1] =  ckl**2
+            TrnsMtrx[:,1,2] = -k*skl**2
+            TrnsMtrx[:,1,3] =  sckl
+            TrnsMtrx[:,2,0] = -sckl
+            TrnsMtrx[:,2,1] = -skl**2/k
+            TrnsMtrx[:,2,2] =  ckl**2
+            TrnsMtrx[:,2,3] =  sckl/k
+            TrnsMtrx[:,3,0] =  k*skl**2
+            TrnsMtrx[:,3,1] = -sckl
+            TrnsMtrx[:,3,2] = -k*sckl
+            TrnsMtrx[:,3,3] =  ckl**2
+
+        if self.getDebug():
+            print(" Solenoid(BeamLineElement).calcTransferMatrixBatch:", \
+                  len(_delta), "matrices")
+
+        return TrnsMtrx
 
     def visualise(self, axs, CoordSys, Proj):
+        import matplotlib.patches as patches
+
         if self.getDebug():
             print(" Solenoid(BeamLineElement).visualise: start")
             print("     ----> self.getrStrt():", self.getrStrt())
@@ -3717,12 +4669,22 @@ setTransferMatrix: Set transfer matrix; calculate using i/p kinetic
                    energy for test particle and reference particle
           Input: Brho (T m)
          Return: np.array(6,6,) transfer matrix
+compileTransferMatrix: Transfer matrix as a function of delta, with the
+               strength and the reference kinematics bound in; used by
+               setTransferMatrix and by compiled tracking (compileKernel).
+         Return: function, delta [float] (and, optionally, the
+                 np.ndarray(6,6) to fill in place) -> np.ndarray(6,6)
          Return: np.array(6,6,) transfer matrix
 
   Get methods:
       getLength, getElectronDensity
 
   Utilities:
+calcTransferMatrixBatch: Stacked transfer matrices for a bunch; same
+               calculation as setTransferMatrix, vectorised in delta
+          Input: _delta: np.ndarray(N,) of particle delta values
+         Return: np.ndarray(N,6,6) transfer matrices
+
     Transport: transport through solenoid.  Sets transfer matrix (using
                call to setTransferMatrix) given Brho
             Input:
@@ -3835,30 +4797,35 @@ class GaborLens(BeamLineElement):
             raise badParameter( \
                 "BeamLineElement.GaborLens.setBz: bad length:", _Bz)
         self._Bz = _Bz
+        self.setChanged()
 
     def setVA(self, _VA):
         if not isinstance(_VA, float):
             raise badParameter( \
                 "BeamLineElement.GaborLens.setVA: bad length:", _VA)
         self._VA = _VA
+        self.setChanged()
 
     def setRA(self, _RA):
         if not isinstance(_RA, float):
             raise badParameter( \
                 "BeamLineElement.GaborLens.setRA: bad length:", _RA)
         self._RA = _RA
+        self.setChanged()
 
     def setRp(self, _Rp):
         if not isinstance(_Rp, float):
             raise badParameter( \
                 "BeamLineElement.GaborLens.setRp: bad length:", _Rp)
         self._Rp = _Rp
+        self.setChanged()
 
     def setLength(self, _Length):
         if not isinstance(_Length, float):
             raise badParameter( \
                 "BeamLineElement.GaborLens.setLength: bad length:", _Length)
         self._Length = _Length
+        self.setChanged()
 
     def setStrength(self, _Strength):
         if not isinstance(_Strength, float):
@@ -3866,6 +4833,7 @@ class GaborLens(BeamLineElement):
                 "BeamLineElement.GaborLens.setLength: bad strength:", \
                                 _Strength)
         self._Strength = _Strength
+        self.setChanged()
 
     def setElectronDensity(self):
         if isinstance(self.getStrength(), float):
@@ -3908,78 +4876,97 @@ class GaborLens(BeamLineElement):
             print("     ----> ne_longi:", ne_longi)
 
         self._ElectronDensity = min(ne_trans, ne_longi)
+        self.setChanged()
         
         if self.getDebug():
             print(" <---- Electron density:", self.getElectronDensity())
             
     def setTransferMatrix(self, _R):
-        iRefPrtcl = Prtcl.ReferenceParticle.getinstances()
-        if not isinstance(iRefPrtcl, Prtcl.ReferenceParticle):
-            raise ReferenceParticleNotSpecified()
-
-        iPrev = len(iRefPrtcl.getPrOut()) - 1
-
-        p0  = mth.sqrt(np.dot(iRefPrtcl.getPrOut()[iPrev][:3], \
-                              iRefPrtcl.getPrOut()[iPrev][:3]))
-        E0  = iRefPrtcl.getPrOut()[iPrev][3]
-        b02 = (p0/E0)**2
-        g02 = 1./(1.-b02)
-        g0  = mth.sqrt(g02)
-        
         if self.getDebug():
             print(" GaborLens(BeamLineElement).setTransferMatrix:")
-            print("     ----> Reference particle 4-mmtm:", \
-                  iRefPrtcl.getPrIn()[0])
-            b0 = mth.sqrt(b02)
-            print("         ----> p0, E0:", p0, E0)
-            print("     <---- b0, g0:", b0, g0)
-            
-        if self.getDebug():
             with np.printoptions(linewidth=500,precision=7,suppress=True):
+                print("     ----> Reference particle p0, E0, b0, g0, Brho0:", \
+                      self.getRefKinematics())
                 print("     ----> Trace space:", _R)
 
-        E = E0 + p0*_R[5]
-        p = mth.sqrt(E**2 - protonMASS**2)
-        g = E / protonMASS  
-        
+        self._TrnsMtrx = self.compileTransferMatrix()(_R[5])
+
         if self.getDebug():
-            print("     ----> Particle energy and mmtm:", E, p)
+            with np.printoptions(linewidth=500,precision=7,suppress=True):
+                print(self._TrnsMtrx)
+
+    def compileTransferMatrix(self):
+        p0, E0, b0, g0, Brho0 = self.getRefKinematics()
+        b02   = (p0/E0)**2
+        g02   = 1./(1.-b02)
+        l     = self.getLength()
+        ne    = self.getElectronDensity()
+        sqrt  = mth.sqrt
+        Tmplt = np.identity(6)
+        Tmplt[4,5] = l/b02/g02
+
+        def TransferMatrix(d, TrnsMtrx=None):
+            E   = E0 + p0*d
+            p   = sqrt(E**2 - protonMASS**2)
+            g   = E / protonMASS
+            w   = sqrt((electricCHARGE**2 * protonMASS * g) / \
+                       (2.*epsilon0 * p**2) * ne /m2InvMeV)
+            cwl = mth.cos(w*l)
+            swl = mth.sin(w*l)
+            if TrnsMtrx is None:
+                TrnsMtrx = Tmplt.copy()
+            TrnsMtrx[0,0] = TrnsMtrx[1,1] = TrnsMtrx[2,2] = TrnsMtrx[3,3] = cwl
+            TrnsMtrx[0,1] = TrnsMtrx[2,3] =  swl/w
+            TrnsMtrx[1,0] = TrnsMtrx[3,2] = -w*swl
+            return TrnsMtrx
+
+        return TransferMatrix
+
+    def TransportKernelBatch(self, _R):
+        p0, E0, b0, g0, Brho0 = self.getRefKinematics()
+        b02 = b0**2
+        g02 = 1./(1.-b02)
+        l   = self.getLength()
+        kGL = electricCHARGE**2 / (2.*epsilon0) * \
+              self.getElectronDensity() / m2InvMeV
+        return TrkKrnl.TrackingKernels.getKernel("transportGaborLens")( \
+                    _R, kGL, l, p0, E0, l/b02/g02)
+
+    def calcTransferMatrixBatch(self, _delta):
+        _delta, TrnsMtrx, p0, b0, E, p = self.initTransferMatrixBatch(_delta)
 
         l      = self.getLength()
         ne     = self.getElectronDensity()
 
-        if self.getDebug():
-            print("     ----> alpha, electricCHARGE, epsilon0:", \
-                  alpha, electricCHARGE, epsilon0)
-            print("     ----> Joule2MeV:", Joule2MeV)
-            print("     ----> m2InvMeV:", m2InvMeV)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            g = E / protonMASS
 
-        k      = (electricCHARGE**2 * protonMASS * g) / \
-                 (2.*epsilon0 * p**2) * \
-                 ne /m2InvMeV
-        w      = mth.sqrt(k)
-        if self.getDebug():
-            print("     ----> k, w:", k, w)
-        
-        cwl  = mth.cos(w*l)
-        swl  = mth.sin(w*l)
+            k      = (electricCHARGE**2 * protonMASS * g) / \
+                     (2.*epsilon0 * p**2) * \
+                     ne /m2InvMeV
+            w      = np.sqrt(k)
+
+            cwl  = np.cos(w*l)
+            swl  = np.sin(w*l)
+
+            TrnsMtrx[:,0,0] =     cwl
+            TrnsMtrx[:,0,1] =     swl/w
+            TrnsMtrx[:,1,0] =  -w*swl
+            TrnsMtrx[:,1,1] =     cwl
+            TrnsMtrx[:,2,2] =     cwl
+            TrnsMtrx[:,2,3] =     swl/w
+            TrnsMtrx[:,3,2] =  -w*swl
+            TrnsMtrx[:,3,3] =     cwl
 
-        TrnsMtrx = np.array([                               \
-            [    cwl, swl/w,     0.,    0.,        0., 0.], \
-            [ -w*swl,   cwl,     0.,    0.,        0., 0.], \
-            [     0.,    0.,    cwl, swl/w,        0., 0.], \
-            [     0.,    0., -w*swl,   cwl,        0., 0.], \
-            [     0.,    0.,     0.,    0.,  1., l/b02/g02],\
-            [     0.,    0.,     0.,    0.,  0.,        1.] \
-                             ])
-        
         if self.getDebug():
-            with np.printoptions(linewidth=500,precision=7,suppress=True):
-                print(TrnsMtrx)
+            print(" GaborLens(BeamLineElement).calcTransferMatrixBatch:", \
+                  len(_delta), "matrices")
 
-        self._TrnsMtrx = TrnsMtrx
+        return TrnsMtrx
 
     def visualise(self, axs, CoordSys, Proj):
+        import matplotlib.patches as patches
+
         if self.getDebug():
             print(" GaborLens(BeamLineElement).visualise: start")
             print("     ----> self.getrStrt():", self.getrStrt())
@@ -4198,6 +5185,8 @@ Derived class CylindricalRFCavity:
   Instance attributes to define drift:
   ------------------------------------
   _       : 
+  _RefValues : [b0, g0b0, p0] of the reference particle entering the
+               cavity, kept when the cavity is created
   
     
   Methods:
@@ -4208,9 +5197,22 @@ Derived class CylindricalRFCavity:
       __str__ : Dump of constants
 
   Set methods:
+ setGradient, setFrequency, setPhase, setLength : set the parameter and
+                     recalculate the derived quantities with
+                     setDerivedQuantities.
+ setDerivedQuantities : Calculate angular frequency, wave number, length
+                     (from the frequency unless given), radius, transit
+                     time factor, V0, alpha and the perpendicular and
+                     parallel w, c and s; then reset the transfer matrix
+                     and m_rf.  Does nothing until gradient, frequency
+                     and phase are all set.
+             Input : _Length [float, default None]
+ resetTransferMatrix : As BeamLineElement; m_rf is reset too.
  setTransferMatrix : "Calculate" and set transfer matrix.
 
   Get methods:
+            getmrf : m_rf; recalculated first if reset.
+      getAffineMap : [transfer matrix, m_rf]
 
 
 """
@@ -4247,60 +5249,20 @@ class CylindricalRFCavity(BeamLineElement):
                                       _Gradient, _Frequency, _Phase)
 
 
-        self.setGradient(_Gradient)
-        self.setFrequency(_Frequency)
-        self.setPhase(_Phase)
-
-        _AngularFrequency  = self.getFrequency()*2.*mth.pi * 10.**6
-        self.setAngularFrequency(_AngularFrequency)
-        _WaveNumber        = self.getAngularFrequency() / speed_of_light
-        self.setWaveNumber(_WaveNumber)
-        
+        #.. Reference particle entering the cavity, kept for the
+        #   recalculation of the derived quantities by the set methods:
         iRefPrtcl = Prtcl.ReferenceParticle.getinstances()
         if not isinstance(iRefPrtcl, Prtcl.ReferenceParticle):
             raise ReferenceParticleNotSpecified()
         iPrev = len(iRefPrtcl.getPrOut()) - 1
-        b0        = iRefPrtcl.getb0(iPrev)
-        g0b0      = iRefPrtcl.getg0b0(iPrev)
-        
-        _Length   = mth.pi*b0*speed_of_light / \
-            self.getAngularFrequency()
-        self.setLength(_Length)
-
-        _Radius   = sp.special.jn_zeros(0, 1)[0]/self.getWaveNumber()
-        self.setRadius(_Radius)
-
-        """
-          Eqn 3.141 in Wolsli seems to have an error, expression for
-          transit time factor below rederived 16Feb24, need to check
-          with Andy.
-        """
-        _TransitTimeFactor = (2.*b0)                                 / \
-                             (self.getWaveNumber()*self.getLength()) * \
-                  mth.sin(self.getWaveNumber()*self.getLength()/2./b0)
-        self.setTransitTimeFactor(_TransitTimeFactor)
-        _V0 = self.getLength()*self.getGradient()*self.getTransitTimeFactor()
-        self.setV0(_V0)
-
-        _alpha = self.getV0()/iRefPrtcl.getMomentumIn(iPrev)/1000.
-        self.setalpha(_alpha)
+        self._RefValues = [iRefPrtcl.getb0(iPrev), \
+                           iRefPrtcl.getg0b0(iPrev), \
+                           iRefPrtcl.getMomentumIn(iPrev)]
 
-        _wperp = self.getWaveNumber()*mth.sqrt( \
-                        self.getalpha()*mth.cos(self.getPhase())/2./mth.pi)
-        self.setwperp(_wperp)
-        _cperp = mth.cos(self.getwperp()*self.getLength())
-        self.setcperp(_cperp)
-        _sperp = mth.sin(self.getwperp()*self.getLength()) / self.getwperp()
-        self.setsperp(_sperp)
-        
-        _wprll = self.getWaveNumber()*mth.sqrt( \
-                        self.getalpha()*mth.cos(self.getPhase())/mth.pi) / \
-                        g0b0
-        self.setwprll(_wprll)
-        _cprll = mth.cos(self.getwprll()*self.getLength())
-        self.setcprll(_cprll)
-        _sprll = mth.sin(self.getwprll()*self.getLength()) / self.getwprll()
-        self.setsprll(_sprll)
+        #.. Derived quantities set once gradient, frequency and phase are:
+        self.setGradient(_Gradient)
+        self.setFrequency(_Frequency)
+        self.setPhase(_Phase)
 
         self.setTransferMatrix()
         self.setmrf()
@@ -4387,6 +5349,8 @@ class CylindricalRFCavity(BeamLineElement):
         self._wprll             = None
         self._cprll             = None
         self._sprll             = None
+        self._RefValues         = None
+        self._mrf               = None
 
         self._TrnsMtrx  = None
 
@@ -4396,6 +5360,7 @@ class CylindricalRFCavity(BeamLineElement):
                     "BeamLineElement.CylindricalRFCavity.setVoltage:" + \
                     " bad gradient:", _Gradient)
         self._Gradient = _Gradient
+        self.setDerivedQuantities(self.getLength())
 
     def setFrequency(self, _Frequency):
         if not isinstance(_Frequency, float):
@@ -4403,6 +5368,7 @@ class CylindricalRFCavity(BeamLineElement):
                     "BeamLineElement.CylindricalRFCavity.setFrequency:" + \
                                 " bad frequency:", _Frequency)
         self._Frequency = _Frequency
+        self.setDerivedQuantities()
 
     def setAngularFrequency(self, _AngularFrequency):
         if not isinstance(_AngularFrequency, float):
@@ -4410,6 +5376,7 @@ class CylindricalRFCavity(BeamLineElement):
              "BeamLineElement.CylindricalRFCavity.setAngularFrequency:" + \
                       " bad angular frequency:", _AngularFrequency)
         self._AngularFrequency = _AngularFrequency
+        self.resetTransferMatrix()
 
     def setPhase(self, _Phase):
         if not isinstance(_Phase, float):
@@ -4417,6 +5384,7 @@ class CylindricalRFCavity(BeamLineElement):
                     "BeamLineElement.CylindricalRFCavity.setPhase:" + \
                                 " bad phase:", _Phase)
         self._Phase = _Phase
+        self.setDerivedQuantities(self.getLength())
 
     def setWaveNumber(self, _WaveNumber):
         if not isinstance(_WaveNumber, float):
@@ -4424,13 +5392,15 @@ class CylindricalRFCavity(BeamLineElement):
                     "BeamLineElement.CylindricalRFCavity.setPhase:" + \
                                 " bad phase:", _WaveNumber)
         self._WaveNumber = _WaveNumber
+        self.resetTransferMatrix()
 
     def setLength(self, _Length):
         if not isinstance(_Length, float):
             raise badParameter( \
                     "BeamLineElement.CylindricalRFCavity.setPhase:" + \
                                 " bad phase:", _Length)
-        self._Length = _Length        
+        self._Length = _Length
+        self.setDerivedQuantities(_Length)
 
     def setRadius(self, _Radius):
         if not isinstance(_Radius, float):
@@ -4438,6 +5408,7 @@ class CylindricalRFCavity(BeamLineElement):
                     "BeamLineElement.CylindricalRFCavity.setPhase:" + \
                                 " bad phase:", _Radius)
         self._Radius = _Radius        
+        self.setChanged()
 
     def setTransitTimeFactor(self, _TransitTimeFactor):
         if not isinstance(_TransitTimeFactor, float):
@@ -4445,6 +5416,7 @@ class CylindricalRFCavity(BeamLineElement):
                     "BeamLineElement.CylindricalRFCavity.setPhase:" + \
                                 " bad phase:", _TransitTimeFactor)
         self._TransitTimeFactor = _TransitTimeFactor        
+        self.setChanged()
         
     def setV0(self, _V0):
         if not isinstance(_V0, float):
@@ -4452,63 +5424,112 @@ class CylindricalRFCavity(BeamLineElement):
                     "BeamLineElement.CylindricalRFCavity.setPhase:" + \
                                 " bad phase:", _V0)
         self._V0 = _V0        
+        self.setChanged()
         
     def setalpha(self, _alpha):
         if not isinstance(_alpha, float):
             raise badParameter( \
                     "BeamLineElement.CylindricalRFCavity.setPhase:" + \
                                 " bad phase:", _alpha)
-        self._alpha = _alpha        
+        self._alpha = _alpha
+        self.resetTransferMatrix()
         
     def setwperp(self, _wperp):
         if not isinstance(_wperp, float):
             raise badParameter( \
                     "BeamLineElement.CylindricalRFCavity.setPhase:" + \
                                 " bad phase:", _wperp)
-        self._wperp = _wperp        
+        self._wperp = _wperp
+        self.resetTransferMatrix()
         
     def setcperp(self, _cperp):
         if not isinstance(_cperp, float):
             raise badParameter( \
                     "BeamLineElement.CylindricalRFCavity.setPhase:" + \
                                 " bad phase:", _cperp)
-        self._cperp = _cperp        
+        self._cperp = _cperp
+        self.resetTransferMatrix()
         
     def setsperp(self, _sperp):
         if not isinstance(_sperp, float):
             raise badParameter( \
                     "BeamLineElement.CylindricalRFCavity.setPhase:" + \
                                 " bad phase:", _sperp)
-        self._sperp = _sperp        
+        self._sperp = _sperp
+        self.resetTransferMatrix()
         
     def setwprll(self, _wprll):
         if not isinstance(_wprll, float):
             raise badParameter( \
                     "BeamLineElement.CylindricalRFCavity.setPhase:" + \
                                 " bad phase:", _wprll)
-        self._wprll = _wprll        
+        self._wprll = _wprll
+        self.resetTransferMatrix()
         
     def setcprll(self, _cprll):
         if not isinstance(_cprll, float):
             raise badParameter( \
                     "BeamLineElement.CylindricalRFCavity.setPhase:" + \
                                 " bad phase:", _cprll)
-        self._cprll = _cprll        
+        self._cprll = _cprll
+        self.resetTransferMatrix()
         
     def setsprll(self, _sprll):
         if not isinstance(_sprll, float):
             raise badParameter( \
                     "BeamLineElement.CylindricalRFCavity.setPhase:" + \
                                 " bad phase:", _sprll)
-        self._sprll = _sprll        
-        
-        
+        self._sprll = _sprll
+        self.resetTransferMatrix()
+
+    def setDerivedQuantities(self, _Length=None):
+        if self.getGradient() is None or self.getFrequency() is None or \
+           self.getPhase() is None or self._RefValues is None:
+            return
+        b0, g0b0, p0 = self._RefValues
+
+        self._AngularFrequency = self.getFrequency()*2.*mth.pi * 10.**6
+        self._WaveNumber       = self.getAngularFrequency() / speed_of_light
+
+        if _Length is None:
+            _Length = mth.pi*b0*speed_of_light / self.getAngularFrequency()
+        self._Length = _Length
+
+        self._Radius = sp.special.jn_zeros(0, 1)[0]/self.getWaveNumber()
+
+        """
+          Eqn 3.141 in Wolsli seems to have an error, expression for
+          transit time factor below rederived 16Feb24, need to check
+          with Andy.
+        """
+        self._TransitTimeFactor = (2.*b0)                           / \
+                             (self.getWaveNumber()*self.getLength()) * \
+                  mth.sin(self.getWaveNumber()*self.getLength()/2./b0)
+        self._V0    = self.getLength()*self.getGradient()* \
+                      self.getTransitTimeFactor()
+        self._alpha = self.getV0()/p0/1000.
+
+        self._wperp = self.getWaveNumber()*mth.sqrt( \
+                        self.getalpha()*mth.cos(self.getPhase())/2./mth.pi)
+        self._cperp = mth.cos(self.getwperp()*self.getLength())
+        self._sperp = mth.sin(self.getwperp()*self.getLength()) / \
+                      self.getwperp()
+
+        self._wprll = self.getWaveNumber()*mth.sqrt( \
+                        self.getalpha()*mth.cos(self.getPhase())/mth.pi) / \
+                        g0b0
+        self._cprll = mth.cos(self.getwprll()*self.getLength())
+        self._sprll = mth.sin(self.getwprll()*self.getLength()) / \
+                      self.getwprll()
+
+        self.resetTransferMatrix()
+
+    def resetTransferMatrix(self):
+        BeamLineElement.resetTransferMatrix(self)
+        self._mrf = None
+
     def setmrf(self):
-        iRefPrtcl = Prtcl.ReferenceParticle.getinstances()
-        if not isinstance(iRefPrtcl, Prtcl.ReferenceParticle):
-            raise ReferenceParticleNotSpecified()
-        iPrev  = len(iRefPrtcl.getPrOut()) - 1
-        g02b02 = iRefPrtcl.getg0b0(iPrev)**2
+        g02b02 = self._RefValues[1]**2
 
         if self.getDebug():
             print(" CylindricalRFCavity(BeamLineElement).setmrf:")
@@ -4526,11 +5547,7 @@ class CylindricalRFCavity(BeamLineElement):
         self._mrf = _mrf
 
     def setTransferMatrix(self):
-        iRefPrtcl = Prtcl.ReferenceParticle.getinstances()
-        if not isinstance(iRefPrtcl, Prtcl.ReferenceParticle):
-            raise ReferenceParticleNotSpecified()
-        iPrev  = len(iRefPrtcl.getPrOut()) - 1
-        g02b02 = iRefPrtcl.getg0b0(iPrev)**2
+        g02b02 = self._RefValues[1]**2
 
         if self.getDebug():
             print(" CylindricalRFCavity(BeamLineElement).setTransferMatrix:")
@@ -4559,6 +5576,8 @@ class CylindricalRFCavity(BeamLineElement):
         self._TrnsMtrx = TrnsMtrx
 
     def visualise(self, axs, CoordSys, Proj):
+        import matplotlib.patches as patches
+
         if self.getDebug():
             print(" CylindricalRFCavity(BeamLineElement).visualise: start")
             print("     ----> self.getrStrt():", self.getrStrt())
@@ -4675,8 +5694,13 @@ class CylindricalRFCavity(BeamLineElement):
         return self._sprll
 
     def getmrf(self):
+        if self._mrf is None:
+            self.setmrf()
         return self._mrf
 
+    def getAffineMap(self):
+        return [self.getTransferMatrix(), self.getmrf()]
+
     
 #--------  Utilities:
     def Transport(self, _R=None):
@@ -4704,11 +5728,7 @@ class CylindricalRFCavity(BeamLineElement):
            abs(_R[4]) > 5.:
             _Rprime = None
         else:
-            detTrnsfrMtrx = np.linalg.det(self.getTransferMatrix())
-            error         = abs(1. - abs(detTrnsfrMtrx))
-            if error > 1.E-6:
-                print(" CylindricalRFCavity(BeamLineElement).Transport:(3):" \
-                      " detTrnsfrMtrx:", detTrnsfrMtrx)
+            self.getdetTrnsfrMtrx()
             
             _Rprime = self.getTransferMatrix().dot(_R) + self.getmrf()
 
@@ -4721,6 +5741,22 @@ class CylindricalRFCavity(BeamLineElement):
 
         return _Rprime
 
+    def TransportBatch(self, _R):
+        _Rprime, Alive = BeamLineElement.TransportBatch(self, _R)
+        _Rprime       += self.getmrf()
+
+        return _Rprime, Alive
+
+    def compileKernel(self):
+        self.getdetTrnsfrMtrx()
+        TrnsMtrx = self.getTransferMatrix().copy()
+        mrf      = np.array(self.getmrf(), dtype=float)
+
+        def Kernel(_R):
+            return TrnsMtrx.dot(_R) + mrf
+
+        return Kernel
+
 #--------  I/o methods:
     def writeElement(self, dataFILE):
         if self.getDebug():
@@ -4791,6 +5827,7 @@ Derived class Source:
   -----------------
     instances : List of instances of BeamLineElement class
   __Debug     : Debug flag
+   BatchModes : Modes for which getParticlesFromSource generates bunches
 
 
   Parent class instance attributes:
@@ -4879,6 +5916,20 @@ getParticleFromSource : Generate one particle at source.  Check that particle
                   Input : None
                  Return : np.ndarray : 6D phase space of particle at source.
 
+getParticlesFromSource : Generate N particles at source in one call using
+                        a numpy random Generator (modes 0, 1 and 2).  If no
+                        Generator is given, one is seeded from "random" so
+                        that seeding "random" reproduces the bunch.  For
+                        mode 0 r' is sampled from the inverse cumulative
+                        distribution of g(r') rather than by rejection.
+                  Input : N [int], Rng [np.random.Generator, optional]
+                 Return : np.ndarray (N,6): trace space at source; may be
+                          passed to BeamLine.trackBeamBatch as SrcTrcSpc.
+
+       getParticles : Generate N sets of x, y, K, cos(theta), phi, xp, yp.
+                  Input : N [int], Rng [np.random.Generator]
+                 Return : tuple of np.ndarray (or None where unused)
+
     getFlatThetaPhi : Generate direction of particle at source flat in
                       cos(theta) and phi
                   Input : None
@@ -4889,12 +5940,29 @@ getLaserDrivenProtonEnergy: Generate proton energy at source using
                   Input : None
                  Return : Energy [float]
 
+getLaserDrivenProtonEnergies: As getLaserDrivenProtonEnergy for N protons.
+                  Input : N [int], Rng [np.random.Generator]
+                 Return : Energies [np.ndarray]
+
+getLaserDrivenParticlesKernel: Energies, positions and divergences of N
+                             laser-driven protons, as getParticles, with
+                             the JIT-compiled kernel of TrackingKernels.
+                  Input : N [int], Rng [np.random.Generator]
+                 Return : KE, X, Y, xp, yp [np.ndarray]
+
+initLaserDrivenProtonEnergy: Calculate the derived parameters of the TNSA
+                             spectrum (first call only).
+
       getTraceSpace : Convert x, y, energy, cos(theta), phi [input] to
                       trace space.
 
                   Input : x, y, energy, cos(theta), phi [floats]
                  Return : np.ndarray : 6D phase space of particle at source.
 
+ getTraceSpaceBatch : As getTraceSpace, for arrays of N particles.
+                  Input : x, y, energy, cos(theta), phi, xp, yp [np.ndarray]
+                 Return : np.ndarray (N,6)
+
 
 """
 class Source(BeamLineElement):
@@ -4902,6 +5970,7 @@ class Source(BeamLineElement):
     __Debug    = False
 
     ModeList   = [0, 1, 2, 3]
+    BatchModes = [0, 1, 2]
     ModeText   = ["Parameterised laser driven", "Gaussian", "Flat", \
                   "Read from file"]
     
@@ -5173,6 +6242,85 @@ class Source(BeamLineElement):
             
         return X, Y, KE, cosTheta, Phi, xp, yp
     
+    def getParticlesFromSource(self, N, Rng=None):
+        if self.__Debug:
+            print(" BeamLineElement(Source).getParticlesFromSource: start")
+            print("     ----> Number of particles:", N)
+
+        if not isinstance(N, int) or N < 0:
+            raise badParameter( \
+                " BeamLineElement(Source).getParticlesFromSource:", \
+                " bad number of particles:", N)
+
+        if Rng is None:
+            Rng = np.random.default_rng(rnd.getrandbits(64))
+
+        #.. Generate initial particles:
+        x, y, K, cTheta, Phi, xp, yp = self.getParticles(N, Rng)
+
+        #.. Convert to trace space:
+        TrcSpc = self.getTraceSpaceBatch(x, y, K, cTheta, Phi, xp, yp)
+
+        if self.__Debug:
+            print(" <---- BeamLineElement(Source).getParticlesFromSource,", \
+                  " done.", \
+                  '  --------  --------  --------  --------  --------')
+
+        return TrcSpc
+
+    def getParticles(self, N, Rng):
+        if self.getDebug():
+            print(" BeamLineElement(Source).getParticles: start")
+            print("     ----> Mode, parameters:", \
+                  self.getMode(), self.getParameters())
+
+        cosTheta = None
+        Phi      = None
+        xp       = None
+        yp       = None
+
+        #-------- Laser driven:
+        if self._Mode == 0 and TrkKrnl.TrackingKernels.getJIT():
+            KE, X, Y, xp, yp = self.getLaserDrivenParticlesKernel(N, Rng)
+
+        elif self._Mode == 0:
+            KE     = self.getLaserDrivenProtonEnergies(N, Rng)  # [MeV]
+            
+            X      = Rng.normal(0., self.getParameters()[0], N)
+            Y      = Rng.normal(0., self.getParameters()[1], N)
+
+            #.. g(r') = 1 - r'^2/upmax^2 on the disk r' < upmax; sample
+            #   s = r'^2/upmax^2 from its inverse cumulative distribution,
+            #   1 - (1-s)^2, and the azimuth flat:
+            upmax  = np.sin(np.radians(self.g_theta(KE)))
+            rp     = upmax * np.sqrt(1. - np.sqrt(1. - Rng.random(N)))
+            Phirp  = Rng.uniform(0., 2.*mth.pi, N)
+            xp     = rp * np.cos(Phirp)
+            yp     = rp * np.sin(Phirp)
+
+        elif self._Mode == 1 or self._Mode == 2:
+            X        = Rng.normal(0., self.getParameters()[0], N)
+            Y        = Rng.normal(0., self.getParameters()[1], N)
+            cosTheta = Rng.uniform(self.getParameters()[2], 1., N)
+            Phi      = Rng.uniform(0., 2.*mth.pi, N)
+            if self._Mode == 1:
+                KE   = Rng.normal(self.getParameters()[3], \
+                                  self.getParameters()[4], N)
+            else:
+                KE   = Rng.uniform(self.getParameters()[3], \
+                                   self.getParameters()[4], N)
+
+        else:
+            raise badSourceSpecification( \
+                " BeamLineElement(Source).getParticles:", \
+                " mode", self._Mode, "can not be generated in batch.")
+
+        if self.getDebug():
+            print(" <---- BeamLineElement(Source).getParticles, done.", \
+                  '  --------  --------  --------  --------  --------')
+            
+        return X, Y, KE, cosTheta, Phi, xp, yp
+    
     def getFlatThetaPhi(self):
         cosTheta = rnd.uniform(self.getParameters()[2], 1.)
         Phi      = rnd.uniform( 0., 2.*mth.pi)
@@ -5231,6 +6379,8 @@ class Source(BeamLineElement):
 
     # Calculates the rest of the parameters needed for the parametrisation
     def parameters(self, P_L, E_laser, lamda, t_laser, d, I, theta_degrees):
+        from scipy.optimize import fsolve
+
 
         c = 3e8               # Speed of light in vacuum [m/s]
         m_e = 9.11e-31        # Electron mass [Kg]
@@ -5295,6 +6445,66 @@ class Source(BeamLineElement):
 
     # Generates energy values for the distribution
     def getLaserDrivenProtonEnergy(self):
+        self.initLaserDrivenProtonEnergy()
+
+        E_max = self.getderivedParameters()[4]
+        E_min = self.getderivedParameters()[5]
+
+        T_e   = self.getderivedParameters()[3]
+        Gamma = self.getderivedParameters()[6]
+
+        if self.getDebug():
+            print("     ----> Get E:")
+            
+        GE = rnd.random()
+
+        if self.getDebug():
+            print("         ----> E_min, GE, Gamma:", E_min, GE, Gamma)
+            
+        sqrtE = ( mth.sqrt(E_min) - mth.sqrt(T_e/2.) * mth.log(1.-GE/Gamma))
+        E     = sqrtE**2
+        if self.getDebug():
+            print("     <---- E:", E, " J")
+            
+        E    /= (1.6e-19*1.e6)
+        if self.getDebug():
+            print("     <---- E:", E, " MeV")
+        
+        return E
+
+    def getLaserDrivenProtonEnergies(self, N, Rng):
+        self.initLaserDrivenProtonEnergy()
+
+        E_min = self.getderivedParameters()[5]
+        T_e   = self.getderivedParameters()[3]
+        Gamma = self.getderivedParameters()[6]
+
+        GE    = Rng.random(N)
+        sqrtE = mth.sqrt(E_min) - mth.sqrt(T_e/2.) * np.log(1.-GE/Gamma)
+
+        return sqrtE**2 / (1.6e-19*1.e6)
+
+    def getLaserDrivenParticlesKernel(self, N, Rng):
+        self.initLaserDrivenProtonEnergy()
+
+        #.. Random numbers drawn in the order of getParticles:
+        GE    = Rng.random(N)
+        X     = Rng.normal(0., self.getParameters()[0], N)
+        Y     = Rng.normal(0., self.getParameters()[1], N)
+        U     = Rng.random(N)
+        Phirp = Rng.uniform(0., 2.*mth.pi, N)
+
+        KE, xp, yp = TrkKrnl.TrackingKernels.getKernel("laserDrivenSample")( \
+                        GE, U, Phirp, \
+                        mth.sqrt(self.getderivedParameters()[5]), \
+                        mth.sqrt(self.getderivedParameters()[3]/2.), \
+                        self.getderivedParameters()[6], \
+                        self.getParameters()[13], self.getParameters()[14], \
+                        self.getderivedParameters()[4] / (1.6e-19*1e6))
+
+        return KE, X, Y, xp, yp
+
+    def initLaserDrivenProtonEnergy(self):
         if not Source.LsrDrvnIni:
             if self.__Debug:
                 print( \
@@ -5352,31 +6562,6 @@ class Source(BeamLineElement):
                 print("                     Gamma:", \
                       self.getderivedParameters()[6])
 
-        E_max = self.getderivedParameters()[4]
-        E_min = self.getderivedParameters()[5]
-
-        T_e   = self.getderivedParameters()[3]
-        Gamma = self.getderivedParameters()[6]
-
-        if self.getDebug():
-            print("     ----> Get E:")
-            
-        GE = rnd.random()
-
-        if self.getDebug():
-            print("         ----> E_min, GE, Gamma:", E_min, GE, Gamma)
-            
-        sqrtE = ( mth.sqrt(E_min) - mth.sqrt(T_e/2.) * mth.log(1.-GE/Gamma))
-        E     = sqrtE**2
-        if self.getDebug():
-            print("     <---- E:", E, " J")
-            
-        E    /= (1.6e-19*1.e6)
-        if self.getDebug():
-            print("     <---- E:", E, " MeV")
-        
-        return E
-
     def getLaserCumProbParam(self):
 
         T_e      = self.getderivedParameters()[3]
@@ -5493,6 +6678,29 @@ class Source(BeamLineElement):
 
         return TrcSpc
 
+    def getTraceSpaceBatch(self, x, y, K, cTheta, Phi, xp=None, yp=None):
+        iRefPrtcl = Prtcl.ReferenceParticle.getinstances()
+        p0        = iRefPrtcl.getMomentumIn(0)
+        E0        = mth.sqrt( protonMASS**2 + p0**2)
+
+        E = protonMASS + K
+        p = np.sqrt(E**2 - protonMASS**2)
+
+        TrcSpc = np.zeros((len(x), 6))
+        TrcSpc[:,0] = x
+        TrcSpc[:,2] = y
+        if cTheta is not None:
+            sTheta = np.sqrt(1.-cTheta**2)
+            TrcSpc[:,1] = sTheta * np.cos(Phi) * p / p0
+            TrcSpc[:,3] = sTheta * np.sin(Phi) * p / p0
+        if xp is not None:
+            TrcSpc[:,1] = xp * p / p0
+        if yp is not None:
+            TrcSpc[:,3] = yp * p / p0
+        TrcSpc[:,5] = (E - E0) / p0
+
+        return TrcSpc
+
 #--------  Utilities:
     def tabulateParameters(self, filename="LaTeX.tex"):
         LTX.TableHeader(filename, '|l|c|l|', \
@@ -5609,6 +6817,8 @@ class Source(BeamLineElement):
         return ValidParam
 
     def visualise(self, axs, CoordSys, Proj):
+        import matplotlib.patches as patches
+
         if self.getDebug():
             print(" Source(BeamLineElement).visualise: start")
             print("     ----> self.getrStrt():", self.getrStrt())
@@ -5916,6 +7126,7 @@ class QuadDoublet(BeamLineElement):
         self.setQ1(iQ1)
         self.setD(iD)
         self.setQ2(iQ2)
+        self.setiLoc(self.getiLoc())
                    
         if self.getDebug():
             print("     ----> New QuadDoublet instance: \n", self)
@@ -5968,6 +7179,7 @@ class QuadDoublet(BeamLineElement):
                     "BeamLineElement.QuadDoublet.setFDorDF:", \
                                 " bad FDorDF:", _FDorDF)
         self._FDorDF = _FDorDF
+        self.setChanged()
         
     def setSeparation(self, _d):
         if not(isinstance(_d, float)):
@@ -5976,6 +7188,7 @@ class QuadDoublet(BeamLineElement):
                     " bad separation:", _d)
                
         self._Separation = _d
+        self.setChanged()
         
     def setQ1par(self, _Q1par):
         if isinstance(_Q1par,list):
@@ -5989,6 +7202,7 @@ class QuadDoublet(BeamLineElement):
                 " for Q1par")
         
         self._Q1par = _Q1par
+        self.setChanged()
         
     def setQ2par(self, _Q2par):
         if isinstance(_Q2par,list):
@@ -6002,6 +7216,7 @@ class QuadDoublet(BeamLineElement):
                 " for Q2par")
         
         self._Q2par = _Q2par
+        self.setChanged()
 
     def setQ1(self, iQ1):
         if not isinstance(iQ1, BeamLineElement):
@@ -6009,6 +7224,7 @@ class QuadDoublet(BeamLineElement):
                 "BeamLineElement.QuadDoublet.setQ1:", \
                 " not a beamline element")
         self._iQ1 = iQ1
+        self.setChanged()
             
     def setD(self, iD):
         if not isinstance(iD, BeamLineElement):
@@ -6016,6 +7232,7 @@ class QuadDoublet(BeamLineElement):
                 "BeamLineElement.QuadDoublet.setD:", \
                 " not a beamline element")
         self._iD = iD
+        self.setChanged()
             
     def setQ2(self, iQ2):
         if not isinstance(iQ2, BeamLineElement):
@@ -6023,7 +7240,13 @@ class QuadDoublet(BeamLineElement):
                 "BeamLineElement.QuadDoublet.setQ2:", \
                 " not a beamline element")
         self._iQ2 = iQ2
+        self.setChanged()
             
+    def setiLoc(self, _iLoc):
+        BeamLineElement.setiLoc(self, _iLoc)
+        for iBLE in [self.getQ1(), self.getD(), self.getQ2()]:
+            iBLE.setiLoc(_iLoc)
+
     def setTransferMatrix(self, _R):
         
         if self.getDebug():
@@ -6064,6 +7287,16 @@ class QuadDoublet(BeamLineElement):
 
         self._TrnsMtrx = TrnsMtrx
 
+    def compileKernel(self):
+        KernelQ1 = self.getQ1().compileKernel()
+        KernelD  = self.getD().compileKernel()
+        KernelQ2 = self.getQ2().compileKernel()
+
+        def Kernel(_R):
+            return KernelQ2(KernelD(KernelQ1(_R)))
+
+        return Kernel
+
         
 # -------- "Get methods"
 # Methods believed to be self-documenting(!)
@@ -6092,6 +7325,10 @@ class QuadDoublet(BeamLineElement):
     def getQ2(self):
         return self._iQ2
 
+    def getChangeCount(self):
+        return self._nChange + self.getQ1().getChangeCount() + \
+            self.getD().getChangeCount() + self.getQ2().getChangeCount()
+
     
 # -------- Utilities:
     
@@ -6261,6 +7498,7 @@ class QuadTriplet(BeamLineElement):
         self.setQ2(iQ2)
         self.setD2(iD2)
         self.setQ3(iQ3)
+        self.setiLoc(self.getiLoc())
                    
         if self.getDebug():
             print("     ----> New QuadTriplet instance: \n", self)
@@ -6320,6 +7558,7 @@ class QuadTriplet(BeamLineElement):
                     "BeamLineElement.QuadDoublet.setFDForDFD:", \
                                 " bad FDForDFD:", _FDForDFD)
         self._FDForDFD = _FDForDFD
+        self.setChanged()
         
     def setQ1par(self, _Q1par):
         if isinstance(_Q1par,list):
@@ -6333,6 +7572,7 @@ class QuadTriplet(BeamLineElement):
                 " for Q1par")
         
         self._Q1par = _Q1par
+        self.setChanged()
         
     def setSeparation1(self, _d1):
         if not(isinstance(_d1, float)):
@@ -6341,6 +7581,7 @@ class QuadTriplet(BeamLineElement):
                     " bad separation 1:", _d1)
                
         self._Separation1 = _d1
+        self.setChanged()
         
     def setQ2par(self, _Q2par):
         if isinstance(_Q2par,list):
@@ -6354,6 +7595,7 @@ class QuadTriplet(BeamLineElement):
                 " for Q2par")
         
         self._Q2par = _Q2par
+        self.setChanged()
 
     def setSeparation2(self, _d2):
         if not(isinstance(_d2, float)):
@@ -6362,6 +7604,7 @@ class QuadTriplet(BeamLineElement):
                     " bad separation 2:", _d2)
                
         self._Separation2 = _d2
+        self.setChanged()
         
     def setQ3par(self, _Q3par):
         if isinstance(_Q3par,list):
@@ -6375,6 +7618,7 @@ class QuadTriplet(BeamLineElement):
                 " for Q3par")
         
         self._Q3par = _Q3par
+        self.setChanged()
 
     def setQ1(self, iQ1):
         if not isinstance(iQ1, BeamLineElement):
@@ -6382,6 +7626,7 @@ class QuadTriplet(BeamLineElement):
                 "BeamLineElement.QuadTriplet.setQ1:", \
                 " not a beamline element")
         self._iQ1 = iQ1
+        self.setChanged()
             
     def setD1(self, iD1):
         if not isinstance(iD1, BeamLineElement):
@@ -6389,6 +7634,7 @@ class QuadTriplet(BeamLineElement):
                 "BeamLineElement.QuadTriplet.setD1:", \
                 " not a beamline element")
         self._iD1 = iD1
+        self.setChanged()
             
     def setQ2(self, iQ2):
         if not isinstance(iQ2, BeamLineElement):
@@ -6396,6 +7642,7 @@ class QuadTriplet(BeamLineElement):
                 "BeamLineElement.QuadTriplet.setQ2:", \
                 " not a beamline element")
         self._iQ2 = iQ2
+        self.setChanged()
             
     def setD2(self, iD2):
         if not isinstance(iD2, BeamLineElement):
@@ -6403,6 +7650,7 @@ class QuadTriplet(BeamLineElement):
                 "BeamLineElement.QuadTriplet.setD2:", \
                 " not a beamline element")
         self._iD2 = iD2
+        self.setChanged()
             
     def setQ3(self, iQ3):
         if not isinstance(iQ3, BeamLineElement):
@@ -6410,7 +7658,14 @@ class QuadTriplet(BeamLineElement):
                 "BeamLineElement.QuadTriplet.setQ3:", \
                 " not a beamline element")
         self._iQ3 = iQ3
+        self.setChanged()
             
+    def setiLoc(self, _iLoc):
+        BeamLineElement.setiLoc(self, _iLoc)
+        for iBLE in [self.getQ1(), self.getD1(), self.getQ2(), \
+                     self.getD2(), self.getQ3()]:
+            iBLE.setiLoc(_iLoc)
+
     def setTransferMatrix(self, _R):
         
         if self.getDebug():
@@ -6468,6 +7723,18 @@ class QuadTriplet(BeamLineElement):
 
         self._TrnsMtrx = TrnsMtrx
 
+    def compileKernel(self):
+        Kernels = [iBLE.compileKernel() for iBLE in \
+                   [self.getQ1(), self.getD1(), self.getQ2(), \
+                    self.getD2(), self.getQ3()]]
+
+        def Kernel(_R):
+            for iKernel in Kernels:
+                _R = iKernel(_R)
+            return _R
+
+        return Kernel
+
         
 # -------- "Get methods"
 # Methods believed to be self-documenting(!)
@@ -6507,6 +7774,12 @@ class QuadTriplet(BeamLineElement):
             
     def getQ3(self):
         return self._iQ3
+
+    def getChangeCount(self):
+        return self._nChange + \
+            sum([iBLE.getChangeCount() for iBLE in \
+                 [self.getQ1(), self.getD1(), self.getQ2(), self.getD2(), \
+                  self.getQ3()]])
                 
     
 # -------- Utilities:
@@ -6559,8 +7832,13 @@ Derived class RPLCswitch:
   Get methods:
      getDebug: get debug flag, bool
     getLength: Returns length of RPLCswitch (presently 0)
+ getAffineMap: [transfer matrix, zero offset] for a planar switch; None
+               if the switch is a 3D rotation.
 
   Utilities:
+AcceptanceFailBatch: as BeamLineElement, with |z| cut at 2.5.
+getLossReasonBatch: as BeamLineElement, with |z| cut at 2.5; "Other" for
+                   a 3D rotation without valid phase space.
 
 
 """
@@ -6620,14 +7898,13 @@ class RPLCswitch(BeamLineElement):
             raise badParameter()
 
         self._3Drotation = _3Drotation
+        self.resetTransferMatrix()
         
     def setTransferMatrix(self):
         if self.getDebug():
             print(" RPLC(BeamLineElement).setTransferMatrix; start:")
 
-        iLst  = BeamLineElement.getinstances()[ \
-                                len(BeamLineElement.getinstances())-2 \
-                                               ]
+        iLst  = BeamLineElement.getinstances()[self.getiLoc()-1]
         if self.get3Drotation():
             invRE = np.linalg.inv(iLst.getRot2LbEnd())
 
@@ -6676,9 +7953,7 @@ class RPLCswitch(BeamLineElement):
         if self.getDebug():
             print(" RPLC(BeamLineElement).calcRot2LbEnd; start:")
 
-        iLst  = BeamLineElement.getinstances()[ \
-                                len(BeamLineElement.getinstances())-2 \
-                                               ]
+        iLst  = BeamLineElement.getinstances()[self.getiLoc()-1]
             
         if self.getDebug():
             with np.printoptions(linewidth=500,precision=7,suppress=True):
@@ -6719,6 +7994,11 @@ class RPLCswitch(BeamLineElement):
     def get3Drotation(self):
         return self._3Drotation
 
+    def getAffineMap(self):
+        if self.get3Drotation():
+            return None
+        return [self.getTransferMatrix(), np.zeros(6)]
+
     def visualise(self, axs, CoordSys, Proj):
         if self.getDebug():
             print(" RPLCswitch(BeamLineElement).visualise: start")
@@ -6822,25 +8102,27 @@ class RPLCswitch(BeamLineElement):
             _Rprime = None
         else:
             if self.get3Drotation():
-                phsSpc      = \
-                    Prtcl.Particle.RPLCTraceSpace2PhaseSpace(_R).reshape(6)
-                if self.getDebug():
-                    with np.printoptions(linewidth=500,precision=7, \
-                                         suppress=True):
-                        print("     ----> PhaseSpace      :", phsSpc) 
-                phsSpcprime = self.getTransferMatrix().dot(phsSpc)
+                phsSpc, Valid = \
+                    Prtcl.Particle.RPLCTraceSpace2PhaseSpaceBatch( \
+                                                    _R.reshape(1,6))
                 if self.getDebug():
                     with np.printoptions(linewidth=500,precision=7, \
                                          suppress=True):
-                        print("     ----> PhaseSpace prime:", phsSpcprime)
-                _Rprime     = \
-                    Prtcl.Particle.RPLCPhaseSpace2TraceSpace(phsSpcprime)
+                        print("     ----> PhaseSpace      :", phsSpc[0]) 
+                if Valid[0]:
+                    phsSpcprime = np.matmul(phsSpc, \
+                                    np.transpose(self.getTransferMatrix()))
+                    if self.getDebug():
+                        with np.printoptions(linewidth=500,precision=7, \
+                                             suppress=True):
+                            print("     ----> PhaseSpace prime:", \
+                                  phsSpcprime[0])
+                    _Rprime = Prtcl.Particle.RPLCPhaseSpace2TraceSpaceBatch( \
+                                                        phsSpcprime)[0]
+                else:
+                    _Rprime = None
             else:
-                detTrnsfrMtrx = np.linalg.det(self.getTransferMatrix())
-                error         = abs(1. - abs(detTrnsfrMtrx))
-                if error > 1.E-6:
-                    print(" RPLCswitch(BeamLineElement).Transport:(4):" \
-                          " detTrnsfrMtrx:", detTrnsfrMtrx)
+                self.getdetTrnsfrMtrx()
                 _Rprime = self.getTransferMatrix().dot(_R)
 
         if self.getDebug():
@@ -6852,7 +8134,54 @@ class RPLCswitch(BeamLineElement):
 
         return _Rprime
 
-    
+    def TransportBatch(self, _R):
+        if not isinstance(_R, np.ndarray) or np.ndim(_R) != 2 or \
+           np.shape(_R)[1] != 6:
+            raise badParameter( \
+                " RPLCswitch(BeamLineElement).TransportBatch: bad input:", \
+                                np.shape(_R))
+
+        Alive = np.logical_not(self.AcceptanceFailBatch(_R))
+
+        if self.get3Drotation():
+            phsSpc, Valid = \
+                Prtcl.Particle.RPLCTraceSpace2PhaseSpaceBatch(_R[Alive])
+            Alive[Alive]  = Valid
+            _Rprime = Prtcl.Particle.RPLCPhaseSpace2TraceSpaceBatch( \
+                np.matmul(phsSpc[Valid], \
+                          np.transpose(self.getTransferMatrix())))
+        else:
+            _Rprime = np.matmul(_R[Alive], \
+                                np.transpose(self.getTransferMatrix()))
+
+        return _Rprime, Alive
+
+    def AcceptanceFailBatch(self, _R):
+        return BeamLineElement.AcceptanceFailBatch(self, _R, 2.5)
+
+    def getLossReasonBatch(self, _R):
+        return BeamLineElement.getLossReasonBatch(self, _R, 2.5)
+
+    def compileKernel(self):
+        if not self.get3Drotation():
+            return BeamLineElement.compileKernel(self)
+
+        TrnsMtrxT = np.transpose(self.getTransferMatrix()).copy()
+
+        def Kernel(_R):
+            phsSpc, Valid = \
+                Prtcl.Particle.RPLCTraceSpace2PhaseSpaceBatch(_R.reshape(1,6))
+            if not Valid[0]:
+                return None
+            return Prtcl.Particle.RPLCPhaseSpace2TraceSpaceBatch( \
+                                        np.matmul(phsSpc, TrnsMtrxT))[0]
+
+        return Kernel
+
+    def compileStep(self, zCut=2.5):
+        return BeamLineElement.compileStep(self, zCut)
+
+
 #--------  Exceptions:
 class badBeamLineElement(Exception):
     pass
@@ -0,0 +1,681 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Class Benchmark:
+================
+
+  Reproducible benchmark of tracking, particle i/o and beam analysis on
+  the shipped lattices (11-Parameters/*.csv).  Each job runs in a fresh
+  process (multiprocessing, start method "spawn", so calling scripts must
+  protect their entry point with if __name__ == "__main__":), so that the
+  class-level state of BeamLine, BeamLineElement and Particle does not
+  leak between jobs and the peak resident memory of each job is measured
+  on its own.  Random numbers are seeded, the timed sections are repeated
+  _nRepeat times and the best time is kept.
+
+  Suites:
+    "lattice"   : for each lattice:
+                    build:<lattice>       time to build the beam line [s]
+                    trackBeam:<lattice>   events/s, BeamLine.trackBeam
+                    trackBeamBatch:<lattice>
+                                          events/s, BeamLine.trackBeamBatch
+                    memory:<lattice>      peak resident memory [MB]
+                  and, summed over the lattices, per element type:
+                    Transport:<type>      us per call, Transport
+                    TransportBatch:<type> us per particle, TransportBatch
+                  Lattices with a source read from file (mode 3) are fed
+                  a seeded Gaussian trace-space sample.
+    "particleIO": Particle.writeParticle and Particle.readParticle,
+                  particles/s, on particles recorded at _nLocations
+                  locations; the reference particle is that of
+                  _BeamLattice.
+    "beam"      : events written with BeamLine.trackBeam to a BeamIO file
+                  (events/s), then Beam.evaluateBeam and
+                  extrapolateBeam.extrapolateBeam (events/s) on that file,
+                  each in its own process.
+
+  Results are held in a dict {name: {"Value", "Unit", "Better"}}, where
+  "Better" is "higher" or "lower".  They are written, with the metadata
+  of the run (date, host, python and numpy versions, git commit,
+  settings), to a json file.  A run is compared with a stored baseline
+  (a json file written by a previous run): a metric regresses if it is
+  worse than the baseline by more than the relative tolerance.
+
+  Class attributes:
+  -----------------
+    instances : List of instances of Benchmark class
+    Suites    : Names of the suites known
+  __Debug     : Debug flag
+
+
+  Instance attributes:
+  --------------------
+      _Lattices : List of paths to beam line specification files
+         _nEvts : Number of events tracked with BeamLine.trackBeam
+    _nEvtsBatch : Number of events tracked with BeamLine.trackBeamBatch
+    _nParticles : Number of particles written and read back
+    _nLocations : Number of locations per particle for particle i/o
+   _nTransport : Number of particles passed through each element for the
+                  per-element-type Transport cost
+       _nRepeat : Number of repeats of each timed section; best kept
+          _Seed : Seed of the random numbers
+        _Suites : Suites to run
+   _BeamLattice : Lattice used by the "particleIO" and "beam" suites;
+                  LhARA Gauss-Gabor if in _Lattices, else the first
+       _Results : dict of results, filled by run
+      _Metadata : dict of metadata of the run
+
+  Methods:
+  --------
+  Built-in methods __init__, __repr__ and __str__.
+      __init__ : Creates instance.
+           Input : _Lattices (default: shipped lattices below HOMEPATH),
+                   _nEvts (default 1000), _nEvtsBatch (default 20000),
+                   _Seed
+      __repr__: One liner with call.
+      __str__ : Dump of parameters
+
+  Set methods:
+     setDebug : set class debug flag
+    setSuites : Suites to run; list of names from Benchmark.Suites
+   setRepeat : Number of repeats, int >= 1
+  setParticleIO : Number of particles and of locations for particle i/o
+  setnTransport : Number of particles per element for Transport cost
+
+  Get methods:
+     getDebug, getLattices, getnEvts, getnEvtsBatch, getnParticles,
+     getnLocations, getnTransport, getRepeat, getSeed, getSuites,
+     getBeamLattice, getResults, getMetadata: believed to be self
+     documenting.
+
+  Processing methods:
+         run : Run the suites, one process per job.
+          Return : dict of results
+  compareResults : Class method; compare results with a baseline.
+           Input : Results, Baseline (dicts as above), Tolerance
+                   (relative, default 0.25)
+          Return : list of regressions, [name, baseline value, value,
+                   relative change]
+     compare : Compare results of this run with a baseline file and print
+               the comparison.
+           Input : path to baseline file, Tolerance
+          Return : list of regressions as compareResults
+
+  I/o methods:
+   writeResults : Write results and metadata to a json file.
+           Input : path to json file
+    readResults : Class method; read a json file written by writeResults.
+           Input : path to json file
+          Return : [Results, Metadata]
+
+  Module-level methods (run in the worker processes):
+    runBenchmarkJob : Run one job; input (Job, Args); returns [Results,
+                      TransportCost]; TransportCost: {type: [time,
+                      calls, particles in batch, batch time]}
+
+
+Created on Mon 12Oct26: Version history:
+----------------------------------------
+ 1.0: 12Oct26: First implementation
+
+@author: kennethlong
+"""
+
+import contextlib
+import io
+import json
+import multiprocessing as mp
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import numpy  as np
+
+import BeamIO          as BmIO
+import BeamLine        as BL
+import Particle        as Prtcl
+import Simulation      as Simu
+import TrackingKernels as TrkKrnl
+
+
+#--------  Jobs, run in a fresh process:
+def runBenchmarkJob(JobArgs):
+    Job, Args = JobArgs
+
+    Simu.Simulation.setProgressPrint(False)
+    Output = io.StringIO()
+    with contextlib.redirect_stdout(Output):
+        if Job == "lattice":
+            Results, TransportCost = benchLattice(*Args)
+        elif Job == "particleIO":
+            Results, TransportCost = benchParticleIO(*Args), {}
+        elif Job == "dataFile":
+            Results, TransportCost = benchDataFile(*Args), {}
+        elif Job == "evaluateBeam":
+            Results, TransportCost = benchEvaluateBeam(*Args), {}
+        elif Job == "extrapolateBeam":
+            Results, TransportCost = benchExtrapolateBeam(*Args), {}
+        else:
+            raise badParameter(" Benchmark.runBenchmarkJob: bad job:", Job)
+
+    Label = Job
+    if Job == "lattice":
+        Label = getLatticeName(Args[0])
+    Results["memory:"+Label] = [getPeakMemory(), "MB", "lower"]
+
+    return Results, TransportCost
+
+def getLatticeName(Lattice):
+    return os.path.splitext(os.path.basename(Lattice))[0]
+
+def getPeakMemory():
+    import resource
+    MaxRSS = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        return MaxRSS / 1024.**2
+    return MaxRSS / 1024.
+
+def getBestTime(Call, nRepeat):
+    Best = None
+    for iRpt in range(nRepeat):
+        Strt = time.perf_counter()
+        Call()
+        Time = time.perf_counter() - Strt
+        if Best == None or Time < Best:
+            Best = Time
+    return Best
+
+def getSourceSample(N, Seed):
+    iSrc = BL.BeamLine.getElement()[1]
+    Rng  = np.random.default_rng(Seed)
+    if iSrc.getMode() == 3:
+        return Rng.normal(0., 1.E-3, (N, 6)) * \
+               np.array([1., 1., 1., 1., 0., 1.])
+    return iSrc.getParticlesFromSource(N, Rng)
+
+def benchLattice(Lattice, nEvts, nEvtsBatch, nTransport, nRepeat, Seed):
+    Name    = getLatticeName(Lattice)
+    Results = {}
+
+    Strt = time.perf_counter()
+    iBmLn = BL.BeamLine(Lattice)
+    Results["build:"+Name] = [time.perf_counter() - Strt, "s", "lower"]
+
+    Sample = getSourceSample(max(nEvts, nEvtsBatch, nTransport), Seed)
+    FromFile = BL.BeamLine.getElement()[1].getMode() == 3
+
+    def trackBeam():
+        np.random.seed(Seed)
+        if FromFile:
+            for iEvt in range(nEvts):
+                BL.BeamLine.setSrcTrcSpc(Sample[iEvt])
+                iBmLn.trackBeam(1)
+            BL.BeamLine.setSrcTrcSpc()
+        else:
+            iBmLn.trackBeam(nEvts)
+        Prtcl.Particle.cleanParticles()
+    Time = getBestTime(trackBeam, nRepeat)
+    Results["trackBeam:"+Name] = [nEvts/Time, "events/s", "higher"]
+
+    def trackBeamBatch():
+        np.random.seed(Seed)
+        if FromFile:
+            iBmLn.trackBeamBatch(nEvtsBatch, None, Sample[:nEvtsBatch])
+        else:
+            iBmLn.trackBeamBatch(nEvtsBatch)
+    Time = getBestTime(trackBeamBatch, nRepeat)
+    Results["trackBeamBatch:"+Name] = \
+                            [nEvtsBatch/Time, "events/s", "higher"]
+
+    #.. Per element type; input of element iLoc is the bunch at the
+    #   exit of element iLoc-1:
+    TransportCost = {}
+    iSrc = BL.BeamLine.getElement()[1]
+    BL.BeamLine.trackBunch(Sample[:nTransport], iSrc.getName())
+    TrcSpc = BL.BeamLine.getBatchTrcSpc()
+    for iLoc in range(2, len(BL.BeamLine.getElement())):
+        if iLoc-2 >= len(TrcSpc) or np.shape(TrcSpc[iLoc-2])[0] == 0:
+            break
+        iBLE = BL.BeamLine.getElement()[iLoc]
+        TrcSpcIn = TrcSpc[iLoc-2]
+        Rows     = [Row for Row in TrcSpcIn]
+        def Transport():
+            for Row in Rows:
+                iBLE.Transport(Row)
+        def TransportBatch():
+            iBLE.TransportBatch(TrcSpcIn)
+        Type = type(iBLE).__name__
+        if not Type in TransportCost:
+            TransportCost[Type] = [0., 0, 0, 0.]
+        TransportCost[Type][0] += getBestTime(Transport, nRepeat)
+        TransportCost[Type][1] += len(Rows)
+        TransportCost[Type][2] += len(Rows)
+        TransportCost[Type][3] += getBestTime(TransportBatch, nRepeat)
+
+    return Results, TransportCost
+
+def benchParticleIO(Lattice, DataDir, nParticles, nLocations, nRepeat, \
+                    Seed):
+    #.. Particles need the reference particle:
+    BL.BeamLine(Lattice)
+
+    Rng      = np.random.default_rng(Seed)
+    Names    = ["Benchmark:Location:"+str(iLoc) for iLoc in \
+                range(nLocations)]
+    Prtcls   = []
+    for iPrtcl in range(nParticles):
+        iPrtcl = Prtcl.Particle()
+        for iLoc in range(nLocations):
+            iPrtcl.recordParticle(Names[iLoc], float(iLoc), float(iLoc), \
+                                  Rng.normal(0., 1.E-3, 6))
+        Prtcls.append(iPrtcl)
+
+    FileName = "Benchmark-Particle.dat"
+    def write():
+        ParticleFILE = Prtcl.Particle.createParticleFile(DataDir, FileName)
+        for iPrtcl in Prtcls:
+            iPrtcl.writeParticle(ParticleFILE, False)
+        Prtcl.Particle.flushNcloseParticleFile(ParticleFILE)
+    Time  = getBestTime(write, nRepeat)
+    Results = {"writeParticle": [nParticles/Time, "particles/s", "higher"]}
+
+    Prtcl.Particle.cleanParticles()
+    def read():
+        ParticleFILE = Prtcl.Particle.openParticleFile(DataDir, FileName)
+        EndOfFile = False
+        while not EndOfFile:
+            EndOfFile = Prtcl.Particle.readParticle(ParticleFILE)
+        Prtcl.Particle.closeParticleFile(ParticleFILE)
+        nRead = len(Prtcl.Particle.getinstances()) - 1
+        Prtcl.Particle.cleanParticles()
+        if nRead != nParticles:
+            raise badResult(" Benchmark.benchParticleIO: read", nRead, \
+                            "particles, expected", nParticles)
+    Time = getBestTime(read, nRepeat)
+    Results["readParticle"] = [nParticles/Time, "particles/s", "higher"]
+
+    os.remove(os.path.join(DataDir, FileName))
+    return Results
+
+def benchDataFile(Lattice, DataDir, DataFile, nEvts, Seed):
+    iBmLn  = BL.BeamLine(Lattice)
+    iBmIOw = BmIO.BeamIO(DataDir, DataFile, True)
+    iBmLn.writeBeamLine(iBmIOw.getdataFILE())
+    np.random.seed(Seed)
+    Strt = time.perf_counter()
+    iBmLn.trackBeam(nEvts, iBmIOw.getdataFILE())
+    iBmIOw.flushNclosedataFile(iBmIOw.getdataFILE())
+    Time = time.perf_counter() - Strt
+    return {"trackBeamWrite": [nEvts/Time, "events/s", "higher"]}
+
+def benchEvaluateBeam(DataFile, nEvts):
+    Strt = time.perf_counter()
+    import Beam as Bm
+    iBm  = Bm.Beam(DataFile)
+    iBm.evaluateBeam()
+    Time = time.perf_counter() - Strt
+    return {"evaluateBeam": [nEvts/Time, "events/s", "higher"]}
+
+def benchExtrapolateBeam(DataFile, CSVFile, nEvts):
+    Strt = time.perf_counter()
+    import Beam as Bm
+    iexBm = Bm.extrapolateBeam(DataFile, nEvts, CSVFile, None)
+    iexBm.extrapolateBeam()
+    Time  = time.perf_counter() - Strt
+    return {"extrapolateBeam": [nEvts/Time, "events/s", "higher"]}
+
+
+#--------  Benchmark class  --------
+class Benchmark:
+    instances  = []
+    Suites     = ["lattice", "particleIO", "beam"]
+    __Debug    = False
+
+
+#--------  "Built-in methods":
+    def __init__(self, _Lattices=None, _nEvts=1000, _nEvtsBatch=20000, \
+                 _Seed=20241012):
+        if self.getDebug():
+            print(' Benchmark.__init__: ', \
+                  'creating the Benchmark object')
+
+        if _Lattices == None:
+            _Lattices = self.getShippedLattices()
+        if not isinstance(_Lattices, list) or len(_Lattices) == 0:
+            raise badParameter(" Benchmark.__init__: bad lattices:", \
+                               _Lattices)
+        for Lattice in _Lattices:
+            if not os.path.isfile(Lattice):
+                raise badParameter(" Benchmark.__init__: lattice", \
+                                   Lattice, "does not exist.")
+        for nEvt in [_nEvts, _nEvtsBatch]:
+            if not isinstance(nEvt, int) or nEvt < 1:
+                raise badParameter(" Benchmark.__init__: bad number", \
+                                   "of events:", nEvt)
+
+        Benchmark.instances.append(self)
+
+        self.setAll2None()
+
+        self._Lattices    = list(_Lattices)
+        self._nEvts       = _nEvts
+        self._nEvtsBatch  = _nEvtsBatch
+        self._Seed        = _Seed
+        self._BeamLattice = self._Lattices[0]
+        for Lattice in self._Lattices:
+            if "LhARABeamLine-Params-Gauss-Gabor" in Lattice:
+                self._BeamLattice = Lattice
+
+        if self.getDebug():
+            print("     ----> New Benchmark instance: \n", self)
+            print(" <---- Benchmark instance created.")
+
+    def __repr__(self):
+        return "Benchmark()"
+
+    def __str__(self):
+        self.print()
+        return " Benchmark __str__ done."
+
+    def print(self):
+        print("\n Benchmark:")
+        print(" ----------")
+        print("     ----> Debug flag:", self.getDebug())
+        print("     ----> Lattices:", \
+              [getLatticeName(Lattice) for Lattice in self.getLattices()])
+        print("     ----> Events, trackBeam, trackBeamBatch:", \
+              self.getnEvts(), self.getnEvtsBatch())
+        print("     ----> Particle i/o, particles, locations:", \
+              self.getnParticles(), self.getnLocations())
+        print("     ----> Particles per element for Transport:", \
+              self.getnTransport())
+        print("     ----> Repeats, seed:", self.getRepeat(), self.getSeed())
+        print("     ----> Suites:", self.getSuites())
+        return " <---- Benchmark parameter dump complete."
+
+
+#--------  "Set methods"
+    @classmethod
+    def setDebug(cls, Debug=False):
+        cls.__Debug = Debug
+        if cls.__Debug:
+            print(" Benchmark.setDebug: ", Debug)
+
+    def setAll2None(self):
+        self._Lattices    = None
+        self._nEvts       = None
+        self._nEvtsBatch  = None
+        self._nParticles  = 2000
+        self._nLocations  = 10
+        self._nTransport  = 200
+        self._nRepeat     = 3
+        self._Seed        = None
+        self._Suites      = list(Benchmark.Suites)
+        self._BeamLattice = None
+        self._Results     = {}
+        self._Metadata    = {}
+
+    def setSuites(self, Suites):
+        if not isinstance(Suites, list) or len(Suites) == 0 or \
+           not set(Suites) <= set(Benchmark.Suites):
+            raise badParameter(" Benchmark.setSuites: bad suites:", Suites)
+        self._Suites = list(Suites)
+
+    def setRepeat(self, nRepeat):
+        if not isinstance(nRepeat, int) or nRepeat < 1:
+            raise badParameter(" Benchmark.setRepeat: bad repeats:", nRepeat)
+        self._nRepeat = nRepeat
+
+    def setParticleIO(self, nParticles, nLocations):
+        for n in [nParticles, nLocations]:
+            if not isinstance(n, int) or n < 1:
+                raise badParameter(" Benchmark.setParticleIO: bad", \
+                                   "number:", n)
+        self._nParticles = nParticles
+        self._nLocations = nLocations
+
+    def setnTransport(self, nTransport):
+        if not isinstance(nTransport, int) or nTransport < 1:
+            raise badParameter(" Benchmark.setnTransport: bad number:", \
+                               nTransport)
+        self._nTransport = nTransport
+
+
+#--------  "Get methods"
+    @classmethod
+    def getDebug(cls):
+        return cls.__Debug
+
+    @classmethod
+    def getShippedLattices(cls):
+        HOMEPATH = os.getenv('HOMEPATH')
+        if HOMEPATH == None:
+            HOMEPATH = os.path.join(os.path.dirname( \
+                                    os.path.abspath(__file__)), "..")
+        return [os.path.join(HOMEPATH, '11-Parameters', Lattice + '.csv') \
+                for Lattice in ["LIONBeamLine-Params-Flat", \
+                                "LIONBeamLine-Params-Gauss", \
+                                "LIONBeamLine-Params-LsrDrvn", \
+                                "LhARABeamLine-Params-Gauss-Gabor", \
+                                "LhARABeamLine-Params-Gauss-Solenoid", \
+                                "DRACOBeamLine-Params-LsrDrvn", \
+                                "LhARA-Stage1-BeamDelivery"]]
+
+    def getLattices(self):
+        return self._Lattices
+
+    def getnEvts(self):
+        return self._nEvts
+
+    def getnEvtsBatch(self):
+        return self._nEvtsBatch
+
+    def getnParticles(self):
+        return self._nParticles
+
+    def getnLocations(self):
+        return self._nLocations
+
+    def getnTransport(self):
+        return self._nTransport
+
+    def getRepeat(self):
+        return self._nRepeat
+
+    def getSeed(self):
+        return self._Seed
+
+    def getSuites(self):
+        return self._Suites
+
+    def getBeamLattice(self):
+        return self._BeamLattice
+
+    def getResults(self):
+        return self._Results
+
+    def getMetadata(self):
+        return self._Metadata
+
+
+#--------  Processing methods:
+    def getJobs(self, DataDir):
+        Jobs = []
+        if "lattice" in self.getSuites():
+            for Lattice in self.getLattices():
+                Jobs.append(("lattice", (Lattice, self.getnEvts(), \
+                                         self.getnEvtsBatch(), \
+                                         self.getnTransport(), \
+                                         self.getRepeat(), self.getSeed())))
+        if "particleIO" in self.getSuites():
+            Jobs.append(("particleIO", (self.getBeamLattice(), DataDir, \
+                                        self.getnParticles(), \
+                                        self.getnLocations(), \
+                                        self.getRepeat(), self.getSeed())))
+        if "beam" in self.getSuites():
+            DataFile = "Benchmark-Beam.dat"
+            Path     = os.path.join(DataDir, DataFile)
+            Jobs.append(("dataFile", (self.getBeamLattice(), DataDir, \
+                                      DataFile, self.getnEvts(), \
+                                      self.getSeed())))
+            Jobs.append(("evaluateBeam", (Path, self.getnEvts())))
+            Jobs.append(("extrapolateBeam", \
+                         (Path, os.path.join(DataDir, "Benchmark-Beam.csv"), \
+                          self.getnEvts())))
+        return Jobs
+
+    def run(self):
+        if self.getDebug():
+            print(" Benchmark.run: start; suites:", self.getSuites())
+
+        self._Results  = {}
+        self._Metadata = self.getRunMetadata()
+
+        DataDir       = tempfile.mkdtemp(prefix="Benchmark-")
+        TransportCost = {}
+        ctx = mp.get_context("spawn")
+        try:
+            for Job in self.getJobs(DataDir):
+                if self.getDebug():
+                    print("     ----> Job:", Job[0], Job[1][0])
+                with ctx.Pool(1) as Pool:
+                    Results, Cost = Pool.apply(runBenchmarkJob, (Job,))
+                for Key, Value in Results.items():
+                    self._Results[Key] = {"Value": Value[0], \
+                                          "Unit": Value[1], \
+                                          "Better": Value[2]}
+                for Type, Sums in Cost.items():
+                    if not Type in TransportCost:
+                        TransportCost[Type] = [0., 0, 0, 0.]
+                    for iSum in range(4):
+                        TransportCost[Type][iSum] += Sums[iSum]
+        finally:
+            shutil.rmtree(DataDir, ignore_errors=True)
+
+        for Type in sorted(TransportCost):
+            Time, nCalls, nBatch, TimeBatch = TransportCost[Type]
+            self._Results["Transport:"+Type] = \
+                {"Value": 1.E6*Time/nCalls, "Unit": "us/call", \
+                 "Better": "lower"}
+            self._Results["TransportBatch:"+Type] = \
+                {"Value": 1.E6*TimeBatch/nBatch, "Unit": "us/particle", \
+                 "Better": "lower"}
+
+        if self.getDebug():
+            print(" <---- Benchmark.run: done;", len(self._Results), \
+                  "results.")
+
+        return self._Results
+
+    def getRunMetadata(self):
+        Commit = None
+        try:
+            Commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], \
+                        cwd=os.path.dirname(os.path.abspath(__file__)), \
+                        capture_output=True, text=True, timeout=10). \
+                        stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            pass
+        return {"Date": time.strftime("%Y-%m-%d %H:%M:%S"), \
+                "Host": platform.node(), \
+                "Platform": platform.platform(), \
+                "Processor": platform.processor(), \
+                "nCPU": os.cpu_count(), \
+                "Python": platform.python_version(), \
+                "NumPy": np.__version__, \
+                "Backend": TrkKrnl.TrackingKernels.getActiveBackend(), \
+                "Commit": Commit, \
+                "Lattices": [getLatticeName(Lattice) for Lattice in \
+                             self.getLattices()], \
+                "nEvts": self.getnEvts(), \
+                "nEvtsBatch": self.getnEvtsBatch(), \
+                "nParticles": self.getnParticles(), \
+                "nLocations": self.getnLocations(), \
+                "nTransport": self.getnTransport(), \
+                "nRepeat": self.getRepeat(), \
+                "Seed": self.getSeed(), \
+                "Suites": self.getSuites()}
+
+    @classmethod
+    def compareResults(cls, Results, Baseline, Tolerance=0.25):
+        if not isinstance(Tolerance, (int, float)) or Tolerance <= 0.:
+            raise badParameter(" Benchmark.compareResults: bad tolerance:", \
+                               Tolerance)
+        Regressions = []
+        for Name in sorted(Results):
+            if not Name in Baseline or Baseline[Name]["Value"] <= 0.:
+                continue
+            Base   = Baseline[Name]["Value"]
+            Value  = Results[Name]["Value"]
+            Change = (Value - Base) / Base
+            if Results[Name]["Better"] == "higher":
+                Change = -Change
+            if Change > Tolerance:
+                Regressions.append([Name, Base, Value, Change])
+        return Regressions
+
+    def compare(self, _filename, Tolerance=0.25):
+        Baseline, Metadata = self.readResults(_filename)
+        Regressions = self.compareResults(self.getResults(), Baseline, \
+                                          Tolerance)
+        Regressed   = [Regression[0] for Regression in Regressions]
+
+        print(" Benchmark.compare: baseline", _filename)
+        print("     ----> Baseline date, commit:", Metadata.get("Date"), \
+              Metadata.get("Commit"))
+        print("     ----> Tolerance:", Tolerance)
+        print("     {:<48} {:>12} {:>12} {:>8} {:<12}".format( \
+              "Metric", "Baseline", "This run", "Change", "Unit"))
+        for Name, Result in self.getResults().items():
+            Base   = "-"
+            Change = "-"
+            if Name in Baseline:
+                Base   = "{:12.4g}".format(Baseline[Name]["Value"])
+                if Baseline[Name]["Value"] > 0.:
+                    Change = "{:+7.1%}".format(Result["Value"] / \
+                                Baseline[Name]["Value"] - 1.)
+            Flag = " REGRESSION" if Name in Regressed else ""
+            print("     {:<48} {:>12} {:12.4g} {:>8} {:<12}{}".format( \
+                  Name, Base, Result["Value"], Change, Result["Unit"], Flag))
+        Missing = [Name for Name in Baseline if not Name in \
+                   self.getResults()]
+        if len(Missing) > 0:
+            print("     ----> In baseline only:", Missing)
+        print(" <---- Benchmark.compare:", len(Regressions), "regressions.")
+
+        return Regressions
+
+
+#--------  I/o methods:
+    def writeResults(self, _filename):
+        if len(self.getResults()) == 0:
+            raise noResults(" Benchmark.writeResults: run the benchmark", \
+                            "first.")
+        with open(_filename, "w") as JsonFILE:
+            json.dump({"Metadata": self.getMetadata(), \
+                       "Results": self.getResults()}, JsonFILE, indent=1)
+
+    @classmethod
+    def readResults(cls, _filename):
+        if not os.path.isfile(_filename):
+            raise badParameter(" Benchmark.readResults: no file", _filename)
+        with open(_filename, "r") as JsonFILE:
+            Content = json.load(JsonFILE)
+        if not "Results" in Content:
+            raise badParameter(" Benchmark.readResults: no results in", \
+                               _filename)
+        return [Content["Results"], Content.get("Metadata", {})]
+
+
+#--------  Exceptions:
+class badParameter(Exception):
+    pass
+
+class badResult(Exception):
+    pass
+
+class noResults(Exception):
+    pass
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Class ParameterScan:
+====================
+
+  Scan of the parameters of a beam line.  The beam line is specified by
+  a beam-line specification file (11-Parameters/*.csv); each point of the
+  scan overrides the "Value" of one or more rows of the specification
+  data frame.
+
+  The source sample is generated once, from a fixed seed, and the base
+  beam line is tracked once, keeping the surviving particles at every
+  element boundary (BeamLine.trackBunch).  For each point the beam line
+  is rebuilt from the modified data frame (BeamLine accepts a data frame)
+  and only the elements from the first modified element onwards are
+  re-tracked, starting from the base survivors at the boundary before it.
+  Every point therefore sees the same particles (common random numbers).
+  If the facility or source is modified, the sample is regenerated at the
+  source with the same seed and the whole beam line tracked.
+
+  Rows are identified by a key, either the row index (int) in the data
+  frame or a string "Section:Element:Parameter[:n]", the n-th (default
+  1st) row with the given Section, Element and Parameter; for example
+  "Capture:Fquad:Strength:2".
+
+  Class attributes:
+  -----------------
+    instances : List of instances of ParameterScan class
+  __Debug     : Debug flag
+
+
+  Instance attributes:
+  --------------------
+  _BeamLineSpecificationCSVfile : Path to the base specification file
+           _BeamLineParamPandas : Base specification data frame
+                    _nParticles : Number of particles generated at source
+                          _Seed : Seed of the source sample
+                      _Location : Name of the location at which the
+                                  summary is made; None: end of beam line
+                        _Points : List of dicts {key: value}, one per
+                                  point
+                         _Table : pandas data frame, one row per point;
+                                  overridden values, name of the first
+                                  re-tracked element, number of particles
+                                  and transmission, means and rms of x,
+                                  x', y, y' and delta, and rms emittances
+                                  at _Location
+       _BaseLocation, _Bases,
+                   _BaseTrcSpc : Locations, s and survivors of the base
+                                  beam line (as BeamLine.trackBunch)
+
+  Methods:
+  --------
+  Built-in methods __init__, __repr__ and __str__.
+      __init__ : Creates instance and reads the base specification file.
+           Input : _BeamLineSpecificationCSVfile, _nParticles (default
+                   10000), _Seed, _Location (default None)
+      __repr__: One liner with call.
+      __str__ : Dump of parameters
+
+  Set methods:
+     setDebug : set class debug flag
+      setGrid : Points on the grid (outer product) of the values of each
+                key.
+           Input : dict {key: list of values}
+    setPoints : Points as a list.
+           Input : list of dicts {key: value}
+
+  Get methods:
+     getDebug, getBeamLineSpecificationCSVfile, getBeamLineParamPandas,
+     getnParticles, getSeed, getLocation, getPoints, getTable: believed
+     to be self documenting.
+
+       getRow : Row index in the base data frame of a key.
+           Input : key, int or str as above
+          Return : int
+
+  Processing methods:
+  buildBeamLine : Class method; clean the BeamLine, beam line element and
+                  particle instances and build the beam line from a data
+                  frame.
+           Input : pandas data frame
+  trackFromSource : Generate the source sample (seed _Seed) and track it
+                    through the whole beam line.
+  getLocationTrcSpc : Survivors at _Location.
+           Input : list of location names, list of np.ndarray(n,6)
+          Return : np.ndarray(n,6) or None if location not reached
+   getSummary : Class method; summary statistics of a bunch.
+           Input : TrcSpc, np.ndarray(n,6); nSource, number generated
+          Return : dict
+         run : Track the base beam line and every point; the base beam
+               line is rebuilt at the end.
+          Return : pandas data frame, the summary table
+
+  I/o methods:
+   writeTable : Write the summary table to a csv file.
+           Input : path to csv file
+
+
+Created on Fri 01Mar24: Version history:
+----------------------------------------
+ 1.0: 01Mar24: First implementation
+
+@author: kennethlong
+"""
+
+import itertools
+import math   as mth
+import numpy  as np
+import pandas as pnds
+
+import Particle        as Prtcl
+import BeamLine        as BL
+import BeamLineElement as BLE
+
+
+class ParameterScan:
+    instances  = []
+    __Debug    = False
+
+
+#--------  "Built-in methods":
+    def __init__(self, _BeamLineSpecificationCSVfile=None, \
+                 _nParticles=10000, _Seed=20240301, _Location=None):
+        if self.getDebug():
+            print(' ParameterScan.__init__: ', \
+                  'creating the ParameterScan object')
+
+        if _BeamLineSpecificationCSVfile == None:
+            raise badParameter( \
+                " ParameterScan.__init__: no beam line specification file.")
+        if not isinstance(_nParticles, int) or _nParticles < 1:
+            raise badParameter( \
+                " ParameterScan.__init__: bad number of particles:", \
+                _nParticles)
+
+        ParameterScan.instances.append(self)
+
+        self.setAll2None()
+
+        self._BeamLineSpecificationCSVfile = _BeamLineSpecificationCSVfile
+        self._BeamLineParamPandas = \
+                        BL.BeamLine.csv2pandas(_BeamLineSpecificationCSVfile)
+        self._nParticles = _nParticles
+        self._Seed       = _Seed
+        self._Location   = _Location
+
+        if self.getDebug():
+            print("     ----> New ParameterScan instance: \n", self)
+            print(" <---- ParameterScan instance created.")
+
+    def __repr__(self):
+        return "ParameterScan()"
+
+    def __str__(self):
+        self.print()
+        return " ParameterScan __str__ done."
+
+    def print(self):
+        print("\n ParameterScan:")
+        print(" --------------")
+        print("     ----> Debug flag:", self.getDebug())
+        print("     ----> Specification file:", \
+              self.getBeamLineSpecificationCSVfile())
+        print("     ----> Number of particles, seed:", \
+              self.getnParticles(), self.getSeed())
+        print("     ----> Summary location:", self.getLocation())
+        print("     ----> Number of points:", len(self.getPoints()))
+        return " <---- ParameterScan parameter dump complete."
+
+
+#--------  "Set methods"
+    @classmethod
+    def setDebug(cls, Debug=False):
+        cls.__Debug = Debug
+        if cls.__Debug:
+            print(" ParameterScan.setDebug: ", Debug)
+
+    def setAll2None(self):
+        self._BeamLineSpecificationCSVfile = None
+        self._BeamLineParamPandas          = None
+        self._nParticles                   = None
+        self._Seed                         = None
+        self._Location                     = None
+        self._Points                       = []
+        self._Table                        = None
+        self._BaseLocation                 = None
+        self._Bases                        = None
+        self._BaseTrcSpc                   = None
+
+    def setGrid(self, Grid):
+        if not isinstance(Grid, dict) or len(Grid) == 0:
+            raise badParameter(" ParameterScan.setGrid: bad grid:", Grid)
+        for Key in Grid:
+            self.getRow(Key)
+        Keys = list(Grid.keys())
+        self._Points = [dict(zip(Keys, Values)) for Values in \
+                        itertools.product(*[Grid[Key] for Key in Keys])]
+
+    def setPoints(self, Points):
+        if not isinstance(Points, list):
+            raise badParameter(" ParameterScan.setPoints: bad points:", \
+                               Points)
+        for Point in Points:
+            for Key in Point:
+                self.getRow(Key)
+        self._Points = [dict(Point) for Point in Points]
+
+
+#--------  "Get methods"
+    @classmethod
+    def getDebug(cls):
+        return cls.__Debug
+
+    def getBeamLineSpecificationCSVfile(self):
+        return self._BeamLineSpecificationCSVfile
+
+    def getBeamLineParamPandas(self):
+        return self._BeamLineParamPandas
+
+    def getnParticles(self):
+        return self._nParticles
+
+    def getSeed(self):
+        return self._Seed
+
+    def getLocation(self):
+        return self._Location
+
+    def getPoints(self):
+        return self._Points
+
+    def getTable(self):
+        return self._Table
+
+    def getRow(self, Key):
+        Pnds = self.getBeamLineParamPandas()
+        if isinstance(Key, (int, np.integer)):
+            if not Key in Pnds.index:
+                raise badParameter(" ParameterScan.getRow: no row", Key)
+            return int(Key)
+
+        Fields = str(Key).split(":")
+        if len(Fields) < 3 or len(Fields) > 4:
+            raise badParameter(" ParameterScan.getRow: bad key:", Key)
+        nMtch = 1
+        if len(Fields) == 4:
+            nMtch = int(Fields[3])
+        Rows = Pnds.index[(Pnds["Section"]   == Fields[0]) & \
+                          (Pnds["Element"]   == Fields[1]) & \
+                          (Pnds["Parameter"] == Fields[2])]
+        if nMtch < 1 or len(Rows) < nMtch:
+            raise badParameter(" ParameterScan.getRow: no row for key", Key)
+        return int(Rows[nMtch-1])
+
+
+#--------  Processing methods:
+    @classmethod
+    def buildBeamLine(cls, ParamPandas):
+        BL.BeamLine.cleaninstance()
+        for SubCls in BLE.BeamLineElement.__subclasses__():
+            if "instances" in SubCls.__dict__:
+                SubCls.instances = []
+        BLE.BeamLineElement.cleaninstances()
+        Prtcl.Particle.cleanAllParticles()
+
+        return BL.BeamLine(ParamPandas)
+
+    @classmethod
+    def getSummary(cls, TrcSpc, nSource):
+        Smmry = {"n": np.shape(TrcSpc)[0], \
+                 "Transmission": np.shape(TrcSpc)[0] / nSource}
+        Names = ["x", "xp", "y", "yp", "z", "delta"]
+        for iCrd in [0, 1, 2, 3, 5]:
+            Smmry["mean_"+Names[iCrd]] = np.nan
+            Smmry["rms_"+Names[iCrd]]  = np.nan
+        Smmry["emittance_x"] = np.nan
+        Smmry["emittance_y"] = np.nan
+        if np.shape(TrcSpc)[0] < 2:
+            return Smmry
+
+        Means  = np.mean(TrcSpc, axis=0)
+        CovMtx = np.cov(TrcSpc, rowvar=False, bias=True)
+        for iCrd in [0, 1, 2, 3, 5]:
+            Smmry["mean_"+Names[iCrd]] = Means[iCrd]
+            Smmry["rms_"+Names[iCrd]]  = mth.sqrt(max(0., CovMtx[iCrd,iCrd]))
+        Smmry["emittance_x"] = mth.sqrt(max(0., \
+                                    np.linalg.det(CovMtx[0:2,0:2])))
+        Smmry["emittance_y"] = mth.sqrt(max(0., \
+                                    np.linalg.det(CovMtx[2:4,2:4])))
+        return Smmry
+
+    def trackFromSource(self):
+        iSrc   = BL.BeamLine.getElement()[1]
+        Rng    = np.random.default_rng(self.getSeed())
+        Sample = iSrc.getParticlesFromSource(self.getnParticles(), Rng)
+        BL.BeamLine.trackBunch(Sample, iSrc.getName())
+
+    def getLocationTrcSpc(self, Location, TrcSpc):
+        if self.getLocation() == None:
+            return TrcSpc[-1]
+        if not self.getLocation() in Location:
+            return None
+        return TrcSpc[Location.index(self.getLocation())]
+
+    def run(self):
+        if self.getDebug():
+            print(" ParameterScan.run: start;", len(self.getPoints()), \
+                  "points.")
+
+        #.. Base beam line, tracked once:
+        self.buildBeamLine(self.getBeamLineParamPandas())
+        self.trackFromSource()
+        self._BaseLocation = list(BL.BeamLine.getBatchLocation())
+        self._Bases        = list(BL.BeamLine.getBatchs())
+        self._BaseTrcSpc   = list(BL.BeamLine.getBatchTrcSpc())
+        if self.getLocation() != None and \
+           not self.getLocation() in self._BaseLocation:
+            raise badParameter(" ParameterScan.run: location", \
+                               self.getLocation(), "not in beam line.")
+
+        Rows = []
+        for iPnt, Point in enumerate(self.getPoints()):
+            Pndas = self.getBeamLineParamPandas().copy()
+            for Key, Value in Point.items():
+                Pndas.at[self.getRow(Key), "Value"] = str(Value)
+            self.buildBeamLine(Pndas)
+
+            #.. Restart from the first element using a modified row:
+            RowMin = min([self.getRow(Key) for Key in Point])
+            iRstrt = len(BL.BeamLine.getElementRow())
+            for iLoc, Row in enumerate(BL.BeamLine.getElementRow()):
+                if Row != None and Row >= RowMin:
+                    iRstrt = iLoc
+                    break
+
+            if iRstrt < 2:
+                self.trackFromSource()
+                Location = BL.BeamLine.getBatchLocation()
+                TrcSpc   = BL.BeamLine.getBatchTrcSpc()
+            elif iRstrt < len(BL.BeamLine.getElement()):
+                iBLE = BL.BeamLine.getElement()[iRstrt-1]
+                BL.BeamLine.trackBunch(self._BaseTrcSpc[iRstrt-2], \
+                                       iBLE.getName(), -999999., \
+                                       self._Bases[iRstrt-2], iRstrt-1)
+                Location = self._BaseLocation[:iRstrt-2] + \
+                    BL.BeamLine.getBatchLocation()
+                TrcSpc   = self._BaseTrcSpc[:iRstrt-2] + \
+                    BL.BeamLine.getBatchTrcSpc()
+            else:
+                Location = self._BaseLocation
+                TrcSpc   = self._BaseTrcSpc
+
+            Row = {"Point": iPnt}
+            for Key, Value in Point.items():
+                Row[str(Key)] = Value
+            Row["Restart"] = None
+            if iRstrt < len(BL.BeamLine.getElement()):
+                Row["Restart"] = BL.BeamLine.getElement()[iRstrt].getName()
+            LocTrcSpc = self.getLocationTrcSpc(Location, TrcSpc)
+            if LocTrcSpc is None:
+                LocTrcSpc = np.empty((0, 6))
+            Row.update(self.getSummary(LocTrcSpc, self.getnParticles()))
+            Rows.append(Row)
+
+            if self.getDebug():
+                print("     ----> Point", iPnt, ":", Point, \
+                      "; restart at", Row["Restart"], \
+                      "; transmission:", Row["Transmission"])
+
+        self._Table = pnds.DataFrame(Rows)
+
+        #.. Leave the base beam line in place:
+        self.buildBeamLine(self.getBeamLineParamPandas())
+
+        if self.getDebug():
+            print(" <---- ParameterScan.run: done.")
+
+        return self._Table
+
+
+#--------  I/o methods:
+    def writeTable(self, _filename):
+        if not isinstance(self.getTable(), pnds.DataFrame):
+            raise noTable(" ParameterScan.writeTable: run the scan first.")
+        self.getTable().to_csv(_filename, index=False)
+
+
+#--------  Exceptions:
+class badParameter(Exception):
+    pass
+
+class noTable(Exception):
+    pass
@@ -65,6 +65,10 @@ setRPLCPhaseSpace: [np.ndarray(3,), np.ndarray(3,)]: two three vectors
 
 setLabPhaseSpace: [np.ndarray(3,), np.ndarray(3,)]: two three vectors
 
+setRPLCPhaseSpaceBatch: i/p: PhsSpc [np.ndarray(n,6)], Valid [np.ndarray(n,)]
+                replace RPLC phase space at all n locations (pz None
+                where not Valid) and clear the Lab phase space.
+
 recordParticle: i/p: Location, s, z, TraceSpace:
                 calls, setLocation, setz, sets, setTraceSpace in turn
                 to store all variables.
@@ -78,6 +82,8 @@ recordParticle: i/p: Location, s, z, TraceSpace:
       getDebug, getinstances, getLocation, getz, gets, 
       getTraceSpace, getRPLCPhaseSpace, getPhaseSpace
           -- thought to be self documenting!
+      getRPLCPhaseSpace and getLabPhaseSpace fill the phase space (see
+      fillPhaseSpace) if it is not up to date with the trace space.
 
   Processing methods:
     cleanParticles : Deletes all particle instances and resets list of
@@ -91,17 +97,35 @@ recordParticle: i/p: Location, s, z, TraceSpace:
           printProgression: print progression through the beamline
          No input or return
 
-   fillPhaseSpaceAll: Class method, no arguments.  Fills RPLC and Lab
-          phase-space attrutes for all particle
+   fillPhaseSpaceAll: Class method, no arguments.  Fills RPLC
+          phase-space attributes for all particles in one batched call;
+          the Lab phase space is filled on request by getLabPhaseSpace.
                Returns: Success: Book=l, True if success.
 
       fillPhaseSpace: fill phase space (RPLC and Lab) for "self"
                Returns: Success: Book=l, True if success.
 
+  resetPhaseSpace: clear RPLC and Lab phase space; refilled when next
+          requested by getRPLCPhaseSpace or getLabPhaseSpace.
+
    calcRPLCPhaseSpace: Calculate RPLC phase space from trace space
           I/p: Location numner, starting from 0
       Returns: Success: Book=l, True if success.
 
+   RPLCTraceSpace2PhaseSpaceBatch: Class method; convert (N,6) trace
+          space to (N,6) RPLC phase space (x, y, z, px, py, pz) in one
+          call.
+          I/p: np.ndarray (N,6)
+      Returns: PhsSpc [np.ndarray (N,6)], Valid [np.ndarray (N,) bool];
+               Valid is False where pz is unphysical (pz set to nan).
+
+   RPLCPhaseSpace2TraceSpaceBatch: Class method; inverse of
+          RPLCTraceSpace2PhaseSpaceBatch.
+          I/p: np.ndarray (N,6); Returns: np.ndarray (N,6)
+
+   getRPLCReference: Class method; returns particle mass, p0, E0 and b0
+          of the reference particle at the start of the beam line.
+
 
   I/o methods:
      createParticleFile: create a file in which to store particle events.
@@ -115,6 +139,14 @@ recordParticle: i/p: Location, s, z, TraceSpace:
           Input: particleFILE full path to file to which event will be
                  written
 
+ writeParticleBatch: Class method; write a bunch of events tracked by
+                 BeamLine.trackBeamBatch in the same format as
+                 writeParticle.
+          Input: ParticleFILE: io.BufferedWriter
+                 Location, z, s: lists, name, z and s of each location
+                 TrcSpc: list of np.ndarray(n,6), survivors at location
+                 Index : list of np.ndarray(n,), event number of survivors
+
       flushNcloseParticleFile: Flush and close file.
           Input: ParticleFILE full path to NEW file to which events will be
                  written
@@ -132,6 +164,10 @@ recordParticle: i/p: Location, s, z, TraceSpace:
                  read
 
 
+  CompactParticle: __slots__, array-backed alternative to Particle for
+                   keeping many events in memory (see class docstring
+                   below).
+
   Exceptions:
     badParticle, badParameter, noPATH, noNAME, noFILE
 
@@ -145,9 +181,6 @@ Created on Mon 03Jul23: Version history:
 """
 
 from copy import deepcopy
-from matplotlib.backends.backend_pdf import PdfPages
-import matplotlib.ticker as ticker
-import matplotlib.pyplot as plt
 import struct            as strct
 import numpy             as np
 import math              as mth
@@ -155,6 +188,9 @@ import os
 import io
 import sys
 
+#.. matplotlib is imported by the plotting methods, on first use, so that
+#   tracking jobs that never plot do not load it.
+
 import Particle          as Prtcl
 import BeamLine          as BL
 import BeamLineElement   as BLE
@@ -223,20 +259,20 @@ class Particle:
             with np.printoptions(linewidth=500,precision=7,suppress=True):
                 print("             ---->     trace space:", \
                       self.getTraceSpace()[iLctn])
-            if len(self.getRPLCPhaseSpace()) == 0:
+            if len(self._PhsSpc) <= iLctn:
                 print("             ---->     phase space: not yet filled")
             else:
                 with np.printoptions(linewidth=500,precision=7,\
                                      suppress=True):
                     print("             ---->     phase space:", \
-                          self.getRPLCPhaseSpace()[iLctn])
-            if len(self.getLabPhaseSpace()) == 0:
+                          self._PhsSpc[iLctn])
+            if len(self._LabPhsSpc) <= iLctn:
                 print("             ----> Lab phase space: not yet filled")
             else:
                 with np.printoptions(linewidth=500,precision=7,\
                                      suppress=True):
                     print("             ----> Lab phase space:", \
-                          self.getLabPhaseSpace()[iLctn])
+                          self._LabPhsSpc[iLctn])
         return " <---- Particle parameter dump complete."
 
     
@@ -311,6 +347,15 @@ class Particle:
 
         return Success
 
+    def setRPLCPhaseSpaceBatch(self, PhsSpc, Valid):
+        self._PhsSpc    = []
+        self._LabPhsSpc = []
+        for iLoc in range(len(PhsSpc)):
+            pz = PhsSpc[iLoc,5] if Valid[iLoc] else None
+            self.setRPLCPhaseSpace( \
+                np.array([PhsSpc[iLoc,:3], \
+                          np.array([PhsSpc[iLoc,3], PhsSpc[iLoc,4], pz])]))
+
     def setLabPhaseSpace(self, PhaseSpace):
         Success = False
         self._LabPhsSpc.append(PhaseSpace)
@@ -318,6 +363,10 @@ class Particle:
 
         return Success
 
+    def resetPhaseSpace(self):
+        self._PhsSpc    = []
+        self._LabPhsSpc = []
+
     def recordParticle(self, Location, z, s, TraceSpace):
         Success = self.setLocation(Location)
         if Success:
@@ -366,9 +415,13 @@ class Particle:
         return self._TrcSpc
     
     def getRPLCPhaseSpace(self):
+        if len(self._PhsSpc) != len(self._TrcSpc):
+            self.fillPhaseSpace()
         return self._PhsSpc
     
     def getLabPhaseSpace(self):
+        if len(self._LabPhsSpc) != len(self._TrcSpc):
+            self.fillPhaseSpace()
         return deepcopy(self._LabPhsSpc)
 
             
@@ -382,21 +435,28 @@ class Particle:
                   len(cls.getinstances()), \
                   "particle instances.")
 
-        nPrtcl = 0
-        for iPrtcl in cls.getinstances():
-            nPrtcl += 1
-            if cls.getDebug():
-                print("     ----> Particle:", nPrtcl)
-            
-            #if not isinstance(iPrtcl, ReferenceParticle):
-            if Particle.getDebug():
-                print("         ----> Fill phase space for particle:", \
-                      nPrtcl)
-            Success = iPrtcl.fillPhaseSpace()
+        #.. Convert the records of all particles in one call:
+        Prtcls = [iPrtcl for iPrtcl in cls.getinstances() \
+                  if isinstance(iPrtcl, Particle) and \
+                     len(iPrtcl.getTraceSpace()) > 0]
+        if len(Prtcls) == 0:
+            return Success
+        nRcrd  = [len(iPrtcl.getTraceSpace()) for iPrtcl in Prtcls]
+        PhsSpc, Valid = cls.RPLCTraceSpace2PhaseSpaceBatch( \
+                    np.concatenate([np.array(iPrtcl.getTraceSpace()) \
+                                    for iPrtcl in Prtcls]))
+
+        iFrst = 0
+        for iPrtcl, n in zip(Prtcls, nRcrd):
+            iPrtcl.setRPLCPhaseSpaceBatch(PhsSpc[iFrst:iFrst+n], \
+                                          Valid[iFrst:iFrst+n])
+            iFrst += n
+        Success = True
 
         if cls.getDebug():
             print("     ----> Particle.fillPhaseSpaceAll:", \
-                  "fill phase space Success =", Success)
+                  "fill phase space Success =", Success, \
+                  "; lab phase space filled when requested.")
             print(" <----  Particle.fillPhaseSpaceAll, compete.")
             
         return Success
@@ -408,44 +468,38 @@ class Particle:
             print("     ----> fill phase space for particle with", \
                   len(self.getLocation()), "records.")
 
-        iRefPrtcl = ReferenceParticle.getinstances()
-
-        nLoc = 0
-        for iLoc in self.getLocation():
-            if self.getDebug():
-                print("         ----> Convert at location:", \
-                      iLoc)
-            PhsSpc  = self.calcRPLCPhaseSpace(nLoc)
-            Success = self.setRPLCPhaseSpace(PhsSpc)
-
-            RotMtrx = iRefPrtcl.getRot2LabOut()[nLoc]
-            if self.getDebug():
-                print("         ----> Rotation matrix:", \
-                      RotMtrx)
-            
-            drLab   = np.matmul(RotMtrx, PhsSpc[0])
-            if PhsSpc[1][2] != None:
-                pLab    = np.matmul(RotMtrx, PhsSpc[1])
-            else:
-                pLab    = np.array([None, None, None])
-
-            rLab    = iRefPrtcl.getRrOut()[nLoc][0:3] + drLab
+        if len(self.getTraceSpace()) == 0:
+            self.resetPhaseSpace()
+            return True
 
-            LabPhsSpc = [rLab, pLab]
-            Success   = self.setLabPhaseSpace(LabPhsSpc)
+        PhsSpc, Valid = self.RPLCTraceSpace2PhaseSpaceBatch( \
+                                        np.array(self.getTraceSpace()))
+        self.setRPLCPhaseSpaceBatch(PhsSpc, Valid)
 
-            nLoc  += 1
+        #.. Lab frame: rotate and displace by reference particle:
+        iRefPrtcl = ReferenceParticle.getinstances()
+        nLoc      = len(PhsSpc)
+        RotMtrx   = np.array(iRefPrtcl.getRot2LabOut()[:nLoc])
+        rLab      = np.einsum('nij,nj->ni', RotMtrx, PhsSpc[:,:3]) + \
+                    np.array(iRefPrtcl.getRrOut()[:nLoc])[:,:3]
+        pLab      = np.einsum('nij,nj->ni', RotMtrx, PhsSpc[:,3:])
 
-        if nLoc == len(self.getLocation()):
-            Success = True
+        self._LabPhsSpc = []
+        for iLoc in range(nLoc):
+            if Valid[iLoc]:
+                self.setLabPhaseSpace([rLab[iLoc], pLab[iLoc]])
+            else:
+                self.setLabPhaseSpace([rLab[iLoc], \
+                                       np.array([None, None, None])])
+        Success = True
         
         if self.getDebug():
             with np.printoptions(linewidth=500,precision=7,suppress=True):
                 print("     ----> Particle.fillPhaseSpace: RPLC phase space:", \
-                      PhsSpc)
+                      self._PhsSpc)
             with np.printoptions(linewidth=500,precision=7,suppress=True):
                 print("     ----> Particle.fillPhaseSpace:  Lab phase space:", \
-                      LabPhsSpc)
+                      self._LabPhsSpc)
             print(" <----  Particle.fillPhaseSpace, compete.", \
                   "Success:", Success)
 
@@ -588,6 +642,75 @@ class Particle:
 
         return TrcSpc
 
+    @classmethod
+    def getRPLCReference(cls):
+        species      = ReferenceParticle.getinstances().getSpecies()
+        particleMASS = iPhysclCnstnts.getparticleMASS(species)
+
+        p0  = BL.BeamLine.getElement()[0].getp0()
+        E0  = mth.sqrt(particleMASS**2 + p0**2)
+        b0  = p0/E0
+
+        return particleMASS, p0, E0, b0
+
+    @classmethod
+    def RPLCTraceSpace2PhaseSpaceBatch(cls, TrcSpc):
+        if not isinstance(TrcSpc, np.ndarray) or np.ndim(TrcSpc) != 2 or \
+           np.shape(TrcSpc)[1] != 6:
+            raise badParameter( \
+                " Particle.RPLCTraceSpace2PhaseSpaceBatch: bad input:", \
+                                np.shape(TrcSpc))
+
+        particleMASS, p0, E0, b0 = cls.getRPLCReference()
+
+        E  = E0 + TrcSpc[:,5]*p0
+        px = TrcSpc[:,1]*p0
+        py = TrcSpc[:,3]*p0
+        p2 = E**2 - particleMASS**2 - px**2 - py**2
+
+        Valid  = p2 >= 0.
+        PhsSpc = np.empty(np.shape(TrcSpc))
+        PhsSpc[:,0] = TrcSpc[:,0]
+        PhsSpc[:,1] = TrcSpc[:,2]
+        PhsSpc[:,2] = TrcSpc[:,4]*b0
+        PhsSpc[:,3] = px
+        PhsSpc[:,4] = py
+        PhsSpc[:,5] = np.sqrt(np.where(Valid, p2, np.nan))
+
+        if cls.getDebug():
+            print(" Particle.RPLCTraceSpace2PhaseSpaceBatch:", \
+                  len(TrcSpc), "records,", \
+                  np.count_nonzero(~Valid), "unphysical.")
+
+        return PhsSpc, Valid
+
+    @classmethod
+    def RPLCPhaseSpace2TraceSpaceBatch(cls, PhsSpc):
+        if not isinstance(PhsSpc, np.ndarray) or np.ndim(PhsSpc) != 2 or \
+           np.shape(PhsSpc)[1] != 6:
+            raise badParameter( \
+                " Particle.RPLCPhaseSpace2TraceSpaceBatch: bad input:", \
+                                np.shape(PhsSpc))
+
+        particleMASS, p0, E0, b0 = cls.getRPLCReference()
+
+        E = np.sqrt(particleMASS**2 + \
+                    np.einsum('ni,ni->n', PhsSpc[:,3:], PhsSpc[:,3:]))
+
+        TrcSpc = np.empty(np.shape(PhsSpc))
+        TrcSpc[:,0] = PhsSpc[:,0]
+        TrcSpc[:,1] = PhsSpc[:,3] / p0
+        TrcSpc[:,2] = PhsSpc[:,1]
+        TrcSpc[:,3] = PhsSpc[:,4] / p0
+        TrcSpc[:,4] = PhsSpc[:,2] / b0
+        TrcSpc[:,5] = (E - E0) / p0
+
+        if cls.getDebug():
+            print(" Particle.RPLCPhaseSpace2TraceSpaceBatch:", \
+                  len(PhsSpc), "records.")
+
+        return TrcSpc
+
     def visualise(self, CoordSys, Projection, axs):
         if self.getDebug():
             print(" Particle.visualise: start")
@@ -681,6 +804,9 @@ class Particle:
     
     @classmethod
     def plotTraceSpaceProgression(cls):
+        import matplotlib.pyplot as plt
+        from matplotlib.backends.backend_pdf import PdfPages
+
         font = {'family': 'serif', \
                 'color':  'darkred' \
                 }
@@ -812,6 +938,8 @@ class Particle:
 
     @classmethod
     def plotLongitudinalTraceSpaceProgression(cls):
+        import matplotlib.pyplot as plt
+        from matplotlib.backends.backend_pdf import PdfPages
 
         font = {'family': 'serif', \
                 'color':  'darkred', \
@@ -982,7 +1110,61 @@ class Particle:
         
         if CleanAfterWrite:
             Cleaned = self.cleanParticles()
-        
+
+    @classmethod
+    def writeParticleBatch(cls, ParticleFILE=None, Location=None, \
+                           z=None, s=None, TrcSpc=None, Index=None):
+        if cls.getDebug():
+            print("Particle.writeParticleBatch starts.")
+
+        if not isinstance(ParticleFILE, io.BufferedWriter):
+            raise noFILE( \
+                    " Particle.writeParticleBatch: file does not exist.")
+
+        NEvts = len(Index[0])
+        bLocation = []
+        for Loc in Location:
+            bLocation.append(bytes(Loc, 'utf-8'))
+
+        #.. Number of locations recorded for each event:
+        nRcrd = np.zeros(NEvts, dtype=int)
+        for iRcrd in range(len(Index)):
+            nRcrd[Index[iRcrd]] += 1
+        if cls.getDebug():
+            print("     ----> Number of events:", NEvts)
+
+        #.. Events with the same number of records have the same record
+        #   layout, so pack them together with a structured array:
+        EvtRcrd = [None] * NEvts
+        for nLoc in np.unique(nRcrd):
+            iEvt   = np.nonzero(nRcrd == nLoc)[0]
+            Layout = [("nLoc", ">i4")]
+            for iLoc in range(nLoc):
+                Layout.append(("len"+str(iLoc), ">i4"))
+                Layout.append(("Loc"+str(iLoc), \
+                               "S"+str(len(bLocation[iLoc]))))
+                Layout.append(("Rcrd"+str(iLoc), ">f8", (8,)))
+            Rcrd = np.zeros(len(iEvt), dtype=np.dtype(Layout))
+            Rcrd["nLoc"] = nLoc
+            for iLoc in range(nLoc):
+                iRow = np.searchsorted(Index[iLoc], iEvt)
+                Rcrd["len"+str(iLoc)]          = len(bLocation[iLoc])
+                Rcrd["Loc"+str(iLoc)]          = bLocation[iLoc]
+                Rcrd["Rcrd"+str(iLoc)][:,0]    = z[iLoc]
+                Rcrd["Rcrd"+str(iLoc)][:,1]    = s[iLoc]
+                Rcrd["Rcrd"+str(iLoc)][:,2:8]  = TrcSpc[iLoc][iRow]
+
+            brecord = Rcrd.tobytes()
+            nByte   = Rcrd.dtype.itemsize
+            for i in range(len(iEvt)):
+                EvtRcrd[iEvt[i]] = brecord[i*nByte:(i+1)*nByte]
+
+        ParticleFILE.write(b''.join(EvtRcrd))
+
+        if cls.getDebug():
+            print(" <---- Particle.writeParticleBatch:", NEvts, \
+                  "events written.")
+
     def writeParticleBDSIM(self, ParticleFILE=None, iLoc=1, \
                            CleanAfterWrite=True):
         if self.getDebug():
@@ -1175,6 +1357,10 @@ Derived class ReferenceParticle(Particle):
                            beamline element.
   _Rot2LabOut[]: ndarray : Rotation matrix from RPLC to lab at exit from
                            beamline element.
+  _KinematicsIn: ndarray : (n,5) table, one row per location, of the
+                           reference-particle kinematics at entrance to
+                           the beamline element: p0 (MeV), E0 (MeV), beta0,
+                           gamma0 and Brho (T m).  Row appended by setPrIn.
 
    All instance attributes are initialised to Null
 
@@ -1194,6 +1380,10 @@ Derived class ReferenceParticle(Particle):
      getsIn, getsOut, getRrIn, getRrOut, getPrIn, getPrOut, getRot2LabIn,
      getRot2LabOut all believed to be self documenting.
 
+getKinematicsIn: Returns (n,5) np.ndarray table of reference-particle
+                 p0, E0, beta0, gamma0 and Brho at entrance to each
+                 location.
+
   Set methods:
    setinstance: Class method, sets ReferencePartcicle instance.
            Input: ReferenceParticle
@@ -1213,7 +1403,9 @@ Derived class ReferenceParticle(Particle):
          setRrIn : i/p 4 param, ndarray   : Sets _RrIn
         setRrOut : i/p 4 param, ndarray   : Sets _RrOut
 
-         setPrIn : i/p 4 param, ndarray   : Sets _PrIn
+         setPrIn : i/p 4 param, ndarray   : Sets _PrIn and appends the
+                                            corresponding row to
+                                            _KinematicsIn
         setPrOut : i/p 4 param, ndarray   : Sets _PrOut
 
     setRot2LabIn : i/p 3x3 param, ndarray : Sets _Rot2LabIn
@@ -1229,6 +1421,11 @@ Derived class ReferenceParticle(Particle):
                                Sets attributes for reference partice at
                                source.
 
+         truncateRecords: I/p: nRcrd : int
+                               Remove all records after the first nRcrd
+                               (e.g. when elements are removed from the end
+                               of the beam line).
+
  setReferenceParticleAtDrift: I/p: iBLE : BeamLineElement instance
                                Sets attributes for reference partice for a
                                drift space.  Also works for apertures,
@@ -1326,6 +1523,9 @@ class ReferenceParticle(Particle):
     def getPrIn(self):
         return self._PrIn
 
+    def getKinematicsIn(self):
+        return self._KinematicsIn
+
     def getMomentumIn(self, iLoc):
         return mth.sqrt(np.dot(self.getPrIn()[iLoc][:3], \
                                self.getPrIn()[iLoc][:3]))
@@ -1392,6 +1592,8 @@ class ReferenceParticle(Particle):
         self._Rot2LabIn  = []
         self._Rot2LabOut = []
 
+        self._KinematicsIn = np.empty((0, 5))
+
     def setsIn(self, sIn):
         Success = False
         if isinstance(sIn, float):
@@ -1424,9 +1626,22 @@ class ReferenceParticle(Particle):
         Success = False
         if isinstance(PrIn, np.ndarray):
             self._PrIn.append(PrIn)
+            self.setKinematicsIn(PrIn)
             Success = True
         return Success
 
+    def setKinematicsIn(self, PrIn):
+        particleMASS = iPhysclCnstnts.getparticleMASS(self.getSpecies())
+        
+        p0   = mth.sqrt(np.dot(PrIn[:3], PrIn[:3]))
+        E0   = PrIn[3]
+        b0   = p0/E0
+        g0   = E0/particleMASS
+        Brho = (1./(iPhysclCnstnts.SoL()*1.E-9))*p0/1000.
+
+        self._KinematicsIn = np.vstack((self._KinematicsIn, \
+                                        [p0, E0, b0, g0, Brho]))
+
     def setPrOut(self, PrOut):
         Success = False
         if isinstance(PrOut, np.ndarray):
@@ -1520,6 +1735,21 @@ class ReferenceParticle(Particle):
 
         return Success
 
+    def truncateRecords(self, nRcrd):
+        if not isinstance(nRcrd, int) or nRcrd < 0:
+            raise badArgument( \
+                " ReferenceParticle.truncateRecords: bad nRcrd:", nRcrd)
+
+        for Rcrds in [self.getsIn(), self.getsOut(), \
+                      self.getRrIn(), self.getRrOut(), \
+                      self.getPrIn(), self.getPrOut(), \
+                      self.getRot2LabIn(), self.getRot2LabOut(), \
+                      self.getLocation(), self.getz(), self.gets(), \
+                      self.getTraceSpace()]:
+            del Rcrds[nRcrd:]
+        self._KinematicsIn = self._KinematicsIn[:nRcrd]
+        self.resetPhaseSpace()
+
     def setReferenceParticleAtDrift(self, iBLE=None):
         nRcrds  = len(self.getsIn())
         if self.getDebug():
@@ -1665,6 +1895,203 @@ class ReferenceParticle(Particle):
         axs.set_ylabel(axl + ' (m)')
     
     
+"""
+Class CompactParticle:
+======================
+
+  Compact, array-backed, record of the progression of a particle through
+  the beam line.  Same "get" interface as Particle for the trace space, so
+  Beam and the plotting methods of Particle can use it, with a fraction
+  of the memory: the class uses __slots__, the trace space is held in one
+  preallocated np.ndarray (nLocMax, 6) and each location is stored as its
+  index in BeamLineElement.getinstances() rather than as a name.
+
+
+  Class attributes:
+  -----------------
+  _LocationIndex : dict: location name -> index; rebuilt when a name is
+                   not found.  Names that are not beam-line elements (e.g.
+                   a user source) are given negative indices into
+                   _ExtraLocation.
+  _ExtraLocation : list of names of locations that are not beam-line
+                   elements.
+
+      
+  Instance attributes (slots):
+  ----------------------------
+   _Species : str     : Species, as Particle
+   _nRcrd   : int     : Number of locations recorded
+   _iLoc    : ndarray : (nLocMax,) int32 location indices
+   _zs      : ndarray : (nLocMax, 2) z and s at each location
+   _TrcSpc  : ndarray : (nLocMax, 6) trace space at each location
+
+    
+  Methods:
+  --------
+  __init__ : Input: nLocMax [int, default number of beam-line elements
+                    less the facility], _species [str], Register [bool]:
+                    if True (default) the instance is appended to
+                    Particle.instances.
+
+  print          : Print the record.
+
+  recordParticle : As Particle.recordParticle; Location may be a name or
+                   an index.  Storage is extended if full.
+
+  getLocation, getz, gets, getTraceSpace, getSpecies : as Particle;
+                   getTraceSpace returns a (nRcrd, 6) view.
+  getLocationIndex : (nRcrd,) view of location indices.
+  getRPLCPhaseSpace, getLabPhaseSpace : empty (not held).
+
+  fromParticle  : Class method; compact copy of a Particle.
+          Input : Particle instance, Register [bool]
+  fromRecords   : Class method; compact particle from the records of one
+                  event as returned by BeamIO.readBeamDataBlock.
+          Input : Location [list of names], Rcrd [np.ndarray(nRcrd,8):
+                  z, s, trace space], Register [bool]
+  toParticle    : Create a full Particle from the compact record.
+
+"""
+class CompactParticle:
+    __slots__ = ("_Species", "_nRcrd", "_iLoc", "_zs", "_TrcSpc")
+
+    _LocationIndex = {}
+    _ExtraLocation = []
+
+#--------  "Built-in methods":
+    def __init__(self, nLocMax=None, _species="proton", Register=True):
+        if nLocMax == None:
+            nLocMax = max(1, len(BLE.BeamLineElement.getinstances()) - 1)
+        if not isinstance(nLocMax, int) or nLocMax < 1:
+            raise badParameter(" CompactParticle.__init__: bad nLocMax:", \
+                               nLocMax)
+        
+        self._Species = _species
+        self._nRcrd   = 0
+        self._iLoc    = np.empty(nLocMax, dtype=np.int32)
+        self._zs      = np.empty((nLocMax, 2))
+        self._TrcSpc  = np.empty((nLocMax, 6))
+
+        if Register:
+            Particle.instances.append(self)
+
+    def __repr__(self):
+        return "CompactParticle()"
+
+    def __str__(self):
+        self.print()
+        return " CompactParticle __str__ done."
+
+    def print(self):
+        print("\n CompactParticle: ", self.getSpecies())
+        print(" ----------------")
+        print("     ----> Number of trace-space records:", self._nRcrd, \
+              "; storage for:", len(self._iLoc))
+        Location = self.getLocation()
+        for iRcrd in range(self._nRcrd):
+            print("         ---->", Location[iRcrd], ":")
+            print("             ----> z, s", self._zs[iRcrd, 0], \
+                                             self._zs[iRcrd, 1])
+            with np.printoptions(linewidth=500,precision=7,suppress=True):
+                print("             ----> trace space:", \
+                      self._TrcSpc[iRcrd])
+
+#--------  Location index:
+    @classmethod
+    def getLocationIndexOf(cls, Location):
+        if Location not in cls._LocationIndex:
+            cls._LocationIndex = {}
+            for iBLE, BLEi in enumerate(BLE.BeamLineElement.getinstances()):
+                cls._LocationIndex.setdefault(BLEi.getName(), iBLE)
+            for iExtr, Name in enumerate(cls._ExtraLocation):
+                cls._LocationIndex.setdefault(Name, -1 - iExtr)
+        if Location not in cls._LocationIndex:
+            cls._ExtraLocation.append(Location)
+            cls._LocationIndex[Location] = -len(cls._ExtraLocation)
+        return cls._LocationIndex[Location]
+
+    @classmethod
+    def getLocationName(cls, iLoc):
+        if iLoc < 0:
+            return cls._ExtraLocation[-1 - iLoc]
+        return BLE.BeamLineElement.getinstances()[iLoc].getName()
+
+#--------  Set/record:
+    def recordParticle(self, Location, z, s, TraceSpace):
+        if not isinstance(TraceSpace, np.ndarray) or len(TraceSpace) != 6:
+            return False
+
+        if self._nRcrd == len(self._iLoc):
+            nLocMax       = 2 * len(self._iLoc)
+            self._iLoc    = np.resize(self._iLoc, nLocMax)
+            self._zs      = np.resize(self._zs, (nLocMax, 2))
+            self._TrcSpc  = np.resize(self._TrcSpc, (nLocMax, 6))
+
+        if isinstance(Location, str):
+            Location = CompactParticle.getLocationIndexOf(Location)
+        self._iLoc[self._nRcrd]   = Location
+        self._zs[self._nRcrd]     = (z, s)
+        self._TrcSpc[self._nRcrd] = TraceSpace
+        self._nRcrd += 1
+        return True
+
+#--------  Get methods:
+    def getSpecies(self):
+        return self._Species
+
+    def getLocationIndex(self):
+        return self._iLoc[:self._nRcrd]
+
+    def getLocation(self):
+        return [CompactParticle.getLocationName(iLoc) \
+                for iLoc in self.getLocationIndex()]
+
+    def getz(self):
+        return self._zs[:self._nRcrd, 0]
+
+    def gets(self):
+        return self._zs[:self._nRcrd, 1]
+
+    def getTraceSpace(self):
+        return self._TrcSpc[:self._nRcrd]
+
+    def getRPLCPhaseSpace(self):
+        return []
+
+    def getLabPhaseSpace(self):
+        return []
+
+#--------  Conversion:
+    @classmethod
+    def fromParticle(cls, iPrtcl, Register=True):
+        iCmpct = cls(max(1, len(iPrtcl.getTraceSpace())), \
+                     iPrtcl.getSpecies(), Register)
+        for iRcrd in range(len(iPrtcl.getTraceSpace())):
+            iCmpct.recordParticle(iPrtcl.getLocation()[iRcrd], \
+                                  iPrtcl.getz()[iRcrd], \
+                                  iPrtcl.gets()[iRcrd], \
+                                  np.asarray(iPrtcl.getTraceSpace()[iRcrd]))
+        return iCmpct
+
+    @classmethod
+    def fromRecords(cls, Location, Rcrd, Register=True):
+        iCmpct = cls(max(1, len(Location)), "proton", Register)
+        for iRcrd in range(len(Location)):
+            iCmpct.recordParticle(Location[iRcrd], Rcrd[iRcrd,0], \
+                                  Rcrd[iRcrd,1], Rcrd[iRcrd,2:])
+        return iCmpct
+
+    def toParticle(self):
+        iPrtcl = Particle(self.getSpecies())
+        Location = self.getLocation()
+        for iRcrd in range(self._nRcrd):
+            iPrtcl.recordParticle(Location[iRcrd], \
+                                  float(self._zs[iRcrd, 0]), \
+                                  float(self._zs[iRcrd, 1]), \
+                                  np.array(self._TrcSpc[iRcrd]))
+        return iPrtcl
+
+    
 #--------  Exceptions:
 class noReferenceParticle(Exception):
     pass
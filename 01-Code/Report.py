@@ -92,9 +92,10 @@ import copy
 from datetime import date
 from operator import itemgetter, attrgetter
 
-import pandas as pnds
 import numpy  as np
 
+#.. pandas is imported by the methods that build data frames, on first use.
+
 """
          -------->  Base "Report" class  <--------
 """
@@ -211,6 +212,8 @@ class Report:
     
 #--------  Processing methods
     def createPandasDataFrame(self):
+        import pandas as pnds
+
         Data = []
         Data.append(self._Header)
         for i in range(len(self._Lines)):
@@ -232,6 +235,7 @@ class Report:
         _DataFrame.to_csv(_filename, index=False, header=False)
 
     def asCSV(self):
+        import pandas as pnds
 
         Data = []
         Data.append(self._Header)
@@ -13,11 +13,13 @@ Class Simulation
   __PrgrssPrnt : Flag to set printing of progress (defalt True)
 __RandomSeed   : Seed for random number, set to time at load of class.  
 __Facility     : Address of instance of a facility
+__nProcesses   : Number of worker processes used by RunSim (default 1)
 
   Packages loaded:
   ----------------
   "time"  : to get current date/time
   "random": uniform random number generator
+  "multiprocessing": process pool for the parallel mode of RunSim
       
   Methods defined at Module level:
   --------------------------------
@@ -26,12 +28,36 @@ __Facility     : Address of instance of a facility
                 from -p1 to p1.
            Input : p1 [float]
        Return : Probability [float]
+  RunSimShard : Worker for the parallel mode of RunSim.  Builds the
+                BeamLine (and the reference particle and beam line
+                element instances) from the parameter file, seeds the
+                random number generators and tracks a shard of events.
+           Input : tuple (ParamFileName, NEvt, Seed, ShardFileName,
+                   Columnar, RecordLocations, CacheDirectory, Profiling,
+                   Compiled);
+                   ShardFileName may be None, in which case no events are
+                   written.  If Columnar the shard is a version 3 BeamIO
+                   file without beam line.  RecordLocations as
+                   BeamLine.setRecordLocations; CacheDirectory as
+                   BeamLine.setCacheDirectory, so that the workers load
+                   the built beam line from the cache.  Profiling as
+                   BeamLine.setProfiling, Compiled as
+                   BeamLine.setCompiledTracking.
+       Return : [Number of events tracked [int], profile of the shard
+                (BeamLine.getProfile) or None if Profiling is False]
 
   Instance attributes:
   --------------------
             _NEvt : Number of events to generate
    _ParamFileName : csv file containing parameters of the simulation
     _RootFileName : Root file for o/p
+        _Columnar : True: write the columnar BeamIO format (version 3);
+                    events are then tracked with BeamLine.trackBeamBatch
+ _RecordLocations : Locations recorded, and written to the data file; list
+                    of element names, types (e.g. "FocusQuadrupole") or
+                    indices, passed to BeamLine.setRecordLocations.  The
+                    source and the end of the beam line are always
+                    recorded.  None (default): all locations.
     
   Methods:
   --------
@@ -48,12 +74,42 @@ __Facility     : Address of instance of a facility
            getDebug: Get debug flag
    getFacility: Get __Facility
             getNEvt: Get NEvt
+        getColumnar: Get _Columnar
+       setnProcesses: Set number of worker processes (int >= 1)
+       getnProcesses: Get number of worker processes
   
   Simulation methods:
       getRandom    : Returns uniformly distributed randum number
       getParabolic : Generates a parabolic distributed random number from
                      -p1 to p1 (p1 input)
             RunSim : CEO method to run simulation.
+                     If getnProcesses() > 1 the NEvt events are split into
+                     nProcesses shards, each tracked in its own process
+                     (start method "spawn", so calling scripts must
+                     protect their entry point with
+                     if __name__ == "__main__":).  Worker i is seeded
+                     with the i-th child of
+                     np.random.SeedSequence(int(getRandomSeed())), for
+                     "random", numpy and the source Generator of
+                     BeamLine.trackBeamBatch, so a run is reproducible
+                     for a given seed and number of processes.  Each worker writes its events to a
+                     temporary file; the shards are appended, in order,
+                     to the BeamIO file after the beam line so that the
+                     output is a single valid BeamIO file.
+                     Check: the event statistics of a parallel run must
+                     agree with those of a serial run within statistical
+                     precision, e.g. the number of events read back
+                     equals NEvt and the means at each location agree
+                     within a few sigma/sqrt(N); see
+                     02-Tests/SimulationParallelTst.py.
+                     If profiling is on (BeamLine.setProfiling) the
+                     profile of the run, summed over the shards in
+                     parallel mode, is written next to the data file, in
+                     <data file name without extension>-profile.csv.
+    RunSimParallel : Parallel mode of RunSim; input: data file (or None),
+                     returns number of events tracked.
+    getProfileFile : Path of the profile table of the data file; None if
+                     no data file is written.
 
           Utilities:
                 print : Print summary of paramters
@@ -62,13 +118,17 @@ __Facility     : Address of instance of a facility
 Created on Thu 10Jan21;11:04: Version history:
 ----------------------------------------------
  1.0: 21Jul23: First implementation
+ 1.1: Parallel (multiprocess) mode of RunSim
 
 @author: kennethlong
 """
 
 #--------  Module dependencies
 import random as __Rnd
+import multiprocessing as mp
 import numpy as np
+import os
+import shutil
 import sys
 
 import BeamIO   as BmIO
@@ -95,6 +155,54 @@ def getParabolic(p1):
 
     return p
 
+def RunSimShard(ShardArgs):
+    ParamFileName, NEvt, Seed, ShardFileName, Columnar, RecordLocations, \
+                          CacheDirectory, Profiling, Compiled = ShardArgs
+
+    #.. Independent, reproducible random number sequence for this shard:
+    __Rnd.seed(Seed)
+    np.random.seed(Seed % 2**32)
+    BL.BeamLine.setSourceGenerator(np.random.default_rng(Seed))
+
+    Simulation.setProgressPrint(False)
+
+    #.. Fresh BeamLine, ReferenceParticle and element instances:
+    BL.BeamLine.setCacheDirectory(CacheDirectory)
+    if BL.BeamLine.getinstances() is None:
+        iBmLn = BL.BeamLine(ParamFileName)
+    else:
+        iBmLn = BL.BeamLine.getinstances()
+    BL.BeamLine.setRecordLocations(RecordLocations)
+    BL.BeamLine.setProfiling(Profiling)
+    BL.BeamLine.resetProfile()
+    BL.BeamLine.setCompiledTracking(Compiled)
+
+    Profile = None
+    if Columnar:
+        iBmIOw = None
+        if ShardFileName is not None:
+            iBmIOw = BmIO.BeamIO(None, ShardFileName, True, False, True)
+        iBmLn.trackBeamBatch(NEvt, iBmIOw)
+        if iBmIOw is not None:
+            iBmIOw.flushNclosedataFile(iBmIOw.getdataFILE())
+        if Profiling:
+            Profile = BL.BeamLine.getProfile()
+        return [NEvt, Profile]
+
+    ShardFILE = None
+    if ShardFileName is not None:
+        ShardFILE = open(ShardFileName, "wb")
+
+    iBmLn.trackBeam(NEvt, ShardFILE)
+
+    if ShardFILE is not None:
+        ShardFILE.flush()
+        ShardFILE.close()
+
+    if Profiling:
+        Profile = BL.BeamLine.getProfile()
+    return [NEvt, Profile]
+
 #--------  Simulation class  --------
 class Simulation(object):
     import random as __Rnd
@@ -104,12 +212,14 @@ class Simulation(object):
 
     __Debug      = True
     __PrgrssPrnt = True
+    __nProcesses = 1
     __instance   = None
 
 
 #--------  "Built-in methods":
     def __new__(cls, NEvt=5, filename=None, 
-                _dataFileDir=None, _dataFileName=None):
+                _dataFileDir=None, _dataFileName=None, _Columnar=False, \
+                _RecordLocations=None):
         if cls.__instance is None:
             if cls.getDebug():
                 print('Simulation.__new__: creating the Simulation object')
@@ -121,6 +231,7 @@ class Simulation(object):
             cls.__Rnd.seed(int(cls.__RandomSeed))
 
             cls.setNEvt(NEvt)
+            cls.setColumnar(_Columnar)
             if filename != None:
                 cls.setBeamLineSpecificationFile(filename)
 
@@ -131,11 +242,13 @@ class Simulation(object):
 
             # Create Facility instance:
             cls.setFacility(BL.BeamLine(filename))
+            BL.BeamLine.setRecordLocations(_RecordLocations)
 
             # Open file for write:
             cls._iBmIOw = None
             if _dataFileDir != None or _dataFileName != None:
-                cls._iBmIOw = BmIO.BeamIO(_dataFileDir, _dataFileName, True)
+                cls._iBmIOw = BmIO.BeamIO(_dataFileDir, _dataFileName, \
+                                          True, False, cls.getColumnar())
             
             # Summarise initialisation
             if cls.getDebug():
@@ -160,6 +273,13 @@ class Simulation(object):
               self.getBeamLineSpecificationFile())
         print(" data file directory for output:", self.getdataFileDir())
         print("       data filename for output:", self.getdataFileName())
+        print("          Columnar output format:", self.getColumnar())
+        print("             Locations recorded:", \
+              BL.BeamLine.getRecordLocations())
+        print("   Per-element profile recorded:", \
+              BL.BeamLine.getProfiling())
+        print("              Compiled tracking:", \
+              BL.BeamLine.getCompiledTracking())
         print(" BeamIO output file instance id:", id(self.getiBmIOw()))
     
             
@@ -173,6 +293,7 @@ class Simulation(object):
             cls._dataFileName  = None
             cls._iBmIOw        = None
             cls._Facility      = None
+            cls._Columnar      = False
 
     @classmethod
     def CdVrsn(self):
@@ -185,6 +306,12 @@ class Simulation(object):
         
         self._NEvt = NEvt
 
+    @classmethod
+    def setColumnar(cls, _Columnar=False):
+        if not isinstance(_Columnar, bool):
+            raise badParameter()
+        cls._Columnar = _Columnar
+
     @classmethod
     def setBeamLineSpecificationFile(self, BLspecfile):
         print(type(BLspecfile))
@@ -223,6 +350,14 @@ class Simulation(object):
     def setProgressPrint(cls, _PrgrssPrnt=True):
         cls.__PrgrssPrnt = _PrgrssPrnt
 
+    @classmethod
+    def setnProcesses(cls, _nProcesses=1):
+        if not isinstance(_nProcesses, int) or _nProcesses < 1:
+            raise badParameter( \
+                " Simulation.setnProcesses: bad number of processes:", \
+                                _nProcesses)
+        cls.__nProcesses = _nProcesses
+
     @classmethod
     def setiBmIOw(self, _iBmIOw):
         self._iBmIOw = _iBmIOw
@@ -243,6 +378,10 @@ class Simulation(object):
     def getdataFileName(cls):
         return cls._dataFileName
 
+    @classmethod
+    def getColumnar(cls):
+        return cls._Columnar
+
     @classmethod
     def getNEvt(self):
         return self._NEvt
@@ -259,6 +398,10 @@ class Simulation(object):
     def getProgressPrint(cls):
         return cls.__PrgrssPrnt
 
+    @classmethod
+    def getnProcesses(cls):
+        return cls.__nProcesses
+
     @classmethod
     def getinstances(cls):
         return cls.__instance
@@ -283,13 +426,90 @@ class Simulation(object):
         dataFILE = None
         if self.getiBmIOw() != None:
             dataFILE = self.getiBmIOw().getdataFILE()
-        nEvt = self.getFacility().trackBeam(self.getNEvt(), dataFILE)
+        if self.getnProcesses() > 1 and self.getNEvt() > 1:
+            self.RunSimParallel(dataFILE)
+        elif self.getColumnar():
+            nEvt = self.getFacility().trackBeamBatch(self.getNEvt(), \
+                                                     self.getiBmIOw())
+        else:
+            nEvt = self.getFacility().trackBeam(self.getNEvt(), dataFILE)
 
         #.. Flush and close particle file:
         if self.getiBmIOw() != None:
             self.getiBmIOw().flushNclosedataFile( \
                                     self.getiBmIOw().getdataFILE())
 
+        #.. Profile table next to the data file:
+        if BL.BeamLine.getProfiling() and self.getProfileFile() != None:
+            BL.BeamLine.writeProfile(self.getProfileFile())
+            if self.getDebug():
+                print('     ----> Profile written to:', \
+                      self.getProfileFile())
+
+    def getProfileFile(self):
+        if self.getiBmIOw() == None:
+            return None
+        return os.path.splitext(self.getiBmIOw().getdataFILE().name)[0] + \
+               "-profile.csv"
+
+    def RunSimParallel(self, dataFILE=None):
+        nPrc = min(self.getnProcesses(), self.getNEvt())
+        NEvt = self.getNEvt()
+
+        #.. Shard sizes and seeds:
+        NShrd = [NEvt // nPrc + (1 if iPrc < NEvt % nPrc else 0) \
+                 for iPrc in range(nPrc)]
+        Seeds = [int(SdSq.generate_state(1)[0]) for SdSq in \
+                 np.random.SeedSequence(int(self.getRandomSeed())). \
+                 spawn(nPrc)]
+
+        ShrdFileNames = [None for iPrc in range(nPrc)]
+        if dataFILE != None:
+            ShrdFileNames = [dataFILE.name + ".shard" + str(iPrc) \
+                             for iPrc in range(nPrc)]
+
+        ShardArgs = [(self.getBeamLineSpecificationFile(), NShrd[iPrc], \
+                      Seeds[iPrc], ShrdFileNames[iPrc], \
+                      self.getColumnar(), \
+                      BL.BeamLine.getRecordLocations(), \
+                      BL.BeamLine.getCacheDirectory(), \
+                      BL.BeamLine.getProfiling(), \
+                      BL.BeamLine.getCompiledTracking()) \
+                     for iPrc in range(nPrc)]
+
+        if self.getDebug():
+            print('     ----> Simulation.RunSimParallel:', nPrc, \
+                  'processes, events per process:', NShrd)
+
+        #.. Track shards:
+        with mp.get_context("spawn").Pool(nPrc) as Pool:
+            Shards = Pool.map(RunSimShard, ShardArgs)
+        nTrckd = [Shard[0] for Shard in Shards]
+        for Shard in Shards:
+            if Shard[1] != None:
+                BL.BeamLine.addProfile(Shard[1])
+
+        #.. Merge shards, in order, after the beam line:
+        #   columnar shards: skip the version header and keep only the
+        #   first location table.
+        if dataFILE != None:
+            for iPrc in range(nPrc):
+                with open(ShrdFileNames[iPrc], "rb") as ShrdFILE:
+                    if self.getColumnar():
+                        ShrdFILE.read(4)
+                        nChr = int.from_bytes(ShrdFILE.read(4), "big")
+                        ShrdFILE.read(nChr)
+                        if iPrc > 0:
+                            BmIO.BeamIO.readLocationTable(ShrdFILE)
+                    shutil.copyfileobj(ShrdFILE, dataFILE)
+                os.remove(ShrdFileNames[iPrc])
+
+        if self.getDebug():
+            print('     <---- Simulation.RunSimParallel: events tracked:', \
+                  sum(nTrckd))
+
+        return sum(nTrckd)
+
 #--------  Exceptions:
 class badParameter(Exception):
     pass
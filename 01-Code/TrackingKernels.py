@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Class TrackingKernels:
+======================
+
+  Optional just-in-time (JIT) compiled kernels for the tight numeric loops
+  of bunch tracking and source sampling.  The kernels are written below as
+  plain loops over the particles of a bunch; if numba is installed they
+  are compiled with numba.njit the first time a kernel is needed, and
+  BeamLineElement uses them in place of its NumPy implementation.  If
+  numba is not installed (or the "numpy" backend is selected) the NumPy
+  implementation in BeamLineElement is used and nothing here is called.
+
+  The backend is a property of the process: shards of a parallel
+  simulation select theirs automatically when they start.
+
+  Kernels (all take and return np.ndarray; R is the (N,6) trace space):
+    expansionParameterFail(R, b0)
+                          : as BeamLineElement.ExpansionParameterFailBatch
+    acceptanceFail(R, Vr, b0, zCut)
+                          : as BeamLineElement.AcceptanceFailBatch, Vr the
+                            beam-pipe radius
+    transportQuadrupole(R, kQ, l, b0, p0, E0, R56, Mode, Xf, Yf)
+                          : transport through a focusing (Xf, Yf = 0, 2)
+                            or defocusing (Xf, Yf = 2, 0) quadrupole
+    transportSectorDipole(R, B, c, s, l, b0, p0, E0, R56)
+    transportSolenoid(R, Bs, l, p0, E0, R56)
+    transportGaborLens(R, kGL, l, p0, E0, R56)
+                          : transport through the chromatic elements with
+                            the matrices of calcTransferMatrixBatch
+                            applied particle by particle; no (N,6,6)
+                            array is built.  For the Gabor lens
+                            k = kGL E/p^2, kGL = e^2 n_e/(2 epsilon0) in
+                            the units of GaborLens.
+    laserDrivenSample(GE, U, Phirp, sqrtEmin, sqrtTe2, Gamma, Intrcpt,
+                      Slope, Emax)
+                          : kinetic energy [MeV] and divergence (x', y')
+                            of laser-driven protons from the uniform
+                            random numbers drawn by Source.getParticles
+
+  Class attributes:
+  -----------------
+    Backends    : Backends known: "auto" (numba if installed, default),
+                  "numba" and "numpy"
+    KernelNames : Names of the kernels
+  __Debug       : Debug flag
+    _Backend    : Backend selected
+    _Kernels    : dict, name -> compiled kernel; empty if the NumPy
+                  implementation is used; None until first needed
+    _Numba      : True/False if numba can/can not be imported; None until
+                  first checked
+
+  Methods:
+  --------
+    setDebug   : set debug flag
+    setBackend : Select the backend; the kernels are (re)compiled when
+                 next needed.
+           Input: str, one of Backends (default "auto")
+
+    getDebug, getBackend : believed to be self documenting; getBackend
+                 returns the backend selected ("auto", "numba", "numpy").
+    isNumbaAvailable : True if numba can be imported
+    getJIT     : True if the JIT-compiled kernels are used; compiles them
+                 on first call
+    getActiveBackend : "numba" or "numpy", the backend in use
+    getKernel  : Kernel Name, compiled if getJIT(), else the plain Python
+                 loop (the source numba compiles; slow, for tests only).
+           Input: str, one of KernelNames
+
+Created on Sun 18Oct26: Version history:
+----------------------------------------
+ 1.0: 18Oct26: First implementation
+
+@author: kennethlong
+"""
+
+import numpy as np
+
+#-------- Physical Constants Instances and Methods ----------------
+import PhysicalConstants as PhysCnst
+
+constants_instance = PhysCnst.PhysicalConstants()
+speed_of_light     = constants_instance.SoL()
+protonMASS         = constants_instance.mp()
+
+
+class TrackingKernels:
+    Backends    = ["auto", "numba", "numpy"]
+    KernelNames = ["expansionParameterFail", "acceptanceFail", \
+                   "transportQuadrupole", "transportSectorDipole", \
+                   "transportSolenoid", "transportGaborLens", \
+                   "laserDrivenSample"]
+    __Debug     = False
+    _Backend    = "auto"
+    _Kernels    = None
+    _Numba      = None
+
+#--------  "Set methods"
+    @classmethod
+    def setDebug(cls, Debug=False):
+        cls.__Debug = Debug
+
+    @classmethod
+    def setBackend(cls, Backend="auto"):
+        if not Backend in cls.Backends:
+            raise badParameter( \
+                " TrackingKernels.setBackend: bad backend:", Backend)
+        if Backend == "numba" and not cls.isNumbaAvailable():
+            raise noNumba( \
+                " TrackingKernels.setBackend: numba can not be imported.")
+        cls._Backend = Backend
+        cls._Kernels = None
+
+#--------  "Get methods"
+    @classmethod
+    def getDebug(cls):
+        return cls.__Debug
+
+    @classmethod
+    def getBackend(cls):
+        return cls._Backend
+
+    @classmethod
+    def isNumbaAvailable(cls):
+        if cls._Numba == None:
+            try:
+                import numba
+                cls._Numba = True
+            except ImportError:
+                cls._Numba = False
+        return cls._Numba
+
+    @classmethod
+    def getJIT(cls):
+        if cls._Kernels == None:
+            cls._Kernels = {}
+            if cls.getBackend() != "numpy" and cls.isNumbaAvailable():
+                cls.compileKernels()
+        return len(cls._Kernels) > 0
+
+    @classmethod
+    def getActiveBackend(cls):
+        if cls.getJIT():
+            return "numba"
+        return "numpy"
+
+    @classmethod
+    def getKernel(cls, Name):
+        if not Name in cls.KernelNames:
+            raise badParameter( \
+                " TrackingKernels.getKernel: unknown kernel:", Name)
+        if cls.getJIT():
+            return cls._Kernels[Name]
+        return globals()[Name]
+
+#--------  Processing methods:
+    @classmethod
+    def compileKernels(cls):
+        import numba
+
+        #.. Division by zero and sqrt of a negative number give inf and
+        #   NaN, as in the NumPy implementation:
+        for Name in cls.KernelNames:
+            cls._Kernels[Name] = numba.njit(cache=True, \
+                                            error_model="numpy") \
+                                            (globals()[Name])
+
+        if cls.getDebug():
+            print(" TrackingKernels.compileKernels: kernels:", \
+                  list(cls._Kernels))
+
+
+#--------  Kernels:
+def expansionParameterFail(R, b0):
+    N    = R.shape[0]
+    Fail = np.empty(N, dtype=np.bool_)
+    for i in range(N):
+        D2  = 1. + 2.*R[i,5]/b0 + R[i,5]**2
+        eps = (R[i,1]**2 + R[i,3]**2) / (2.*D2)
+        Fail[i] = not (eps <= 1.0)
+    return Fail
+
+def acceptanceFail(R, Vr, b0, zCut):
+    N    = R.shape[0]
+    Fail = np.empty(N, dtype=np.bool_)
+    for i in range(N):
+        D2  = 1. + 2.*R[i,5]/b0 + R[i,5]**2
+        eps = (R[i,1]**2 + R[i,3]**2) / (2.*D2)
+        Fail[i] = np.sqrt(R[i,0]**2 + R[i,2]**2) >= Vr or \
+                  not (eps <= 1.0) or abs(R[i,4]) > zCut
+    return Fail
+
+def transportQuadrupole(R, kQ, l, b0, p0, E0, R56, Mode, Xf, Yf):
+    N      = R.shape[0]
+    Rprime = np.empty((N, 6))
+    for i in range(N):
+        d   = R[i,5]
+        D   = 1.
+        Scl = 1.
+        if Mode == 1:
+            D = np.sqrt(1. + 2.*d/b0 + d**2)
+        else:
+            E = E0 + d*p0
+            p = np.sqrt(E**2 - protonMASS**2)
+            if p > 0.:
+                Scl = p0/p
+        b  = np.sqrt(kQ*Scl/D)
+        a  = l * b
+        b  = b * D
+        c  = np.cos(a)
+        s  = np.sin(a)
+        ch = np.cosh(a)
+        sh = np.sinh(a)
+        Rprime[i,Xf]   =  c*R[i,Xf]    + s/b*R[i,Xf+1]
+        Rprime[i,Xf+1] = -b*s*R[i,Xf]  + c*R[i,Xf+1]
+        Rprime[i,Yf]   =  ch*R[i,Yf]   + sh/b*R[i,Yf+1]
+        Rprime[i,Yf+1] =  b*sh*R[i,Yf] + ch*R[i,Yf+1]
+        Rprime[i,4]    =  R[i,4] + R56*d
+        Rprime[i,5]    =  d
+    return Rprime
+
+def transportSectorDipole(R, B, c, s, l, b0, p0, E0, R56):
+    N      = R.shape[0]
+    Rprime = np.empty((N, 6))
+    for i in range(N):
+        d = R[i,5]
+        E = E0 + p0*d
+        r = (1/(speed_of_light*1.E-9))*np.sqrt(E**2 - protonMASS**2)/1000. \
+            / B
+        Rprime[i,0] = c*R[i,0] + r*s*R[i,1] + r*(1-c)/b0*d
+        Rprime[i,1] = -s/r*R[i,0] + c*R[i,1] + s/b0*d
+        Rprime[i,2] = R[i,2] + l*R[i,3]
+        Rprime[i,3] = R[i,3]
+        Rprime[i,4] = -s/b0*R[i,0] - (r/b0)*(1.-c)*R[i,1] + R[i,4] + \
+                      (R56 - (l-r*s)/b0**2)*d
+        Rprime[i,5] = d
+    return Rprime
+
+def transportSolenoid(R, Bs, l, p0, E0, R56):
+    N      = R.shape[0]
+    Rprime = np.empty((N, 6))
+    for i in range(N):
+        x, xp, y, yp, d = R[i,0], R[i,1], R[i,2], R[i,3], R[i,5]
+        E    = E0 + p0*d
+        Brho = (1./(speed_of_light*1.E-9))*np.sqrt(E**2 - protonMASS**2) \
+               /1000.
+        k    = Bs / (2.*Brho)
+        ckl  = np.cos(k*l)
+        skl  = np.sin(k*l)
+        sckl = ckl*skl
+        ckl2 = ckl**2
+        skl2 = skl**2
+        Rprime[i,0] =  ckl2*x + sckl/k*xp + sckl*y + skl2/k*yp
+        Rprime[i,1] = -k*sckl*x + ckl2*xp - k*skl2*y + sckl*yp
+        Rprime[i,2] = -sckl*x - skl2/k*xp + ckl2*y + sckl/k*yp
+        Rprime[i,3] =  k*skl2*x - sckl*xp - k*sckl*y + ckl2*yp
+        Rprime[i,4] =  R[i,4] + R56*d
+        Rprime[i,5] =  d
+    return Rprime
+
+def transportGaborLens(R, kGL, l, p0, E0, R56):
+    N      = R.shape[0]
+    Rprime = np.empty((N, 6))
+    for i in range(N):
+        d   = R[i,5]
+        E   = E0 + p0*d
+        w   = np.sqrt(kGL * E / (E**2 - protonMASS**2))
+        cwl = np.cos(w*l)
+        swl = np.sin(w*l)
+        Rprime[i,0] =  cwl*R[i,0] + swl/w*R[i,1]
+        Rprime[i,1] = -w*swl*R[i,0] + cwl*R[i,1]
+        Rprime[i,2] =  cwl*R[i,2] + swl/w*R[i,3]
+        Rprime[i,3] = -w*swl*R[i,2] + cwl*R[i,3]
+        Rprime[i,4] =  R[i,4] + R56*d
+        Rprime[i,5] =  d
+    return Rprime
+
+def laserDrivenSample(GE, U, Phirp, sqrtEmin, sqrtTe2, Gamma, \
+                      Intrcpt, Slope, Emax):
+    N  = GE.shape[0]
+    KE = np.empty(N)
+    xp = np.empty(N)
+    yp = np.empty(N)
+    for i in range(N):
+        sqrtE = sqrtEmin - sqrtTe2 * np.log(1.-GE[i]/Gamma)
+        KE[i] = sqrtE**2 / (1.6e-19*1.e6)
+        upmax = np.sin(np.radians(Intrcpt - Slope * KE[i] / Emax))
+        rp    = upmax * np.sqrt(1. - np.sqrt(1. - U[i]))
+        xp[i] = rp * np.cos(Phirp[i])
+        yp[i] = rp * np.sin(Phirp[i])
+    return KE, xp, yp
+
+
+#--------  Exceptions:
+class badParameter(Exception):
+    pass
+
+class noNumba(Exception):
+    pass
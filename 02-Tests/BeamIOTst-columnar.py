@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test script for "BeamIO" class ... columnar (version 3) format
+==============================
+
+  BeamIO.py -- set "relative" path to code.
+
+  Writes the same events in the version 2 and columnar (version 3)
+  formats and checks that reading them back, event by event and with
+  Beam, gives the same result.  Files are read in fresh processes so that
+  the beam line is rebuilt from each file.
+
+"""
+
+import os
+import random as rnd
+import multiprocessing as mp
+import numpy  as np
+
+import BeamIO   as bmIO
+import BeamLine as BL
+import Beam     as Bm
+import Particle as Prtcl
+
+def ReadEvents(datafile, nEvt):
+    ibmIOr = bmIO.BeamIO(None, datafile)
+    Version = None
+    Events  = []
+    EoF = ibmIOr.readBeamDataRecord()
+    while not EoF and len(Events) < nEvt:
+        EoF = ibmIOr.readBeamDataRecord()
+        if not EoF:
+            iPrtcl = Prtcl.Particle.getinstances()[-1]
+            Events.append([iPrtcl.getLocation(), \
+                           np.array(iPrtcl.gets()), \
+                           np.array(iPrtcl.getTraceSpace())])
+    return ibmIOr.getdataFILEversion(), Events
+
+def EvaluateBeam(datafile):
+    iBm = Bm.Beam(datafile)
+    iBm.evaluateBeam()
+    return iBm.getnParticles(), iBm.getCovSums()
+
+def PlotBeam(datafile, Streaming, plotFILE):
+    iBm = Bm.Beam(datafile)
+    iBm.evaluateBeam(False, Streaming)
+    nInst = len(Prtcl.Particle.getinstances())
+    iBm.plotBeamProgression(plotFILE)
+    return len(iBm.getReservoir()), nInst, \
+           len(Prtcl.Particle.getinstances()), os.path.exists(plotFILE)
+
+if __name__ == "__main__":
+
+    HOMEPATH = os.getenv('HOMEPATH')
+    filename = os.path.join(HOMEPATH, \
+                    '11-Parameters/LhARABeamLine-Params-Gauss-Gabor.csv')
+    datafiledir = os.path.join(HOMEPATH, '99-Scratch')
+
+    NEvt = 2500
+
+    ##! Start:
+    print("========  BeamIO (columnar): tests start  ========")
+
+    ##! Write the same events in both formats:
+    BeamIOTest = 1
+    print()
+    print("BeamIOTest:", BeamIOTest, " write", NEvt, \
+          "events in version 2 and columnar formats.")
+    BmLn = BL.BeamLine(filename)
+    BL.BeamLine.setBatchSize(1000)
+
+    ibmIOw = bmIO.BeamIO(datafiledir, "BeamIOTst-v2.dat", True)
+    BmLn.writeBeamLine(ibmIOw.getdataFILE())
+    rnd.seed(24680)
+    BmLn.trackBeamBatch(NEvt, ibmIOw.getdataFILE())
+    ibmIOw.flushNclosedataFile(ibmIOw.getdataFILE())
+
+    ibmIOw = bmIO.BeamIO(datafiledir, "BeamIOTst-v3.dat", True, False, True)
+    print("     ----> Columnar:", ibmIOw.getColumnar())
+    BmLn.writeBeamLine(ibmIOw.getdataFILE())
+    rnd.seed(24680)
+    BmLn.trackBeamBatch(NEvt, ibmIOw)
+    ibmIOw.flushNclosedataFile(ibmIOw.getdataFILE())
+    print("     <---- Files written.")
+
+    ##! Read events back:
+    BeamIOTest += 1
+    print()
+    print("BeamIOTest:", BeamIOTest, " read events back.")
+    with mp.get_context("spawn").Pool(2) as Pool:
+        v2 = Pool.apply_async(ReadEvents, \
+                    (os.path.join(datafiledir, "BeamIOTst-v2.dat"), NEvt+1))
+        v3 = Pool.apply_async(ReadEvents, \
+                    (os.path.join(datafiledir, "BeamIOTst-v3.dat"), NEvt+1))
+        v2 = v2.get()
+        v3 = v3.get()
+    print("     ----> Versions:", v2[0], v3[0])
+    print("     ----> Events read:", len(v2[1]), len(v3[1]))
+    if v2[0] != 2 or v3[0] != 3:
+        raise Exception("Wrong data file version!")
+    if len(v2[1]) != NEvt or len(v3[1]) != NEvt:
+        raise Exception("Wrong number of events read back!")
+    for iEvt in range(NEvt):
+        if v2[1][iEvt][0] != v3[1][iEvt][0]:
+            raise Exception("Locations disagree for event", iEvt)
+        if not np.array_equal(v2[1][iEvt][1], v3[1][iEvt][1]) or \
+           not np.array_equal(v2[1][iEvt][2], v3[1][iEvt][2]):
+            raise Exception("Trace space disagrees for event", iEvt)
+    print("     <---- Events agree.")
+
+    ##! Beam evaluation:
+    BeamIOTest += 1
+    print()
+    print("BeamIOTest:", BeamIOTest, " evaluate beam from both files.")
+    with mp.get_context("spawn").Pool(2) as Pool:
+        v2 = Pool.apply_async(EvaluateBeam, \
+                    (os.path.join(datafiledir, "BeamIOTst-v2.dat"),))
+        v3 = Pool.apply_async(EvaluateBeam, \
+                    (os.path.join(datafiledir, "BeamIOTst-v3.dat"),))
+        v2 = v2.get()
+        v3 = v3.get()
+    print("     ----> Particles at locations, v2:", v2[0])
+    print("     ----> Particles at locations, v3:", v3[0])
+    if not np.array_equal(v2[0], v3[0]):
+        raise Exception("Number of particles by location disagree!")
+    for iAddr in range(len(v2[1])):
+        if not np.allclose(v2[1][iAddr], v3[1][iAddr], \
+                           rtol=1.E-9, atol=1.E-20):
+            raise Exception("Covariance sums disagree at", iAddr)
+    print("     <---- Beam evaluation agrees.")
+
+    ##! Plot from the reservoir, streamed version 2 and columnar files:
+    BeamIOTest += 1
+    print()
+    print("BeamIOTest:", BeamIOTest, " plot beam progression.")
+    for datafile, Streaming in [["BeamIOTst-v2.dat", True], \
+                                ["BeamIOTst-v3.dat", False]]:
+        plotFILE = os.path.join(datafiledir, \
+                                datafile.replace(".dat", ".pdf"))
+        with mp.get_context("spawn").Pool(1) as Pool:
+            nRsrvr, nInst, nInstAftr, Done = Pool.apply(PlotBeam, \
+                    (os.path.join(datafiledir, datafile), Streaming, \
+                     plotFILE))
+        print("     ---->", datafile, ": reservoir:", nRsrvr, \
+              "; particle instances before, after plot:", nInst, nInstAftr)
+        if nRsrvr == 0 or nInst != 1 or nInstAftr != 1 or not Done:
+            raise Exception("Plot from reservoir failed!")
+        os.remove(plotFILE)
+    print("     <---- Beam progression plotted.")
+
+    ##! Complete:
+    print()
+    print("========  BeamIO (columnar): tests complete  ========")
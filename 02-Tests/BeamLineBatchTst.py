@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test script for "BeamLine" class ... batch tracking
+==========================
+
+  BeamLine.py -- set "relative" path to code
+
+  Tracks the same source particles event-by-event (trackBeam) and as a
+  bunch (trackBeamBatch) and checks that the two agree.
+
+"""
+
+import os
+import random as rnd
+import numpy  as np
+
+import BeamLine        as BL
+import BeamLineElement as BLE
+import Particle        as Prtcl
+
+HOMEPATH = os.getenv('HOMEPATH')
+filename = os.path.join(HOMEPATH, \
+                        '11-Parameters/LhARABeamLine-Params-Gauss-Gabor.csv')
+datafiledir = os.path.join(HOMEPATH, '99-Scratch')
+
+NEvt = 500
+
+##! Start:
+print("========  BeamLine batch tracking: tests start  ========")
+
+##! Create beam line:
+BeamLineBatchTest = 1
+print()
+print("BeamLineBatchTest:", BeamLineBatchTest, " create beam line.")
+BmLn = BL.BeamLine(filename)
+
+##! Scalar tracking:
+BeamLineBatchTest = 2
+print()
+print("BeamLineBatchTest:", BeamLineBatchTest, \
+      " track", NEvt, "events with trackBeam.")
+rnd.seed(12345)
+BmLn.trackBeam(NEvt)
+Scalar = Prtcl.Particle.getinstances()[1:]
+if len(Scalar) != NEvt:
+    raise Exception("Wrong number of particles from trackBeam!")
+
+##! Batch tracking, same source particles:
+BeamLineBatchTest = 3
+print()
+print("BeamLineBatchTest:", BeamLineBatchTest, \
+      " track", NEvt, "events with trackBeamBatch.")
+rnd.seed(12345)
+BL.BeamLine.setBatchSize(200)
+BL.BeamLine.setScalarSourceSampling(True)
+nTrckd = BmLn.trackBeamBatch(NEvt)
+print("     ----> Events tracked:", nTrckd)
+print("     ----> Survivors at last location:", \
+      len(BL.BeamLine.getBatchIndex()[-1]))
+
+##! Compare:
+BeamLineBatchTest = 4
+print()
+print("BeamLineBatchTest:", BeamLineBatchTest, \
+      " compare scalar and batch tracking for last batch.")
+iFrst = NEvt - len(BL.BeamLine.getBatchIndex()[0])
+nDiff = 0
+for iEvt in range(len(BL.BeamLine.getBatchIndex()[0])):
+    iPrtcl = Scalar[iFrst+iEvt]
+    nRcrd  = 0
+    for iLoc in range(len(BL.BeamLine.getBatchIndex())):
+        Index = BL.BeamLine.getBatchIndex()[iLoc]
+        iRow  = np.searchsorted(Index, iEvt)
+        if iRow >= len(Index) or Index[iRow] != iEvt:
+            break
+        nRcrd += 1
+        if not np.allclose(BL.BeamLine.getBatchTrcSpc()[iLoc][iRow], \
+                           iPrtcl.getTraceSpace()[iLoc], \
+                           rtol=1.E-9, atol=1.E-12):
+            nDiff += 1
+    if nRcrd != len(iPrtcl.getTraceSpace()):
+        print("     ----> Event", iEvt, ": records, batch, scalar:", \
+              nRcrd, len(iPrtcl.getTraceSpace()))
+        nDiff += 1
+print("     ----> Number of differences:", nDiff)
+if nDiff != 0:
+    raise Exception("Batch and scalar tracking disagree!")
+Prtcl.Particle.cleanParticles()
+
+##! Write and read back:
+BeamLineBatchTest = 5
+print()
+print("BeamLineBatchTest:", BeamLineBatchTest, \
+      " write bunch and read back with readParticle.")
+ParticleFILE = Prtcl.Particle.createParticleFile(datafiledir, \
+                                                 "BeamLineBatchTst.dat")
+rnd.seed(12345)
+BmLn.trackBeamBatch(NEvt, ParticleFILE)
+Prtcl.Particle.flushNcloseParticleFile(ParticleFILE)
+
+ParticleFILE = Prtcl.Particle.openParticleFile(datafiledir, \
+                                               "BeamLineBatchTst.dat")
+EoF = False
+while not EoF:
+    EoF = Prtcl.Particle.readParticle(ParticleFILE)
+Prtcl.Particle.closeParticleFile(ParticleFILE)
+Read = Prtcl.Particle.getinstances()[1:]
+print("     ----> Events read:", len(Read))
+if len(Read) != NEvt:
+    raise Exception("Wrong number of events read back!")
+for iEvt in range(NEvt):
+    if len(Read[iEvt].getTraceSpace()) != len(Scalar[iEvt].getTraceSpace()):
+        raise Exception("Wrong number of records read back!")
+    if Read[iEvt].getLocation() != Scalar[iEvt].getLocation():
+        raise Exception("Wrong locations read back!")
+    for iLoc in range(len(Read[iEvt].getTraceSpace())):
+        if not np.allclose(Read[iEvt].getTraceSpace()[iLoc], \
+                           Scalar[iEvt].getTraceSpace()[iLoc], \
+                           rtol=1.E-9, atol=1.E-12):
+            raise Exception("Trace space read back disagrees!")
+print("     <---- Read back OK.")
+BL.BeamLine.setScalarSourceSampling(False)
+
+##! Batch transfer matrices of chromatic elements:
+BeamLineBatchTest = 6
+print()
+print("BeamLineBatchTest:", BeamLineBatchTest, \
+      " compare calcTransferMatrixBatch with setTransferMatrix.")
+delta = np.linspace(-0.02, 0.02, 11)
+nChkd = 0
+for iBLE in BLE.BeamLineElement.getinstances():
+    if not hasattr(iBLE, "calcTransferMatrixBatch"):
+        continue
+    TrnsMtrx = iBLE.calcTransferMatrixBatch(delta)
+    for iPrtcl in range(len(delta)):
+        iBLE.setTransferMatrix(np.array([0., 0., 0., 0., 0., delta[iPrtcl]]))
+        if not np.allclose(TrnsMtrx[iPrtcl], iBLE.getTransferMatrix(), \
+                           rtol=1.E-12, atol=1.E-14):
+            raise Exception("Batch transfer matrix disagrees for", \
+                            iBLE.getName())
+    nChkd += 1
+print("     <---- Elements checked:", nChkd)
+if nChkd == 0:
+    raise Exception("No chromatic elements checked!")
+
+##! Bunches generated with Source.getParticlesFromSource:
+BeamLineBatchTest += 1
+print()
+print("BeamLineBatchTest:", BeamLineBatchTest, \
+      " bunches from the source generator.")
+try:
+    BL.BeamLine.setScalarSourceSampling(1)
+    raise Exception("Bad scalar-sampling flag accepted!")
+except BL.badParameter:
+    print("     ----> Bad flag rejected, OK.")
+try:
+    BL.BeamLine.setSourceGenerator(12345)
+    raise Exception("Bad source generator accepted!")
+except BL.badParameter:
+    print("     ----> Bad generator rejected, OK.")
+BL.BeamLine.setBatchSize(NEvt)
+BL.BeamLine.setSourceGenerator(np.random.default_rng(13579))
+BmLn.trackBeamBatch(NEvt)
+Bunch = BL.BeamLine.getBatchTrcSpc()[0]
+iSrc  = BL.BeamLine.getElement()[1]
+if not np.array_equal(Bunch, \
+                      iSrc.getParticlesFromSource(NEvt, \
+                                        np.random.default_rng(13579))):
+    raise Exception("Bunch not from Source.getParticlesFromSource!")
+BL.BeamLine.setSourceGenerator()
+rnd.seed(12345)
+BmLn.trackBeamBatch(NEvt)
+Bunch = BL.BeamLine.getBatchTrcSpc()[0]
+rnd.seed(12345)
+BmLn.trackBeamBatch(NEvt)
+if not np.array_equal(Bunch, BL.BeamLine.getBatchTrcSpc()[0]):
+    raise Exception("Bunches not reproduced by seeding random!")
+print("     <---- Bunches from getParticlesFromSource, reproducible.")
+BL.BeamLine.setBatchSize()
+
+##! Complete:
+print()
+print("========  BeamLine batch tracking: tests complete  ========")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test script for "BeamLine" class ... cache of the built beam line
+================================
+
+  BeamLine.py -- set "relative" path to code
+
+  The beam line is built, in fresh processes, from the specification
+  file with and without the cache.  The beam line loaded from the cache
+  must track exactly as the one built from the specification; a changed
+  specification must not hit the cache and an unreadable cache file
+  must be ignored.
+
+"""
+
+import os
+import time
+import shutil
+import multiprocessing as mp
+import numpy as np
+
+import BeamLine        as BL
+import BeamLineElement as BLE
+import Particle        as Prtcl
+
+def BuildAndTrack(filename, CacheDirectory):
+    BL.BeamLine.setCacheDirectory(CacheDirectory)
+    Strt = time.time()
+    BL.BeamLine(filename)
+    tBld = time.time() - Strt
+
+    iSrc   = BL.BeamLine.getElement()[1]
+    TrcSpc = iSrc.getParticlesFromSource(5000, np.random.default_rng(86420))
+    BL.BeamLine.trackBunch(TrcSpc, iSrc.getName())
+
+    Summary = {"Names" : [iBLE.getName() for iBLE in BL.BeamLine.getElement()],
+               "Loaded": len(Prtcl.Particle.getinstances()) == 1 and \
+                         Prtcl.ReferenceParticle.getinstances() is \
+                         Prtcl.Particle.getinstances()[0] and \
+                         BLE.Facility.instance is BL.BeamLine.getElement()[0],
+               "nDrift": len(BLE.Drift.instances),
+               "Rows"  : BL.BeamLine.getElementRow(),
+               "nPndas": len(BL.BeamLine.getBeamLineParamPandas()),
+               "Index" : BL.BeamLine.getBatchIndex()[-1],
+               "TrcSpc": BL.BeamLine.getBatchTrcSpc()[-1],
+               "tBld"  : tBld}
+    return Summary
+
+def Run(filename, CacheDirectory):
+    with mp.get_context("spawn").Pool(1) as Pool:
+        return Pool.apply(BuildAndTrack, (filename, CacheDirectory))
+
+if __name__ == "__main__":
+
+    HOMEPATH = os.getenv('HOMEPATH')
+    filename = os.path.join(HOMEPATH, \
+                        '11-Parameters/LhARABeamLine-Params-Gauss-Gabor.csv')
+    cachedir = os.path.join(HOMEPATH, '99-Scratch/BeamLineCacheTst')
+    modified = os.path.join(cachedir, 'Modified.csv')
+    if os.path.isdir(cachedir):
+        shutil.rmtree(cachedir)
+    os.mkdir(cachedir)
+
+    ##! Start:
+    print("========  BeamLine cache: tests start  ========")
+
+    ##! Bad input, keys:
+    BeamLineTest = 1
+    print()
+    print("BeamLineTest:", BeamLineTest, " bad input, cache keys.")
+    try:
+        BL.BeamLine.setCacheDirectory(os.path.join(cachedir, "missing"))
+        raise Exception("Bad cache directory accepted!")
+    except BL.badParameter:
+        print("     ----> Bad cache directory rejected, OK.")
+    with open(filename, "r") as csvFILE:
+        Lines = csvFILE.read().replace("Strength,2.491694909", \
+                                       "Strength,2.5", 1)
+    with open(modified, "w") as csvFILE:
+        csvFILE.write(Lines)
+    Key = BL.BeamLine.getCacheKey(filename)
+    print("     ----> Key:", Key)
+    if Key != BL.BeamLine.getCacheKey(filename) or \
+       Key == BL.BeamLine.getCacheKey(modified) or \
+       Key != BL.BeamLine.getCacheKey(shutil.copy(filename, \
+                                        os.path.join(cachedir, "Copy.csv"))):
+        raise Exception("Cache key does not follow file content!")
+
+    ##! Build without and with cache:
+    BeamLineTest += 1
+    print()
+    print("BeamLineTest:", BeamLineTest, " build, write and read cache.")
+    Ref    = Run(filename, None)
+    if len(os.listdir(cachedir)) != 2:
+        raise Exception("Cache written without cache directory!")
+    Write  = Run(filename, cachedir)
+    BL.BeamLine.setCacheDirectory(cachedir)
+    if not os.path.isfile(BL.BeamLine.getCacheFile(Key)):
+        raise Exception("Cache file not written!")
+    Read   = Run(filename, cachedir)
+    print("     ----> Build (ms), no cache, cache written, cache read:", \
+          round(1000.*Ref["tBld"], 1), round(1000.*Write["tBld"], 1), \
+          round(1000.*Read["tBld"], 1))
+    for Summary in [Write, Read]:
+        if not Summary["Loaded"]:
+            raise Exception("Instance lists not restored!")
+        for Item in ["Names", "nDrift", "Rows", "nPndas"]:
+            if Summary[Item] != Ref[Item]:
+                raise Exception("Beam line differs:", Item)
+        if not np.array_equal(Summary["Index"], Ref["Index"]) or \
+           not np.array_equal(Summary["TrcSpc"], Ref["TrcSpc"]):
+            raise Exception("Tracking differs!")
+    print("     <---- Beam line from cache tracks as built beam line.")
+
+    ##! Modified specification, unreadable cache:
+    BeamLineTest += 1
+    print()
+    print("BeamLineTest:", BeamLineTest, \
+          " modified specification, unreadable cache.")
+    nFiles = len(os.listdir(cachedir))
+    Run(modified, cachedir)
+    if len(os.listdir(cachedir)) != nFiles + 1:
+        raise Exception("Modified specification hit the cache!")
+    with open(BL.BeamLine.getCacheFile(Key), "wb") as CacheFILE:
+        CacheFILE.write(b"not a beam line")
+    Bad = Run(filename, cachedir)
+    if Bad["Names"] != Ref["Names"] or \
+       not np.array_equal(Bad["TrcSpc"], Ref["TrcSpc"]):
+        raise Exception("Unreadable cache not ignored!")
+    print("     <---- Cache rebuilt for bad file; modified file new entry.")
+    shutil.rmtree(cachedir)
+
+    ##! Complete:
+    print()
+    print("========  BeamLine cache: tests complete  ========")
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test script for "BeamLine" class ... checkpoints and re-tracking
+================================
+
+  BeamLine.py -- set "relative" path to code
+
+  A bunch is tracked with checkpoints; after a downstream element is
+  changed the bunch is re-tracked from the nearest upstream checkpoint.
+  The result must be identical to tracking the bunch from the source
+  through the changed beam line.
+
+"""
+
+import os
+import time
+import numpy as np
+
+import BeamLine        as BL
+import BeamLineElement as BLE
+
+HOMEPATH = os.getenv('HOMEPATH')
+filename = os.path.join(HOMEPATH, \
+                    '11-Parameters/LhARABeamLine-Params-Gauss-Gabor.csv')
+
+NEvt = 20000
+
+##! Start:
+print("========  BeamLine checkpoints: tests start  ========")
+
+##! Bad input and no checkpoints:
+BeamLineTest = 1
+print()
+print("BeamLineTest:", BeamLineTest, " bad input, no checkpoints.")
+BmLn   = BL.BeamLine(filename)
+iSrc   = BL.BeamLine.getElement()[1]
+TrcSpc = iSrc.getParticlesFromSource(NEvt, np.random.default_rng(97531))
+try:
+    BL.BeamLine.setCheckpoints("every other")
+    raise Exception("Bad checkpoints accepted!")
+except BL.badParameter:
+    print("     ----> Bad checkpoints rejected, OK.")
+BL.BeamLine.setCheckpoints(None)
+BL.BeamLine.trackBunch(TrcSpc, iSrc.getName())
+try:
+    BL.BeamLine.retrackFrom(30)
+    raise Exception("Re-track without checkpoints accepted!")
+except BL.noCheckpoint:
+    print("     ----> Re-track without checkpoints rejected, OK.")
+
+##! Track with checkpoints:
+BeamLineTest += 1
+print()
+print("BeamLineTest:", BeamLineTest, " track with checkpoints.")
+BL.BeamLine.setCheckpoints(10)
+Strt = time.time()
+BL.BeamLine.trackBunch(TrcSpc, iSrc.getName())
+tFull = time.time() - Strt
+print("     ----> Checkpoints at:", sorted(BL.BeamLine.getCheckpoint().keys()))
+print("     ----> Full tracking (ms):", round(1000.*tFull, 1))
+if sorted(BL.BeamLine.getCheckpoint().keys()) != \
+   [1] + BL.BeamLine.getCheckpointLoc():
+    raise Exception("Wrong checkpoints!")
+iCkpt = BL.BeamLine.getCheckpointLoc()[-1]
+Ckpt  = BL.BeamLine.getCheckpoint()[iCkpt]
+if Ckpt[0] != BL.BeamLine.getElement()[iCkpt].getName() or \
+   not np.array_equal(Ckpt[3], BL.BeamLine.getBatchTrcSpc()[iCkpt-1]):
+    raise Exception("Checkpoint does not match tracked bunch!")
+
+##! Change a downstream quadrupole and re-track:
+BeamLineTest += 1
+print()
+print("BeamLineTest:", BeamLineTest, \
+      " change downstream quadrupole and re-track.")
+iQ = [iBLE for iBLE in BL.BeamLine.getElement() \
+      if isinstance(iBLE, BLE.FocusQuadrupole)][-1]
+iQ.setStrength(1.1*iQ.getStrength())
+iQ.setkFQ(iQ.calckFQ())
+Strt  = time.time()
+iUsed = BL.BeamLine.retrackFrom(iQ)
+tRtrk = time.time() - Strt
+print("     ----> Changed element, checkpoint used:", iQ.getiLoc(), iUsed)
+print("     ----> Re-tracking (ms):", round(1000.*tRtrk, 1))
+if iUsed != max([iCkpt for iCkpt in BL.BeamLine.getCheckpointLoc() \
+                 if iCkpt < iQ.getiLoc()]):
+    raise Exception("Not nearest upstream checkpoint!")
+if BL.BeamLine.getBatchLocation()[0] != \
+   BL.BeamLine.getElement()[iUsed].getName():
+    raise Exception("Re-tracking does not start at checkpoint!")
+Rtrk = [BL.BeamLine.getBatchTrcSpc()[-1], BL.BeamLine.getBatchIndex()[-1]]
+
+BL.BeamLine.trackBunch(TrcSpc, iSrc.getName())
+print("     ----> Survivors, re-tracked, from source:", \
+      len(Rtrk[1]), len(BL.BeamLine.getBatchIndex()[-1]))
+if not np.array_equal(Rtrk[1], BL.BeamLine.getBatchIndex()[-1]) or \
+   not np.array_equal(Rtrk[0], BL.BeamLine.getBatchTrcSpc()[-1]):
+    raise Exception("Re-tracked and fully tracked bunches differ!")
+print("     <---- Re-tracked bunch agrees with full tracking.")
+
+##! Checkpoints beyond truncated beam line removed:
+BeamLineTest += 1
+print()
+print("BeamLineTest:", BeamLineTest, " truncate beam line.")
+BL.BeamLine.truncateBeamLine(25)
+print("     ----> Checkpoints at:", sorted(BL.BeamLine.getCheckpoint().keys()))
+if max(BL.BeamLine.getCheckpoint().keys()) >= 25:
+    raise Exception("Stale checkpoints kept!")
+BL.BeamLine.setCheckpoints(None)
+
+##! Complete:
+print()
+print("========  BeamLine checkpoints: tests complete  ========")
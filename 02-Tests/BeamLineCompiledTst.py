@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test script for "BeamLine" class ... compiled tracking
+================================
+
+  BeamLine.py -- set "relative" path to code
+
+  The same source sample is tracked particle by particle through each of
+  the shipped beam lines with the normal (debuggable) path and with the
+  compiled steps; the locations recorded and the trace spaces must
+  agree.  Each beam line is built in a fresh process.
+
+"""
+
+import os
+import time
+import multiprocessing as mp
+import numpy as np
+
+import BeamLine        as BL
+import BeamLineElement as BLE
+import Benchmark       as Bnch
+import Particle        as Prtcl
+import Simulation      as Simu
+
+def TrackSample(BmLn, Sample):
+    Records = []
+    Strt    = time.perf_counter()
+    for TrcSpc in Sample:
+        BL.BeamLine.setSrcTrcSpc(TrcSpc)
+        BmLn.trackBeam(1)
+    Time    = time.perf_counter() - Strt
+    BL.BeamLine.setSrcTrcSpc()
+    for iPrtcl in Prtcl.Particle.getinstances()[1:]:
+        Records.append([list(iPrtcl.getLocation()), \
+                        np.array(iPrtcl.getTraceSpace())])
+    Prtcl.Particle.cleanParticles()
+    return Records, Time
+
+def CompareLattice(Lattice, NEvt):
+    Simu.Simulation.setProgressPrint(False)
+    BmLn   = BL.BeamLine(Lattice)
+    Sample = Bnch.getSourceSample(NEvt, 24680)
+
+    Normal, tNormal = TrackSample(BmLn, Sample)
+    BL.BeamLine.setCompiledTracking(True)
+    Compiled, tCompiled = TrackSample(BmLn, Sample)
+
+    nDiff  = 0
+    MaxDev = 0.
+    for (LocN, TrcSpcN), (LocC, TrcSpcC) in zip(Normal, Compiled):
+        if LocN != LocC or np.shape(TrcSpcN) != np.shape(TrcSpcC):
+            nDiff += 1
+            continue
+        Dev    = np.abs(TrcSpcN - TrcSpcC) / (1.E-9 + np.abs(TrcSpcN))
+        MaxDev = max(MaxDev, float(np.max(Dev)))
+    nEnd = len([Rcrd for Rcrd in Normal if len(Rcrd[0]) > 1 and \
+                Rcrd[0][-1] == BL.BeamLine.getElement()[-1].getName()])
+
+    #.. Start downstream with the selected locations recorded:
+    BL.BeamLine.setRecordLocations(["Drift"])
+    LocStrt = 4
+    Rtrck   = []
+    for Flag in [False, True]:
+        BL.BeamLine.setCompiledTracking(Flag)
+        iPrtcl = Prtcl.Particle()
+        iPrtcl.recordParticle("Start", 0., 0., Sample[0])
+        for iBLE in BL.BeamLine.getElement()[1:LocStrt]:
+            iPrtcl.recordParticle(iBLE.getName(), 0., 0., Sample[0])
+        BmLn.trackBeam(1, None, iPrtcl, LocStrt)
+        Rtrck.append(list(iPrtcl.getLocation()))
+        Prtcl.Particle.cleanParticles()
+
+    return len(Normal), len(Compiled), nDiff, MaxDev, nEnd, \
+           tNormal, tCompiled, Rtrck[0] == Rtrck[1]
+
+def ChangeQuadrupole(Lattice, NEvt):
+    Simu.Simulation.setProgressPrint(False)
+    BmLn   = BL.BeamLine(Lattice)
+    Sample = Bnch.getSourceSample(NEvt, 13579)
+
+    #.. Compile, then change the first focusing quadrupole:
+    BL.BeamLine.setCompiledTracking(True)
+    Steps = BL.BeamLine.getCompiledSteps()
+    iQd   = [iStp for iStp in range(len(Steps)) \
+             if isinstance(BL.BeamLine.getElement()[Steps[iStp][0]], \
+                           BLE.FocusQuadrupole)][0]
+    iFQ   = BL.BeamLine.getElement()[Steps[iQd][0]]
+    Old   = [Step[1] for Step in Steps]
+    iFQ.setkFQ(1.1*iFQ.getkFQ())
+    New   = [Step[1] for Step in BL.BeamLine.getCompiledSteps()]
+    nRcmp = len([iStp for iStp in range(len(Old)) \
+                 if New[iStp] is not Old[iStp]])
+
+    Compiled, tCompiled = TrackSample(BmLn, Sample)
+    BL.BeamLine.setCompiledTracking(False)
+    Normal, tNormal     = TrackSample(BmLn, Sample)
+
+    nDiff  = 0
+    MaxDev = 0.
+    for (LocN, TrcSpcN), (LocC, TrcSpcC) in zip(Normal, Compiled):
+        if LocN != LocC or np.shape(TrcSpcN) != np.shape(TrcSpcC):
+            nDiff += 1
+            continue
+        Dev    = np.abs(TrcSpcN - TrcSpcC) / (1.E-9 + np.abs(TrcSpcN))
+        MaxDev = max(MaxDev, float(np.max(Dev)))
+
+    return iFQ.getName(), nRcmp, New[iQd] is not Old[iQd], \
+           len(Normal), len(Compiled), nDiff, MaxDev
+
+if __name__ == "__main__":
+
+    HOMEPATH = os.getenv('HOMEPATH')
+    filename = os.path.join(HOMEPATH, \
+                    '11-Parameters/LhARABeamLine-Params-Gauss-Gabor.csv')
+    NEvt     = 1000
+
+    ##! Start:
+    print("========  BeamLine compiled tracking: tests start  ========")
+
+    ##! Bad input and compilation:
+    BeamLineTest = 1
+    print()
+    print("BeamLineTest:", BeamLineTest, " bad input, compile.")
+    Simu.Simulation.setProgressPrint(False)
+    BmLn = BL.BeamLine(filename)
+    try:
+        BL.BeamLine.setCompiledTracking(1)
+        raise Exception("Bad compiled-tracking flag accepted!")
+    except BL.badParameter:
+        print("     ----> Bad flag rejected, OK.")
+    Steps = BL.BeamLine.getCompiledSteps()
+    if [Step[0] for Step in Steps] != \
+       list(range(2, len(BL.BeamLine.getElement()))):
+        raise Exception("Wrong compiled steps!")
+    print("     ----> Steps compiled:", len(Steps))
+    iBLE = BL.BeamLine.getElement()[2]
+    R    = np.array([1.E-4, 1.E-4, -1.E-4, 2.E-4, 0., 1.E-3])
+    if not np.allclose(Steps[0][1](R), iBLE.Transport(R), \
+                       rtol=1.E-12, atol=0.):
+        raise Exception("Compiled step differs from Transport!")
+    if Steps[0][1](np.array([1., 0., 0., 0., 0., 0.])) is not None:
+        raise Exception("Particle outside beam pipe not lost!")
+    BL.BeamLine.truncateBeamLine(len(BL.BeamLine.getElement())-1)
+    if len(BL.BeamLine.getCompiledSteps()) != len(Steps) - 1:
+        raise Exception("Compiled steps not refreshed on truncation!")
+    print("     <---- Compiled steps OK.")
+
+    ##! Compiled and normal tracking of the shipped beam lines:
+    BeamLineTest += 1
+    print()
+    print("BeamLineTest:", BeamLineTest, " shipped beam lines.")
+    ctx = mp.get_context("spawn")
+    for Lattice in Bnch.Benchmark.getShippedLattices():
+        with ctx.Pool(1) as Pool:
+            nN, nC, nDiff, MaxDev, nEnd, tN, tC, Rtrck = \
+                Pool.apply(CompareLattice, (Lattice, NEvt))
+        print("     ---->", os.path.basename(Lattice), ": particles:", nN, \
+              "; at end:", nEnd, "; max. relative deviation:", \
+              "{:.1e}".format(MaxDev), "; speed up:", round(tN/tC, 1))
+        if nN != NEvt or nC != NEvt or nDiff != 0 or MaxDev > 1.E-10:
+            raise Exception("Compiled and normal tracking differ!")
+        if not Rtrck:
+            raise Exception("Re-tracking from LocStrt differs!")
+    print("     <---- Compiled tracking agrees with normal tracking.")
+
+    ##! Element changed after compilation:
+    BeamLineTest += 1
+    print()
+    print("BeamLineTest:", BeamLineTest, " quadrupole changed after", \
+          "compilation.")
+    with ctx.Pool(1) as Pool:
+        Name, nRcmp, QdRcmp, nN, nC, nDiff, MaxDev = \
+            Pool.apply(ChangeQuadrupole, (filename, NEvt))
+    print("     ----> kFQ of", Name, "increased by 10%; steps recompiled:", \
+          nRcmp, "; max. relative deviation:", "{:.1e}".format(MaxDev))
+    if nRcmp != 1 or not QdRcmp:
+        raise Exception("Stale compiled step not recompiled!")
+    if nN != NEvt or nC != NEvt or nDiff != 0 or MaxDev > 1.E-10:
+        raise Exception("Compiled and normal tracking differ after change!")
+    print("     <---- Changed quadrupole recompiled, tracking agrees.")
+
+    ##! Complete:
+    print()
+    print("========  BeamLine compiled tracking: tests complete  ========")
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test script for "BeamLineElement" class ... delta-grid interpolation
+==========================
+
+  BeamLineElement.py -- set "relative" path to code
+
+  The transfer matrices of the chromatic elements are tabulated on a
+  delta grid and interpolated per particle.  The validation report must
+  show small errors, particles outside the grid must get the exact
+  matrices and bunch tracking must agree with exact tracking.  With a
+  laser-driven (mode 0) source the default grid range, derived from the
+  source, must contain most of the particles.
+
+"""
+
+import os
+import time
+import numpy           as np
+import multiprocessing as mp
+
+import BeamLine        as BL
+import BeamLineElement as BLE
+
+HOMEPATH = os.getenv('HOMEPATH')
+filename = os.path.join(HOMEPATH, \
+                        '11-Parameters/LhARABeamLine-Params-Gauss-Gabor.csv')
+
+NEvt = 20000
+
+def LaserDriven(filename, nPoints, Intrpltn):
+    BL.BeamLine(filename)
+    iSrc   = BL.BeamLine.getElement()[1]
+    TrcSpc = iSrc.getParticlesFromSource(NEvt, np.random.default_rng(2468))
+
+    BLE.BeamLineElement.setDeltaGrid(None)
+    BL.BeamLine.trackBunch(TrcSpc, iSrc.getName())
+    Exct = [BL.BeamLine.getBatchTrcSpc()[-1], \
+            BL.BeamLine.getBatchIndex()[-1]]
+
+    BLE.BeamLineElement.setDeltaGrid(nPoints, Intrpltn)
+    dMin, dMax = BLE.BeamLineElement.getGridRange()
+    BL.BeamLine.trackBunch(TrcSpc, iSrc.getName())
+    Grid = [BL.BeamLine.getBatchTrcSpc()[-1], \
+            BL.BeamLine.getBatchIndex()[-1]]
+
+    delta = TrcSpc[:,5]
+    Frctn = [np.mean((delta >= dMin) & (delta <= dMax)), \
+             np.mean(np.abs(delta) <= 0.02)]
+    Cmmn  = np.intersect1d(Grid[1], Exct[1])
+    Dev   = np.max(np.abs(Grid[0][np.isin(Grid[1], Cmmn)] - \
+                          Exct[0][np.isin(Exct[1], Cmmn)]))
+
+    return [dMin, dMax], Frctn, len(Grid[1]), len(Exct[1]), len(Cmmn), Dev
+
+if __name__ == "__main__":
+
+    ##! Start:
+    print("========  BeamLineElement delta grid: tests start  ========")
+
+    ##! Bad input, switching between polynomial and grid:
+    GridTest = 1
+    print()
+    print("GridTest:", GridTest, " bad input, polynomial and grid exclusive.")
+    BmLn = BL.BeamLine(filename)
+    for nPoints, Intrpltn, Range in [(1, "linear", [-0.02, 0.02]), \
+                                     (101, "quintic", [-0.02, 0.02]), \
+                                     (3, "cubic", [-0.02, 0.02]), \
+                                     (101, "linear", [0.02, -0.02])]:
+        try:
+            BLE.BeamLineElement.setDeltaGrid(nPoints, Intrpltn, Range)
+            raise Exception("Bad input accepted:", nPoints, Intrpltn, Range)
+        except BLE.badParameter:
+            print("     ----> Bad input", nPoints, Intrpltn, Range, \
+                  "rejected, OK.")
+    BLE.BeamLineElement.setTaylorExpansion(6)
+    BLE.BeamLineElement.setDeltaGrid(101)
+    if BLE.BeamLineElement.getTaylorOrder() != None:
+        raise Exception("Polynomial not switched off by grid!")
+    BLE.BeamLineElement.setTaylorExpansion(6)
+    if BLE.BeamLineElement.getGridPoints() != None:
+        raise Exception("Grid not switched off by polynomial!")
+    BLE.BeamLineElement.setTaylorExpansion(None)
+
+    ##! Validation report, out of range delta:
+    GridTest += 1
+    print()
+    print("GridTest:", GridTest, " validation report, out of range delta.")
+    delta = np.array([-0.05, -0.02, -0.0137, 0., 0.0071, 0.02, 0.05])
+    R     = np.tile([1.E-3, -1.E-3, 2.E-3, 1.E-3, 0., 0.], (len(delta), 1))
+    R[:,5] = delta
+    for nPoints, Intrpltn, Tlrnc in [(201, "linear", 1.E-5), \
+                                     (1001, "linear", 1.E-6), \
+                                     (41, "cubic", 1.E-7)]:
+        BLE.BeamLineElement.setDeltaGrid(nPoints, Intrpltn, [-0.02, 0.02])
+        Report = BLE.BeamLineElement.validateDeltaGrid()
+        MaxErr = max([Error for Name, Type, Error in Report])
+        print("     ----> Points, interpolation, largest error:", \
+              nPoints, Intrpltn, MaxErr)
+        if len(Report) == 0 or MaxErr > Tlrnc:
+            raise Exception("Interpolation error too large!")
+        for iBLE in BL.BeamLine.getElement():
+            if not hasattr(iBLE, "calcTransferMatrixBatch"):
+                continue
+            Grid  = iBLE.getChromaticMatrixBatch(delta)
+            Exact = iBLE.calcTransferMatrixBatch(delta)
+            if not np.array_equal(Grid[[0, -1]], Exact[[0, -1]]):
+                raise Exception("Exact matrices not used out of range:", \
+                                iBLE.getName())
+            if not np.allclose(iBLE.TransportChromaticBatch(R), \
+                               np.einsum('nij,nj->ni', Grid, R), \
+                               rtol=1.E-12, atol=1.E-15):
+                raise Exception("Transport disagrees with matrices:", \
+                                iBLE.getName())
+    print("     <---- Validation report OK.")
+
+    ##! Tracking with interpolated and exact matrices:
+    GridTest += 1
+    print()
+    print("GridTest:", GridTest, " bunch tracking, interpolated and exact.")
+    iSrc   = BL.BeamLine.getElement()[1]
+    TrcSpc = iSrc.getParticlesFromSource(NEvt, np.random.default_rng(97531))
+    BLE.BeamLineElement.setDeltaGrid(None)
+    Strt   = time.time()
+    BL.BeamLine.trackBunch(TrcSpc, iSrc.getName())
+    tExct  = time.time() - Strt
+    Exct   = [BL.BeamLine.getBatchTrcSpc()[-1], BL.BeamLine.getBatchIndex()[-1]]
+    for nPoints, Intrpltn in [(401, "linear"), (41, "cubic")]:
+        BLE.BeamLineElement.setDeltaGrid(nPoints, Intrpltn)
+        Strt  = time.time()
+        BL.BeamLine.trackBunch(TrcSpc, iSrc.getName())
+        tGrid = time.time() - Strt
+        Grid  = [BL.BeamLine.getBatchTrcSpc()[-1], \
+                 BL.BeamLine.getBatchIndex()[-1]]
+        print("     ---->", nPoints, Intrpltn, ": tracking (ms), grid, exact:", \
+              round(1000.*tGrid, 1), round(1000.*tExct, 1))
+        print("           Survivors, grid, exact:", len(Grid[1]), len(Exct[1]))
+        Cmmn = np.intersect1d(Grid[1], Exct[1])
+        if len(Cmmn) < 0.999*len(Exct[1]):
+            raise Exception("Survivors differ!")
+        Dev  = np.max(np.abs(Grid[0][np.isin(Grid[1], Cmmn)] - \
+                             Exct[0][np.isin(Exct[1], Cmmn)]))
+        print("           Largest trace space difference at end:", Dev)
+        if Dev > 1.E-6:
+            raise Exception("Interpolated and exact tracking disagree!")
+    BLE.BeamLineElement.setDeltaGrid(None)
+    print("     <---- Interpolated tracking agrees with exact tracking.")
+
+    ##! Laser-driven source, grid range from the source:
+    GridTest += 1
+    print()
+    print("GridTest:", GridTest, " laser-driven source, default grid range.")
+    for Lattice in ['LhARABeamLine-Params-LsrDrvn-Gabor.csv', \
+                    'LIONBeamLine-Params-LsrDrvn.csv']:
+        with mp.get_context("spawn").Pool(1) as Pool:
+            Range, Frctn, nGrid, nExct, nCmmn, Dev = \
+                Pool.apply(LaserDriven, \
+                           (os.path.join(HOMEPATH, '11-Parameters', Lattice), \
+                            401, "cubic"))
+        print("     ---->", Lattice, ": range:", Range)
+        print("           Fraction interpolated, in [-0.02, 0.02]:", Frctn)
+        print("           Survivors, grid, exact, common:", nGrid, nExct, nCmmn)
+        print("           Largest trace space difference at end:", Dev)
+        if Frctn[0] < 0.99:
+            raise Exception("Most particles not interpolated!")
+        if nCmmn < 0.999*nExct or Dev > 1.E-6:
+            raise Exception("Interpolated and exact tracking disagree!")
+    print("     <---- Most particles interpolated, tracking agrees.")
+
+    ##! Complete:
+    print()
+    print("========  BeamLineElement delta grid: tests complete  ========")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test script for "BeamLineElement" class ... polynomial-in-delta matrices
+==========================
+
+  BeamLineElement.py -- set "relative" path to code
+
+  The transfer matrices of the chromatic elements are replaced by
+  polynomials in delta fitted once per element.  The error bound of each
+  element must be small, particles outside the fitted range must get the
+  exact matrices and bunch tracking must agree with exact tracking.
+
+"""
+
+import os
+import time
+import numpy as np
+
+import BeamLine        as BL
+import BeamLineElement as BLE
+
+HOMEPATH = os.getenv('HOMEPATH')
+filename = os.path.join(HOMEPATH, \
+                        '11-Parameters/LhARABeamLine-Params-Gauss-Gabor.csv')
+
+NEvt = 20000
+
+##! Start:
+print("========  BeamLineElement Taylor maps: tests start  ========")
+
+##! Bad input:
+TaylorTest = 1
+print()
+print("TaylorTest:", TaylorTest, " bad input.")
+BmLn = BL.BeamLine(filename)
+for Order, Range in [(0, [-0.02, 0.02]), (2.5, [-0.02, 0.02]), \
+                     (3, [0.01, 0.02])]:
+    try:
+        BLE.BeamLineElement.setTaylorExpansion(Order, Range)
+        raise Exception("Bad input accepted:", Order, Range)
+    except BLE.badParameter:
+        print("     ----> Bad input", Order, Range, "rejected, OK.")
+if BLE.BeamLineElement.getTaylorOrder() != None:
+    raise Exception("Exact matrices not default!")
+
+##! Error bounds and fall back outside range:
+TaylorTest += 1
+print()
+print("TaylorTest:", TaylorTest, " error bounds, out of range delta.")
+BLE.BeamLineElement.setTaylorExpansion(6, [-0.02, 0.02])
+delta = np.array([-0.05, -0.02, -0.0137, 0., 0.0071, 0.02, 0.05])
+nChkd = 0
+for iBLE in BL.BeamLine.getElement():
+    if not hasattr(iBLE, "calcTransferMatrixBatch"):
+        continue
+    ErrBound = iBLE.getTaylorErrorBound()
+    Exact    = iBLE.calcTransferMatrixBatch(delta)
+    Poly     = iBLE.getChromaticMatrixBatch(delta)
+    if ErrBound > 1.E-6:
+        raise Exception("Error bound too large:", iBLE.getName(), ErrBound)
+    if np.max(np.abs(Poly - Exact)) > ErrBound + 1.E-12:
+        raise Exception("Error bound exceeded:", iBLE.getName())
+    if not np.array_equal(Poly[[0, -1]], Exact[[0, -1]]):
+        raise Exception("Exact matrices not used out of range:", \
+                        iBLE.getName())
+    R = np.tile([1.E-3, -1.E-3, 2.E-3, 1.E-3, 0., 0.], (len(delta), 1))
+    R[:,5] = delta
+    if not np.allclose(iBLE.TransportChromaticBatch(R), \
+                       np.einsum('nij,nj->ni', Poly, R), \
+                       rtol=1.E-12, atol=1.E-15):
+        raise Exception("Transport disagrees with matrices:", iBLE.getName())
+    nChkd += 1
+print("     <---- Elements checked:", nChkd)
+if nChkd == 0:
+    raise Exception("No chromatic elements checked!")
+
+##! Tracking with polynomial and exact matrices:
+TaylorTest += 1
+print()
+print("TaylorTest:", TaylorTest, " bunch tracking, polynomial and exact.")
+iSrc   = BL.BeamLine.getElement()[1]
+TrcSpc = iSrc.getParticlesFromSource(NEvt, np.random.default_rng(97531))
+Strt   = time.time()
+BL.BeamLine.trackBunch(TrcSpc, iSrc.getName())
+tPoly  = time.time() - Strt
+Poly   = [BL.BeamLine.getBatchTrcSpc()[-1], BL.BeamLine.getBatchIndex()[-1]]
+BLE.BeamLineElement.setTaylorExpansion(None)
+Strt   = time.time()
+BL.BeamLine.trackBunch(TrcSpc, iSrc.getName())
+tExct  = time.time() - Strt
+Exct   = [BL.BeamLine.getBatchTrcSpc()[-1], BL.BeamLine.getBatchIndex()[-1]]
+print("     ----> Tracking (ms), polynomial, exact:", \
+      round(1000.*tPoly, 1), round(1000.*tExct, 1))
+print("     ----> Survivors, polynomial, exact:", len(Poly[1]), len(Exct[1]))
+Cmmn  = np.intersect1d(Poly[1], Exct[1])
+if len(Cmmn) < 0.999*len(Exct[1]):
+    raise Exception("Survivors differ!")
+Dev   = np.max(np.abs(Poly[0][np.isin(Poly[1], Cmmn)] - \
+                      Exct[0][np.isin(Exct[1], Cmmn)]))
+print("     ----> Largest trace space difference at end:", Dev)
+if Dev > 1.E-6:
+    raise Exception("Polynomial and exact tracking disagree!")
+print("     <---- Polynomial tracking agrees with exact tracking.")
+
+##! Complete:
+print()
+print("========  BeamLineElement Taylor maps: tests complete  ========")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test script for "BeamLine" class ... fused tracking
+================================
+
+  BeamLine.py -- set "relative" path to code
+
+  Runs of drifts, RF cavities and planar RPLC switches are transported
+  with one fused affine map and the bunch is recorded only at the
+  requested locations.  Survivors and trace space at these locations
+  must agree with element-by-element tracking.
+
+"""
+
+import os
+import time
+import numpy as np
+
+import BeamLine        as BL
+import BeamLineElement as BLE
+
+HOMEPATH = os.getenv('HOMEPATH')
+filename = os.path.join(HOMEPATH, \
+                    '11-Parameters/LhARABeamLine-Params-Gauss-Gabor.csv')
+
+NEvt = 20000
+
+##! Start:
+print("========  BeamLine fused tracking: tests start  ========")
+
+##! Bad input and affine maps:
+BeamLineTest = 1
+print()
+print("BeamLineTest:", BeamLineTest, " bad input, affine maps.")
+BmLn   = BL.BeamLine(filename)
+iSrc   = BL.BeamLine.getElement()[1]
+TrcSpc = iSrc.getParticlesFromSource(NEvt, np.random.default_rng(24680))
+try:
+    BL.BeamLine.setRecordLocations("LhARA:1:Arc:Drift:12")
+    raise Exception("Bad locations accepted!")
+except BL.badParameter:
+    print("     ----> Bad locations rejected, OK.")
+try:
+    BL.BeamLine.setFusedTracking("yes")
+    raise Exception("Bad fused flag accepted!")
+except BL.badParameter:
+    print("     ----> Bad fused flag rejected, OK.")
+for iBLE in BL.BeamLine.getElement():
+    Affine = isinstance(iBLE, BLE.Drift) or \
+             isinstance(iBLE, BLE.CylindricalRFCavity) or \
+             (isinstance(iBLE, BLE.RPLCswitch) and not iBLE.get3Drotation())
+    if (iBLE.getAffineMap() != None) != Affine:
+        raise Exception("Wrong affine map:", iBLE.getName())
+print("     <---- Affine maps OK.")
+
+##! Element-by-element reference:
+BeamLineTest += 1
+print()
+print("BeamLineTest:", BeamLineTest, " element-by-element tracking.")
+Strt = time.time()
+BL.BeamLine.trackBunch(TrcSpc, iSrc.getName())
+tFull = time.time() - Strt
+Full  = {}
+for iRcrd in range(len(BL.BeamLine.getBatchLocation())):
+    Full[BL.BeamLine.getBatchLocation()[iRcrd]] = \
+        [BL.BeamLine.getBatchTrcSpc()[iRcrd], \
+         BL.BeamLine.getBatchIndex()[iRcrd]]
+print("     ----> Steps, records:", len(BL.BeamLine.getTrackingSteps()), \
+      len(Full))
+print("     ----> Tracking (ms):", round(1000.*tFull, 1))
+
+##! Fused tracking:
+BeamLineTest += 1
+print()
+print("BeamLineTest:", BeamLineTest, " fused tracking.")
+iCav   = [iBLE for iBLE in BL.BeamLine.getElement() \
+          if isinstance(iBLE, BLE.CylindricalRFCavity)][0]
+Record = [iCav.getName(), "LhARA:1:Matching:Drift:11", 40]
+BL.BeamLine.setRecordLocations(Record)
+BL.BeamLine.setFusedTracking(True)
+Steps = BL.BeamLine.getTrackingSteps()
+Strt  = time.time()
+BL.BeamLine.trackBunch(TrcSpc, iSrc.getName())
+tFsd  = time.time() - Strt
+print("     ----> Steps, records:", len(Steps), \
+      len(BL.BeamLine.getBatchLocation()))
+print("     ----> Tracking (ms):", round(1000.*tFsd, 1))
+print("     ----> Locations:", BL.BeamLine.getBatchLocation())
+Expctd = [iSrc.getName()] + \
+         [BL.BeamLine.getElement()[iLoc].getName() for iLoc in \
+          sorted(BL.BeamLine.getRecordLoc()) + [len(Full)]]
+if BL.BeamLine.getBatchLocation() != Expctd:
+    raise Exception("Wrong locations recorded!")
+if len(Steps) >= len(BL.BeamLine.getElement()) - 2:
+    raise Exception("No elements fused!")
+for iRcrd in range(len(BL.BeamLine.getBatchLocation())):
+    TrcSpcRef, IndexRef = Full[BL.BeamLine.getBatchLocation()[iRcrd]]
+    if not np.array_equal(BL.BeamLine.getBatchIndex()[iRcrd], IndexRef) or \
+       not np.allclose(BL.BeamLine.getBatchTrcSpc()[iRcrd], TrcSpcRef, \
+                       rtol=1.E-10, atol=1.E-12):
+        raise Exception("Fused and element-by-element tracking differ at", \
+                        BL.BeamLine.getBatchLocation()[iRcrd])
+print("     <---- Fused tracking agrees with element-by-element tracking.")
+
+##! Checkpoints end a fused step:
+BeamLineTest += 1
+print()
+print("BeamLineTest:", BeamLineTest, " checkpoints with fused tracking.")
+BL.BeamLine.setCheckpoints([25])
+BL.BeamLine.trackBunch(TrcSpc, iSrc.getName())
+print("     ----> Checkpoints at:", sorted(BL.BeamLine.getCheckpoint().keys()))
+Ckpt = BL.BeamLine.getCheckpoint()[25]
+if Ckpt[0] != BL.BeamLine.getElement()[25].getName() or \
+   not np.array_equal(Ckpt[4], Full[Ckpt[0]][1]):
+    raise Exception("Checkpoint inside fused step wrong!")
+BL.BeamLine.setCheckpoints(None)
+BL.BeamLine.setFusedTracking(False)
+if len(BL.BeamLine.getTrackingSteps()) != len(BL.BeamLine.getElement()) - 2:
+    raise Exception("Fused tracking not switched off!")
+BL.BeamLine.setRecordLocations(None)
+print("     <---- Checkpoints OK.")
+
+##! Complete:
+print()
+print("========  BeamLine fused tracking: tests complete  ========")
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test script for "BeamLine" class ... per-element profile
+================================
+
+  BeamLine.py -- set "relative" path to code
+
+  The same source sample is tracked particle by particle (trackBeam) and
+  as a bunch (trackBeamBatch); the particles in and out and the losses by
+  reason must agree element by element.  The profile of a parallel
+  simulation is written next to its data file.
+
+"""
+
+import os
+import csv
+import numpy as np
+
+import BeamLine        as BL
+import BeamLineElement as BLE
+import Particle        as Prtcl
+import Simulation      as Simu
+
+def CopyProfile(Profile):
+    return {Key: [list(Value) if isinstance(Value, list) else Value \
+                  for Value in Values] for Key, Values in Profile.items()}
+
+def CheckBalance(Profile, nEvt):
+    nLoc = len(Profile["In"])
+    for iLoc in range(2, nLoc):
+        if Profile["In"][iLoc] - Profile["Out"][iLoc] != \
+           sum(Profile["Loss"][iLoc]):
+            raise Exception("Losses do not balance at", iLoc)
+    if Profile["In"][2] != nEvt:
+        raise Exception("Wrong number of particles in at first element!")
+
+def RunSimulation(filename, datafiledir, datafilename, NEvt, nPrc):
+    Smltn = Simu.Simulation(NEvt, filename, datafiledir, datafilename)
+    Smltn.setnProcesses(nPrc)
+    BL.BeamLine.setProfiling(True)
+    BL.BeamLine.resetProfile()
+    Smltn.RunSim()
+    return Smltn.getProfileFile()
+
+if __name__ == "__main__":
+
+    HOMEPATH = os.getenv('HOMEPATH')
+    filename = os.path.join(HOMEPATH, \
+                    '11-Parameters/LhARABeamLine-Params-Gauss-Gabor.csv')
+    datafiledir = os.path.join(HOMEPATH, '99-Scratch')
+    NEvt        = 2000
+
+    ##! Start:
+    print("========  BeamLine profile: tests start  ========")
+
+    ##! Bad input, profile off:
+    BeamLineTest = 1
+    print()
+    print("BeamLineTest:", BeamLineTest, " bad input, profile off.")
+    Simu.Simulation.setProgressPrint(False)
+    BmLn = BL.BeamLine(filename)
+    try:
+        BL.BeamLine.setProfiling(1)
+        raise Exception("Bad profiling flag accepted!")
+    except BL.badParameter:
+        print("     ----> Bad profiling flag rejected, OK.")
+    BmLn.trackBeamBatch(100)
+    if BL.BeamLine.getProfile() != None:
+        raise Exception("Profile recorded with profiling off!")
+    print("     ----> Loss reasons:", BLE.BeamLineElement.LossReasons)
+
+    ##! Scalar tracking:
+    BeamLineTest += 1
+    print()
+    print("BeamLineTest:", BeamLineTest, " particle by particle.")
+    iSrc   = BL.BeamLine.getElement()[1]
+    Sample = iSrc.getParticlesFromSource(NEvt, np.random.default_rng(97531))
+    BL.BeamLine.setProfiling(True)
+    for TrcSpc in Sample:
+        BL.BeamLine.setSrcTrcSpc(TrcSpc)
+        BmLn.trackBeam(1)
+    BL.BeamLine.setSrcTrcSpc()
+    nEnd = len([iPrtcl for iPrtcl in Prtcl.Particle.getinstances()[1:] \
+                if iPrtcl.getLocation()[-1] == \
+                   BL.BeamLine.getElement()[-1].getName()])
+    Prtcl.Particle.cleanParticles()
+    Scalar = CopyProfile(BL.BeamLine.getProfile())
+    CheckBalance(Scalar, NEvt)
+    if Scalar["Out"][-1] != nEnd or Scalar["Calls"] != Scalar["In"]:
+        raise Exception("Wrong particles out or calls!")
+    Lost = np.sum(np.array(Scalar["Loss"]), axis=0)
+    print("     ----> Survivors:", nEnd, "; losses:", \
+          dict(zip(BLE.BeamLineElement.LossReasons, Lost.tolist())))
+    if Lost[BLE.BeamLineElement.LossReasons.index("Aperture:Circular")] \
+       == 0 or Lost[BLE.BeamLineElement.LossReasons.index("BeamPipe")] == 0:
+        raise Exception("Losses not classified!")
+
+    ##! Batch tracking:
+    BeamLineTest += 1
+    print()
+    print("BeamLineTest:", BeamLineTest, " bunch, same sample.")
+    BL.BeamLine.resetProfile()
+    BL.BeamLine.setBatchSize(700)
+    BmLn.trackBeamBatch(NEvt, None, Sample)
+    Batch = BL.BeamLine.getProfile()
+    CheckBalance(Batch, NEvt)
+    for Key in ["In", "Out", "Loss"]:
+        if Batch[Key] != Scalar[Key]:
+            raise Exception("Scalar and batch profiles differ:", Key)
+    if Batch["Calls"][2] != 3:
+        raise Exception("Wrong number of batch calls!")
+    print("     <---- Particles in, out and losses agree with scalar.")
+
+    ##! Fused tracking:
+    BeamLineTest += 1
+    print()
+    print("BeamLineTest:", BeamLineTest, " fused tracking.")
+    BL.BeamLine.setFusedTracking(True)
+    BL.BeamLine.setRecordLocations(["Aperture"])
+    BL.BeamLine.resetProfile()
+    BmLn.trackBeamBatch(NEvt, None, Sample)
+    Fused = BL.BeamLine.getProfile()
+    CheckBalance(Fused, NEvt)
+    nSkip = Fused["In"].count(0) - 2
+    print("     ----> Elements inside fused steps:", nSkip)
+    if nSkip == 0 or Fused["Out"][-1] != Scalar["Out"][-1] or \
+       np.sum(Fused["Loss"]) != np.sum(Scalar["Loss"]):
+        raise Exception("Fused profile wrong!")
+    BL.BeamLine.setFusedTracking(False)
+    BL.BeamLine.setRecordLocations(None)
+    BL.BeamLine.setBatchSize(100000)
+
+    ##! Profile table:
+    BeamLineTest += 1
+    print()
+    print("BeamLineTest:", BeamLineTest, " profile table.")
+    BL.BeamLine.resetProfile()
+    BL.BeamLine.addProfile(Scalar)
+    BL.BeamLine.printProfile()
+    profilefile = os.path.join(datafiledir, "BeamLineProfileTst.csv")
+    BL.BeamLine.writeProfile(profilefile)
+    with open(profilefile, newline="") as ProfileFILE:
+        Rows = list(csv.DictReader(ProfileFILE))
+    os.remove(profilefile)
+    if len(Rows) != len(BL.BeamLine.getElement()) - 2 or \
+       int(Rows[-1]["Out"]) != nEnd or \
+       Rows[0]["Name"] != BL.BeamLine.getElement()[2].getName():
+        raise Exception("Wrong profile table!")
+    BL.BeamLine.setProfiling(False)
+    print("     <---- Table OK.")
+
+    ##! Parallel simulation:
+    BeamLineTest += 1
+    print()
+    print("BeamLineTest:", BeamLineTest, " profile of parallel simulation.")
+    profilefile = RunSimulation(filename, datafiledir, \
+                                "BeamLineProfileTst.dat", NEvt, 2)
+    print("     ----> Profile file:", profilefile)
+    with open(profilefile, newline="") as ProfileFILE:
+        Rows = list(csv.DictReader(ProfileFILE))
+    if int(Rows[0]["In"]) != NEvt or \
+       sum([int(Row["Lost"]) for Row in Rows]) + int(Rows[-1]["Out"]) \
+       != NEvt:
+        raise Exception("Wrong profile of parallel simulation!")
+    os.remove(profilefile)
+    os.remove(os.path.join(datafiledir, "BeamLineProfileTst.dat"))
+    print("     <---- Profile of shards summed.")
+
+    ##! Complete:
+    print()
+    print("========  BeamLine profile: tests complete  ========")
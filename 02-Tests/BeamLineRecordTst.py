@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test script for "BeamLine" class ... selective recording of locations
+================================
+
+  BeamLine.py -- set "relative" path to code
+
+  The same events are written with every location recorded and with a
+  selection of locations only.  Beam, reading the files in fresh
+  processes, must give the same sums at the selected locations.
+
+"""
+
+import os
+import random as rnd
+import multiprocessing as mp
+import numpy  as np
+
+import BeamIO     as bmIO
+import BeamLine   as BL
+import Beam       as Bm
+import Particle   as Prtcl
+
+def EvaluateBeam(datafile):
+    iBm = Bm.Beam(datafile)
+    iBm.evaluateBeam()
+    Names = [iBm.getLocation()[iLoc-1] for iLoc in iBm.getiLoc()]
+    return Names, iBm.getnParticles(), iBm.getCovSums()
+
+def WriteEvents(BmLn, datafile, NEvt, Columnar):
+    ibmIOw = bmIO.BeamIO(datafiledir, datafile, True, False, Columnar)
+    BmLn.writeBeamLine(ibmIOw.getdataFILE())
+    rnd.seed(13579)
+    np.random.seed(13579)
+    if Columnar:
+        BmLn.trackBeamBatch(NEvt, ibmIOw)
+    else:
+        BmLn.trackBeamBatch(NEvt, ibmIOw.getdataFILE())
+    ibmIOw.flushNclosedataFile(ibmIOw.getdataFILE())
+    return os.path.getsize(os.path.join(datafiledir, datafile))
+
+if __name__ == "__main__":
+
+    HOMEPATH = os.getenv('HOMEPATH')
+    filename = os.path.join(HOMEPATH, \
+                    '11-Parameters/LhARABeamLine-Params-Gauss-Gabor.csv')
+    datafiledir = os.path.join(HOMEPATH, '99-Scratch')
+
+    NEvt   = 2000
+    Record = ["FocusQuadrupole", "DefocusQuadrupole", \
+              "LhARA:1:Matching:Drift:11"]
+
+    ##! Start:
+    print("========  BeamLine selective recording: tests start  ========")
+
+    ##! Selection resolved to element indices:
+    BeamLineTest = 1
+    print()
+    print("BeamLineTest:", BeamLineTest, " selection of locations.")
+    BmLn = BL.BeamLine(filename)
+    BL.BeamLine.setBatchSize(1000)
+    try:
+        BL.BeamLine.setRecordLocations([1.5])
+        raise Exception("Bad locations accepted!")
+    except BL.badParameter:
+        print("     ----> Bad locations rejected, OK.")
+    BL.BeamLine.setRecordLocations(Record)
+    Selected = sorted(BL.BeamLine.getRecordLoc())
+    print("     ----> Selected elements:", Selected)
+    for iLoc in Selected:
+        iBLE = BL.BeamLine.getElement()[iLoc]
+        if iBLE.getName() not in Record and \
+           type(iBLE).__name__ not in Record:
+            raise Exception("Wrong element selected:", iBLE.getName())
+    if len(Selected) != 7:
+        raise Exception("Wrong number of elements selected!")
+
+    ##! Write all and selected locations:
+    BeamLineTest += 1
+    print()
+    print("BeamLineTest:", BeamLineTest, " write all and selected locations.")
+    BL.BeamLine.setRecordLocations(None)
+    nAll = WriteEvents(BmLn, "BeamLineRecordTst-all.dat", NEvt, False)
+    BL.BeamLine.setRecordLocations(Record)
+    nV2  = WriteEvents(BmLn, "BeamLineRecordTst-v2.dat", NEvt, False)
+    nV3  = WriteEvents(BmLn, "BeamLineRecordTst-v3.dat", NEvt, True)
+    print("     ----> File sizes, all, selected v2, v3:", nAll, nV2, nV3)
+    if nV2 > nAll/4:
+        raise Exception("Selected file not smaller!")
+
+    ##! Scalar tracking records the selection:
+    BeamLineTest += 1
+    print()
+    print("BeamLineTest:", BeamLineTest, " scalar tracking.")
+    BmLn.trackBeam(20, None, None, None, False)
+    Expctd = [BL.BeamLine.getElement()[1].getName()] + \
+             [BL.BeamLine.getElement()[iLoc].getName() for iLoc in \
+              Selected + [len(BL.BeamLine.getElement())-1]]
+    for iPrtcl in Prtcl.Particle.getinstances()[1:]:
+        if iPrtcl.getLocation() != Expctd[0:len(iPrtcl.getLocation())]:
+            raise Exception("Scalar tracking records wrong locations!")
+    print("     ----> Locations of last particle:", \
+          Prtcl.Particle.getinstances()[-1].getLocation())
+    BL.BeamLine.setRecordLocations(None)
+
+    ##! Beam sums at selected locations:
+    BeamLineTest += 1
+    print()
+    print("BeamLineTest:", BeamLineTest, " Beam from selected locations.")
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(1) as Pool:
+        All = Pool.apply(EvaluateBeam, \
+                    (os.path.join(datafiledir, "BeamLineRecordTst-all.dat"),))
+    for datafile in ["BeamLineRecordTst-v2.dat", "BeamLineRecordTst-v3.dat"]:
+        with ctx.Pool(1) as Pool:
+            Names, nPrtcls, CovSums = Pool.apply(EvaluateBeam, \
+                                (os.path.join(datafiledir, datafile),))
+        print("     ---->", datafile, ": locations:", len(Names))
+        if Names != Expctd:
+            raise Exception("Wrong locations in Beam:", Names)
+        for iAddr in range(len(Names)):
+            jAddr = All[0].index(Names[iAddr])
+            if nPrtcls[iAddr] != All[1][jAddr] or \
+               not np.allclose(CovSums[iAddr], All[2][jAddr], \
+                               rtol=1.E-10, atol=1.E-20):
+                raise Exception("Sums differ at", Names[iAddr])
+    print("     <---- Beam sums agree with file of all locations.")
+
+    ##! Complete:
+    print()
+    print("========  BeamLine selective recording: tests complete  ========")
@@ -15,6 +15,7 @@ import Particle        as Prtcl
 import BeamLineElement as BLE
 import BeamLine        as BL
 import Beam            as Bm
+import BeamIO          as bmIO
 
 ##! Start:
 print("========  Beam: tests start  ========")
@@ -71,6 +72,29 @@ print("BeamTest:", BeamTest, \
 BmInst.evaluateBeam()
 BmInst.createReport()
 
+##! Check means and covariance matrices against direct calculation:
+BeamTest += 1
+print()
+print("BeamTest:", BeamTest, \
+      " means and covariance matrices against numpy.")
+Prtcls = Prtcl.Particle.getinstances()[1:]
+nChkd  = 0
+for iAddr in range(len(BmInst.getCovarianceMatrix())):
+    TrcSpc = np.array([iPrtcl.getTraceSpace()[iAddr] for iPrtcl in Prtcls \
+                       if len(iPrtcl.getTraceSpace()) > iAddr])
+    if len(TrcSpc) != BmInst.getnParticles()[iAddr]:
+        raise Exception("Wrong number of particles at", iAddr)
+    if not np.allclose(BmInst.getMeans()[iAddr], np.mean(TrcSpc, axis=0), \
+                       rtol=1.E-9, atol=1.E-15):
+        raise Exception("Means disagree at", iAddr)
+    if not np.allclose(BmInst.getCovarianceMatrix()[iAddr], \
+                       np.cov(TrcSpc, rowvar=False, bias=True), \
+                       rtol=1.E-9, atol=1.E-18):
+        raise Exception("Covariance matrices disagree at", iAddr)
+    nChkd += 1
+print("     <---- Locations checked:", nChkd)
+CovMtrx1000 = [np.array(CovMtrx) for CovMtrx in BmInst.getCovarianceMatrix()]
+
 ##! Check start of calculation beyond source:
 BeamTest += 1
 print()
@@ -88,6 +112,83 @@ print(BmInst)
 BmInst.evaluateBeam()
 BmInst.createReport()
 
+##! Check streaming evaluation:
+BeamTest += 1
+print()
+print("BeamTest:", BeamTest, \
+      " streaming evaluation with bounded reservoir:")
+BmInst.getInputDataFile().close()
+Bm.Beam.cleanBeams()
+BL.BeamLine.cleaninstance()
+BLE.BeamLineElement.cleaninstances()
+Prtcl.Particle.cleanAllParticles()
+Bm.Beam.setSumBufferSize(100)
+Bm.Beam.setReservoirSize(50)
+BmInst = Bm.Beam(inputdatafile, 1000, None, None)
+BmInst.evaluateBeam(False, True)
+print("     ----> Particles in reservoir, instances:", \
+      len(BmInst.getReservoir()), len(Prtcl.Particle.getinstances()))
+if len(BmInst.getReservoir()) != 50 or \
+   len(Prtcl.Particle.getinstances()) != 1:
+    raise Exception("Reservoir not bounded, or in Particle instances!")
+if len(BmInst.getCovarianceMatrix()) != len(CovMtrx1000):
+    raise Exception("Wrong number of covariance matrices!")
+for iAddr in range(len(CovMtrx1000)):
+    if not np.allclose(BmInst.getCovarianceMatrix()[iAddr], \
+                       CovMtrx1000[iAddr], rtol=1.E-9, atol=1.E-18):
+        raise Exception("Streaming covariance matrix disagrees at", iAddr)
+print("     <---- Streaming evaluation agrees.")
+Bm.Beam.setSumBufferSize()
+Bm.Beam.setReservoirSize()
+
+##! Check block read against record-by-record read:
+BeamTest += 1
+print()
+print("BeamTest:", BeamTest, \
+      " block read agrees with record-by-record read:")
+BmInst.getInputDataFile().close()
+Bm.Beam.cleanBeams()
+BL.BeamLine.cleaninstance()
+BLE.BeamLineElement.cleaninstances()
+Prtcl.Particle.cleanAllParticles()
+ibmIOr = bmIO.BeamIO(None, inputdatafile)
+ibmIOr.readBeamDataRecord()
+for iEvt in range(400):
+    ibmIOr.readBeamDataRecord()
+Rcrds = Prtcl.Particle.getinstances()[1:]
+ibmIOr.getdataFILE().close()
+BL.BeamLine.cleaninstance()
+BLE.BeamLineElement.cleaninstances()
+Prtcl.Particle.cleanAllParticles()
+bmIO.BeamIO.BlockSize = 1000
+ibmIOb = bmIO.BeamIO(None, inputdatafile)
+ibmIOb.readBeamDataRecord()
+Location = []
+Rcrd     = []
+for nMax in [7, 100, 292]:
+    Lctn, nRcrd, Rcrdi, EoF = ibmIOb.readBeamDataBlock(nMax)
+    if len(nRcrd) != nMax or EoF:
+        raise Exception("Wrong number of events in block:", len(nRcrd))
+    Location += Lctn
+    Rcrd     += np.split(Rcrdi, np.cumsum(nRcrd)[:-1])
+ibmIOb.readBeamDataRecord()
+Location.append(Prtcl.Particle.getinstances()[-1].getLocation())
+Rcrd.append(np.column_stack( \
+    (Prtcl.Particle.getinstances()[-1].getz(), \
+     Prtcl.Particle.getinstances()[-1].gets(), \
+     Prtcl.Particle.getinstances()[-1].getTraceSpace())))
+bmIO.BeamIO.BlockSize = 1048576
+ibmIOb.getdataFILE().close()
+for iEvt in range(len(Rcrds)):
+    iPrtcl = Rcrds[iEvt]
+    if Location[iEvt] != iPrtcl.getLocation() or \
+       not np.array_equal(Rcrd[iEvt][:,0], iPrtcl.getz()) or \
+       not np.array_equal(Rcrd[iEvt][:,1], iPrtcl.gets()) or \
+       not np.array_equal(Rcrd[iEvt][:,2:], \
+                          np.array(iPrtcl.getTraceSpace())):
+        raise Exception("Block and record read disagree at event", iEvt)
+print("     <---- Events compared:", len(Rcrds))
+
 ##! Complete:
 print()
 print("========  Beam: tests complete  ========")
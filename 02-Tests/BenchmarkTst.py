@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test script for "Benchmark" class
+=================================
+
+  Benchmark.py -- set "relative" path to code
+
+  A short run of every suite on one lattice; the results written to and
+  read back from the json file, and compared with modified baselines.
+
+"""
+
+import os
+import copy
+
+import Benchmark as Bnch
+
+if __name__ == "__main__":
+
+    HOMEPATH = os.getenv('HOMEPATH')
+    filename = os.path.join(HOMEPATH, \
+                    '11-Parameters/LhARABeamLine-Params-Gauss-Gabor.csv')
+    resultfile = os.path.join(HOMEPATH, '99-Scratch/BenchmarkTst.json')
+
+    ##! Start:
+    print("========  Benchmark: tests start  ========")
+
+    ##! Bad input:
+    BenchmarkTest = 1
+    print()
+    print("BenchmarkTest:", BenchmarkTest, " bad input.")
+    for Args in [[["NoSuchLattice.csv"]], [[filename], 0], []]:
+        try:
+            if len(Args) == 0:
+                Bnch.Benchmark([filename]).setSuites(["tracking"])
+            else:
+                Bnch.Benchmark(*Args)
+            raise Exception("Bad input accepted:", Args)
+        except Bnch.badParameter:
+            print("     ----> Bad input", Args, "rejected, OK.")
+    print("     ----> Shipped lattices:", \
+          len(Bnch.Benchmark.getShippedLattices()))
+    for Lattice in Bnch.Benchmark.getShippedLattices():
+        if not os.path.isfile(Lattice):
+            raise Exception("Shipped lattice missing:", Lattice)
+
+    ##! Short run of all suites:
+    BenchmarkTest += 1
+    print()
+    print("BenchmarkTest:", BenchmarkTest, " all suites, one lattice.")
+    iBnch = Bnch.Benchmark([filename], 100, 2000)
+    iBnch.setRepeat(1)
+    iBnch.setParticleIO(200, 5)
+    iBnch.setnTransport(50)
+    print(iBnch)
+    Results = iBnch.run()
+    Name    = "LhARABeamLine-Params-Gauss-Gabor"
+    for Key in ["build:"+Name, "trackBeam:"+Name, "trackBeamBatch:"+Name, \
+                "memory:"+Name, "Transport:GaborLens", \
+                "TransportBatch:Drift", "writeParticle", "readParticle", \
+                "trackBeamWrite", "evaluateBeam", "extrapolateBeam", \
+                "memory:evaluateBeam"]:
+        if not Key in Results or not Results[Key]["Value"] > 0.:
+            raise Exception("Missing or bad result:", Key)
+        print("     ---->", Key, ":", round(Results[Key]["Value"], 3), \
+              Results[Key]["Unit"])
+    print("     <---- Results OK.")
+
+    ##! Write, read and compare:
+    BenchmarkTest += 1
+    print()
+    print("BenchmarkTest:", BenchmarkTest, " write, read and compare.")
+    iBnch.writeResults(resultfile)
+    Baseline, Metadata = Bnch.Benchmark.readResults(resultfile)
+    if Baseline != Results or Metadata["nEvts"] != 100:
+        raise Exception("Results not read back!")
+    if len(iBnch.compare(resultfile)) != 0:
+        raise Exception("Regression against itself!")
+
+    Faster = copy.deepcopy(Baseline)
+    Faster["trackBeam:"+Name]["Value"]    *= 2.
+    Faster["Transport:GaborLens"]["Value"] *= 0.5
+    Faster["evaluateBeam"]["Value"]        *= 1.1
+    Regressions = Bnch.Benchmark.compareResults(Results, Faster)
+    print("     ----> Regressions:", [Rgrsn[0] for Rgrsn in Regressions])
+    if sorted([Rgrsn[0] for Rgrsn in Regressions]) != \
+       ["Transport:GaborLens", "trackBeam:"+Name]:
+        raise Exception("Wrong regressions!")
+    if len(Bnch.Benchmark.compareResults(Results, Faster, 2.)) != 0:
+        raise Exception("Tolerance ignored!")
+    try:
+        Bnch.Benchmark.compareResults(Results, Faster, -1.)
+        raise Exception("Bad tolerance accepted!")
+    except Bnch.badParameter:
+        print("     ----> Bad tolerance rejected, OK.")
+    os.remove(resultfile)
+    print("     <---- Comparison OK.")
+
+    ##! Complete:
+    print()
+    print("========  Benchmark: tests complete  ========")
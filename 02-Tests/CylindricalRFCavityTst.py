@@ -125,6 +125,35 @@ if Norm > 1E-5:
 else:
     print(" <---- Cylindrical RF cavity transport test successful.")
 
+##! Set methods recalculate the derived quantities, matrix and m_rf:
+CylindricalRFCavityTest += 1
+print()
+print("CylindricalRFCavityTest:", CylindricalRFCavityTest, \
+      " change phase, gradient and frequency; compare with new cavity.")
+for Grdnt, Frqncy, Phs in [[20.0, 200., 0.3], [12.5, 200., 0.3], \
+                           [12.5, 180., -0.2]]:
+    RF.getAffineMap()
+    RF.setGradient(Grdnt)
+    RF.setFrequency(Frqncy)
+    RF.setPhase(Phs)
+    RFnew = BLE.CylindricalRFCavity("CavityNew", rStrt, vStrt, drStrt, \
+                                    dvStrt, Grdnt, Frqncy, Phs)
+    Derived = ["getLength", "getRadius", "getTransitTimeFactor", "getV0", \
+               "getalpha", "getwperp", "getcperp", "getsperp", \
+               "getwprll", "getcprll", "getsprll"]
+    for Get in Derived:
+        if getattr(RF, Get)() != getattr(RFnew, Get)():
+            raise Exception("Derived quantity not recalculated:", Get)
+    if not np.array_equal(RF.getTransferMatrix(), \
+                          RFnew.getTransferMatrix()) or \
+       not np.array_equal(RF.getmrf(), RFnew.getmrf()):
+        raise Exception("Transfer matrix or m_rf not recalculated!")
+    if not np.array_equal(RF.Transport(R), RFnew.Transport(R)):
+        raise Exception("Transport differs from new cavity!")
+    print("     ----> Gradient, frequency, phase:", Grdnt, Frqncy, Phs, \
+          "; mrf:", RF.getmrf()[4:])
+print("     <---- Set methods agree with new cavity.")
+
 ##! Complete:
 print()
 print("========  Cylindrical Cylindrical RF cavity: tests complete  ========")
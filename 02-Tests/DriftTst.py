@@ -134,6 +134,24 @@ if Norm > 1E-6:
 else:
     print(" <---- Drift transport test successful.")
 
+##! Check cached transfer matrix and determinant:
+DriftTest += 1
+print()
+print("DriftTest:", DriftTest, \
+      " check transfer matrix cache is refreshed by setLength.")
+TrnsMtrx = Drft.getTransferMatrix()
+if Drft.getTransferMatrix() is not TrnsMtrx:
+    raise Exception(" !!!!----> FAILED: transfer matrix not cached.")
+if abs(Drft.getdetTrnsfrMtrx() - 1.) > 1.E-6:
+    raise Exception(" !!!!----> FAILED: bad determinant.")
+Drft.setLength(0.5)
+if Drft.getTransferMatrix()[0,1] != 0.5 or \
+   Drft.getTransferMatrix()[2,3] != 0.5:
+    raise Exception(" !!!!----> FAILED: transfer matrix not refreshed.")
+if abs(Drft.getdetTrnsfrMtrx() - 1.) > 1.E-6:
+    raise Exception(" !!!!----> FAILED: bad determinant after setLength.")
+print(" <---- Drift transfer matrix cache test successful.")
+
 ##! Complete:
 print()
 print("========  Drift: tests complete  ========")
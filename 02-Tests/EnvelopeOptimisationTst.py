@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test script for "Optimiser" class ... parallel capture-section optimisation
+=================================
+
+  EnvelopeOptimisation.py -- in 31-UserDirectory/01-Code, added to path.
+
+  Checks the rebuilding of the capture section in a worker, the
+  optimisation strategies on a quadratic and a short parallel run.
+
+"""
+
+import os
+import sys
+import numpy as np
+
+import BeamLine as BL
+import Particle as Prtcl
+
+HOMEPATH = os.getenv('HOMEPATH')
+sys.path.append(os.path.join(HOMEPATH, '31-UserDirectory/01-Code'))
+import EnvelopeOptimisation as EO
+
+if __name__ == "__main__":
+
+    filename = os.path.join(HOMEPATH, \
+                    '31-UserDirectory/11-Parameters/LIONBeamLine-Params-Gauss.csv')
+
+    ##! Start:
+    print("========  EnvelopeOptimisation: tests start  ========")
+
+    ##! Worker in this process:
+    OptimiserTest = 1
+    print()
+    print("OptimiserTest:", OptimiserTest, \
+          " worker: base beam line, sample and capture section.")
+    iOpt = EO.Optimiser(filename, None, "RandomSearch", 2, 5000, 2)
+    EO.initOptimiserWorker(iOpt.getWorkerArgs())
+    nElmnt = len(BL.BeamLine.getElement())
+    nRcrd  = len(Prtcl.ReferenceParticle.getinstances().getsIn())
+    print("     ----> Sample, elements, reference-particle records:", \
+          np.shape(EO.Optimiser.getWorkerSample()), nElmnt, nRcrd)
+    if nElmnt != 7 or nRcrd != 6 or \
+       np.shape(EO.Optimiser.getWorkerSample()) != (5000, 6):
+        raise Exception("Bad worker set up!")
+    try:
+        BL.BeamLine.truncateBeamLine(1)
+        raise Exception("truncateBeamLine(1) accepted!")
+    except BL.badParameter:
+        print("     ----> truncateBeamLine(1) rejected, OK.")
+
+    ##! Capture section is rebuilt for each candidate:
+    OptimiserTest += 1
+    print()
+    print("OptimiserTest:", OptimiserTest, " evaluate candidates.")
+    x1    = EO.Optimiser.x0Default + EO.UserAnal.ParamScale
+    Cost0 = EO.evaluateOptimiserWorker(EO.Optimiser.x0Default)
+    Cost1 = EO.evaluateOptimiserWorker(x1)
+    Cost2 = EO.evaluateOptimiserWorker(EO.Optimiser.x0Default)
+    print("     ----> Costs:", Cost0, Cost1, Cost2)
+    if Cost0 != Cost2 or Cost0 == Cost1 or not np.isfinite(Cost0):
+        raise Exception("Costs not reproduced after rebuild!")
+    if len(BL.BeamLine.getElement()) != nElmnt or \
+       len(Prtcl.ReferenceParticle.getinstances().getsIn()) != nRcrd:
+        raise Exception("Beam line grows on rebuild!")
+    if EO.evaluateOptimiserWorker(np.array([0.5, 0.1, 130., 0.3, 130.])) \
+       != np.inf:
+        raise Exception("Too long capture section accepted!")
+    print("     <---- Costs reproduced, infeasible rejected.")
+
+    ##! Strategies on a quadratic:
+    OptimiserTest += 1
+    print()
+    print("OptimiserTest:", OptimiserTest, " strategies on a quadratic.")
+    xMin = EO.Optimiser.x0Default + 3.*EO.UserAnal.ParamScale
+    for Name, Strtgy in EO.Optimiser.Strategies.items():
+        iStr = Strtgy(EO.Optimiser.x0Default, EO.UserAnal.ParamScale, 8, 1)
+        for iGen in range(60):
+            X = iStr.ask()
+            iStr.tell(X, \
+                np.sum(((X - xMin) / EO.UserAnal.ParamScale)**2, axis=1))
+        print("     ---->", Name, ": best cost:", iStr.getBest()[1])
+        if iStr.getBest()[1] > 1.:
+            raise Exception("Strategy failed to converge:", Name)
+
+    ##! Parallel optimisation:
+    OptimiserTest += 1
+    print()
+    print("OptimiserTest:", OptimiserTest, " parallel optimisation.")
+    xBest, CostBest = iOpt.optimise(4)
+    History = [Rcrd[1] for Rcrd in iOpt.getHistory()]
+    print("     ----> Best cost by generation:", History)
+    print("     ----> Best parameters:", xBest)
+    if CostBest > Cost0 or np.any(np.diff(History) > 0.):
+        raise Exception("Optimisation did not improve on start!")
+    print("     <---- Parallel optimisation OK.")
+
+    ##! Complete:
+    print()
+    print("========  EnvelopeOptimisation: tests complete  ========")
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test script for "Envelope" class
+================================
+
+  Beam.py -- set "relative" path to code
+
+  Moment-based envelope transport; checked against the moments of a
+  sample of particles tracked with TransportBatch (apertures and beam
+  pipe opened), with on- and off-crest RF cavities, and, with Gaussian
+  truncation at the apertures, against the tracked beam.
+
+"""
+
+import os
+import time
+import numpy as np
+
+import BeamLine        as BL
+import BeamLineElement as BLE
+import Beam            as Bm
+
+HOMEPATH = os.getenv('HOMEPATH')
+filename = os.path.join(HOMEPATH, \
+                    '11-Parameters/LhARABeamLine-Params-Gauss-Gabor.csv')
+
+##! Start:
+print("========  Envelope: tests start  ========")
+
+##! Source moments:
+EnvelopeTest = 1
+print()
+print("EnvelopeTest:", EnvelopeTest, " source moments from parameters.")
+BmLn = BL.BeamLine(filename)
+iSrc = BLE.BeamLineElement.getinstances()[1]
+Means, CovMtrx = Bm.Envelope.getSourceMoments(iSrc)
+TrcSpc = iSrc.getParticlesFromSource(200000, np.random.default_rng(1357))
+with np.printoptions(linewidth=500,precision=7,suppress=False):
+    print("     ----> Analytic variances:", np.diag(CovMtrx))
+    print("     ---->   Sample variances:", np.var(TrcSpc, axis=0))
+Chk = np.diag(CovMtrx) > 0.
+if not np.allclose(np.diag(CovMtrx)[Chk], np.var(TrcSpc, axis=0)[Chk], \
+                   rtol=0.02):
+    raise Exception("Analytic and sampled source moments disagree!")
+print("     <---- Source moments agree.")
+
+##! Bad input:
+EnvelopeTest += 1
+print()
+print("EnvelopeTest:", EnvelopeTest, " check bad input trapped.")
+try:
+    Bm.Envelope(None, None, None, 0)
+    raise Exception("nDelta = 0 accepted!")
+except Bm.badParameter:
+    print("     ----> nDelta = 0 rejected, OK.")
+
+##! Propagate and compare with tracked sample:
+EnvelopeTest += 1
+print()
+print("EnvelopeTest:", EnvelopeTest, \
+      " propagate and compare with tracked sample (apertures open).")
+iFclty = BLE.Facility.getinstances()
+VCMVr  = iFclty.getVCMVr()
+iFclty.setVCMVr(10.)
+TrcSpc = TrcSpc[:50000]
+CovMtrx0 = np.cov(TrcSpc, rowvar=False, bias=True)
+Means0   = np.mean(TrcSpc, axis=0)
+
+def TrackSample(TrcSpc, Open=True):
+    #.. Bunch tracking with TransportBatch, as BeamLine.trackBunch; with
+    #   Open the apertures are passed without a cut:
+    Tracked = [TrcSpc]
+    for iBLE in BLE.BeamLineElement.getinstances()[2:]:
+        if not (Open and isinstance(iBLE, BLE.Aperture)):
+            TrcSpc, Alive = iBLE.TransportBatch(TrcSpc)
+            TrcSpc = TrcSpc[np.logical_not( \
+                                iBLE.ExpansionParameterFailBatch(TrcSpc))]
+        Tracked.append(TrcSpc)
+    return Tracked
+
+def Compare(Envlp, Tracked):
+    dSxy   = 0.
+    dMeans = 0.
+    for iAddr in range(1, len(Tracked)):
+        Std    = np.std(Tracked[iAddr], axis=0)
+        dSxy   = max(dSxy, np.max(np.abs( \
+                    np.array(Envlp.getsigmaxy()[iAddr]) / Std[[0,2]] - 1.)))
+        dMeans = max(dMeans, np.max(np.abs(Envlp.getMeans()[iAddr] - \
+                    np.mean(Tracked[iAddr], axis=0)) / Std))
+    return dSxy, dMeans
+
+Tracked = TrackSample(TrcSpc)
+print("     ----> Particles at end of tracking:", len(Tracked[-1]), \
+      "of", len(TrcSpc))
+
+Envlps = {}
+dSxy   = {}
+for nDelta in [1, 5]:
+    Strt = time.time()
+    Envlps[nDelta] = Bm.Envelope(CovMtrx0, Means0, None, nDelta)
+    Envlps[nDelta].propagate()
+    print("     ----> nDelta =", nDelta, ": propagated in", \
+          round(1000.*(time.time() - Strt), 1), "ms")
+    dSxy[nDelta], dMeans = Compare(Envlps[nDelta], Tracked)
+    print("         ----> Largest fractional difference in sigma_xy:", \
+          "{:.4f}".format(dSxy[nDelta]), "; in means (/sigma):", \
+          "{:.4f}".format(dMeans))
+if dSxy[5] > 0.05 or dMeans > 0.01:
+    raise Exception("Envelope and tracked sample disagree!")
+if len(Envlps[5].getTwiss()) != len(Envlps[5].getCovarianceMatrix()):
+    raise Exception("Twiss parameters missing!")
+print("     <---- Envelope agrees with tracked sample.")
+
+##! Off-crest cavities; affine map:
+EnvelopeTest += 1
+print()
+print("EnvelopeTest:", EnvelopeTest, " off-crest RF cavities.")
+for iCvty in BLE.CylindricalRFCavity.instances:
+    iCvty.setPhase(0.4)
+    if iCvty.getAffineMap()[1][5] == 0.:
+        raise Exception("Off-crest cavity has no offset!")
+EnvlpOff = Bm.Envelope(CovMtrx0, Means0, None, 5)
+EnvlpOff.propagate()
+TrackedOff = TrackSample(TrcSpc)
+dSxyOff, dMeansOff = Compare(EnvlpOff, TrackedOff)
+#.. Shift of the means by the phase; the same sample is tracked so the
+#   sampling and chromatic errors common to both cancel:
+dEnv = EnvlpOff.getMeans()[-1] - Envlps[5].getMeans()[-1]
+dTrk = np.mean(TrackedOff[-1], axis=0) - np.mean(Tracked[-1], axis=0)
+with np.printoptions(linewidth=500,precision=4):
+    print("     ----> Shift of <z>, <delta> at end, envelope:", dEnv[4:], \
+          "; tracked:", dTrk[4:])
+print("     ----> Largest fractional difference in sigma_xy:", \
+      "{:.4f}".format(dSxyOff), "; in means (/sigma):", \
+      "{:.4f}".format(dMeansOff))
+if dSxyOff > 0.05 or dMeansOff > 0.01 or \
+   np.any(np.abs(dEnv[4:] - dTrk[4:]) > 0.01*np.abs(dTrk[4:])):
+    raise Exception("Envelope and tracked sample disagree off crest!")
+print("     <---- Envelope agrees with tracked sample off crest.")
+
+##! Re-propagate with the stored affine maps:
+EnvelopeTest += 1
+print()
+print("EnvelopeTest:", EnvelopeTest, " re-propagate a new source covariance.")
+CovMtrx1 = CovMtrx0.copy()
+CovMtrx1[0:4,0:4] = 2.*CovMtrx1[0:4,0:4]
+Means1   = Means0.copy()
+Means1[0:4] = Means1[0:4] + 0.1*np.sqrt(np.diag(CovMtrx0)[0:4])
+Envlp1 = Bm.Envelope(CovMtrx1, Means1, None, 5)
+Envlp1.propagate()
+EnvlpOff.repropagate(CovMtrx1, Means1)
+for iAddr in range(len(Envlp1.getCovarianceMatrix())):
+    if not np.allclose(Envlp1.getCovarianceMatrix()[iAddr], \
+                       EnvlpOff.getCovarianceMatrix()[iAddr], \
+                       rtol=1.E-9, atol=1.E-18) or \
+       not np.allclose(Envlp1.getMeans()[iAddr], \
+                       EnvlpOff.getMeans()[iAddr], \
+                       rtol=1.E-9, atol=1.E-15):
+        raise Exception("Re-propagated moments differ at", iAddr)
+print("     ----> sigma_xy at end:", EnvlpOff.getsigmaxy()[-1])
+print("     <---- Re-propagation agrees with propagation.")
+for iCvty in BLE.CylindricalRFCavity.instances:
+    iCvty.setPhase(0.)
+
+##! Gaussian truncation at apertures:
+EnvelopeTest += 1
+print()
+print("EnvelopeTest:", EnvelopeTest, " truncation at apertures.")
+iFclty.setVCMVr(VCMVr)
+Tracked = TrackSample(TrcSpc, False)
+sxyTrk  = np.std(Tracked[-1][:,[0,2]], axis=0)
+print("     ----> Tracked: sigma_xy at end:", sxyTrk, "; transmission:", \
+      len(Tracked[-1]) / len(TrcSpc))
+for Truncate in [False, True]:
+    Envlp = Bm.Envelope(CovMtrx0, Means0, None, 5, len(TrcSpc), Truncate)
+    Envlp.propagate()
+    print("     ----> Truncate:", Truncate, ": sigma_xy at end:", \
+          Envlp.getsigmaxy()[-1], "; transmission:", \
+          Envlp.getnParticles()[-1] / len(TrcSpc))
+if np.any(np.abs(np.array(Envlp.getsigmaxy()[-1]) / sxyTrk - 1.) > 0.2):
+    raise Exception("Truncated envelope far from tracked beam!")
+if not Envlp.getnParticles()[-1] < len(TrcSpc):
+    raise Exception("No losses with truncation!")
+try:
+    Envlp.repropagate(CovMtrx1)
+    raise Exception("Re-propagation with truncation accepted!")
+except Bm.badBeam:
+    print("     ----> Re-propagation with truncation rejected, OK.")
+print("     <---- Truncated envelope close to tracked beam.")
+
+##! RPLCswitch with 3D rotation:
+EnvelopeTest += 1
+print()
+print("EnvelopeTest:", EnvelopeTest, " RPLCswitch with 3D rotation.")
+RPLCswtch = BLE.RPLCswitch("RPLCswitch3D", np.array([0.,0.,0.]), \
+                           np.array([[np.pi/2.,0.],[0.,0.]]), \
+                           np.array([0.,0.,0.]), \
+                           np.array([[0.,0.],[0.,0.]]), True)
+try:
+    Bm.Envelope.getDeltaAffineMaps(RPLCswtch, np.zeros(1))
+    raise Exception("RPLCswitch with 3D rotation accepted!")
+except Bm.unsupportedElement:
+    print("     <---- RPLCswitch with 3D rotation rejected, OK.")
+
+##! Complete:
+print()
+print("========  Envelope: tests complete  ========")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test script for lazy imports and the pandas-free parameter table
+================================================================
+
+  The tracking modules are imported, a beam line is built from its csv
+  file and a bunch tracked in fresh processes; matplotlib, pandas and
+  scipy.optimize must not be loaded unless needed.  The beam line built
+  from the ParamTable must be the one built from the pandas data frame.
+
+"""
+
+import os
+import sys
+import time
+import multiprocessing as mp
+import numpy as np
+
+Heavy = ["matplotlib", "pandas", "scipy.optimize", "scipy.interpolate"]
+
+def BuildAndTrack(filename, Pandas):
+    Strt = time.time()
+    import Simulation
+    import Beam
+    import BeamLine as BL
+    tImprt = time.time() - Strt
+
+    BmLn = BL.BeamLine(filename)
+    BL.BeamLine.setBatchSize(500)
+    BmLn.trackBeamBatch(500)
+    Loaded = [Module for Module in Heavy if Module in sys.modules]
+
+    Same = None
+    if Pandas:
+        Frame = BL.BeamLine.getBeamLineParamPandas()
+        Same  = Frame.equals(BL.BeamLine.csv2pandas(filename)) and \
+                "pandas" in sys.modules
+    return tImprt, Loaded, Same
+
+def Summary(filename, FromFrame):
+    import BeamLine        as BL
+    import BeamLineElement as BLE
+    if FromFrame:
+        BL.BeamLine(BL.BeamLine.csv2pandas(filename))
+    else:
+        BL.BeamLine(filename)
+    Elements = []
+    for iBLE in BL.BeamLine.getElement():
+        Elements.append([iBLE.getName(), type(iBLE).__name__] + \
+                        [repr(Value) for Value in vars(iBLE).values() \
+                         if isinstance(Value, (int, float, str, \
+                                               np.ndarray))])
+    return Elements, BL.BeamLine.getElementRow(), \
+           type(BL.BeamLine.getBeamLineParams()).__name__
+
+def Run(Function, Args):
+    with mp.get_context("spawn").Pool(1) as Pool:
+        return Pool.apply(Function, Args)
+
+if __name__ == "__main__":
+
+    HOMEPATH = os.getenv('HOMEPATH')
+    Lattices = ['LhARABeamLine-Params-Gauss-Gabor.csv', \
+                'LhARABeamLine-Params-LsrDrvn-Solenoid.csv', \
+                'LIONBeamLine-Params-LsrDrvn.csv', \
+                'LhARA-Stage1-BeamDelivery.csv']
+    Lattices = [os.path.join(HOMEPATH, '11-Parameters', Lattice) \
+                for Lattice in Lattices]
+
+    ##! Start:
+    print("========  Lazy imports: tests start  ========")
+
+    ##! Headless tracking:
+    LazyImportTest = 1
+    print()
+    print("LazyImportTest:", LazyImportTest, \
+          " modules loaded by headless tracking.")
+    tImprt, Loaded, Same = Run(BuildAndTrack, (Lattices[0], False))
+    print("     ----> Import time (ms):", round(1000.*tImprt, 1))
+    print("     ----> Modules loaded:", Loaded)
+    if len(Loaded) != 0:
+        raise Exception("Modules loaded but not needed:", Loaded)
+
+    ##! Laser-driven source, data frame on request:
+    LazyImportTest += 1
+    print()
+    print("LazyImportTest:", LazyImportTest, \
+          " laser-driven source; data frame on request.")
+    tImprt, Loaded, Same = Run(BuildAndTrack, (Lattices[2], True))
+    print("     ----> Modules loaded:", Loaded)
+    if "matplotlib" in Loaded or "scipy.optimize" not in Loaded:
+        raise Exception("Wrong modules loaded for laser-driven source!")
+    if not Same:
+        raise Exception("Data frame from getBeamLineParamPandas wrong!")
+    print("     <---- scipy.optimize and pandas loaded only when needed.")
+
+    ##! ParamTable and pandas build the same beam line:
+    LazyImportTest += 1
+    print()
+    print("LazyImportTest:", LazyImportTest, \
+          " beam line from ParamTable and from pandas data frame.")
+    for Lattice in Lattices:
+        Table = Run(Summary, (Lattice, False))
+        Frame = Run(Summary, (Lattice, True))
+        print("     ---->", os.path.basename(Lattice), ": elements:", \
+              len(Table[0]), "; tables:", Table[2], Frame[2])
+        if Table[2] != "ParamTable" or Table[:2] != Frame[:2]:
+            raise Exception("Beam lines differ:", Lattice)
+    print("     <---- Same beam lines.")
+
+    ##! Complete:
+    print()
+    print("========  Lazy imports: tests complete  ========")
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test script for "ParameterScan" class
+=====================================
+
+  ParameterScan.py -- set "relative" path to code
+
+  Each point of a scan restarts from the first modified element; the
+  result must be identical to tracking the same source sample through
+  the whole modified beam line.
+
+"""
+
+import os
+import numpy as np
+import pandas as pnds
+
+import BeamLine      as BL
+import ParameterScan as PScn
+
+HOMEPATH = os.getenv('HOMEPATH')
+filename = os.path.join(HOMEPATH, \
+                    '11-Parameters/LhARABeamLine-Params-Gauss-Gabor.csv')
+tablefile = os.path.join(HOMEPATH, '99-Scratch/ParameterScanTst.csv')
+
+##! Start:
+print("========  ParameterScan: tests start  ========")
+
+##! Keys and bad input:
+ParameterScanTest = 1
+print()
+print("ParameterScanTest:", ParameterScanTest, " keys and bad input.")
+iScn = PScn.ParameterScan(filename, 5000, 13579)
+Row  = iScn.getRow("Arc:Fquad:kq:2")
+print("     ----> Row of Arc:Fquad:kq:2:", Row)
+if iScn.getBeamLineParamPandas().loc[Row, "Parameter"] != "kq":
+    raise Exception("Wrong row for key!")
+for Key in ["Arc:Fquad:kq:9", "Arc:Fquad", 1000]:
+    try:
+        iScn.getRow(Key)
+        raise Exception("Bad key accepted:", Key)
+    except PScn.badParameter:
+        print("     ----> Bad key", Key, "rejected, OK.")
+
+##! Element rows recorded by BeamLine:
+ParameterScanTest += 1
+print()
+print("ParameterScanTest:", ParameterScanTest, \
+      " beam line built from data frame records element rows.")
+iBL = PScn.ParameterScan.buildBeamLine(iScn.getBeamLineParamPandas())
+print("     ----> Elements, rows:", len(BL.BeamLine.getElement()), \
+      len(BL.BeamLine.getElementRow()))
+if len(BL.BeamLine.getElement()) != len(BL.BeamLine.getElementRow()) or \
+   BL.BeamLine.getElementRow() != sorted(BL.BeamLine.getElementRow()):
+    raise Exception("Element rows not recorded!")
+
+##! Grid scan against full tracking:
+ParameterScanTest += 1
+print()
+print("ParameterScanTest:", ParameterScanTest, \
+      " grid scan compared with full tracking.")
+Grid = {"Arc:Fquad:kq:2": [28., 34.], "Arc:Dquad:kq:4": [30., 31.]}
+iScn.setGrid(Grid)
+Table = iScn.run()
+with pnds.option_context("display.width", 250, "display.max_columns", 10):
+    print(Table[["Point", "Arc:Fquad:kq:2", "Arc:Dquad:kq:4", \
+                 "Restart", "n", "rms_x", "rms_y"]])
+if len(Table) != 4 or \
+   set(Table["Restart"]) != {"LhARA:1:Arc:Fquad:2"}:
+    raise Exception("Wrong table!")
+
+for iPnt, Point in enumerate(iScn.getPoints()):
+    Pndas = iScn.getBeamLineParamPandas().copy()
+    for Key, Value in Point.items():
+        Pndas.at[iScn.getRow(Key), "Value"] = str(Value)
+    PScn.ParameterScan.buildBeamLine(Pndas)
+    iScn.trackFromSource()
+    Smmry = PScn.ParameterScan.getSummary(BL.BeamLine.getBatchTrcSpc()[-1], \
+                                          iScn.getnParticles())
+    if Smmry["n"] != Table["n"][iPnt] or \
+       not np.isclose(Smmry["rms_x"], Table["rms_x"][iPnt], rtol=1.E-12) or \
+       not np.isclose(Smmry["rms_y"], Table["rms_y"][iPnt], rtol=1.E-12):
+        raise Exception("Scan and full tracking disagree at point", iPnt)
+print("     <---- Scan agrees with full tracking.")
+
+##! List of points, source modified, table written:
+ParameterScanTest += 1
+print()
+print("ParameterScanTest:", ParameterScanTest, \
+      " list of points, source modified, table written.")
+Location = "LhARA:1:Matching:Drift:11"
+iScn = PScn.ParameterScan(filename, 5000, 13579, Location)
+iScn.setPoints([{"Source:Source:SigmaX": 2.E-6}, \
+                {"Source:Source:SigmaX": 4.E-6, \
+                 "Matching:Gabor lens:Strength:2": 0.1}])
+Table = iScn.run()
+iScn.writeTable(tablefile)
+Table = pnds.read_csv(tablefile)
+print("     ----> Restart:", list(Table["Restart"]))
+print("     ----> rms x at", Location, ":", list(Table["rms_x"]))
+if list(Table["Restart"]) != ["LhARA:1:Source:Source"]*2 or \
+   Table["rms_x"][0] == Table["rms_x"][1]:
+    raise Exception("Source scan wrong!")
+if len(BL.BeamLine.getElement()) != len(BL.BeamLine.getElementRow()):
+    raise Exception("Base beam line not restored!")
+print("     <---- List of points OK.")
+
+##! Complete:
+print()
+print("========  ParameterScan: tests complete  ========")
@@ -113,6 +113,86 @@ Prtcl.Particle.setDebug(True)
 print(uKInst)
 Prtcl.Particle.setDebug(False)
 
+##! Compact particle:
+ParticleTest = 9
+print()
+print("ParticleTest:", ParticleTest, " check compact particle.")
+Prtcl.Particle.cleanParticles()
+BLI.setSrcTrcSpc(np.array([0.0001, -0.0001, 0.0002, 0.0001, 0., 20.]))
+OK = BLI.trackBeam(1)
+iPrtcl = Prtcl.Particle.getinstances()[-1]
+nInst  = len(Prtcl.Particle.getinstances())
+
+iCmpct = Prtcl.CompactParticle.fromParticle(iPrtcl, False)
+print(iCmpct)
+if len(Prtcl.Particle.getinstances()) != nInst:
+    raise Exception("Unregistered compact particle added to instances!")
+if iCmpct.getLocation() != iPrtcl.getLocation() or \
+   not np.array_equal(iCmpct.getz(), iPrtcl.getz()) or \
+   not np.array_equal(iCmpct.gets(), iPrtcl.gets()) or \
+   not np.array_equal(iCmpct.getTraceSpace(), \
+                      np.array(iPrtcl.getTraceSpace())):
+    raise Exception("Compact particle record differs from particle!")
+print("     ----> Compact record matches particle at", \
+      len(iCmpct.getLocation()), "locations")
+
+#.. Storage grows, and unknown locations are kept by name:
+iCmpct = Prtcl.CompactParticle(1)
+iCmpct.recordParticle("Place 1", 1.1, 1.2, TrcSpc)
+iCmpct.recordParticle(iPrtcl.getLocation()[0], 2.1, 2.2, TrcSpc)
+iCmpct.recordParticle("Place 1", 3.1, 3.2, TrcSpc)
+if iCmpct.getLocation() != ["Place 1", iPrtcl.getLocation()[0], "Place 1"]:
+    raise Exception("Compact particle locations wrong!")
+if len(Prtcl.Particle.getinstances()) != nInst + 1:
+    raise Exception("Registered compact particle not in instances!")
+iBack = iCmpct.toParticle()
+if iBack.getLocation() != iCmpct.getLocation() or \
+   not np.array_equal(np.array(iBack.getTraceSpace()), \
+                      iCmpct.getTraceSpace()):
+    raise Exception("Particle from compact particle differs!")
+try:
+    iCmpct.__dict__
+    raise Exception("Compact particle has an instance __dict__!")
+except AttributeError:
+    print("     ----> No instance __dict__, OK.")
+print("     <---- Compact particle OK.")
+
+##! Batched trace-space <-> phase-space conversion:
+ParticleTest = 10
+print()
+print("ParticleTest:", ParticleTest, \
+      " check batched phase-space conversion and lazy lab frame.")
+TrcSpcs = np.array(iPrtcl.getTraceSpace())
+TrcSpcs = np.vstack([TrcSpcs, [0., 0.5, 0., 0.5, 0., -0.99]])
+PhsSpcs, Valid = Prtcl.Particle.RPLCTraceSpace2PhaseSpaceBatch(TrcSpcs)
+print("     ----> Valid:", Valid)
+if Valid[-1] or not np.all(Valid[:-1]):
+    raise Exception("Unphysical pz not flagged correctly!")
+for iRcrd in range(len(TrcSpcs)-1):
+    PhsSpc = Prtcl.Particle.RPLCTraceSpace2PhaseSpace(TrcSpcs[iRcrd])
+    if not np.allclose(PhsSpcs[iRcrd], PhsSpc.reshape(6), \
+                       rtol=1.E-12, atol=1.E-15):
+        raise Exception("Batch and scalar phase space disagree!")
+    TrcSpc = Prtcl.Particle.RPLCPhaseSpace2TraceSpace(PhsSpc.reshape(6))
+    if not np.allclose(Prtcl.Particle.RPLCPhaseSpace2TraceSpaceBatch( \
+                                   PhsSpcs[iRcrd:iRcrd+1])[0], TrcSpc, \
+                       rtol=1.E-12, atol=1.E-15):
+        raise Exception("Batch and scalar trace space disagree!")
+if not np.allclose(Prtcl.Particle.RPLCPhaseSpace2TraceSpaceBatch( \
+                       PhsSpcs[Valid]), TrcSpcs[Valid], atol=1.E-9):
+    raise Exception("Trace space does not survive round trip!")
+print("     ----> Batch and scalar conversions agree.")
+
+iPrtcl.resetPhaseSpace()
+Prtcl.Particle.fillPhaseSpaceAll()
+if len(iPrtcl._LabPhsSpc) != 0:
+    raise Exception("Lab phase space filled before it was requested!")
+LabPhsSpc = iPrtcl.getLabPhaseSpace()
+if len(LabPhsSpc) != len(iPrtcl.getTraceSpace()):
+    raise Exception("Lab phase space not filled on request!")
+print("     ----> Lab phase space at source:", LabPhsSpc[0])
+print("     <---- Batched conversion OK.")
+
 """
 Legacy; wont work as delete instances after generating ... needs to check
         fillPhaseSpaceAll
@@ -190,6 +190,30 @@ if Norm > 1E-6:
 else:
     print(" <---- RPLCswitch transport test successful.")
     
+##! 3D rotation: batched phase-space conversion:
+RPLCswitchTest += 1
+print()
+print("RPLCswitchTest:", RPLCswitchTest, " test 3D-rotation switch.")
+vStrt3D = np.array([[np.pi/2.,0.3],[0.1,0.]])
+RPLCswtch3D = BLE.RPLCswitch("RPLCswitch3D", rStrt, vStrt3D, drStrt, dvStrt, \
+                             True)
+Rs = np.array([[ 0.005,  0.01, -0.003, -0.02,  0.1,  0.05], \
+               [-0.001,  0.02,  0.002,  0.01, -0.2, -0.01], \
+               [ 0.,     0.,    0.,     0.,    0.,   0.  ]])
+RprimeBatch, Alive = RPLCswtch3D.TransportBatch(Rs)
+for iR in range(len(Rs)):
+    PhsSpc = Prtcl.Particle.RPLCTraceSpace2PhaseSpace(Rs[iR]).reshape(6)
+    RprimeTest = Prtcl.Particle.RPLCPhaseSpace2TraceSpace( \
+                        RPLCswtch3D.getTransferMatrix().dot(PhsSpc))
+    Rprime = RPLCswtch3D.Transport(Rs[iR])
+    with np.printoptions(linewidth=500,precision=7,suppress=True):
+        print("     ----> Rprime:", Rprime)
+    if not np.allclose(Rprime, RprimeTest, rtol=1.E-9, atol=1.E-12) or \
+       not np.allclose(RprimeBatch[iR], RprimeTest, rtol=1.E-9, atol=1.E-12):
+        raise Exception( \
+            " !!!!----> FAILED: 3D-rotation transport result not as expected.")
+print(" <---- RPLCswitch 3D-rotation transport test successful.")
+    
 
 ##! Complete:
 print()
@@ -13,6 +13,8 @@ import sys
 
 import BeamLine as BL
 import Particle as Prtcl
+import numpy    as np
+import math     as mth
 
 ##! Start:
 print("========  ReferenceParticle: tests start  ========")
@@ -75,6 +77,27 @@ BLI  = BL.BeamLine(filename)
 print(BLI)
 print(Prtcl.ReferenceParticle.getinstances())
 
+##! Check kinematics table and element index:
+ReferenceParticleTest += 1
+print()
+print("ReferenceParticleTest:", ReferenceParticleTest, \
+      " check kinematics table against PrIn and element indices.")
+iRefPrtcl    = Prtcl.ReferenceParticle.getinstances()
+KinematicsIn = iRefPrtcl.getKinematicsIn()
+if len(KinematicsIn) != len(iRefPrtcl.getPrIn()):
+    raise Exception(" !!!!----> FAILED: kinematics table wrong length.")
+for iLoc in range(len(KinematicsIn)):
+    PrIn = iRefPrtcl.getPrIn()[iLoc]
+    p0   = mth.sqrt(np.dot(PrIn[:3], PrIn[:3]))
+    if abs(KinematicsIn[iLoc][0] - p0) > 1.E-9 or \
+       abs(KinematicsIn[iLoc][1] - PrIn[3]) > 1.E-9 or \
+       abs(KinematicsIn[iLoc][2] - p0/PrIn[3]) > 1.E-12:
+        raise Exception(" !!!!----> FAILED: kinematics table entry bad.")
+for iBLE in BL.BeamLine.getElement():
+    if BL.BeamLine.getElement()[iBLE.getiLoc()] is not iBLE:
+        raise Exception(" !!!!----> FAILED: bad element index.")
+print(" <---- Kinematics table and element index test successful.")
+
 
 ##! Complete:
 print()
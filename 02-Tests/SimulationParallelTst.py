@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test script for "Simulation" class ... parallel (multiprocess) RunSim
+==================================
+
+  Simulation.py -- set "relative" path to code
+
+  Runs the simulation with several processes, reads the merged BeamIO
+  file back (in a fresh process, so that the beam line is rebuilt from
+  the file) and checks the event statistics against a serial run.
+
+"""
+
+import os
+import math
+import random as rnd
+import multiprocessing as mp
+import numpy as np
+
+import BeamIO     as BmIO
+import Particle   as Prtcl
+import Simulation as Simu
+
+def Statistics(Particles):
+    Src   = np.array([iPrtcl.getTraceSpace()[0] for iPrtcl in Particles])
+    LstLc = [iPrtcl.getLocation()[-1] for iPrtcl in Particles]
+    Lst   = max(set(LstLc), key=LstLc.count)
+    nLst  = LstLc.count(Lst)
+    return len(Particles), Src.mean(axis=0), Src.std(axis=0), Lst, nLst
+
+def ReadBack(datafiledir, datafilename):
+    iBmIOr = BmIO.BeamIO(datafiledir, datafilename)
+    EoF = False
+    while not EoF:
+        EoF = iBmIOr.readBeamDataRecord()
+    return Statistics(Prtcl.Particle.getinstances()[1:])
+
+if __name__ == "__main__":
+
+    HOMEPATH = os.getenv('HOMEPATH')
+    filename = os.path.join(HOMEPATH, \
+                    '11-Parameters/LhARABeamLine-Params-Gauss-Gabor.csv')
+    datafiledir  = os.path.join(HOMEPATH, '99-Scratch')
+    datafilename = "SimulationParallelTst.dat"
+
+    NEvt = 2000
+    nPrc = 3
+
+    ##! Start:
+    print("========  Simulation parallel: start  ========")
+
+    ##! Create simulation:
+    SimulationParallelTest = 1
+    print()
+    print("SimulationParallelTest:", SimulationParallelTest, \
+          " create simulation.")
+    Smltn = Simu.Simulation(NEvt, filename, datafiledir, datafilename)
+    try:
+        Smltn.setnProcesses(0)
+        raise Exception("setnProcesses accepted 0 processes!")
+    except Simu.badParameter:
+        print("     ----> setnProcesses(0) rejected, OK.")
+    Smltn.setnProcesses(nPrc)
+    print("     ----> Number of processes:", Smltn.getnProcesses())
+
+    ##! Parallel run:
+    SimulationParallelTest = 2
+    print()
+    print("SimulationParallelTest:", SimulationParallelTest, \
+          " run", NEvt, "events in", nPrc, "processes.")
+    Smltn.RunSim()
+
+    ##! Read back in a fresh process:
+    SimulationParallelTest = 3
+    print()
+    print("SimulationParallelTest:", SimulationParallelTest, \
+          " read merged file back.")
+    with mp.get_context("spawn").Pool(1) as Pool:
+        Prll = Pool.apply(ReadBack, (datafiledir, datafilename))
+    print("     ----> Events read:", Prll[0])
+    print("     ----> Last location, events reaching it:", Prll[3], Prll[4])
+    if Prll[0] != NEvt:
+        raise Exception("Wrong number of events in merged file!")
+
+    ##! Serial run and comparison:
+    SimulationParallelTest = 4
+    print()
+    print("SimulationParallelTest:", SimulationParallelTest, \
+          " compare with serial run.")
+    Simu.Simulation.setProgressPrint(False)
+    rnd.seed(54321)
+    Smltn.getFacility().trackBeam(NEvt)
+    Srl = Statistics(Prtcl.Particle.getinstances()[1:])
+    print("     ----> Serial last location, events reaching it:", \
+          Srl[3], Srl[4])
+    with np.printoptions(linewidth=500, precision=7, suppress=True):
+        print("     ----> Source means, parallel:", Prll[1])
+        print("     ----> Source means,   serial:", Srl[1])
+
+    Err = np.sqrt((Prll[2]**2 + Srl[2]**2) / NEvt)
+    Pll = np.abs(Prll[1] - Srl[1])
+    Chk = Err > 0.
+    if np.any(Pll[Chk] > 5.*Err[Chk]):
+        raise Exception("Source means of parallel and serial runs disagree!")
+    if not np.allclose(Prll[2], Srl[2], rtol=0.15, atol=1.E-12):
+        raise Exception("Source widths of parallel and serial runs disagree!")
+
+    if Prll[3] != Srl[3]:
+        raise Exception("Last location of parallel and serial runs differ!")
+    fPrll = Prll[4] / NEvt
+    fSrl  = Srl[4] / NEvt
+    fErr  = math.sqrt((fPrll*(1.-fPrll) + fSrl*(1.-fSrl)) / NEvt)
+    if abs(fPrll - fSrl) > 5.*fErr + 1.E-9:
+        raise Exception("Transmission of parallel and serial runs disagree!")
+    print("     <---- Parallel and serial statistics agree.")
+
+    ##! Parallel run writing the columnar format:
+    SimulationParallelTest = 5
+    print()
+    print("SimulationParallelTest:", SimulationParallelTest, \
+          " parallel run, columnar data file.")
+    Prtcl.Particle.cleanParticles()
+    Smltn.setColumnar(True)
+    Smltn.setiBmIOw(BmIO.BeamIO(datafiledir, \
+                                "SimulationParallelTst-v3.dat", \
+                                True, False, True))
+    Smltn.RunSim()
+    with mp.get_context("spawn").Pool(1) as Pool:
+        Clmn = Pool.apply(ReadBack, \
+                          (datafiledir, "SimulationParallelTst-v3.dat"))
+    print("     ----> Events read:", Clmn[0])
+    print("     ----> Last location, events reaching it:", Clmn[3], Clmn[4])
+    if Clmn[0] != NEvt:
+        raise Exception("Wrong number of events in merged columnar file!")
+    if Clmn[3] != Srl[3]:
+        raise Exception("Last location of columnar and serial runs differ!")
+
+    ##! Complete:
+    print()
+    print("========  Simulation parallel: complete  ========")
@@ -122,6 +122,22 @@ if Norm > 1E-6:
 else:
     print(" <---- Solenoid transport test successful.")
 
+##! Check batch transfer matrices:
+SolenoidTest += 1
+print()
+print("SolenoidTest:", SolenoidTest, \
+      " compare calcTransferMatrixBatch with setTransferMatrix.")
+delta    = np.array([-0.01, -0.001, 0., 0.001, 0.01])
+TrnsMtrx = Sol.calcTransferMatrixBatch(delta)
+for iPrtcl in range(len(delta)):
+    R = np.array([0., 0., 0., 0., 0., delta[iPrtcl]])
+    Sol.setTransferMatrix(R)
+    if not np.allclose(TrnsMtrx[iPrtcl], Sol.getTransferMatrix(), \
+                       rtol=1.E-12, atol=1.E-14):
+        raise Exception(" !!!!----> FAILED:", \
+                        "batch transfer matrix not as expected.")
+print(" <---- Solenoid batch transfer matrix test successful.")
+
 ##! Complete:
 print()
 print("========  Solenoid: tests complete  ========")
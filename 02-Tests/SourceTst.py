@@ -469,6 +469,35 @@ plt.savefig('99-Scratch/SourceTst_plot30.pdf')
 plt.close()
 
 
+##! Next: vectorised generation compared with particle-by-particle:
+SourceTest += 1
+print()
+print("SourceTest:", SourceTest, \
+      " compare getParticlesFromSource with getParticleFromSource.")
+NPrtcl = 20000
+Rng    = np.random.default_rng(13579)
+for iSrc in [Src, Src1, Src2]:
+    Scl = np.array([iSrc.getParticleFromSource() for i in range(NPrtcl)])
+    Btch = iSrc.getParticlesFromSource(NPrtcl, Rng)
+    if np.shape(Btch) != (NPrtcl, 6):
+        raise Exception("getParticlesFromSource: bad shape!")
+    Err = np.sqrt((np.var(Scl, axis=0) + np.var(Btch, axis=0)) / NPrtcl)
+    Dff = np.abs(np.mean(Scl, axis=0) - np.mean(Btch, axis=0))
+    with np.printoptions(linewidth=500, precision=7, suppress=False):
+        print("     ---->", iSrc.getName(), "mode", iSrc.getMode())
+        print("         ----> means, scalar:", np.mean(Scl, axis=0))
+        print("         ---->  means, batch:", np.mean(Btch, axis=0))
+        print("         ---->   std, scalar:", np.std(Scl, axis=0))
+        print("         ---->    std, batch:", np.std(Btch, axis=0))
+    Chk = Err > 0.
+    if np.any(Dff[Chk] > 5.*Err[Chk]):
+        raise Exception("Batch and scalar source means disagree!")
+    if not np.allclose(np.std(Scl, axis=0), np.std(Btch, axis=0), \
+                       rtol=0.05, atol=1.E-15):
+        raise Exception("Batch and scalar source widths disagree!")
+print("     <---- Batch and scalar source distributions agree.")
+
+
 ##! Complete:
 print()
 print("========  Source: tests complete  ========")
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Test script for "TrackingKernels" class
+=======================================
+
+  TrackingKernels.py -- set "relative" path to code
+
+  The kernels are compared with the NumPy implementation in
+  BeamLineElement on the same bunches: element by element, for the
+  source sampling and, if numba is installed, for the whole beam line
+  with the backend switched.  Without numba the kernels run as plain
+  Python loops on a small bunch.  Each beam line is built in a fresh
+  process.
+
+"""
+
+import os
+import time
+import multiprocessing as mp
+import numpy as np
+
+import BeamLine        as BL
+import BeamLineElement as BLE
+import Benchmark       as Bnch
+import Simulation      as Simu
+import TrackingKernels as TrkKrnl
+
+def MaxDeviation(A, B):
+    if np.shape(A) != np.shape(B):
+        return np.inf
+    if np.size(A) == 0:
+        return 0.
+    return float(np.max(np.abs(A - B) / (1.E-9 + np.abs(A))))
+
+def useKernels(JIT):
+    if JIT:
+        TrkKrnl.TrackingKernels.setBackend("numba")
+    else:
+        TrkKrnl.TrackingKernels.setBackend("numpy")
+
+def CompareLattice(Lattice, NEvt):
+    Simu.Simulation.setProgressPrint(False)
+    JIT = TrkKrnl.TrackingKernels.isNumbaAvailable()
+    TrkKrnl.TrackingKernels.setBackend("numpy")
+    BmLn   = BL.BeamLine(Lattice)
+    Sample = Bnch.getSourceSample(NEvt, 13579)
+    Kernel = TrkKrnl.TrackingKernels.getKernel
+
+    #.. Element by element; the kernels on the bunch entering the element:
+    MaxDev = 0.
+    nDiff  = 0
+    Types  = set()
+    TrcSpc = Sample
+    for iBLE in BL.BeamLine.getElement()[2:]:
+        Types.add(type(iBLE).__name__)
+        b0   = iBLE.getRefKinematics()[2]
+        zCut = 2.5 if isinstance(iBLE, BLE.RPLCswitch) else 5.
+        useKernels(JIT)
+        Fail    = Kernel("acceptanceFail")(TrcSpc, \
+                        BLE.Facility.getinstances().getVCMVr(), b0, zCut)
+        ExpFail = Kernel("expansionParameterFail")(TrcSpc, b0)
+        Alive   = np.logical_not(Fail)
+        if hasattr(iBLE, "TransportKernelBatch"):
+            Types.add(type(iBLE).__name__ + ":kernel")
+            Rprime = iBLE.TransportKernelBatch(TrcSpc[Alive])
+        TrkKrnl.TrackingKernels.setBackend("numpy")
+
+        if not np.array_equal(Fail, iBLE.AcceptanceFailBatch(TrcSpc)) or \
+           not np.array_equal(ExpFail, \
+                              iBLE.ExpansionParameterFailBatch(TrcSpc)):
+            nDiff += 1
+        if hasattr(iBLE, "TransportKernelBatch"):
+            MaxDev = max(MaxDev, MaxDeviation( \
+                iBLE.TransportChromaticBatch(TrcSpc[Alive]), Rprime))
+        TrcSpc, Alive = iBLE.TransportBatch(TrcSpc)
+        TrcSpc = TrcSpc[np.logical_not( \
+                        iBLE.ExpansionParameterFailBatch(TrcSpc))]
+
+    #.. Whole beam line, backend switched:
+    Times = [None, None]
+    Ends  = [None, None]
+    if JIT:
+        BL.BeamLine.setRecordLocations([])
+        for iBknd, Backend in enumerate(["numpy", "numba"]):
+            TrkKrnl.TrackingKernels.setBackend(Backend)
+            BmLn.trackBeamBatch(NEvt, None, Sample)
+            Strt = time.perf_counter()
+            BmLn.trackBeamBatch(NEvt, None, Sample)
+            Times[iBknd] = time.perf_counter() - Strt
+            Ends[iBknd]  = [BL.BeamLine.getBatchIndex()[-1], \
+                            BL.BeamLine.getBatchTrcSpc()[-1]]
+        if not np.array_equal(Ends[0][0], Ends[1][0]):
+            nDiff += 1
+        MaxDev = max(MaxDev, MaxDeviation(Ends[0][1], Ends[1][1]))
+        Ends = [len(Ends[0][0]), len(Ends[1][0])]
+
+    #.. Laser-driven source:
+    SrcDev = None
+    iSrc   = BL.BeamLine.getElement()[1]
+    if iSrc.getMode() == 0:
+        useKernels(JIT)
+        Jit = iSrc.getLaserDrivenParticlesKernel(NEvt, \
+                                                 np.random.default_rng(97))
+        TrkKrnl.TrackingKernels.setBackend("numpy")
+        Ref = iSrc.getParticles(NEvt, np.random.default_rng(97))
+        SrcDev = max([MaxDeviation(Ref[iRef], Jit[iJit]) for iRef, iJit \
+                      in zip([2, 0, 1, 5, 6], range(5))])
+
+    return sorted(Types), nDiff, MaxDev, SrcDev, Times, Ends
+
+if __name__ == "__main__":
+
+    HOMEPATH = os.getenv('HOMEPATH')
+
+    ##! Start:
+    print("========  TrackingKernels: tests start  ========")
+
+    ##! Backend selection:
+    TrackingKernelsTest = 1
+    print()
+    print("TrackingKernelsTest:", TrackingKernelsTest, " backend selection.")
+    JIT = TrkKrnl.TrackingKernels.isNumbaAvailable()
+    print("     ----> numba available:", JIT, "; backend in use:", \
+          TrkKrnl.TrackingKernels.getActiveBackend())
+    if TrkKrnl.TrackingKernels.getActiveBackend() != \
+       ("numba" if JIT else "numpy"):
+        raise Exception("Wrong backend selected automatically!")
+    for Bad in ["cuda", None]:
+        try:
+            TrkKrnl.TrackingKernels.setBackend(Bad)
+            raise Exception("Bad backend accepted:", Bad)
+        except TrkKrnl.badParameter:
+            print("     ----> Bad backend", Bad, "rejected, OK.")
+    try:
+        TrkKrnl.TrackingKernels.getKernel("transportDrift")
+        raise Exception("Unknown kernel accepted!")
+    except TrkKrnl.badParameter:
+        print("     ----> Unknown kernel rejected, OK.")
+    if not JIT:
+        try:
+            TrkKrnl.TrackingKernels.setBackend("numba")
+            raise Exception("numba backend accepted without numba!")
+        except TrkKrnl.noNumba:
+            print("     ----> numba backend refused, OK.")
+    TrkKrnl.TrackingKernels.setBackend("numpy")
+    if TrkKrnl.TrackingKernels.getJIT():
+        raise Exception("NumPy backend not selected!")
+    TrkKrnl.TrackingKernels.setBackend()
+
+    ##! Kernels and NumPy on the shipped beam lines:
+    TrackingKernelsTest += 1
+    print()
+    print("TrackingKernelsTest:", TrackingKernelsTest, \
+          " kernels against NumPy.")
+    NEvt  = 20000 if JIT else 500
+    Types = set()
+    ctx   = mp.get_context("spawn")
+    for Lattice in Bnch.Benchmark.getShippedLattices():
+        with ctx.Pool(1) as Pool:
+            LatTypes, nDiff, MaxDev, SrcDev, Times, Ends = \
+                Pool.apply(CompareLattice, (Lattice, NEvt))
+        Types |= set(LatTypes)
+        print("     ---->", os.path.basename(Lattice), \
+              ": max. relative deviation:", "{:.1e}".format(MaxDev), \
+              "; source:", SrcDev, "; survivors:", Ends)
+        if JIT:
+            print("         ----> trackBeamBatch, numpy, numba (s):", \
+                  round(Times[0], 3), round(Times[1], 3))
+        if nDiff != 0 or MaxDev > 1.E-9 or \
+           (SrcDev != None and SrcDev > 1.E-12):
+            raise Exception("Kernels and NumPy differ!")
+    for Type in ["FocusQuadrupole", "DefocusQuadrupole", "Solenoid", \
+                 "GaborLens"]:
+        if not Type + ":kernel" in Types:
+            raise Exception("Kernel not exercised:", Type)
+    print("     <---- Kernels agree with NumPy.")
+
+    ##! Complete:
+    print()
+    print("========  TrackingKernels: tests complete  ========")
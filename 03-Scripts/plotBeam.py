@@ -14,7 +14,7 @@ def main(argv):
     """
        Parse input arguments:
     """
-    opts, args = getopt.getopt(argv,"hdi:o:b:n:l:",\
+    opts, args = getopt.getopt(argv,"hdsi:o:b:n:l:",\
                                ["ifile=","nEvts", "ofile=","bfile", "iLoc"])
 
     beamlinefile = None
@@ -22,16 +22,19 @@ def main(argv):
     outputfile   = None
     strtloc      = None
     Debug        = False
+    Streaming    = False
     nEvts        = None
     for opt, arg in opts:
         if opt == '-h':
             print ( \
                     'plotBeam.py '  + \
                     ' -i <inputfile> -n <nEvts> -o <outputfile>' + \
-                    ' -l <startlocation> [-b <beamlinefile>]')
+                    ' -l <startlocation> [-b <beamlinefile>] [-s]')
             sys.exit()
         if opt == '-d':
             Debug = True
+        elif opt == '-s':
+            Streaming = True
         elif opt in ("-b", "--bfile"):
             beamlinefile = arg
         elif opt in ("-i", "--ifile"):
@@ -47,7 +50,7 @@ def main(argv):
         print ( \
                 'plotBeam.py '  + \
                 ' -i <inputfile> -n <nEvts> -o <outputfile>' + \
-                ' -l <startlocation> [-b <beamlinefile>]')
+                ' -l <startlocation> [-b <beamlinefile>] [-s]')
         sys.exit()
 
     print(" plotBEAM: start")
@@ -79,7 +82,7 @@ def main(argv):
 
     print("     ----> Evaluate beam:")
 
-    iBm.evaluateBeam()
+    iBm.evaluateBeam(False, Streaming)
 
     print("     <---- Beam evaluated.")
         
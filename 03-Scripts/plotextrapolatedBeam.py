@@ -14,7 +14,7 @@ def main(argv):
     """
        Parse input arguments:
     """
-    opts, args = getopt.getopt(argv,"hdi:o:b:n:l:",\
+    opts, args = getopt.getopt(argv,"hdsi:o:b:n:l:",\
                                ["ifile=","nEvts", "ofile=","bfile", "iLoc"])
 
     beamlinefile = None
@@ -22,16 +22,19 @@ def main(argv):
     outputfile   = None
     strtloc      = None
     Debug        = False
+    Streaming    = False
     nEvts        = None
     for opt, arg in opts:
         if opt == '-h':
             print ( \
                     'plotextrapolateBeam.py '  + \
                     ' -i <inputfile> -n <nEvts> -o <outputfile>' + \
-                    ' -l <startlocation> [-b <beamlinefile>]')
+                    ' -l <startlocation> [-b <beamlinefile>] [-s]')
             sys.exit()
         if opt == '-d':
             Debug = True
+        elif opt == '-s':
+            Streaming = True
         elif opt in ("-b", "--bfile"):
             beamlinefile = arg
         elif opt in ("-i", "--ifile"):
@@ -47,7 +50,7 @@ def main(argv):
         print ( \
                 'plotextrapolateBeam.py '  + \
                 ' -i <inputfile> -n <nEvts> -o <outputfile>' + \
-                ' -l <startlocation> [-b <beamlinefile>]')
+                ' -l <startlocation> [-b <beamlinefile>] [-s]')
         sys.exit()
 
     print(" plotextrapolateBeam: start")
@@ -82,7 +85,7 @@ def main(argv):
 
     print("     ----> Create report:")
 
-    iexBm.extrapolateBeam()
+    iexBm.extrapolateBeam(Streaming)
     iexBm.createReport()
 
     print("     <---- Create report:")
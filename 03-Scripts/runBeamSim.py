@@ -9,28 +9,51 @@ import Particle as Prtcl
 import BeamLine as BL
 import Beam     as Bm
 
+def Usage():
+    print ( \
+            'runBEAMsim.py -b <beamlinefile>'  + \
+            ' -i <inputfile> -o <outputfile>' + \
+            ' -n <nEvts> -p <nProcesses> [-c]' + \
+            ' -r <location>,<location>,...' + \
+            ' -k <cachedirectory> [-P] [-C]')
+    print("     ----> <input file> not yet implemented.>")
+    print("     ----> <location>: element name or type to record.")
+    print("     ----> <cachedirectory>: cache of built beam lines.")
+    print("     ----> -P: per-element time and losses written to", \
+          "<outputfile>-profile.csv")
+    print("     ----> -C: compiled tracking (no debug output).")
+
 def main(argv):
     """
        Parse input arguments:
     """
-    opts, args = getopt.getopt(argv,"hdi:o:b:n:",\
-                               ["ifile=","ofile=","bfile", "nEvts"])
+    opts, args = getopt.getopt(argv,"hdcPCi:o:b:n:p:r:k:",\
+                               ["ifile=","ofile=","bfile", "nEvts", \
+                                "nProcesses=", "record=", "cache="])
 
     beamlinefile = None
     inputfile    = None
     outputfile   = None
     Debug        = False
     nEvts        = 10000
+    nProcesses   = 1
+    Columnar     = False
+    Record       = None
+    CacheDir     = None
+    Profiling    = False
+    Compiled     = False
     for opt, arg in opts:
         if opt == '-h':
-            print ( \
-                    'runBEAMsim.py -b <beamlinefile>'  + \
-                    ' -i <inputfile> -o <outputfile>' + \
-                    ' -n <nEvts>')
-            print("     ----> <input file> not yet implemented.>")
+            Usage()
             sys.exit()
         if opt == '-d':
             Debug = True
+        elif opt == '-c':
+            Columnar = True
+        elif opt == '-P':
+            Profiling = True
+        elif opt == '-C':
+            Compiled = True
         elif opt in ("-b", "--bfile"):
             beamlinefile = arg
         elif opt in ("-i", "--ifile"):
@@ -39,14 +62,16 @@ def main(argv):
             outputfile = arg
         elif opt in ("-n", "--nEvts"):
             nEvts = int(arg)
+        elif opt in ("-p", "--nProcesses"):
+            nProcesses = int(arg)
+        elif opt in ("-r", "--record"):
+            Record = arg.split(",")
+        elif opt in ("-k", "--cache"):
+            CacheDir = arg
 
     if beamlinefile == None or \
        outputfile    == None:
-        print ( \
-                'runBEAMsim.py -b <beamlinefile>'  + \
-                ' -i <inputfile> -o <outputfile>' + \
-                ' -n <nEvts>')
-        print("     ----> <input file> not yet implemented.>")
+        Usage()
         sys.exit()
 
     print(" runBEAMsim: start")
@@ -94,7 +119,16 @@ def main(argv):
 
     print("             ----> Write beamline summary file to:", outputfile)
     
-    Smltn = Simu.Simulation(nEvts, beamlinefile, None, outputfile)
+    if CacheDir != None:
+        print("             ----> Built beam line cached in:", CacheDir)
+        BL.BeamLine.setCacheDirectory(CacheDir)
+
+    BL.BeamLine.setProfiling(Profiling)
+    BL.BeamLine.setCompiledTracking(Compiled)
+
+    Smltn = Simu.Simulation(nEvts, beamlinefile, None, outputfile, Columnar, \
+                            Record)
+    Smltn.setnProcesses(nProcesses)
 
     print("     <---- Initialisation complete.")
 
@@ -103,6 +137,10 @@ def main(argv):
     Smltn.RunSim()
 
     print("     <---- Simulation done.")
+
+    if Profiling:
+        BL.BeamLine.printProfile()
+        print("     ----> Profile written to:", Smltn.getProfileFile())
         
     print(" runBEAMsim: ends")
     
@@ -112,4 +150,4 @@ def main(argv):
 if __name__ == "__main__":
    main(sys.argv[1:])
 
-sys.exit(1)
+   sys.exit(1)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys, getopt
+
+import Benchmark as Bnch
+
+def Usage():
+    print ( \
+            'runBenchmark.py -o <resultfile> -B <baselinefile> [-u] [-c]' + \
+            ' -t <tolerance> -n <nEvts> -N <nEvtsBatch> -r <nRepeat>' + \
+            ' -l <beamlinefile> [-l ...] -s <suite>,<suite>,... [-d]')
+    print("     ----> <resultfile>: json file of results, default", \
+          "99-Scratch/Benchmark.json")
+    print("     ----> <baselinefile>: stored baseline, default", \
+          "11-Parameters/Benchmark-Baseline.json")
+    print("     ----> -u: write the results of this run as the baseline.")
+    print("     ----> -c: CI mode; a missing baseline is an error (exit", \
+          "code 2) unless -u is given.")
+    print("     ----> <tolerance>: relative change flagged as a", \
+          "regression, default 0.25")
+    print("     ----> <suite>:", ", ".join(Bnch.Benchmark.Suites))
+    print("     ----> Exit code 1 if a metric regressed, 2 if there is", \
+          "no baseline in CI mode.")
+
+def main(argv):
+    """
+       Parse input arguments:
+    """
+    opts, args = getopt.getopt(argv,"hduco:B:t:n:N:r:l:s:",\
+                               ["ofile=","baseline=","tolerance=", \
+                                "nEvts=","nEvtsBatch=","repeat=", \
+                                "lattice=","suites=","ci"])
+
+    HOMEPATH     = os.getenv('HOMEPATH')
+    outputfile   = os.path.join('99-Scratch', 'Benchmark.json')
+    baselinefile = os.path.join('11-Parameters', 'Benchmark-Baseline.json')
+    Update       = False
+    CI           = False
+    Debug        = False
+    Tolerance    = 0.25
+    nEvts        = 1000
+    nEvtsBatch   = 20000
+    nRepeat      = 3
+    Lattices     = None
+    Suites       = None
+    for opt, arg in opts:
+        if opt == '-h':
+            Usage()
+            sys.exit()
+        if opt == '-d':
+            Debug = True
+        elif opt == '-u':
+            Update = True
+        elif opt in ("-c", "--ci"):
+            CI = True
+        elif opt in ("-o", "--ofile"):
+            outputfile = arg
+        elif opt in ("-B", "--baseline"):
+            baselinefile = arg
+        elif opt in ("-t", "--tolerance"):
+            Tolerance = float(arg)
+        elif opt in ("-n", "--nEvts"):
+            nEvts = int(arg)
+        elif opt in ("-N", "--nEvtsBatch"):
+            nEvtsBatch = int(arg)
+        elif opt in ("-r", "--repeat"):
+            nRepeat = int(arg)
+        elif opt in ("-l", "--lattice"):
+            if Lattices == None: Lattices = []
+            if not os.path.isfile(arg):
+                arg = os.path.join(HOMEPATH, arg)
+            Lattices.append(arg)
+        elif opt in ("-s", "--suites"):
+            Suites = arg.split(",")
+
+    print(" runBenchmark: start")
+
+    if not os.path.isabs(outputfile):
+        outputfile = os.path.join(HOMEPATH, outputfile)
+    if not os.path.isabs(baselinefile):
+        baselinefile = os.path.join(HOMEPATH, baselinefile)
+
+    Bnch.Benchmark.setDebug(Debug)
+    iBnch = Bnch.Benchmark(Lattices, nEvts, nEvtsBatch)
+    iBnch.setRepeat(nRepeat)
+    if Suites != None:
+        iBnch.setSuites(Suites)
+    print(iBnch)
+
+    iBnch.run()
+    iBnch.writeResults(outputfile)
+    print("     ----> Results written to:", outputfile)
+
+    Regressions = []
+    NoBaseline  = False
+    if os.path.isfile(baselinefile):
+        Regressions = iBnch.compare(baselinefile, Tolerance)
+    else:
+        print("     ----> No baseline", baselinefile)
+        NoBaseline = CI and not Update
+
+    if Update:
+        iBnch.writeResults(baselinefile)
+        print("     ----> Baseline written to:", baselinefile)
+
+    print(" runBenchmark: ends")
+
+    if NoBaseline:
+        print(" runBenchmark: CI mode and no baseline to compare with.")
+        return 2
+    return 1 if len(Regressions) > 0 else 0
+
+"""
+   Execute main"
+"""
+if __name__ == "__main__":
+   ExitCode = main(sys.argv[1:])
+
+   sys.exit(ExitCode)
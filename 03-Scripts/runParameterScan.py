@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys, getopt
+
+import ParameterScan as PScn
+
+def Usage():
+    print ( \
+            'runParameterScan.py -b <beamlinefile> -o <tablefile>' + \
+            ' -s <key>=<v1>,<v2>,... [-s ...] [-l]' + \
+            ' -n <nEvts> -r <seed> -L <location> [-d]')
+    print("     ----> <key>: row number or Section:Element:Parameter[:n]")
+    print("     ----> -l: list mode, i-th values of each key form a point;")
+    print("           default: grid of all combinations.")
+
+def main(argv):
+    """
+       Parse input arguments:
+    """
+    opts, args = getopt.getopt(argv,"hdlb:o:n:s:r:L:",\
+                               ["bfile=","ofile=","nEvts=","scan=", \
+                                "seed=","location="])
+
+    beamlinefile = None
+    outputfile   = None
+    Debug        = False
+    ListMode     = False
+    nEvts        = 10000
+    Seed         = 20240301
+    Location     = None
+    Scan         = {}
+    for opt, arg in opts:
+        if opt == '-h':
+            Usage()
+            sys.exit()
+        if opt == '-d':
+            Debug = True
+        elif opt == '-l':
+            ListMode = True
+        elif opt in ("-b", "--bfile"):
+            beamlinefile = arg
+        elif opt in ("-o", "--ofile"):
+            outputfile = arg
+        elif opt in ("-n", "--nEvts"):
+            nEvts = int(arg)
+        elif opt in ("-r", "--seed"):
+            Seed = int(arg)
+        elif opt in ("-L", "--location"):
+            Location = arg
+        elif opt in ("-s", "--scan"):
+            Key, Values = arg.split("=")
+            if Key.isdigit(): Key = int(Key)
+            Scan[Key] = [float(Value) for Value in Values.split(",")]
+
+    if beamlinefile == None or outputfile == None or len(Scan) == 0:
+        Usage()
+        sys.exit()
+
+    print(" runParameterScan: start")
+
+    HOMEPATH = os.getenv('HOMEPATH')
+    if not os.path.isfile(beamlinefile):
+        beamlinefile = os.path.join(HOMEPATH, beamlinefile)
+    if not os.path.isfile(beamlinefile):
+        print("     ----> Beam line parameter file does not exist.")
+        print("           Exit.")
+        sys.exit(1)
+    if not os.path.isabs(outputfile):
+        outputfile = os.path.join(HOMEPATH, outputfile)
+
+    PScn.ParameterScan.setDebug(Debug)
+    iScn = PScn.ParameterScan(beamlinefile, nEvts, Seed, Location)
+    if ListMode:
+        nPnts = min([len(Values) for Values in Scan.values()])
+        iScn.setPoints([{Key: Scan[Key][iPnt] for Key in Scan} \
+                        for iPnt in range(nPnts)])
+    else:
+        iScn.setGrid(Scan)
+    print("     ----> Number of points:", len(iScn.getPoints()))
+
+    Table = iScn.run()
+    iScn.writeTable(outputfile)
+    print(Table)
+    print("     ----> Summary table written to:", outputfile)
+
+    print(" runParameterScan: ends")
+
+"""
+   Execute main"
+"""
+if __name__ == "__main__":
+   main(sys.argv[1:])
+
+sys.exit(1)
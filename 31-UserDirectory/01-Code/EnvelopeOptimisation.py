@@ -38,15 +38,52 @@ Class UserAnal:
           Return: None
 
 
+  Get/set methods for the capture-section parameters as a vector:
+     getBLEparamsVector: return np.ndarray [d1, lFQ, kFQ, d2, kDQ]; drift
+                         1 length, F-quad length and strength, drift 2
+                         length and D-quad strength (the D-quad length is
+                         2*lFQ).
+     setBLEparamsVector: set the parameters from such a vector.
+
+
+  Methods defined at Module level:
+  --------------------------------
+     SpotCost : Built-in cost; spot area times aspect ratio,
+                pi*sx*sy*max(sx/sy, sy/sx).
+           Input : sigmaxy, [sx, sy]
+          Return : float (np.inf if sx or sy is not positive)
+
+  initOptimiserWorker : Initialiser of an optimisation worker process.
+                Builds the base beam line (from the beam specification
+                file or the header of the input file), keeps only its
+                first nBase elements, loads the sample of particles at
+                the end of the base beam line (read from the input file or
+                generated at the source and tracked through the base) and
+                creates the UserAnal instance that appends the capture
+                section.
+           Input : dict, see Optimiser.getWorkerArgs
+     evaluateOptimiserWorker : Cost of one parameter vector; the capture
+                section is rebuilt (BeamLine.truncateBeamLine) and the
+                pre-loaded sample is tracked through it with
+                BeamLine.trackBunch.
+           Input : np.ndarray parameter vector
+          Return : float, np.inf if the parameters are infeasible or too
+                   few particles survive.
+
+
 Created on Tue 27Feb24: Version history:
 ----------------------------------------
  1.0: 27Feb24: First implementation
+ 1.1: Parallel, population-based optimisation (Optimiser; strategies
+      RandomSearch, NelderMead and CMAES)
 
 @author: kennethlong
 """
 
 import io
 import math  as mth
+import time
+import multiprocessing as mp
 import numpy as np
 
 import Particle        as Prtcl
@@ -54,13 +91,97 @@ import Beam            as Bm
 import BeamLine        as BL
 import BeamLineElement as BLE
 import BeamIO          as bmIO
-
+import Simulation      as Smltn
+
+#--------  Module methods
+def SpotCost(sigmaxy):
+    sx = sigmaxy[0]
+    sy = sigmaxy[1]
+    if not sx > 0. or not sy > 0.:
+        return np.inf
+
+    Scl = sx / sy
+    if Scl < 1.: Scl = 1./Scl
+
+    return mth.pi * sx * sy * Scl
+
+def initOptimiserWorker(WorkerArgs):
+    Optimiser.setWorkerParams(WorkerArgs)
+    Smltn.Simulation.setProgressPrint(False)
+
+    #.. Base beam line and sample at its end:
+    Sample = None
+    if WorkerArgs["inputfile"] != None:
+        ibmIOr = bmIO.BeamIO(None, WorkerArgs["inputfile"])
+        EndOfFile = ibmIOr.readBeamDataRecord()
+    else:
+        BL.BeamLine(WorkerArgs["beamspecfile"])
+
+    nBase = WorkerArgs["nBase"]
+    if nBase == None:
+        nBase = len(BL.BeamLine.getElement())
+    if nBase < len(BL.BeamLine.getElement()):
+        BL.BeamLine.truncateBeamLine(nBase)
+    iLst = BL.BeamLine.getElement()[-1]
+
+    if WorkerArgs["inputfile"] != None:
+        Sample = []
+        while not EndOfFile and len(Sample) < WorkerArgs["nSample"]:
+            EndOfFile = ibmIOr.readBeamDataRecord()
+            for iPrtcl in Prtcl.Particle.getinstances()[1:]:
+                if iLst.getName() in iPrtcl.getLocation():
+                    iAddr = iPrtcl.getLocation().index(iLst.getName())
+                    Sample.append(iPrtcl.getTraceSpace()[iAddr])
+            Prtcl.Particle.cleanParticles()
+        Sample = np.array(Sample).reshape(-1, 6)
+    else:
+        iSrc   = BL.BeamLine.getElement()[1]
+        Rng    = np.random.default_rng(WorkerArgs["Seed"])
+        Sample = iSrc.getParticlesFromSource(WorkerArgs["nSample"], Rng)
+        BL.BeamLine.trackBunch(Sample, iSrc.getName())
+        Sample = BL.BeamLine.getBatchTrcSpc()[-1]
+
+    Optimiser.setWorkerSample(Sample)
+    Optimiser.setWorkernBase(nBase)
+    Optimiser.setWorkerzBase(iLst.getrStrt()[2] + iLst.getStrt2End()[2])
+
+    #.. Capture section:
+    Optimiser.setWorkerUserAnal(UserAnal())
+
+def evaluateOptimiserWorker(x):
+    x     = np.asarray(x, dtype=float)
+    nBase = Optimiser.getWorkernBase()
+    if not Optimiser.isFeasible(x, Optimiser.getWorkerzBase()):
+        return np.inf
+
+    BL.BeamLine.truncateBeamLine(nBase)
+    iUA = Optimiser.getWorkerUserAnal()
+    iUA.setBLEparamsVector(x)
+    iUA.setBeamLine()
+
+    iLst = BL.BeamLine.getElement()[nBase-1]
+    BL.BeamLine.trackBunch(Optimiser.getWorkerSample(), iLst.getName(), \
+                           -999999., iLst.getrStrt()[2] + iLst.getLength(), \
+                           nBase-1)
+    TrcSpc = BL.BeamLine.getBatchTrcSpc()[-1]
+    if np.shape(TrcSpc)[0] < Optimiser.getWorkerParams()["nMin"]:
+        return np.inf
+
+    return Optimiser.getWorkerParams()["CostFunction"]( \
+                                            np.std(TrcSpc[:,[0,2]], axis=0))
+
+
+#--------  UserAnal class  --------
 class UserAnal:
     instances  = []
     __Debug    = False
 
     Iter = 0
 
+    #.. Step size of each parameter, [d1, lFQ, kFQ, d2, kDQ], used by the
+    #   random walk and as the scale of the optimisation strategies:
+    ParamScale = np.array([0.02, 0.002, 2.0, 0.002, 2.0])
+
 
 #--------  UserHooks:
     def UserInit(self):
@@ -92,15 +213,11 @@ class UserAnal:
         if self.getDebug():
             print(" EnvelopeOptimisation.UserEnd: start")
 
-        iBm = Bm.Beam.getBeamInstances()[0]
+        iBm = Bm.Beam.getinstances()[0]
         if self.getDebug():
             print("     ----> Dump of Beam instance: \n", iBm)
 
-        Scl  = iBm.getsigmaxy()[-1][0] / iBm.getsigmaxy()[-1][1]
-        if Scl < 1.: Scl = 1./Scl
-
-        Cost = mth.pi * iBm.getsigmaxy()[-1][0] * iBm.getsigmaxy()[-1][1] * \
-            Scl
+        Cost = SpotCost(iBm.getsigmaxy()[-1])
         
         if self.getCost() == None or Cost < self.getCost():
             print("     ----> nIter, Previous cost, new cost:", \
@@ -145,7 +262,7 @@ class UserAnal:
 
         self.setBeamLine()
         
-        iBm = Bm.Beam.getBeamInstances()[0]
+        iBm = Bm.Beam.getinstances()[0]
         if self.getDebug():
             with np.printoptions(linewidth=500,precision=7,suppress=True):
                 print("     ----> Initial Beam instance: \n", iBm)
@@ -199,8 +316,8 @@ class UserAnal:
         if self.getDebug():
             print("\n Envelopeptimisation.setBeamLine: start")
         #--------  Get beam line defined so far and reference particle:
-        iBL      = BL.BeamLine.getinstance()
-        refPrtcl = Prtcl.ReferenceParticle.getinstance()
+        iBL      = BL.BeamLine.getinstances()
+        refPrtcl = Prtcl.ReferenceParticle.getinstances()
 
         #.. Last beam line element:
         iLst = iBL.getElement()[-1]
@@ -257,8 +374,8 @@ class UserAnal:
         #--------  Print at end:
         if self.getDebug():
             print(" UserAnal.UserInit: Beam line:")
-            print(BL.BeamLine.getinstance())
-            if BL.BeamLine.getinstance() == None:
+            print(BL.BeamLine.getinstances())
+            if BL.BeamLine.getinstances() == None:
                 print("     ----> No beam line!  Quit.")
                 exit(1)
     
@@ -276,6 +393,14 @@ class UserAnal:
     def setBLEparamsRef(self, BLEparamsRef):
         self.BLEparamsRef = BLEparamsRef
 
+    def setBLEparamsVector(self, x):
+        self.setBLEparams([ \
+                ["User:1:Capture:Drift:1", x[0]], \
+                ["User:1:Capture:FQ:1",    x[1], x[2]], \
+                ["User:1:Capture:Drift:2", x[3]], \
+                ["User:1:Capture:DQ:1",    2.*x[1], x[4]], \
+                ["User:1:Capture:Drift:3", None]])
+
     def getnIter(self):
         return self.nIter
             
@@ -288,6 +413,13 @@ class UserAnal:
     def getBLEparamsRef(self):
         return self.BLEparamsRef
 
+    def getBLEparamsVector(self):
+        return np.array([self.getBLEparams()[0][1], \
+                         self.getBLEparams()[1][1], \
+                         self.getBLEparams()[1][2], \
+                         self.getBLEparams()[2][1], \
+                         self.getBLEparams()[3][2]])
+
 
 #--------  "Built-in methods":
     def __init__(self, Debug=False):
@@ -364,9 +496,494 @@ class UserAnal:
         
         Prtcl.Particle.cleanParticles()
 
-        
+
+"""
+Class RandomSearch:
+===================
+
+  Population version of the random walk of UserAnal.newBLEparams: each
+  generation PopSize candidates are drawn from a normal distribution
+  centred on the best point found so far.
+
+  All strategies provide the same interface; ask() returns an
+  np.ndarray(PopSize, n) of candidates, tell(X, Costs) passes back their
+  costs and getBest() returns the best point and cost so far.
+
+  Instance attributes:
+  --------------------
+   _Scale   : np.ndarray(n,), width of the search in each parameter
+   _PopSize : Number of candidates per generation
+   _Rng     : np.random.Generator
+   _xBest, _CostBest : Best point and cost so far
+
+
+Class NelderMead:
+=================
+
+  Nelder-Mead simplex, parallelised by evaluating the reflection,
+  expansion and the outside and inside contractions of the worst vertex
+  together; a shrink evaluates the n new vertices together.  The first
+  generation evaluates the initial simplex, x0 and x0 + Scale_i e_i.
+
+  Instance attributes:
+  --------------------
+   _Simplex : np.ndarray(n+1, n), vertices
+   _Costs   : np.ndarray(n+1,), cost at each vertex
+   _Stage   : "Init", "Step" or "Shrink"
+
+
+Class CMAES:
+============
+
+  (mu/mu_w, lambda) covariance-matrix-adaptation evolution strategy with
+  cumulative step-size adaptation and rank-one and rank-mu updates of the
+  covariance matrix (Hansen, "The CMA evolution strategy: a tutorial").
+  The search runs in parameters normalised by Scale, starting with unit
+  step size.
+
+  Instance attributes:
+  --------------------
+   _Mean, _Sigma, _C : Mean (normalised), step size and covariance matrix
+   _pc, _ps          : Evolution paths
+   _Weights, _mueff  : Recombination weights and variance-effective mu
+
+
+Class Optimiser:
+================
+
+  Parallel, population-based optimisation of the capture section built
+  by UserAnal.setBeamLine.  Each generation the strategy proposes a
+  population of parameter vectors, [d1, lFQ, kFQ, d2, kDQ], that are
+  evaluated in a pool of worker processes (start method "spawn", so
+  calling scripts must protect their entry point with
+  if __name__ == "__main__":).
+
+  Each worker builds the base beam line once and keeps its own sample of
+  particles at the end of the base; for each candidate only the capture
+  section is rebuilt and the sample tracked through it with
+  BeamLine.trackBunch.  The sample is generated from the same seed in
+  every worker, so all candidates are evaluated with the same particles.
+
+  Class attributes:
+  -----------------
+    instances    : List of instances of Optimiser class
+  __Debug        : Debug flag
+    Strategies   : dict, name -> strategy class
+    MinStrength  : Smallest quadrupole strength accepted (T/m)
+    x0Default    : Default start, the parameters set in UserAnal.UserInit
+  __Worker...    : State of a worker process (arguments, sample, number of
+                   base elements, z at end of base and UserAnal instance),
+                   set by initOptimiserWorker.
+
+  Instance attributes:
+  --------------------
+   _WorkerArgs : dict; beamspecfile, inputfile, nBase, nSample, Seed,
+                 nMin (minimum number of surviving particles) and
+                 CostFunction (function of [sx, sy] at the end of the beam
+                 line, default SpotCost)
+   _Strategy   : Name of strategy, or instance with ask/tell/getBest
+   _nProcesses : Number of worker processes
+   _History    : List of [generation, best cost, time (s)]
+   _xBest, _CostBest : Result of last call to optimise
+
+  Methods:
+  --------
+  Built-in methods __init__, __repr__ and __str__.
+
+  Set/get methods: setDebug, getDebug, getWorkerArgs etc. believed to be
+  self documenting; setWorkerParams, getWorkerParams, setWorkerSample
+  etc. hold the state of a worker process.
+
+  Processing methods:
+     isFeasible : Class method; True if lengths are positive, strengths
+                  at least MinStrength and the capture section ends
+                  before z = 1 m.
+          Input : x, zBase (z at end of base beam line)
+       optimise : Run nGenerations generations of the strategy.
+          Input : nGenerations; x0 (default x0Default); PopSize
+         Return : xBest, CostBest
+
+
+Created on Tue 27Feb24: Version history:
+----------------------------------------
+ 1.0: First implementation
+
+@author: kennethlong
+"""
+
+#--------  RandomSearch class  --------
+class RandomSearch:
+
+    def __init__(self, x0, Scale, PopSize=8, Seed=None):
+        self._Scale    = np.asarray(Scale, dtype=float)
+        self._PopSize  = PopSize
+        if self._PopSize == None:
+            self._PopSize = 8
+        self._Rng      = np.random.default_rng(Seed)
+        self._xBest    = np.asarray(x0, dtype=float)
+        self._CostBest = np.inf
+        self._First    = True
+
+    def __repr__(self):
+        return "RandomSearch()"
+
+    def ask(self):
+        X = self._xBest + self._Scale * \
+            self._Rng.normal(0., 1., (self._PopSize, len(self._xBest)))
+        if self._First:
+            X[0]        = self._xBest
+            self._First = False
+        return X
+
+    def tell(self, X, Costs):
+        iMin = int(np.argmin(Costs))
+        if Costs[iMin] < self._CostBest:
+            self._xBest    = np.array(X[iMin])
+            self._CostBest = Costs[iMin]
+
+    def getBest(self):
+        return self._xBest, self._CostBest
+
+
+#--------  NelderMead class  --------
+class NelderMead:
+
+    def __init__(self, x0, Scale, PopSize=None, Seed=None):
+        x0 = np.asarray(x0, dtype=float)
+        self._Simplex = np.vstack((x0, x0 + np.diag(Scale)))
+        self._Costs   = np.full(len(x0)+1, np.inf)
+        self._Stage   = "Init"
+
+    def __repr__(self):
+        return "NelderMead()"
+
+    def ask(self):
+        if self._Stage == "Init":
+            return np.array(self._Simplex)
+
+        Order = np.argsort(self._Costs)
+        self._Simplex = self._Simplex[Order]
+        self._Costs   = self._Costs[Order]
+        if self._Stage == "Shrink":
+            return self._Simplex[0] + 0.5*(self._Simplex[1:] - \
+                                           self._Simplex[0])
+
+        xc = np.mean(self._Simplex[:-1], axis=0)
+        xh = self._Simplex[-1]
+        return np.array([xc + (xc - xh),       \
+                         xc + 2.*(xc - xh),    \
+                         xc + 0.5*(xc - xh),   \
+                         xc - 0.5*(xc - xh)])
+
+    def tell(self, X, Costs):
+        Costs = np.asarray(Costs, dtype=float)
+        if self._Stage != "Step":
+            if self._Stage == "Init":
+                self._Simplex = np.array(X)
+                self._Costs   = Costs
+            else:
+                self._Simplex[1:] = X
+                self._Costs[1:]   = Costs
+            self._Stage = "Step"
+            return
+
+        fr, fe, foc, fic = Costs
+        iNew = None
+        if fr < self._Costs[0]:
+            iNew = 1 if fe < fr else 0
+        elif fr < self._Costs[-2]:
+            iNew = 0
+        elif fr < self._Costs[-1]:
+            if foc <= fr: iNew = 2
+        elif fic < self._Costs[-1]:
+            iNew = 3
+
+        if iNew == None:
+            self._Stage = "Shrink"
+        else:
+            self._Simplex[-1] = X[iNew]
+            self._Costs[-1]   = Costs[iNew]
+
+    def getBest(self):
+        iMin = int(np.argmin(self._Costs))
+        return self._Simplex[iMin], self._Costs[iMin]
+
+
+#--------  CMAES class  --------
+class CMAES:
+
+    def __init__(self, x0, Scale, PopSize=None, Seed=None):
+        n = len(x0)
+        self._x0       = np.asarray(x0, dtype=float)
+        self._Scale    = np.asarray(Scale, dtype=float)
+        self._Rng      = np.random.default_rng(Seed)
+        self._PopSize  = PopSize
+        if self._PopSize == None:
+            self._PopSize = 4 + int(3.*mth.log(n))
+
+        mu = self._PopSize // 2
+        Weights = mth.log(mu + 0.5) - np.log(np.arange(1, mu+1))
+        self._Weights = Weights / np.sum(Weights)
+        self._mueff   = 1. / np.sum(self._Weights**2)
+
+        mueff = self._mueff
+        self._cc    = (4. + mueff/n) / (n + 4. + 2.*mueff/n)
+        self._cs    = (mueff + 2.) / (n + mueff + 5.)
+        self._c1    = 2. / ((n + 1.3)**2 + mueff)
+        self._cmu   = min(1. - self._c1, \
+                          2.*(mueff - 2. + 1./mueff) / ((n + 2.)**2 + mueff))
+        self._damps = 1. + 2.*max(0., mth.sqrt((mueff - 1.)/(n + 1.)) - 1.) \
+            + self._cs
+        self._chiN  = mth.sqrt(n) * (1. - 1./(4.*n) + 1./(21.*n*n))
+
+        self._Mean  = np.zeros(n)
+        self._Sigma = 1.
+        self._C     = np.eye(n)
+        self._pc    = np.zeros(n)
+        self._ps    = np.zeros(n)
+        self._Gen   = 0
+
+        self._xBest    = np.array(self._x0)
+        self._CostBest = np.inf
+
+    def __repr__(self):
+        return "CMAES()"
+
+    def ask(self):
+        Eval, Evec = np.linalg.eigh(self._C)
+        self._D = np.sqrt(np.maximum(Eval, 1.E-20))
+        self._B = Evec
+        Z = self._Rng.normal(0., 1., (self._PopSize, len(self._Mean)))
+        self._Y = (Z * self._D) @ self._B.T
+        U = self._Mean + self._Sigma * self._Y
+        return self._x0 + self._Scale * U
+
+    def tell(self, X, Costs):
+        Costs = np.asarray(Costs, dtype=float)
+        n     = len(self._Mean)
+        Order = np.argsort(Costs)
+        if Costs[Order[0]] < self._CostBest:
+            self._xBest    = np.array(X[Order[0]])
+            self._CostBest = Costs[Order[0]]
+
+        Ysel = self._Y[Order[:len(self._Weights)]]
+        yw   = self._Weights @ Ysel
+        self._Mean = self._Mean + self._Sigma * yw
+        self._Gen += 1
+
+        #.. Step size, with C^-1/2 yw:
+        CinvSqrtyw = self._B @ ((self._B.T @ yw) / self._D)
+        self._ps = (1. - self._cs) * self._ps + \
+            mth.sqrt(self._cs*(2. - self._cs)*self._mueff) * CinvSqrtyw
+        psNrm = np.linalg.norm(self._ps)
+        hsig  = psNrm / mth.sqrt(1. - (1. - self._cs)**(2*self._Gen)) / \
+            self._chiN < 1.4 + 2./(n + 1.)
+
+        #.. Covariance matrix, rank-one and rank-mu updates:
+        self._pc = (1. - self._cc) * self._pc + \
+            hsig * mth.sqrt(self._cc*(2. - self._cc)*self._mueff) * yw
+        dh = (1. - hsig) * self._cc * (2. - self._cc)
+        self._C = (1. - self._c1 - self._cmu) * self._C + \
+            self._c1 * (np.outer(self._pc, self._pc) + dh * self._C) + \
+            self._cmu * np.einsum('k,ki,kj->ij', self._Weights, Ysel, Ysel)
+        self._C = 0.5*(self._C + self._C.T)
+
+        self._Sigma = self._Sigma * \
+            mth.exp((self._cs/self._damps) * (psNrm/self._chiN - 1.))
+
+    def getBest(self):
+        return self._xBest, self._CostBest
+
+
+#--------  Optimiser class  --------
+class Optimiser:
+    instances  = []
+    __Debug    = False
+
+    Strategies  = {"RandomSearch": RandomSearch, \
+                   "NelderMead":   NelderMead,   \
+                   "CMAES":        CMAES}
+    MinStrength = 90.
+    x0Default   = np.array([0.1, 0.025, 130., 0.1, 130.])
+
+    __WorkerParams   = None
+    __WorkerSample   = None
+    __WorkernBase    = None
+    __WorkerzBase    = None
+    __WorkerUserAnal = None
+
+#--------  "Built-in methods":
+    def __init__(self, beamspecfile=None, inputfile=None, \
+                 Strategy="CMAES", nProcesses=1, nSample=10000, \
+                 nBase=None, CostFunction=SpotCost, Seed=20240227, \
+                 nMin=10, Debug=False):
+        self.setDebug(Debug)
+        if self.getDebug():
+            print(' Optimiser.__init__: creating the Optimiser object')
+
+        if (beamspecfile == None) == (inputfile == None):
+            raise badParameter( \
+                " Optimiser: need one of beam specification or input file")
+        if not isinstance(Strategy, str) or \
+           not Strategy in Optimiser.Strategies:
+            if not hasattr(Strategy, "ask") or not hasattr(Strategy, "tell"):
+                raise badParameter(" Optimiser: bad strategy:", Strategy)
+        if not isinstance(nProcesses, int) or nProcesses < 1:
+            raise badParameter(" Optimiser: bad nProcesses:", nProcesses)
+
+        Optimiser.instances.append(self)
+
+        self._WorkerArgs = {"beamspecfile": beamspecfile, \
+                            "inputfile":    inputfile,    \
+                            "nBase":        nBase,        \
+                            "nSample":      nSample,      \
+                            "Seed":         Seed,         \
+                            "nMin":         nMin,         \
+                            "CostFunction": CostFunction}
+        self._Strategy   = Strategy
+        self._nProcesses = nProcesses
+        self._History    = []
+        self._xBest      = None
+        self._CostBest   = None
+
+        if self.getDebug():
+            print("     ----> New Optimiser instance: \n", self)
+            print(" <---- Optimiser instance created.")
+
+    def __repr__(self):
+        return "Optimiser()"
+
+    def __str__(self):
+        self.print()
+        return " Optimiser __str__ done."
+
+    def print(self):
+        print("\n Optimiser:")
+        print(" ----------")
+        print("     ----> Debug flag:", self.getDebug())
+        print("     ----> Strategy:", self.getStrategy())
+        print("     ----> Number of processes:", self.getnProcesses())
+        print("     ----> Worker arguments:", self.getWorkerArgs())
+        print("     ----> Best cost, parameters:", \
+              self.getCostBest(), self.getxBest())
+        return " <---- Optimiser parameter dump complete."
+
+#--------  "Set/get methods"
+    @classmethod
+    def setDebug(cls, Debug=False):
+        cls.__Debug = Debug
+
+    @classmethod
+    def getDebug(cls):
+        return cls.__Debug
+
+    @classmethod
+    def setWorkerParams(cls, WorkerArgs):
+        cls.__WorkerParams = WorkerArgs
+
+    @classmethod
+    def setWorkerSample(cls, Sample):
+        cls.__WorkerSample = Sample
+
+    @classmethod
+    def setWorkernBase(cls, nBase):
+        cls.__WorkernBase = nBase
+
+    @classmethod
+    def setWorkerzBase(cls, zBase):
+        cls.__WorkerzBase = zBase
+
+    @classmethod
+    def setWorkerUserAnal(cls, iUA):
+        cls.__WorkerUserAnal = iUA
+
+    @classmethod
+    def getWorkerParams(cls):
+        return cls.__WorkerParams
+
+    @classmethod
+    def getWorkerSample(cls):
+        return cls.__WorkerSample
+
+    @classmethod
+    def getWorkernBase(cls):
+        return cls.__WorkernBase
+
+    @classmethod
+    def getWorkerzBase(cls):
+        return cls.__WorkerzBase
+
+    @classmethod
+    def getWorkerUserAnal(cls):
+        return cls.__WorkerUserAnal
+
+    def getWorkerArgs(self):
+        return self._WorkerArgs
+
+    def getStrategy(self):
+        return self._Strategy
+
+    def getnProcesses(self):
+        return self._nProcesses
+
+    def getHistory(self):
+        return self._History
+
+    def getxBest(self):
+        return self._xBest
+
+    def getCostBest(self):
+        return self._CostBest
+
+#--------  Processing methods:
+    @classmethod
+    def isFeasible(cls, x, zBase=0.):
+        if x[0] < 0. or x[1] <= 0. or x[3] < 0.:
+            return False
+        if x[2] < cls.MinStrength or x[4] < cls.MinStrength:
+            return False
+        return zBase + x[0] + 3.*x[1] + x[3] < 1.
+
+    def optimise(self, nGenerations, x0=None, PopSize=None):
+        if x0 is None:
+            x0 = Optimiser.x0Default
+        if isinstance(self.getStrategy(), str):
+            Strtgy = Optimiser.Strategies[self.getStrategy()]( \
+                x0, UserAnal.ParamScale, PopSize, \
+                self.getWorkerArgs()["Seed"])
+        else:
+            Strtgy = self.getStrategy()
+        if self.getDebug():
+            print(" Optimiser.optimise: start;", nGenerations, \
+                  "generations,", repr(Strtgy))
+
+        Strt = time.time()
+        with mp.get_context("spawn").Pool(self.getnProcesses(), \
+                                          initOptimiserWorker, \
+                                          (self.getWorkerArgs(),)) as Pool:
+            for iGen in range(nGenerations):
+                X     = Strtgy.ask()
+                Costs = np.array(Pool.map(evaluateOptimiserWorker, X))
+                Strtgy.tell(X, Costs)
+                self._xBest, self._CostBest = Strtgy.getBest()
+                self._History.append([iGen, self._CostBest, \
+                                      time.time() - Strt])
+                if self.getDebug():
+                    print("     ----> Generation, best cost:", \
+                          iGen, self._CostBest)
+
+        if self.getDebug():
+            with np.printoptions(linewidth=500,precision=7,suppress=True):
+                print(" <---- Optimiser.optimise: best cost, parameters:", \
+                      self._CostBest, self._xBest)
+
+        return self._xBest, self._CostBest
+
 
 #--------  Exceptions:
 class noReferenceParticle(Exception):
     pass
 
+class badParameter(Exception):
+    pass
+
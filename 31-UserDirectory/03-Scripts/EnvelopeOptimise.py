@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parallel optimisation of the capture section of EnvelopeOptimisation:
+
+  python EnvelopeOptimise.py -b <beam specification file (.csv)> \
+                             [-s CMAES|NelderMead|RandomSearch] \
+                             [-p <processes>] [-g <generations>] \
+                             [-n <particles per worker>] [-l <base elements>]
+  or -i <input file (.dat)> in place of -b.
+
+"""
+
+import sys
+import argparse as ap
+import numpy as np
+
+import EnvelopeOptimisation as EO
+
+
+def main(argv):
+    prsr = ap.ArgumentParser()
+    prsr.add_argument("-b", "--beamspecfile", \
+                      help="beam specification file (.csv)")
+    prsr.add_argument("-i", "--inputfile", help="input file (.dat)")
+    prsr.add_argument("-s", "--strategy", default="CMAES", \
+                      choices=list(EO.Optimiser.Strategies.keys()), \
+                      help="optimisation strategy")
+    prsr.add_argument("-p", "--processes", default=4, type=int, \
+                      help="number of worker processes")
+    prsr.add_argument("-g", "--generations", default=50, type=int, \
+                      help="number of generations")
+    prsr.add_argument("-n", "--nParticles", default=10000, type=int, \
+                      help="number of particles in each worker's sample")
+    prsr.add_argument("-l", "--nBase", default=None, type=int, \
+                      help="number of beam line elements kept as base")
+    args = prsr.parse_args(argv)
+
+    if (args.beamspecfile == None) == (args.inputfile == None):
+        prsr.print_usage()
+        print("     ----> Need either input file or beam specification file.")
+        sys.exit(1)
+
+    iOpt = EO.Optimiser(args.beamspecfile, args.inputfile, args.strategy, \
+                        args.processes, args.nParticles, args.nBase, \
+                        EO.SpotCost, 20240227, 10, True)
+    xBest, CostBest = iOpt.optimise(args.generations)
+
+    print(" EnvelopeOptimise: best cost:", CostBest)
+    with np.printoptions(linewidth=500,precision=7,suppress=True):
+        print("     ----> [d1, lFQ, kFQ, d2, kDQ]:", xBest)
+        print("     ----> Time (s):", iOpt.getHistory()[-1][2])
+
+
+"""
+   Execute main"
+"""
+if __name__ == "__main__":
+    main(sys.argv[1:])